@@ -0,0 +1,104 @@
+from datetime import datetime, timezone
+from typing import Optional
+from dotenv import load_dotenv
+from sqlalchemy import JSON, DateTime, Float, Integer, String, Text, create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.pool import StaticPool
+import os
+import logging
+
+logger = logging.getLogger("database")
+
+load_dotenv()
+
+# URL do banco; sem DATABASE_URL é montada a partir das variáveis POSTGRES_*
+DATABASE_URL = os.getenv("DATABASE_URL") or (
+    f"postgresql+psycopg2://{os.getenv('POSTGRES_USER', 'postgres')}:{os.getenv('POSTGRES_PASSWORD', 'postgres')}"
+    f"@{os.getenv('POSTGRES_HOST', 'db')}:{os.getenv('POSTGRES_PORT', '5432')}/{os.getenv('POSTGRES_DB', 'codesprint')}"
+)
+# Conexões mantidas abertas no pool e quantas podem ser abertas além delas em picos
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Tempo máximo (segundos) esperando uma conexão livre do pool
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Conexões mais velhas que isso (segundos) são recicladas antes de reusar
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Tempo máximo (segundos) para abrir uma conexão com o Postgres
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Projeto(Base):
+    """Projeto gerado: o pedido, as seções do resultado e como ele foi gerado"""
+    __tablename__ = "projetos"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    criado_em: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True,
+                                                default=lambda: datetime.now(timezone.utc))
+    areas: Mapped[list] = mapped_column(JSON)
+    tecnologias: Mapped[str] = mapped_column(Text)
+    descricao: Mapped[str] = mapped_column(Text)
+    usar_exa: Mapped[bool] = mapped_column(default=False)
+    resumo: Mapped[Optional[str]] = mapped_column(Text)
+    estrutura: Mapped[Optional[str]] = mapped_column(Text)
+    recursos: Mapped[Optional[list]] = mapped_column(JSON)
+    resultado: Mapped[dict] = mapped_column(JSON)
+    modelo: Mapped[Optional[str]] = mapped_column(String(500))
+    duracao_segundos: Mapped[float] = mapped_column(Float)
+
+    def resumir(self) -> dict:
+        """Campos mostrados na listagem (sem o resultado completo)"""
+        return {
+            "id": self.id,
+            "criado_em": self.criado_em.isoformat(),
+            "areas": self.areas,
+            "tecnologias": self.tecnologias,
+            "descricao": self.descricao,
+            "resumo": self.resumo,
+            "modelo": self.modelo,
+            "duracao_segundos": self.duracao_segundos
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            **self.resumir(),
+            "usar_exa": self.usar_exa,
+            "estrutura": self.estrutura,
+            "recursos": self.recursos,
+            "resultado": self.resultado
+        }
+
+
+def create_db_engine(url: str = DATABASE_URL) -> Engine:
+    """
+    Engine com pool de conexões compartilhado pelo backend. URLs sqlite
+    (usadas nos testes) ficam numa única conexão em memória ou arquivo
+    """
+    if url.startswith("postgresql://"):
+        # O driver instalado é o psycopg2-binary
+        url = url.replace("postgresql://", "postgresql+psycopg2://", 1)
+    if url.startswith("sqlite"):
+        return create_engine(url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    return create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        connect_args={"connect_timeout": DB_CONNECT_TIMEOUT}
+    )
+
+
+def create_tables(engine: Engine) -> bool:
+    """Cria as tabelas que ainda não existem; o backend continua de pé se o banco estiver fora"""
+    try:
+        Base.metadata.create_all(engine)
+        return True
+    except Exception as e:
+        logger.error(f"Não foi possível criar as tabelas no banco: {str(e)}")
+        return False
@@ -1,16 +1,26 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from typing import List, Optional, Dict
 from pydantic import BaseModel, validator
 import requests
 from app.services.crewai import CrewAiService
-from app.services.network_diagnostics import debug_service_connectivity
-import psycopg2
-from psycopg2 import OperationalError
+from app.services.network_diagnostics import summarize_services
+from app.services.health_monitor import HealthMonitor, http_probe, db_probe
+from app.services import metrics
+from app.services.tracing import TracingMiddleware, tracer_provider
+from app.services.projetos import ProjetoService, MAX_PAGE_SIZE
+from app.database import create_db_engine
+from starlette.concurrency import run_in_threadpool
 import os
 import time
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import subprocess
 import json
+import asyncio
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger("backend_api")
 
 app = FastAPI(
     app_name="CodeSpark",
@@ -25,14 +35,88 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Cada pedido vira um span; as chamadas ao CrewAI feitas nele ficam no mesmo trace
+app.add_middleware(TracingMiddleware)
+
+@app.middleware("http")
+async def medir_pedidos(request: Request, call_next):
+    """Duração de cada pedido por rota (o template, não a URL) e pedidos em andamento"""
+    start = time.perf_counter()
+    status = 500
+    metrics.http_requests_in_flight.inc()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.http_requests_in_flight.dec()
+        route = request.scope.get("route")
+        metrics.http_request_duration.labels(
+            request.method, route.path if route else "desconhecida", str(status)
+        ).observe(time.perf_counter() - start)
 
 client = CrewAiService()
+# Histórico dos projetos; o pool do engine também atende os health checks do banco
+projetos = ProjetoService(create_db_engine())
+# Verifica as dependências em segundo plano; os diagnósticos leem o último resultado
+monitor = HealthMonitor([
+    http_probe("CrewAI", f"{client.base_url}/health", lambda: client.client),
+    http_probe("Ollama", f"{os.getenv('OLLAMA_BASE_URL', 'http://ollama:11434')}/api/version", lambda: client.client),
+    db_probe(projetos.engine.url.render_as_string(hide_password=True), projetos.check_health)
+])
+
+
+@app.on_event("startup")
+async def iniciar_monitor():
+    monitor.start()
+
+
+@app.on_event("shutdown")
+async def parar_monitor():
+    await monitor.stop()
+
+
+@app.on_event("shutdown")
+async def fechar_cliente_crewai():
+    await client.aclose()
+
+
+# Tempo máximo (segundos) acompanhando um job para gravar o resultado no histórico
+JOB_HISTORY_TIMEOUT = float(os.getenv("JOB_HISTORY_TIMEOUT", "3600"))
+# Espera de cada long-poll do acompanhamento e pausa depois de uma falha ao consultar o CrewAI
+JOB_HISTORY_POLL = 30
+JOB_HISTORY_RETRY = 5
+# Jobs concluídos lembrados com o id do projeto gravado, para GET /jobs/{id} devolvê-lo
+JOB_HISTORY_MAX_IDS = 1000
+
+# Acompanhamentos em andamento (a referência evita que a task seja coletada) e projetos gravados por job
+acompanhamentos = set()
+projetos_por_job: "OrderedDict[str, Optional[int]]" = OrderedDict()
+
+
+@app.on_event("shutdown")
+async def parar_acompanhamentos():
+    for tarefa in list(acompanhamentos):
+        tarefa.cancel()
+
+
+@app.on_event("shutdown")
+def fechar_pool_banco():
+    projetos.engine.dispose()
+
+
+@app.on_event("shutdown")
+def encerrar_tracing():
+    # Envia os spans ainda no lote antes de o processo terminar
+    tracer_provider.shutdown()
 
 class ProjetoRequest(BaseModel):
     areas: List[str]
     tecnologias: str
     descricao: str
     usar_exa: Optional[bool] = False
+    ignorar_cache: Optional[bool] = False
+    atualizar_cache: Optional[bool] = False
 
     @validator('areas')
     def validate_areas(cls, v):
@@ -66,6 +150,13 @@ async def health_check():
     return {"status": "Tudo correto"}
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Métricas no formato do Prometheus: pedidos por rota, pedidos em andamento e latência das dependências"""
+    content, content_type = metrics.render_metrics()
+    return Response(content=content, media_type=content_type)
+
+
 @app.get("/")
 async def root():
     return {"messagem": "Bem vindo ao backend do Codesprint"}
@@ -73,14 +164,144 @@ async def root():
 
 @app.post("/gerar-projeto")
 async def gerar_projeto(req: ProjetoRequest):
-    resultado = client.gerar_projeto(
+    inicio = time.time()
+    resultado = await client.gerar_projeto(
         areas=req.areas,
         tecnologias=req.tecnologias,
         descricao=req.descricao,
-        usar_exa=req.usar_exa or False 
+        usar_exa=req.usar_exa or False,
+        ignorar_cache=req.ignorar_cache or False,
+        atualizar_cache=req.atualizar_cache or False
+        )
+    if "retry_after" in resultado:
+        # CrewAI sobrecarregado: o cliente recebe o mesmo status e quando tentar de novo
+        return JSONResponse(
+            status_code=resultado["status_code"], content=resultado,
+            headers={"Retry-After": resultado["retry_after"]}
         )
+    dados = resultado.get("data") or {}
+    if resultado["status"] == "success" and isinstance(dados.get("resultado"), dict):
+        dados["projeto_id"] = await salvar_projeto(req, dados["resultado"], dados.get("modelo"), inicio)
     return resultado
 
+async def salvar_projeto(req: ProjetoRequest, resultado: Dict, modelo: Optional[str], inicio: float) -> Optional[int]:
+    """Grava no histórico um projeto gerado por qualquer um dos endpoints de geração"""
+    return await run_in_threadpool(
+        projetos.salvar,
+        areas=req.areas,
+        tecnologias=req.tecnologias,
+        descricao=req.descricao,
+        usar_exa=req.usar_exa or False,
+        resultado=resultado,
+        modelo=modelo,
+        duracao_segundos=time.time() - inicio
+    )
+
+@app.get("/projetos")
+def listar_projetos(pagina: int = Query(1, ge=1), por_pagina: int = Query(20, ge=1, le=MAX_PAGE_SIZE)):
+    """Projetos já gerados, do mais recente ao mais antigo"""
+    try:
+        return projetos.listar(pagina=pagina, por_pagina=por_pagina)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Database connection failed: {str(e)}")
+
+@app.get("/projetos/{projeto_id}")
+def obter_projeto(projeto_id: int):
+    """Reabre um projeto gerado antes, sem gerar de novo"""
+    try:
+        projeto = projetos.obter(projeto_id)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Database connection failed: {str(e)}")
+    if projeto is None:
+        raise HTTPException(status_code=404, detail="Projeto não encontrado")
+    return projeto
+
+@app.post("/gerar-projeto/stream")
+async def gerar_projeto_stream(req: ProjetoRequest):
+    """
+    Repassa ao cliente os eventos de geração do CrewAI à medida que chegam;
+    o evento com o resultado final é gravado no histórico e sai com o
+    projeto_id
+    """
+    inicio = time.time()
+    eventos = client.gerar_projeto_stream(
+        areas=req.areas,
+        tecnologias=req.tecnologias,
+        descricao=req.descricao,
+        usar_exa=req.usar_exa or False
+    )
+
+    async def eventos_com_historico():
+        async for linha in eventos:
+            # Só o evento final é decodificado; os demais passam como chegaram
+            if b'"resultado"' in linha:
+                evento = json.loads(linha)
+                if evento.get("tipo") == "resultado" and isinstance(evento.get("resultado"), dict):
+                    evento["projeto_id"] = await salvar_projeto(req, evento["resultado"], evento.get("modelo"), inicio)
+                    linha = (json.dumps(evento, ensure_ascii=False) + "\n").encode("utf-8")
+            yield linha
+
+    return StreamingResponse(
+        eventos_com_historico(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/jobs", status_code=202)
+async def criar_job(req: ProjetoRequest):
+    """
+    Enfileira a geração do projeto no CrewAI e devolve o id do job. O job é
+    acompanhado em segundo plano para que o resultado entre no histórico
+    mesmo que o cliente nunca consulte o job
+    """
+    inicio = time.time()
+    resultado = await client.submeter_job(
+        areas=req.areas,
+        tecnologias=req.tecnologias,
+        descricao=req.descricao,
+        usar_exa=req.usar_exa or False
+    )
+    if resultado["status"] == "error":
+        raise HTTPException(status_code=503, detail=resultado["error"])
+    tarefa = asyncio.create_task(acompanhar_job(resultado["data"]["job_id"], req, inicio))
+    acompanhamentos.add(tarefa)
+    tarefa.add_done_callback(acompanhamentos.discard)
+    return resultado["data"]
+
+async def acompanhar_job(job_id: str, req: ProjetoRequest, inicio: float):
+    """Espera o job terminar (por long-poll) e grava o resultado no histórico"""
+    limite = inicio + JOB_HISTORY_TIMEOUT
+    while time.time() < limite:
+        resultado = await client.consultar_job(job_id, espera=min(JOB_HISTORY_POLL, max(limite - time.time(), 0)))
+        if resultado["status"] == "not_found":
+            return
+        if resultado["status"] == "error":
+            await asyncio.sleep(JOB_HISTORY_RETRY)
+            continue
+        job = resultado["data"]
+        if job["status"] == "erro":
+            return
+        if job["status"] == "concluido":
+            if isinstance(job.get("resultado"), dict):
+                projetos_por_job[job_id] = await salvar_projeto(req, job["resultado"], job.get("modelo"), inicio)
+                while len(projetos_por_job) > JOB_HISTORY_MAX_IDS:
+                    projetos_por_job.popitem(last=False)
+            return
+    logger.warning(f"Job {job_id} não terminou em {JOB_HISTORY_TIMEOUT:.0f}s; resultado não será gravado no histórico")
+
+@app.get("/jobs/{job_id}")
+async def consultar_job(job_id: str, espera: float = Query(0, ge=0, le=60)):
+    """Consulta o estado de um job; `espera` ativa o long-poll (em segundos)"""
+    resultado = await client.consultar_job(job_id, espera=espera)
+    if resultado["status"] == "not_found":
+        raise HTTPException(status_code=404, detail=resultado["error"])
+    if resultado["status"] == "error":
+        raise HTTPException(status_code=503, detail=resultado["error"])
+    dados = resultado["data"]
+    if job_id in projetos_por_job:
+        dados["projeto_id"] = projetos_por_job[job_id]
+    return dados
+
 @app.get("/diagnose-crewai")
 async def diagnose_crewai():
     """Endpoint para diagnóstico da conexão com o CrewAI"""
@@ -108,22 +329,18 @@ async def diagnose_crewai():
 @app.get("/diagnose-network")
 async def diagnose_network():
     """Endpoint para diagnóstico completo da rede entre os serviços"""
-    results = debug_service_connectivity()
+    results = summarize_services([
+        service for service in await monitor.results() if service["name"] != "Database"
+    ])
+    results["monitor"] = monitor.snapshot()
     return results
 
 @app.get("/api/health/db")
 async def check_db_health():
     try:
-        conn = psycopg2.connect(
-            dbname=os.getenv("POSTGRES_DB", "codesprint"),
-            user=os.getenv("POSTGRES_USER", "postgres"),
-            password=os.getenv("POSTGRES_PASSWORD", "postgres"),
-            host=os.getenv("POSTGRES_HOST", "db"),
-            port=os.getenv("POSTGRES_PORT", "5432")
-        )
-        conn.close()
-        return {"status": "healthy", "message": "Database connection successful"}
-    except OperationalError as e:
+        await run_in_threadpool(projetos.check_health)
+        return {"status": "healthy", "message": "Database connection successful", "pool": projetos.pool_status()}
+    except Exception as e:
         raise HTTPException(status_code=503, detail=f"Database connection failed: {str(e)}")
 
 @app.get("/health/db")
@@ -134,82 +351,31 @@ async def check_db_health_alt():
 @app.get("/api/teste-rapido")
 async def teste_rapido():
     """Endpoint para teste rápido de conectividade com todos os serviços"""
-    results = []
-    start_time = time.time()
-    
-    # Teste do banco de dados
-    db_start = time.time()
-    try:
-        conn = psycopg2.connect(
-            dbname=os.getenv("POSTGRES_DB", "codesprint"),
-            user=os.getenv("POSTGRES_USER", "postgres"),
-            password=os.getenv("POSTGRES_PASSWORD", "postgres"),
-            host=os.getenv("POSTGRES_HOST", "db"),
-            port=os.getenv("POSTGRES_PORT", "5432")
+    results = [
+        TestResult(
+            url=service["url"],
+            success=service["success"],
+            status=service.get("status_code"),
+            statusText=service.get("status_text"),
+            responseTime=service["response_time"],
+            data=service.get("data"),
+            error=service.get("error")
         )
-        conn.close()
-        db_time = time.time() - db_start
-        results.append(TestResult(
-            url="postgresql://db:5432/codesprint",
-            success=True,
-            status=200,
-            statusText="OK",
-            responseTime=f"{db_time:.2f}s",
-            data={"message": "Database connection successful"}
-        ))
-    except Exception as e:
-        results.append(TestResult(
-            url="postgresql://db:5432/codesprint",
-            success=False,
-            error=str(e)
-        ))
-
-    # Teste do CrewAI
-    crewai_url = os.getenv("CREWAI_BASE_URL", "http://crewai:8004")
-    crewai_start = time.time()
-    try:
-        response = requests.get(f"{crewai_url}/health", timeout=5)
-        crewai_time = time.time() - crewai_start
-        results.append(TestResult(
-            url=f"{crewai_url}/health",
-            success=response.ok,
-            status=response.status_code,
-            statusText=response.reason,
-            responseTime=f"{crewai_time:.2f}s",
-            data=response.json() if response.ok else None
-        ))
-    except Exception as e:
-        results.append(TestResult(
-            url=f"{crewai_url}/health",
-            success=False,
-            error=str(e)
-        ))
-
-    # Teste do backend
-    backend_start = time.time()
-    try:
-        response = requests.get("http://localhost:8000/health", timeout=5)
-        backend_time = time.time() - backend_start
-        results.append(TestResult(
-            url="http://localhost:8000/health",
-            success=response.ok,
-            status=response.status_code,
-            statusText=response.reason,
-            responseTime=f"{backend_time:.2f}s",
-            data=response.json() if response.ok else None
-        ))
-    except Exception as e:
-        results.append(TestResult(
-            url="http://localhost:8000/health",
-            success=False,
-            error=str(e)
-        ))
+        for service in await monitor.results()
+    ]
+    # O próprio backend está respondendo este pedido; não há o que testar pela rede
+    results.append(TestResult(
+        url="http://localhost:8000/health",
+        success=True,
+        status=200,
+        statusText="OK",
+        responseTime="0.00s",
+        data={"status": "Tudo correto"}
+    ))
 
-    total_time = time.time() - start_time
-    
     return {
         "backendUrl": os.getenv("BACKEND_URL", "http://backend:8000"),
-        "testTime": f"{total_time:.2f}s",
+        "testTime": f"{monitor.snapshot()['duracao_rodada_s']:.2f}s",
         "results": results
     }
 
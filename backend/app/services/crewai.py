@@ -1,8 +1,8 @@
-import requests
-from typing import List, Optional, Dict
+import httpx
+from typing import List, Optional, Dict, AsyncIterator
 from dotenv import load_dotenv
+from app.services.tracing import TracingTransport
 import os
-import time
 import json
 import logging
 
@@ -13,51 +13,95 @@ logger = logging.getLogger("crewai_service")
 
 load_dotenv()
 
+# Cabeçalho com o tempo (em segundos) que o backend ainda espera pela resposta
+DEADLINE_HEADER = "X-Request-Timeout"
+# Folga para rede e serialização: o CrewAI desiste um pouco antes do backend
+DEADLINE_MARGIN = 2.0
+# Pool de conexões com o CrewAI, compartilhado por todos os pedidos
+MAX_CONNECTIONS = int(os.getenv("CREWAI_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("CREWAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("CREWAI_KEEPALIVE_EXPIRY", "30"))
+# Tempo máximo para abrir a conexão com o CrewAI
+CONNECT_TIMEOUT = 5.0
+# Respostas do controle de admissão do CrewAI, repassadas ao cliente com o Retry-After
+OVERLOAD_STATUS = (429, 503)
+
+def overload_error(response: httpx.Response) -> Optional[Dict]:
+    """Erro de sobrecarga (429/503) do CrewAI com o status e o Retry-After, ou None"""
+    if response.status_code not in OVERLOAD_STATUS or "retry-after" not in response.headers:
+        return None
+    try:
+        detail = response.json().get("detail", response.reason_phrase)
+    except ValueError:
+        detail = response.reason_phrase
+    return {
+        "status": "error",
+        "error": detail,
+        "status_code": response.status_code,
+        "retry_after": response.headers["retry-after"]
+    }
+
 class CrewAiService: 
-    def __init__(self):
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
         self.base_url = os.getenv("CREWAI_BASE_URL", "http://crewai:8004")
+        # Prazo único de uma geração; o CrewAI divide esse orçamento entre as etapas
+        self.timeout = float(os.getenv("CREWAI_TIMEOUT", "600"))
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        # Sem teste de conexão aqui: a disponibilidade do CrewAI é acompanhada
+        # pelo HealthMonitor em segundo plano, sem bloquear o import do app
         logger.info(f"CrewAiService inicializado com base_url: {self.base_url}")
-        # Testar a conexão durante a inicialização
-        self._test_connection()
 
-    def _test_connection(self):
-        """Testa a conexão com o serviço CrewAI"""
-        max_retries = 5
-        retry_count = 0
-        
-        while retry_count < max_retries:
-            try:
-                logger.info(f"Tentando conexão com CrewAI em {self.base_url}/health")
-                response = requests.get(f"{self.base_url}/health", timeout=5)
-                if response.status_code == 200:
-                    logger.info(f"Conexão com CrewAI estabelecida com sucesso: {response.json()}")
-                    return True
-                else:
-                    logger.warning(f"CrewAI respondeu com código de status inesperado: {response.status_code}")
-            except Exception as e:
-                logger.error(f"Erro ao conectar com CrewAI: {str(e)}")
-            
-            retry_count += 1
-            if retry_count < max_retries:
-                wait_time = 2 * retry_count
-                logger.info(f"Tentando novamente em {wait_time} segundos... (tentativa {retry_count}/{max_retries})")
-                time.sleep(wait_time)
-        
-        logger.warning("Aviso: Não foi possível estabelecer conexão com CrewAI durante a inicialização, mas continuando...")
-        return False
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        Cliente assíncrono compartilhado: as chamadas ao CrewAI não bloqueiam o
+        event loop e reaproveitam conexões keep-alive em vez de abrir uma por pedido
+        """
+        if self._client is None or self._client.is_closed:
+            transport = self._transport or httpx.AsyncHTTPTransport(limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY
+            ))
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                # Cada chamada vira um span e leva o traceparent até o CrewAI
+                transport=TracingTransport(transport),
+                timeout=httpx.Timeout(self.timeout, connect=CONNECT_TIMEOUT)
+            )
+        return self._client
+
+    async def aclose(self):
+        """Fecha as conexões do pool (no shutdown do backend)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _deadline_headers(self, timeout: float) -> Dict[str, str]:
+        """Cabeçalho que propaga o prazo do pedido até o Ollama"""
+        return {DEADLINE_HEADER: f"{max(timeout - DEADLINE_MARGIN, 0):.1f}"}
 
-    def gerar_projeto(self, areas: List[str], tecnologias: str, descricao: str, usar_exa: bool = False) -> Dict:
+    async def gerar_projeto(self, areas: List[str], tecnologias: str, descricao: str, usar_exa: bool = False,
+                            ignorar_cache: bool = False, atualizar_cache: bool = False) -> Dict:
         try:
-            response = requests.post(
-                f"{self.base_url}/gerar-projeto",
+            response = await self.client.post(
+                "/gerar-projeto",
                 json={
                     "areas": areas,
                     "tecnologias": tecnologias,
                     "descricao": descricao,
-                    "usar_exa": usar_exa
+                    "usar_exa": usar_exa,
+                    "ignorar_cache": ignorar_cache,
+                    "atualizar_cache": atualizar_cache
                 },
-                timeout=30
+                headers=self._deadline_headers(self.timeout),
+                timeout=httpx.Timeout(self.timeout, connect=CONNECT_TIMEOUT)
             )
+            overload = overload_error(response)
+            if overload:
+                logger.warning(f"CrewAI sobrecarregado ({response.status_code}), Retry-After {overload['retry_after']}s")
+                return overload
             response.raise_for_status()
             return {
                 "status": "success",
@@ -70,9 +114,92 @@ class CrewAiService:
                 "error": str(e)
             }
 
-    def check_health(self) -> Dict:
+    async def gerar_projeto_stream(self, areas: List[str], tecnologias: str, descricao: str,
+                                   usar_exa: bool = False) -> AsyncIterator[bytes]:
+        """Repassa as linhas NDJSON do endpoint de streaming do CrewAI"""
+        try:
+            async with self.client.stream(
+                "POST",
+                "/gerar-projeto/stream",
+                json={
+                    "areas": areas,
+                    "tecnologias": tecnologias,
+                    "descricao": descricao,
+                    "usar_exa": usar_exa
+                },
+                headers=self._deadline_headers(self.timeout),
+                timeout=httpx.Timeout(self.timeout, connect=CONNECT_TIMEOUT)
+            ) as response:
+                if response.status_code in OVERLOAD_STATUS:
+                    await response.aread()
+                    overload = overload_error(response)
+                    if overload:
+                        yield (json.dumps({
+                            "tipo": "erro", "detalhe": overload["error"], "status": overload["status_code"],
+                            "retry_after": overload["retry_after"]
+                        }, ensure_ascii=False) + "\n").encode("utf-8")
+                        return
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line:
+                        yield line.encode("utf-8") + b"\n"
+        except Exception as e:
+            logger.error(f"Erro no streaming com o CrewAi: {str(e)}")
+            yield (json.dumps({"tipo": "erro", "detalhe": str(e)}, ensure_ascii=False) + "\n").encode("utf-8")
+
+    async def submeter_job(self, areas: List[str], tecnologias: str, descricao: str, usar_exa: bool = False) -> Dict:
+        """Enfileira a geração no CrewAI e devolve o id do job sem esperar o resultado"""
+        try:
+            response = await self.client.post(
+                "/jobs",
+                json={
+                    "areas": areas,
+                    "tecnologias": tecnologias,
+                    "descricao": descricao,
+                    "usar_exa": usar_exa
+                },
+                timeout=10
+            )
+            response.raise_for_status()
+            return {
+                "status": "success",
+                "data": response.json()
+            }
+        except Exception as e:
+            logger.error(f"Erro ao submeter job ao CrewAi: {str(e)}")
+            return {
+                "status": "error",
+                "error": str(e)
+            }
+
+    async def consultar_job(self, job_id: str, espera: float = 0) -> Dict:
+        """Consulta (com long-poll opcional) o estado de um job no CrewAI"""
+        try:
+            response = await self.client.get(
+                f"/jobs/{job_id}",
+                params={"espera": espera},
+                timeout=espera + 10
+            )
+            if response.status_code == 404:
+                return {
+                    "status": "not_found",
+                    "error": "Job não encontrado"
+                }
+            response.raise_for_status()
+            return {
+                "status": "success",
+                "data": response.json()
+            }
+        except Exception as e:
+            logger.error(f"Erro ao consultar job {job_id} no CrewAi: {str(e)}")
+            return {
+                "status": "error",
+                "error": str(e)
+            }
+
+    async def check_health(self) -> Dict:
         try:
-            response = requests.get(f"{self.base_url}/health", timeout=5)
+            response = await self.client.get("/health", timeout=5)
             response.raise_for_status()
             return {
                 "status": response.json().get("status", "ok"),
@@ -0,0 +1,180 @@
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+from app.services import metrics
+import httpx
+import asyncio
+import bisect
+import os
+import time
+import logging
+
+logger = logging.getLogger("health_monitor")
+
+load_dotenv()
+
+# Intervalo (segundos) entre duas rodadas de verificação das dependências
+HEALTH_INTERVAL = float(os.getenv("HEALTH_INTERVAL", "15"))
+# Tempo máximo de cada verificação; uma rodada nunca demora mais que isso
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "5"))
+# Latências guardadas por dependência para os percentis e o histograma
+HEALTH_HISTORY = int(os.getenv("HEALTH_HISTORY", "240"))
+# Limites superiores (ms) das faixas do histograma de latência
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class Probe:
+    """Uma dependência verificada pelo monitor: nome, URL exibida e a verificação em si"""
+
+    def __init__(self, name: str, url: str, check: Callable[[], Awaitable[Dict]]):
+        self.name = name
+        self.url = url
+        self.check = check
+
+
+def http_probe(name: str, url: str, client: Callable[[], httpx.AsyncClient]) -> Probe:
+    """Verificação HTTP: GET na URL, sucesso com status 2xx"""
+    async def check() -> Dict:
+        response = await client().get(url, timeout=HEALTH_PROBE_TIMEOUT)
+        try:
+            data = response.json() if response.is_success else None
+        except ValueError:
+            data = None
+        return {
+            "success": response.is_success,
+            "status_code": response.status_code,
+            "status_text": response.reason_phrase,
+            "data": data
+        }
+    return Probe(name, url, check)
+
+
+def db_probe(url: str, check_health: Callable[[], None]) -> Probe:
+    """Verificação do banco: SELECT 1 numa conexão do pool, fora do event loop"""
+    async def check() -> Dict:
+        await run_in_threadpool(check_health)
+        return {"success": True, "status_code": 200, "status_text": "OK",
+                "data": {"message": "Database connection successful"}}
+    return Probe("Database", url, check)
+
+
+class LatencyWindow:
+    """Latências recentes de uma dependência, com percentis e histograma"""
+
+    def __init__(self, size: int = HEALTH_HISTORY):
+        self.samples = deque(maxlen=size)
+        self.checks = 0
+        self.failures = 0
+
+    def record(self, latency: float, success: bool):
+        self.checks += 1
+        if success:
+            self.samples.append(latency)
+        else:
+            self.failures += 1
+
+    def summary(self) -> Dict:
+        ordered = sorted(self.samples)
+        percentile = lambda q: round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000, 2) if ordered else None
+        histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        for latency in ordered:
+            histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, latency * 1000)] += 1
+        return {
+            "verificacoes": self.checks,
+            "falhas": self.failures,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "histograma_ms": {
+                **{f"<={bound}": count for bound, count in zip(LATENCY_BUCKETS_MS, histogram)},
+                f">{LATENCY_BUCKETS_MS[-1]}": histogram[-1]
+            }
+        }
+
+
+class HealthMonitor:
+    """
+    Verifica todas as dependências em paralelo a cada HEALTH_INTERVAL segundos
+    e guarda o resultado; os endpoints de diagnóstico só leem a última rodada
+    """
+
+    def __init__(self, probes: List[Probe], interval: float = HEALTH_INTERVAL,
+                 timeout: float = HEALTH_PROBE_TIMEOUT):
+        self.probes = probes
+        self.interval = interval
+        self.timeout = timeout
+        self.windows = {probe.name: LatencyWindow() for probe in probes}
+        self._results: List[Dict] = []
+        self._updated_at: Optional[float] = None
+        self._round_time = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._refresh: Optional[asyncio.Task] = None
+
+    async def _run_probe(self, probe: Probe) -> Dict:
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(probe.check(), self.timeout)
+        except asyncio.TimeoutError:
+            result = {"success": False, "error": f"Timeout após {self.timeout:g}s"}
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        elapsed = time.perf_counter() - start
+        self.windows[probe.name].record(elapsed, result["success"])
+        metrics.dependency_probe_duration.labels(probe.name).observe(elapsed)
+        metrics.dependency_up.labels(probe.name).set(int(result["success"]))
+        if not result["success"]:
+            logger.warning(f"{probe.name} não respondeu corretamente: {result.get('error', result.get('status_code'))}")
+        return {"name": probe.name, "url": probe.url, "response_time": f"{elapsed:.2f}s", **result}
+
+    async def probe_once(self) -> List[Dict]:
+        """Uma rodada: a duração é a da dependência mais lenta, não a soma de todas"""
+        start = time.perf_counter()
+        self._results = await asyncio.gather(*(self._run_probe(probe) for probe in self.probes))
+        self._round_time = time.perf_counter() - start
+        self._updated_at = time.time()
+        return self._results
+
+    async def _loop(self):
+        while True:
+            await self.probe_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+            logger.info(f"Monitor de saúde iniciado (intervalo de {self.interval:g}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def stale(self) -> bool:
+        """Sem rodada recente (monitor parado ou ainda não iniciado)"""
+        return self._updated_at is None or time.time() - self._updated_at > 3 * self.interval
+
+    async def results(self) -> List[Dict]:
+        """
+        Resultado da última rodada. Se ele estiver velho, uma rodada é feita na
+        hora; pedidos simultâneos esperam a mesma rodada em vez de abrir outra
+        """
+        if self.stale:
+            if self._refresh is None or self._refresh.done():
+                self._refresh = asyncio.ensure_future(self.probe_once())
+            await asyncio.shield(self._refresh)
+        return self._results
+
+    def snapshot(self) -> Dict:
+        return {
+            "intervalo_s": self.interval,
+            "atualizado_em": self._updated_at,
+            "idade_s": round(time.time() - self._updated_at, 2) if self._updated_at else None,
+            "duracao_rodada_s": round(self._round_time, 3),
+            "dependencias": {name: window.summary() for name, window in self.windows.items()}
+        }
@@ -0,0 +1,26 @@
+from prometheus_client import CONTENT_TYPE_LATEST, Gauge, Histogram, generate_latest
+
+# Faixas (segundos) de duração dos pedidos: de health checks (ms) a gerações (minutos)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+# Faixas (segundos) da latência das verificações de saúde das dependências
+PROBE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+http_request_duration = Histogram(
+    "backend_http_request_duration_seconds", "Duração dos pedidos HTTP por rota, método e status",
+    ["method", "route", "status"], buckets=REQUEST_BUCKETS
+)
+http_requests_in_flight = Gauge(
+    "backend_http_requests_in_flight", "Pedidos HTTP em andamento"
+)
+dependency_probe_duration = Histogram(
+    "backend_dependency_probe_duration_seconds", "Latência das verificações do monitor de saúde",
+    ["dependency"], buckets=PROBE_BUCKETS
+)
+dependency_up = Gauge(
+    "backend_dependency_up", "1 se a última verificação da dependência teve sucesso", ["dependency"]
+)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Métricas no formato de texto do Prometheus e o content-type da resposta"""
+    return generate_latest(), CONTENT_TYPE_LATEST
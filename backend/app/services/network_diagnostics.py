@@ -182,6 +182,10 @@ def debug_service_connectivity() -> Dict:
                 "error": f"Erro inesperado: {str(e)}"
             })
 
+    return summarize_services(results)
+
+def summarize_services(results) -> Dict:
+    """Resumo do diagnóstico a partir do resultado de cada serviço"""
     all_success = all(service["success"] for service in results)
     return {
         "success": all_success,
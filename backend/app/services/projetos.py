@@ -0,0 +1,84 @@
+from typing import Dict, List, Optional
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Projeto, create_tables
+import logging
+
+logger = logging.getLogger("projetos_service")
+
+# Tamanho máximo de uma página da listagem de projetos
+MAX_PAGE_SIZE = 100
+
+
+class ProjetoService:
+    """Histórico dos projetos gerados, gravado no banco pelo pool do engine"""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.Session = sessionmaker(bind=engine, expire_on_commit=False)
+        self._tables_ready = False
+
+    def _ensure_tables(self):
+        # Tenta de novo a cada uso enquanto o banco não tiver respondido
+        if not self._tables_ready:
+            self._tables_ready = create_tables(self.engine)
+
+    def salvar(self, areas: List[str], tecnologias: str, descricao: str, usar_exa: bool,
+               resultado: Dict, modelo: Optional[str], duracao_segundos: float) -> Optional[int]:
+        """Grava o projeto gerado e devolve o id; falhas no banco não derrubam a geração"""
+        try:
+            self._ensure_tables()
+            with self.Session.begin() as session:
+                projeto = Projeto(
+                    areas=areas,
+                    tecnologias=tecnologias,
+                    descricao=descricao,
+                    usar_exa=usar_exa,
+                    resumo=resultado.get("resumo"),
+                    estrutura=resultado.get("estrutura"),
+                    recursos=resultado.get("recursos"),
+                    resultado=resultado,
+                    modelo=modelo,
+                    duracao_segundos=round(duracao_segundos, 3)
+                )
+                session.add(projeto)
+                session.flush()
+                logger.info(f"Projeto {projeto.id} salvo no histórico")
+                return projeto.id
+        except Exception as e:
+            logger.error(f"Erro ao salvar projeto no banco: {str(e)}")
+            return None
+
+    def obter(self, projeto_id: int) -> Optional[Dict]:
+        self._ensure_tables()
+        with self.Session() as session:
+            projeto = session.get(Projeto, projeto_id)
+            return projeto.to_dict() if projeto else None
+
+    def listar(self, pagina: int = 1, por_pagina: int = 20) -> Dict:
+        """Projetos do mais recente ao mais antigo, sem o resultado completo"""
+        self._ensure_tables()
+        por_pagina = min(por_pagina, MAX_PAGE_SIZE)
+        with self.Session() as session:
+            total = session.scalar(select(func.count()).select_from(Projeto))
+            projetos = session.scalars(
+                select(Projeto)
+                .order_by(Projeto.criado_em.desc(), Projeto.id.desc())
+                .offset((pagina - 1) * por_pagina)
+                .limit(por_pagina)
+            ).all()
+            return {
+                "pagina": pagina,
+                "por_pagina": por_pagina,
+                "total": total,
+                "projetos": [projeto.resumir() for projeto in projetos]
+            }
+
+    def check_health(self):
+        """SELECT 1 numa conexão do pool, sem abrir uma conexão nova a cada verificação"""
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    def pool_status(self) -> str:
+        return self.engine.pool.status()
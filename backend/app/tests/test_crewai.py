@@ -1,5 +1,9 @@
+import asyncio
+import json
+import time
+
+import httpx
 import pytest
-from unittest.mock import patch, MagicMock
 from app.services.crewai import CrewAiService
 import os
 
@@ -7,69 +11,239 @@ import os
 def crewai_service():
     return CrewAiService()
 
+def servico_com(handler):
+    """CrewAiService cujas chamadas ao CrewAI são respondidas por handler(request)"""
+    return CrewAiService(transport=httpx.MockTransport(handler))
+
+def servico_com_erro():
+    def handler(request):
+        raise httpx.ConnectError("Erro de conexão", request=request)
+    return servico_com(handler)
+
 def test_crewai_service_initialization():
     service = CrewAiService()
     assert service.base_url == os.getenv("CREWAI_BASE_URL", "http://crewai:8004")
 
-@patch('requests.post')
-def test_gerar_projeto_success(mock_post):
-    # Configura o mock para simular uma resposta bem-sucedida
-    mock_response = MagicMock()
-    mock_response.status_code = 200
-    mock_response.json.return_value = {
+def test_inicializacao_nao_acessa_a_rede(monkeypatch):
+    # O import do app cria o serviço; sem CrewAI no ar ele não pode esperar por conexões
+    monkeypatch.setenv("CREWAI_BASE_URL", "http://10.255.255.1:9")
+    inicio = time.monotonic()
+    service = CrewAiService()
+    assert time.monotonic() - inicio < 1
+    assert service._client is None
+
+def test_gerar_projeto_success():
+    # Simula uma resposta bem-sucedida do CrewAI
+    service = servico_com(lambda request: httpx.Response(200, json={
         "projeto": "Teste de projeto",
         "status": "success"
-    }
-    mock_post.return_value = mock_response
-
-    service = CrewAiService()
-    result = service.gerar_projeto(
+    }))
+    result = asyncio.run(service.gerar_projeto(
         areas=["web", "backend"],
         tecnologias="Python, FastAPI",
         descricao="Projeto de teste",
         usar_exa=False
-    )
+    ))
 
     assert result["status"] == "success"
     assert "projeto" in result["data"]
 
-@patch('requests.post')
-def test_gerar_projeto_error(mock_post):
-    # Configura o mock para simular um erro
-    mock_post.side_effect = Exception("Erro de conexão")
-
-    service = CrewAiService()
-    result = service.gerar_projeto(
+def test_gerar_projeto_error():
+    # Simula um erro de conexão
+    service = servico_com_erro()
+    result = asyncio.run(service.gerar_projeto(
         areas=["web", "backend"],
         tecnologias="Python, FastAPI",
         descricao="Projeto de teste",
         usar_exa=False
-    )
+    ))
 
     assert result["status"] == "error"
     assert "error" in result
 
-@patch('requests.get')
-def test_health_check_success(mock_get):
-    # Configura o mock para simular uma resposta bem-sucedida
-    mock_response = MagicMock()
-    mock_response.status_code = 200
-    mock_response.json.return_value = {"status": "ok"}
-    mock_get.return_value = mock_response
-
-    service = CrewAiService()
-    result = service.check_health()
+def test_health_check_success():
+    service = servico_com(lambda request: httpx.Response(200, json={"status": "ok"}))
+    result = asyncio.run(service.check_health())
 
     assert result["status"] == "ok"
     assert result["success"] is True
 
-@patch('requests.get')
-def test_health_check_error(mock_get):
-    # Configura o mock para simular um erro
-    mock_get.side_effect = Exception("Erro de conexão")
-
-    service = CrewAiService()
-    result = service.check_health()
+def test_health_check_error():
+    service = servico_com_erro()
+    result = asyncio.run(service.check_health())
 
     assert result["success"] is False
-    assert "error" in result 
\ No newline at end of file
+    assert "error" in result 
+
+def test_gerar_projeto_stream_repassa_eventos():
+    # Simula o endpoint de streaming devolvendo duas linhas NDJSON
+    requisicoes = []
+
+    def handler(request):
+        requisicoes.append(request)
+        return httpx.Response(200, content=b'{"tipo": "pipeline_iniciado"}\n\n{"tipo": "token"}\n')
+
+    service = servico_com(handler)
+
+    async def consumir():
+        return [linha async for linha in service.gerar_projeto_stream(
+            areas=["web"],
+            tecnologias="Python, FastAPI",
+            descricao="Projeto de teste"
+        )]
+
+    linhas = asyncio.run(consumir())
+
+    assert linhas == [b'{"tipo": "pipeline_iniciado"}\n', b'{"tipo": "token"}\n']
+    assert requisicoes[0].url.path == "/gerar-projeto/stream"
+
+
+def test_gerar_projeto_stream_error():
+    service = servico_com_erro()
+
+    async def consumir():
+        return [linha async for linha in service.gerar_projeto_stream(
+            areas=["web"],
+            tecnologias="Python, FastAPI",
+            descricao="Projeto de teste"
+        )]
+
+    linhas = asyncio.run(consumir())
+
+    assert len(linhas) == 1
+    assert b'"erro"' in linhas[0]
+
+
+def test_submeter_job_success():
+    requisicoes = []
+
+    def handler(request):
+        requisicoes.append(request)
+        return httpx.Response(202, json={"job_id": "abc", "status": "pendente"})
+
+    service = servico_com(handler)
+    result = asyncio.run(service.submeter_job(
+        areas=["web"],
+        tecnologias="Python, FastAPI",
+        descricao="Projeto de teste"
+    ))
+
+    assert result["status"] == "success"
+    assert result["data"]["job_id"] == "abc"
+    assert requisicoes[0].url.path.endswith("/jobs")
+
+
+def test_consultar_job_not_found():
+    requisicoes = []
+
+    def handler(request):
+        requisicoes.append(request)
+        return httpx.Response(404)
+
+    service = servico_com(handler)
+    result = asyncio.run(service.consultar_job("inexistente", espera=5))
+
+    assert result["status"] == "not_found"
+    assert requisicoes[0].url.params["espera"] == "5"
+
+
+def test_gerar_projeto_repassa_flags_de_cache():
+    requisicoes = []
+
+    def handler(request):
+        requisicoes.append(request)
+        return httpx.Response(200, json={"resultado": {}})
+
+    service = servico_com(handler)
+    asyncio.run(service.gerar_projeto(
+        areas=["web"],
+        tecnologias="Python, FastAPI",
+        descricao="Projeto de teste",
+        atualizar_cache=True
+    ))
+
+    payload = json.loads(requisicoes[0].content)
+    assert payload["atualizar_cache"] is True
+    assert payload["ignorar_cache"] is False
+
+def test_gerar_projeto_propaga_prazo():
+    requisicoes = []
+
+    def handler(request):
+        requisicoes.append(request)
+        return httpx.Response(200, json={"resultado": {}})
+
+    service = servico_com(handler)
+    service.timeout = 120
+    asyncio.run(service.gerar_projeto(
+        areas=["web"],
+        tecnologias="Python, FastAPI",
+        descricao="Projeto de teste"
+    ))
+
+    request = requisicoes[0]
+    assert request.extensions["timeout"] == {"connect": 5.0, "read": 120, "write": 120, "pool": 120}
+    assert float(request.headers["X-Request-Timeout"]) < 120
+
+
+def test_pedidos_simultaneos_nao_se_bloqueiam():
+    # Com o cliente assíncrono, dez gerações de 0.2s terminam juntas em vez de em sequência
+    async def handler(request):
+        await asyncio.sleep(0.2)
+        return httpx.Response(200, json={"resultado": {}})
+
+    service = servico_com(handler)
+
+    async def gerar_varios():
+        inicio = asyncio.get_running_loop().time()
+        resultados = await asyncio.gather(*(
+            service.gerar_projeto(areas=["web"], tecnologias="Python", descricao=f"Projeto {i}")
+            for i in range(10)
+        ))
+        return resultados, asyncio.get_running_loop().time() - inicio
+
+    resultados, duracao = asyncio.run(gerar_varios())
+
+    assert all(r["status"] == "success" for r in resultados)
+    assert duracao < 1.0
+
+
+def test_cliente_compartilhado_entre_pedidos():
+    service = servico_com(lambda request: httpx.Response(200, json={"status": "ok"}))
+
+    async def duas_chamadas():
+        await service.check_health()
+        primeiro = service.client
+        await service.check_health()
+        return primeiro is service.client
+
+    assert asyncio.run(duas_chamadas())
+
+def test_gerar_projeto_repassa_sobrecarga():
+    service = servico_com(lambda request: httpx.Response(
+        429, headers={"Retry-After": "12"}, json={"detail": "Serviço sobrecarregado (fila_cheia)"}
+    ))
+    result = asyncio.run(service.gerar_projeto(areas=["web"], tecnologias="Python", descricao="Projeto de teste"))
+
+    assert result["status"] == "error"
+    assert result["status_code"] == 429
+    assert result["retry_after"] == "12"
+
+
+def test_gerar_projeto_stream_repassa_sobrecarga():
+    service = servico_com(lambda request: httpx.Response(
+        503, headers={"Retry-After": "30"}, json={"detail": "Serviço sobrecarregado (tempo_de_fila)"}
+    ))
+
+    async def consumir():
+        return [linha async for linha in service.gerar_projeto_stream(
+            areas=["web"], tecnologias="Python", descricao="Projeto de teste"
+        )]
+
+    linhas = asyncio.run(consumir())
+
+    assert len(linhas) == 1
+    evento = json.loads(linhas[0])
+    assert evento["tipo"] == "erro"
+    assert evento["status"] == 503
+    assert evento["retry_after"] == "30"
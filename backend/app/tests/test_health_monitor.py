@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import httpx
+from app.services.health_monitor import HealthMonitor, LatencyWindow, Probe, http_probe
+
+
+def sonda_lenta(nome, atraso, chamadas=None):
+    async def check():
+        if chamadas is not None:
+            chamadas.append(nome)
+        await asyncio.sleep(atraso)
+        return {"success": True, "status_code": 200}
+    return Probe(nome, f"http://{nome}/health", check)
+
+
+def test_rodada_dura_o_tempo_da_dependencia_mais_lenta():
+    monitor = HealthMonitor([sonda_lenta("a", 0.2), sonda_lenta("b", 0.2), sonda_lenta("c", 0.3)])
+
+    inicio = time.perf_counter()
+    resultados = asyncio.run(monitor.probe_once())
+    duracao = time.perf_counter() - inicio
+
+    assert [r["name"] for r in resultados] == ["a", "b", "c"]
+    assert all(r["success"] for r in resultados)
+    assert duracao < 0.5
+
+
+def test_timeout_da_sonda():
+    monitor = HealthMonitor([sonda_lenta("lenta", 5)], timeout=0.1)
+    resultado = asyncio.run(monitor.probe_once())[0]
+
+    assert resultado["success"] is False
+    assert "Timeout" in resultado["error"]
+    assert monitor.snapshot()["dependencias"]["lenta"]["falhas"] == 1
+
+
+def test_erro_da_sonda():
+    async def check():
+        raise ConnectionError("recusada")
+    monitor = HealthMonitor([Probe("fora", "http://fora", check)])
+    resultado = asyncio.run(monitor.probe_once())[0]
+
+    assert resultado["success"] is False
+    assert resultado["error"] == "recusada"
+
+
+def test_resultados_servidos_do_cache():
+    chamadas = []
+    monitor = HealthMonitor([sonda_lenta("a", 0, chamadas)], interval=60)
+
+    async def consultar():
+        await monitor.results()
+        await monitor.results()
+        await monitor.results()
+
+    asyncio.run(consultar())
+    assert chamadas == ["a"]
+
+
+def test_pedidos_simultaneos_compartilham_a_rodada():
+    chamadas = []
+    monitor = HealthMonitor([sonda_lenta("a", 0.1, chamadas)], interval=60)
+
+    async def consultar():
+        return await asyncio.gather(*(monitor.results() for _ in range(10)))
+
+    resultados = asyncio.run(consultar())
+    assert chamadas == ["a"]
+    assert all(r == resultados[0] for r in resultados)
+
+
+def test_monitor_em_segundo_plano():
+    chamadas = []
+    monitor = HealthMonitor([sonda_lenta("a", 0, chamadas)], interval=0.05)
+
+    async def rodar():
+        monitor.start()
+        await asyncio.sleep(0.22)
+        await monitor.stop()
+
+    asyncio.run(rodar())
+    assert len(chamadas) >= 3
+
+
+def test_histograma_de_latencia():
+    janela = LatencyWindow(size=10)
+    for latencia in (0.003, 0.004, 0.02, 0.2, 7.0):
+        janela.record(latencia, True)
+    janela.record(1.0, False)
+    resumo = janela.summary()
+
+    assert resumo["verificacoes"] == 6
+    assert resumo["falhas"] == 1
+    assert resumo["histograma_ms"]["<=5"] == 2
+    assert resumo["histograma_ms"]["<=25"] == 1
+    assert resumo["histograma_ms"]["<=250"] == 1
+    assert resumo["histograma_ms"][">5000"] == 1
+    assert resumo["p50_ms"] == 20.0
+
+
+def test_http_probe():
+    def handler(request):
+        if request.url.host == "crewai":
+            return httpx.Response(200, json={"status": "ok"})
+        return httpx.Response(503)
+
+    cliente = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monitor = HealthMonitor([
+        http_probe("CrewAI", "http://crewai:8004/health", lambda: cliente),
+        http_probe("Ollama", "http://ollama:11434/api/version", lambda: cliente)
+    ])
+    crewai, ollama = asyncio.run(monitor.probe_once())
+
+    assert crewai["success"] is True
+    assert crewai["data"] == {"status": "ok"}
+    assert ollama["success"] is False
+    assert ollama["status_code"] == 503
@@ -1,6 +1,6 @@
 from fastapi.testclient import TestClient
 from app.main import app
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock, MagicMock
 
 client = TestClient(app)
 
@@ -98,3 +98,49 @@ def test_test_results():
     assert "success" in data
     assert "tests" in data
     assert isinstance(data["tests"], list)
+
+
+@patch("app.main.client.gerar_projeto")
+def test_gerar_projeto_sobrecarregado(mock_gerar):
+    mock_gerar.return_value = {
+        "status": "error", "error": "Serviço sobrecarregado", "status_code": 429, "retry_after": "12"
+    }
+    response = client.post("/gerar-projeto", json={
+        "areas": ["web"],
+        "tecnologias": "Python, FastAPI",
+        "descricao": "Projeto de teste",
+    })
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "12"
+
+
+@patch("app.main.acompanhar_job", new_callable=AsyncMock)
+@patch("app.main.client.submeter_job")
+def test_criar_job(mock_submeter, mock_acompanhar):
+    mock_submeter.return_value = {"status": "success", "data": {"job_id": "abc", "status": "pendente"}}
+    projeto_data = {
+        "areas": ["web"],
+        "tecnologias": "Python, FastAPI",
+        "descricao": "Projeto de teste",
+    }
+    response = client.post("/jobs", json=projeto_data)
+    assert response.status_code == 202
+    assert response.json()["job_id"] == "abc"
+    assert mock_acompanhar.call_args.args[0] == "abc"
+
+
+@patch("app.main.client.consultar_job")
+def test_consultar_job(mock_consultar):
+    mock_consultar.return_value = {"status": "not_found", "error": "Job não encontrado"}
+    response = client.get("/jobs/abc?espera=1")
+    assert response.status_code == 404
+    mock_consultar.assert_called_once_with("abc", espera=1.0)
+
+
+def test_metrics():
+    client.get("/health")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'backend_http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in response.text
+    assert "backend_http_requests_in_flight" in response.text
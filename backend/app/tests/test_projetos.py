@@ -0,0 +1,155 @@
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, patch
+from app.database import create_db_engine
+from app.services.projetos import ProjetoService
+from app.main import ProjetoRequest, acompanhar_job, app
+import asyncio
+import json
+import pytest
+import time
+
+client = TestClient(app)
+
+RESULTADO = {
+    "resumo": "Plataforma de cursos",
+    "tecnologias": "Python, FastAPI",
+    "areas": ["web"],
+    "estrutura": "app/\n  main.py",
+    "codigo": "",
+    "recursos": ["Autenticação"]
+}
+
+
+@pytest.fixture
+def projetos():
+    # Banco SQLite em memória no lugar do Postgres
+    return ProjetoService(create_db_engine("sqlite://"))
+
+
+def salvar(projetos, descricao="Projeto de teste"):
+    return projetos.salvar(
+        areas=["web"],
+        tecnologias="Python, FastAPI",
+        descricao=descricao,
+        usar_exa=False,
+        resultado=RESULTADO,
+        modelo="gerente=ollama/llama2",
+        duracao_segundos=42.5
+    )
+
+
+def test_salvar_e_obter(projetos):
+    projeto_id = salvar(projetos)
+    projeto = projetos.obter(projeto_id)
+
+    assert projeto["descricao"] == "Projeto de teste"
+    assert projeto["resumo"] == "Plataforma de cursos"
+    assert projeto["recursos"] == ["Autenticação"]
+    assert projeto["resultado"] == RESULTADO
+    assert projeto["modelo"] == "gerente=ollama/llama2"
+    assert projeto["duracao_segundos"] == 42.5
+
+
+def test_obter_inexistente(projetos):
+    assert projetos.obter(999) is None
+
+
+def test_listar_paginado(projetos):
+    ids = [salvar(projetos, descricao=f"Projeto {i}") for i in range(5)]
+    pagina = projetos.listar(pagina=2, por_pagina=2)
+
+    assert pagina["total"] == 5
+    # Do mais recente ao mais antigo
+    assert [p["id"] for p in pagina["projetos"]] == [ids[2], ids[1]]
+    assert "resultado" not in pagina["projetos"][0]
+
+
+def test_salvar_com_banco_fora():
+    projetos = ProjetoService(create_db_engine("sqlite:////diretorio/inexistente/banco.db"))
+    assert salvar(projetos) is None
+
+
+def test_gerar_projeto_salva_historico(projetos):
+    resposta_crewai = {"status": "success", "data": {"resultado": RESULTADO, "modelo": "gerente=ollama/llama2"}}
+    with patch("app.main.projetos", projetos), patch("app.main.client.gerar_projeto", return_value=resposta_crewai):
+        response = client.post("/gerar-projeto", json={
+            "areas": ["web"],
+            "tecnologias": "Python, FastAPI",
+            "descricao": "Projeto de teste"
+        })
+        projeto_id = response.json()["data"]["projeto_id"]
+
+        response = client.get(f"/projetos/{projeto_id}")
+        assert response.status_code == 200
+        assert response.json()["resultado"] == RESULTADO
+        assert response.json()["modelo"] == "gerente=ollama/llama2"
+
+        response = client.get("/projetos?pagina=1&por_pagina=10")
+        assert response.json()["total"] == 1
+
+
+def test_gerar_projeto_com_erro_nao_salva(projetos):
+    with patch("app.main.projetos", projetos), \
+            patch("app.main.client.gerar_projeto", return_value={"status": "error", "error": "timeout"}):
+        client.post("/gerar-projeto", json={
+            "areas": ["web"],
+            "tecnologias": "Python, FastAPI",
+            "descricao": "Projeto de teste"
+        })
+        assert client.get("/projetos").json()["total"] == 0
+
+
+def test_obter_projeto_nao_encontrado(projetos):
+    with patch("app.main.projetos", projetos):
+        response = client.get("/projetos/123")
+    assert response.status_code == 404
+
+
+def test_db_health_usa_pool(projetos):
+    with patch("app.main.projetos", projetos):
+        response = client.get("/api/health/db")
+    assert response.status_code == 200
+    assert "pool" in response.json()
+
+
+PEDIDO = {"areas": ["web"], "tecnologias": "Python, FastAPI", "descricao": "Projeto de teste"}
+
+
+async def eventos_crewai(**kwargs):
+    for evento in ({"tipo": "pipeline_iniciado"}, {"tipo": "resultado", "resultado": RESULTADO, "cache": False}):
+        yield (json.dumps(evento, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def test_stream_salva_historico(projetos):
+    with patch("app.main.projetos", projetos), patch("app.main.client.gerar_projeto_stream", eventos_crewai):
+        response = client.post("/gerar-projeto/stream", json=PEDIDO)
+        eventos = [json.loads(linha) for linha in response.text.splitlines()]
+
+        assert eventos[0] == {"tipo": "pipeline_iniciado"}
+        assert eventos[1]["resultado"] == RESULTADO
+        assert client.get(f"/projetos/{eventos[1]['projeto_id']}").json()["resultado"] == RESULTADO
+
+
+def test_job_concluido_salva_historico(projetos):
+    estados = [
+        {"status": "error", "error": "timeout"},
+        {"status": "success", "data": {"job_id": "abc", "status": "executando", "resultado": None}},
+        {"status": "success", "data": {"job_id": "abc", "status": "concluido", "resultado": RESULTADO}}
+    ]
+    with patch("app.main.projetos", projetos), \
+            patch("app.main.JOB_HISTORY_RETRY", 0), \
+            patch("app.main.client.consultar_job", AsyncMock(side_effect=estados)):
+        asyncio.run(acompanhar_job("abc", ProjetoRequest(**PEDIDO), time.time()))
+        assert projetos.listar()["total"] == 1
+
+    with patch("app.main.projetos", projetos), \
+            patch("app.main.client.consultar_job", AsyncMock(return_value=estados[-1])):
+        response = client.get("/jobs/abc")
+        assert client.get(f"/projetos/{response.json()['projeto_id']}").json()["descricao"] == "Projeto de teste"
+
+
+def test_job_com_erro_nao_salva(projetos):
+    falha = {"status": "success", "data": {"job_id": "xyz", "status": "erro", "erro": "Ollama fora"}}
+    with patch("app.main.projetos", projetos), patch("app.main.client.consultar_job", AsyncMock(return_value=falha)):
+        asyncio.run(acompanhar_job("xyz", ProjetoRequest(**PEDIDO), time.time()))
+    assert projetos.listar()["total"] == 0
@@ -0,0 +1,87 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import SpanKind
+from app.services.tracing import JsonLinesSpanExporter, TracingMiddleware, tracer, tracer_provider
+from app.tests.test_crewai import servico_com
+
+spans = InMemorySpanExporter()
+tracer_provider.add_span_processor(SimpleSpanProcessor(spans))
+
+TRACEPARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+def test_traceparent_enviado_ao_crewai():
+    recebidos = []
+
+    def handler(request):
+        recebidos.append(request.headers.get("traceparent"))
+        return httpx.Response(200, json={"resultado": "ok"})
+
+    service = servico_com(handler)
+    spans.clear()
+
+    async def gerar():
+        with tracer.start_as_current_span("pedido") as pai:
+            await service.gerar_projeto(areas=["web"], tecnologias="Python", descricao="Teste")
+            return pai.get_span_context().trace_id
+
+    trace_id = asyncio.run(gerar())
+
+    chamada = next(span for span in spans.get_finished_spans() if span.kind == SpanKind.CLIENT)
+    assert chamada.name == "POST /gerar-projeto"
+    assert chamada.context.trace_id == trace_id
+    assert chamada.attributes["http.response.status_code"] == 200
+    # O CrewAI recebe o span da chamada como pai dos spans dele
+    assert len(recebidos) == 1
+    assert recebidos[0].startswith(f"00-{trace_id:032x}-{chamada.context.span_id:016x}-")
+
+
+def test_chamadas_fora_de_um_pedido_nao_geram_trace():
+    recebidos = []
+
+    def handler(request):
+        recebidos.append(request.headers.get("traceparent"))
+        return httpx.Response(200, json={"status": "ok"})
+
+    service = servico_com(handler)
+    spans.clear()
+    asyncio.run(service.check_health())
+
+    assert recebidos == [None]
+    assert spans.get_finished_spans() == ()
+
+
+def test_middleware_continua_o_trace_recebido():
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware)
+
+    @app.get("/projetos/{projeto_id}")
+    def obter(projeto_id: int):
+        return {"id": projeto_id}
+
+    spans.clear()
+    response = TestClient(app).get("/projetos/7", headers={"traceparent": TRACEPARENT})
+
+    assert response.status_code == 200
+    servidor = next(span for span in spans.get_finished_spans() if span.kind == SpanKind.SERVER)
+    assert servidor.name == "GET /projetos/{projeto_id}"
+    assert f"{servidor.context.trace_id:032x}" == "0af7651916cd43dd8448eb211c80319c"
+    assert servidor.parent.span_id == 0xb7ad6b7169203331
+    assert servidor.attributes["http.response.status_code"] == 200
+
+
+def test_exportador_de_arquivo(tmp_path):
+    destino = tmp_path / "traces.jsonl"
+    exportador = JsonLinesSpanExporter(str(destino))
+    with tracer.start_as_current_span("etapa"):
+        pass
+    exportador.export(spans.get_finished_spans()[-1:])
+
+    linhas = destino.read_text(encoding="utf-8").splitlines()
+    assert len(linhas) == 1
+    assert '"name": "etapa"' in linhas[0]
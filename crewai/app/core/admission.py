@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+from app.core import metrics
+from app.core.cancellation import CancelToken
+from app.core.deadline import Deadline
+
+logger = logging.getLogger("crewai_admission")
+
+# Gerações que podem usar o Ollama ao mesmo tempo (0 desliga o controle de admissão)
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "2"))
+# Pedidos que podem esperar por uma vaga; com a fila cheia a resposta é 429 imediato
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "8"))
+# Tempo máximo de espera na fila antes de desistir com 503
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "60"))
+# Duração estimada de uma geração enquanto não há medições, usada no Retry-After
+ADMISSION_INITIAL_ESTIMATE = float(os.getenv("ADMISSION_INITIAL_ESTIMATE", "60"))
+# Peso de cada geração concluída na média móvel da duração
+DURATION_SMOOTHING = 0.2
+# Intervalo com que a espera síncrona confere o token de cancelamento
+CANCEL_POLL_INTERVAL = 0.5
+
+REASON_QUEUE_FULL = "fila_cheia"
+REASON_QUEUE_TIMEOUT = "tempo_de_fila"
+REASON_DEADLINE = "prazo"
+STATUS_BY_REASON = {REASON_QUEUE_FULL: 429, REASON_QUEUE_TIMEOUT: 503, REASON_DEADLINE: 503}
+
+
+class AdmissionRejected(Exception):
+    """Pedido recusado pelo controle de admissão, com o status HTTP e o Retry-After sugerido"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Serviço sobrecarregado ({reason}); tente novamente em {retry_after}s")
+        self.reason = reason
+        self.status_code = STATUS_BY_REASON[reason]
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Limita as gerações simultâneas que chegam ao Ollama. Quem não encontra
+    vaga espera numa fila FIFO limitada; com a fila cheia, com a espera
+    estimada maior que o prazo do pedido ou depois de `queue_timeout`
+    segundos na fila, o pedido é recusado com um Retry-After calculado a
+    partir da duração média das gerações. Serve tanto ao event loop quanto
+    às threads do streaming e dos jobs
+    """
+
+    def __init__(self, max_concurrent: int = ADMISSION_MAX_CONCURRENT, max_queue: int = ADMISSION_MAX_QUEUE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+                 initial_estimate: float = ADMISSION_INITIAL_ESTIMATE):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.average_duration = initial_estimate
+        self._active = 0
+        self._queue: deque[Future] = deque()
+        self._lock = threading.Lock()
+        self._waits: deque[float] = deque(maxlen=1000)
+        self.stats = {"admitidos": 0, "enfileirados": 0, "recusados": {reason: 0 for reason in STATUS_BY_REASON}}
+        if self.enabled:
+            logger.info(f"Controle de admissão: {max_concurrent} gerações simultâneas, fila de {max_queue}")
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrent > 0
+
+    def full(self) -> bool:
+        """Indica se um pedido que chegasse agora seria recusado por fila cheia"""
+        with self._lock:
+            return self.enabled and self._active >= self.max_concurrent and len(self._queue) >= self.max_queue
+
+    def _estimated_wait(self, position: int) -> float:
+        """Espera de quem ocupa a posição `position` da fila (0 é o próximo a ser atendido)"""
+        return (position + 1) * self.average_duration / self.max_concurrent
+
+    def retry_after(self) -> int:
+        """Segundos sugeridos para tentar de novo: quando a fila atual deve ter andado"""
+        with self._lock:
+            return self._retry_after()
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self._estimated_wait(len(self._queue))))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self.stats["recusados"][reason] += 1
+        metrics.admission_rejections.labels(reason).inc()
+        rejected = AdmissionRejected(reason, self._retry_after())
+        logger.warning(f"Pedido recusado: {rejected} ({self._active} em andamento, {len(self._queue)} na fila)")
+        return rejected
+
+    def reject_full(self) -> AdmissionRejected:
+        """Recusa por fila cheia para quem consultou full() antes de entrar, como o streaming"""
+        with self._lock:
+            return self._reject(REASON_QUEUE_FULL)
+
+    def _update_gauges(self):
+        metrics.admission_active.set(self._active)
+        metrics.admission_queue_depth.set(len(self._queue))
+
+    def _enter(self, deadline: Optional[Deadline], bounded: bool) -> Optional[Future]:
+        """Ocupa uma vaga livre (devolve None) ou entra na fila (devolve o Future que recebe a vaga)"""
+        with self._lock:
+            if self._active < self.max_concurrent and not self._queue:
+                self._active += 1
+                self._update_gauges()
+                return None
+            if bounded:
+                if len(self._queue) >= self.max_queue:
+                    raise self._reject(REASON_QUEUE_FULL)
+                # Melhor recusar agora do que ocupar a fila até o prazo acabar
+                if deadline is not None and self._estimated_wait(len(self._queue)) > deadline.remaining():
+                    raise self._reject(REASON_DEADLINE)
+            future = Future()
+            self._queue.append(future)
+            self.stats["enfileirados"] += 1
+            self._update_gauges()
+            return future
+
+    def _abandon(self, future: Future) -> bool:
+        """Tira da fila quem desistiu de esperar; False se a vaga já tinha sido entregue"""
+        with self._lock:
+            if not future.cancel():
+                return False
+            self._queue.remove(future)
+            self._update_gauges()
+            return True
+
+    def _admitted(self, waited: float):
+        with self._lock:
+            self.stats["admitidos"] += 1
+            self._waits.append(waited)
+        metrics.admission_wait.observe(waited)
+
+    def _release(self, duration: Optional[float] = None):
+        """Libera a vaga, passando-a direto ao primeiro da fila"""
+        with self._lock:
+            if duration is not None:
+                self.average_duration += DURATION_SMOOTHING * (duration - self.average_duration)
+            while self._queue:
+                future = self._queue.popleft()
+                if future.set_running_or_notify_cancel():
+                    future.set_result(True)
+                    self._update_gauges()
+                    return
+            self._active -= 1
+            self._update_gauges()
+
+    def _timeout(self, deadline: Optional[Deadline], bounded: bool) -> Optional[float]:
+        """Espera máxima na fila: queue_timeout para pedidos interativos, só o prazo para jobs"""
+        timeout = self.queue_timeout if bounded else None
+        if deadline is not None:
+            timeout = deadline.remaining() if timeout is None else min(timeout, deadline.remaining())
+        return timeout
+
+    @contextmanager
+    def slot(self, deadline: Optional[Deadline] = None, cancel_token: Optional[CancelToken] = None,
+             bounded: bool = True):
+        """
+        Vaga de geração para código síncrono (threads do streaming e dos jobs).
+        Sem `bounded` (jobs) a fila não tem limite e só o prazo limita a espera
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.monotonic()
+        future = self._enter(deadline, bounded)
+        if future is not None:
+            self._wait(future, self._timeout(deadline, bounded), cancel_token)
+        self._admitted(time.monotonic() - start)
+        admitted_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - admitted_at)
+
+    def _wait(self, future: Future, timeout: Optional[float], cancel_token: Optional[CancelToken]):
+        limit = None if timeout is None else time.monotonic() + timeout
+        while True:
+            interval = CANCEL_POLL_INTERVAL if limit is None else min(CANCEL_POLL_INTERVAL, limit - time.monotonic())
+            try:
+                future.result(timeout=max(0.0, interval))
+            except FutureTimeoutError:
+                cancelled = cancel_token is not None and cancel_token.cancelled
+                if not cancelled and (limit is None or time.monotonic() < limit):
+                    continue
+                if self._abandon(future):
+                    if cancelled:
+                        cancel_token.raise_if_cancelled()
+                    with self._lock:
+                        raise self._reject(REASON_QUEUE_TIMEOUT)
+                # A vaga chegou junto com a desistência
+                if cancelled:
+                    self._release()
+                    cancel_token.raise_if_cancelled()
+                future.result()
+            return
+
+    @asynccontextmanager
+    async def aslot(self, deadline: Optional[Deadline] = None, bounded: bool = True):
+        """Vaga de geração para o pipeline assíncrono; o cancelamento da task tira o pedido da fila"""
+        if not self.enabled:
+            yield
+            return
+        start = time.monotonic()
+        future = self._enter(deadline, bounded)
+        if future is not None:
+            try:
+                # shield: quem decide tirar o pedido da fila é _abandon, não o cancelamento do asyncio
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self._timeout(deadline, bounded))
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if self._abandon(future):
+                    if isinstance(e, asyncio.CancelledError):
+                        raise
+                    with self._lock:
+                        raise self._reject(REASON_QUEUE_TIMEOUT) from None
+                if isinstance(e, asyncio.CancelledError):
+                    self._release()
+                    raise
+        self._admitted(time.monotonic() - start)
+        admitted_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - admitted_at)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            stats = {
+                "habilitado": self.enabled,
+                "vagas": self.max_concurrent,
+                "em_andamento": self._active,
+                "fila": len(self._queue),
+                "fila_max": self.max_queue,
+                "timeout_fila_s": self.queue_timeout,
+                "admitidos": self.stats["admitidos"],
+                "enfileirados": self.stats["enfileirados"],
+                "recusados": dict(self.stats["recusados"]),
+                "duracao_media_s": round(self.average_duration, 2),
+                "retry_after_s": self._retry_after() if self.enabled else 0
+            }
+        stats["espera_p50_s"] = round(waits[len(waits) // 2], 3) if waits else None
+        stats["espera_p99_s"] = round(waits[min(len(waits) - 1, int(len(waits) * 0.99))], 3) if waits else None
+        return stats
+
+
+admission = AdmissionController()
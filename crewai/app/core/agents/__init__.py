@@ -1,12 +1,49 @@
-from .specialist_agent import create_specialist_agent, execute_specialist_task
-from .project_manager_agent import create_project_manager_agent, execute_project_manager_task
-from .utils import extract_section, extract_resources
+from .specialist_agent import (
+    create_specialist_agent,
+    create_specialist_agents,
+    execute_specialist_task,
+    aexecute_specialist_task,
+    stream_specialist_task,
+    iter_specialists_parallel,
+    execute_specialists_parallel,
+    aexecute_specialists_parallel,
+    merge_specialist_results
+)
+from .project_manager_agent import (
+    create_project_manager_agent,
+    execute_project_manager_task,
+    aexecute_project_manager_task,
+    execute_project_manager_structured,
+    aexecute_project_manager_structured,
+    stream_project_manager_task
+)
+from .structured_output import STRUCTURED_OUTPUT, ProjectPlan, merge_plan, missing_fields, parse_plan, plan_from_markdown
+from .utils import extract_section, extract_resources, SectionIndexer, StreamingSectionSplitter
 
 __all__ = [
     'create_specialist_agent',
+    'create_specialist_agents',
     'execute_specialist_task',
+    'aexecute_specialist_task',
+    'stream_specialist_task',
+    'iter_specialists_parallel',
+    'execute_specialists_parallel',
+    'aexecute_specialists_parallel',
+    'merge_specialist_results',
     'create_project_manager_agent',
     'execute_project_manager_task',
+    'aexecute_project_manager_task',
+    'execute_project_manager_structured',
+    'aexecute_project_manager_structured',
+    'stream_project_manager_task',
+    'STRUCTURED_OUTPUT',
+    'ProjectPlan',
+    'merge_plan',
+    'missing_fields',
+    'parse_plan',
+    'plan_from_markdown',
     'extract_section',
-    'extract_resources'
+    'extract_resources',
+    'SectionIndexer',
+    'StreamingSectionSplitter'
 ] 
\ No newline at end of file
@@ -1,73 +1,248 @@
-from crewai import Agent
 from app.core.litellm_adapter import llm_adapter
+from app.core.cancellation import CancelToken, GenerationCancelled, current_token
+from app.core.deadline import DEADLINE_REASON, current_deadline, has_budget, max_tokens_for, stage_timeout
+from app.core.model_router import STAGE_DEFAULT
+from app.core import metrics
+from app.core.tracing import current_span, tracer
+from concurrent.futures import ThreadPoolExecutor, wait
+import asyncio
+import contextvars
 import logging
+import os
 import time
 
 logger = logging.getLogger("crewai_agents")
 
-def execute_task_directly(agent, task_description, expected_output):
+# Pool compartilhado para as chamadas ao LLM; uma chamada cancelada devolve a
+# thread assim que o stream é fechado, sem bloquear quem esperava por ela
+_llm_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LLM_MAX_WORKERS", "16")),
+    thread_name_prefix="llm"
+)
+# Intervalo com que a espera verifica se o pedido foi cancelado
+CANCEL_POLL_INTERVAL = 0.5
+
+def build_agent_prompt(agent, task_description):
     """
-    Executa o agente com timeout aumentado e prompt simplificado
+    Monta o prompt simplificado para reduzir o tempo de processamento
     """
-    try:
-        logger.info(f"Executando agente diretamente: {agent.role}")
-        
-        # Prompt simplificado para reduzir o tempo de processamento
-        full_prompt = f"""
+    return f"""
         {agent.role} deve responder de forma objetiva e relevante. Tarefa:
         {task_description}
         Resposta deve ser completa e específica para o projeto.
         """
+
+def _call_llm(prompt, timeout, parent_token, stage=STAGE_DEFAULT, area=None, response_format=None):
+    """
+    Chama o LLM numa thread do pool compartilhado e espera no máximo timeout
+    segundos. No timeout ou no cancelamento do pedido, a chamada é cancelada
+    (fechando a conexão com o Ollama) e o slot é liberado sem esperar a thread.
+    O timeout e o max_tokens são limitados ao orçamento restante do pedido;
+    stage e area escolhem o modelo no model_router e response_format pede
+    uma saída JSON restrita a um schema
+    """
+    timeout = stage_timeout(timeout)
+    if timeout <= 0:
+        raise GenerationCancelled(DEADLINE_REASON)
+    call_token = CancelToken(parent=parent_token)
+    context = contextvars.copy_context()
+    future = _llm_executor.submit(
+        context.run, llm_adapter.chat, [{"role": "user", "content": prompt}], call_token,
+        max_tokens_for(timeout), timeout, stage=stage, area=area, response_format=response_format
+    )
+    deadline = time.time() + timeout
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            call_token.cancel("timeout")
+            raise TimeoutError()
+        done, _ = wait([future], timeout=min(remaining, CANCEL_POLL_INTERVAL))
+        if done:
+            return future.result()
+        if parent_token is not None and parent_token.cancelled:
+            call_token.cancel(parent_token.reason)
+            raise GenerationCancelled(parent_token.reason)
+
+def _agent_span(agent, stage, area):
+    """Span de uma execução do agente; as chamadas ao LLM feitas nela ficam como filhas"""
+    return tracer.start_as_current_span("agente", attributes={
+        "crewai.agent": agent.role, "crewai.stage": stage, "crewai.area": area or "",
+        "crewai.retries": 0, "crewai.timeout_hit": False
+    })
+
+def _fallback_result(agent, detail=None, stage=STAGE_DEFAULT):
+    """Resultado degradado devolvido quando o agente não consegue responder"""
+    metrics.fallbacks.labels(stage, "agente").inc()
+    current_span().set_attribute("crewai.fallback", True)
+    if detail:
+        return {
+            "agent": agent.role,
+            "result": f"Análise técnica simplificada (erro: {detail[:50]}...)",
+            "success": False
+        }
+    return {
+        "agent": agent.role,
+        "result": f"Análise técnica simplificada para projeto utilizando as tecnologias solicitadas.",
+        "success": False
+    }
+
+def execute_task_directly(agent, task_description, expected_output, timeout=10000, retry_timeout=500,
+                          stage=STAGE_DEFAULT, area=None, response_format=None):
+    """
+    Executa o agente com timeout aumentado e prompt simplificado.
+    Com retry_timeout <= 0, ou sem orçamento restante no prazo do pedido,
+    não há segunda tentativa após o timeout
+    """
+    with _agent_span(agent, stage, area) as span:
+        try:
+            logger.info(f"Executando agente diretamente: {agent.role}")
         
-        start_time = time.time()
+            full_prompt = build_agent_prompt(agent, task_description)
         
-        # Sempre usar o adaptador do LiteLLM
-        agent_llm = llm_adapter
+            start_time = time.time()
+            parent_token = current_token()
         
-        # Adicionar timeout para a chamada
-        from concurrent.futures import ThreadPoolExecutor, TimeoutError
-        with ThreadPoolExecutor() as executor:
-            # Iniciar chamada com timeout aumentado para 1000 segundos
-            future = executor.submit(agent_llm.chat, [{"role": "user", "content": full_prompt}])
-            
             try:
-                # Aguardar no máximo 1000 segundos
-                result = future.result(timeout=10000)
+                result = _call_llm(full_prompt, timeout, parent_token, stage, area, response_format)
             except TimeoutError:
+                metrics.timeouts.labels(stage).inc()
+                span.set_attribute("crewai.timeout_hit", True)
+                span.add_event("timeout", {"tentativa": 1})
+                if retry_timeout <= 0 or not has_budget():
+                    logger.error(f"Timeout ao processar {agent.role}")
+                    return _fallback_result(agent, stage=stage)
                 logger.warning(f"Timeout ao processar {agent.role}, tentando novamente com prompt mais curto")
+                metrics.retries.labels(stage, "timeout").inc()
+                span.set_attribute("crewai.retries", 1)
                 # Tentar novamente com prompt mais curto
                 retry_prompt = f"""
                 {agent.role}, forneça uma resposta concisa para:
                 {task_description}
                 """
                 try:
-                    future = executor.submit(agent_llm.chat, [{"role": "user", "content": retry_prompt}])
-                    result = future.result(timeout=500)  # Timeout menor para a segunda tentativa
+                    result = _call_llm(retry_prompt, retry_timeout, parent_token, stage, area, response_format)  # Timeout menor para a segunda tentativa
                 except TimeoutError:
+                    metrics.timeouts.labels(stage).inc()
+                    span.add_event("timeout", {"tentativa": 2})
                     logger.error(f"Timeout na segunda tentativa para {agent.role}")
-                    return {
-                        "agent": agent.role,
-                        "result": f"Análise técnica simplificada para projeto utilizando as tecnologias solicitadas.",
-                        "success": False
-                    }
+                    return _fallback_result(agent, stage=stage)
         
-        execution_time = time.time() - start_time
-        logger.info(f"Execução direta de {agent.role} concluída em {execution_time:.2f} segundos")
+            execution_time = time.time() - start_time
+            logger.info(f"Execução direta de {agent.role} concluída em {execution_time:.2f} segundos")
         
-        # Verificar se a resposta é muito curta ou vazia
-        if not result or len(result) < 50:
-            logger.warning(f"Resposta muito curta de {agent.role}, tentando novamente")
-            return execute_task_directly(agent, task_description, expected_output)
+            # Verificar se a resposta é muito curta ou vazia
+            if not result or len(result) < 50:
+                if not has_budget():
+                    logger.warning(f"Resposta muito curta de {agent.role}, sem tempo para nova tentativa")
+                    return {"agent": agent.role, "result": result or "", "success": False}
+                logger.warning(f"Resposta muito curta de {agent.role}, tentando novamente")
+                metrics.short_response_recursions.labels(stage).inc()
+                span.add_event("resposta_curta", {"caracteres": len(result or "")})
+                return execute_task_directly(
+                    agent, task_description, expected_output, timeout, retry_timeout, stage, area, response_format
+                )
         
-        return {
-            "agent": agent.role,
-            "result": result,
-            "success": True
-        }
-    except Exception as e:
-        logger.error(f"Erro ao executar agente diretamente {agent.role}: {str(e)}")
-        return {
-            "agent": agent.role,
-            "result": f"Análise técnica simplificada (erro: {str(e)[:50]}...)",
-            "success": False
-        } 
\ No newline at end of file
+            return {
+                "agent": agent.role,
+                "result": result,
+                "success": True
+            }
+        except GenerationCancelled as e:
+            logger.warning(f"Execução de {agent.role} cancelada: {str(e)}")
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao executar agente diretamente {agent.role}: {str(e)}")
+            return _fallback_result(agent, str(e), stage)
+
+async def _acall_llm(prompt, timeout, stage=STAGE_DEFAULT, area=None, response_format=None):
+    """Chamada assíncrona ao LLM limitada ao timeout e ao prazo do pedido"""
+    timeout = stage_timeout(timeout)
+    if timeout <= 0:
+        raise GenerationCancelled(DEADLINE_REASON)
+    return await asyncio.wait_for(
+        llm_adapter.achat(
+            [{"role": "user", "content": prompt}], max_tokens_for(timeout), timeout,
+            stage=stage, area=area, response_format=response_format
+        ),
+        timeout
+    )
+
+async def aexecute_task_directly(agent, task_description, expected_output, timeout=10000, retry_timeout=500,
+                                 stage=STAGE_DEFAULT, area=None, response_format=None):
+    """
+    Versão assíncrona de execute_task_directly: mesma política de timeout e
+    nova tentativa, sem ocupar uma thread enquanto espera o Ollama
+    """
+    with _agent_span(agent, stage, area) as span:
+        try:
+            logger.info(f"Executando agente (assíncrono): {agent.role}")
+            start_time = time.time()
+
+            try:
+                result = await _acall_llm(build_agent_prompt(agent, task_description), timeout, stage, area, response_format)
+            except asyncio.TimeoutError:
+                metrics.timeouts.labels(stage).inc()
+                span.set_attribute("crewai.timeout_hit", True)
+                span.add_event("timeout", {"tentativa": 1})
+                if retry_timeout <= 0 or not has_budget():
+                    logger.error(f"Timeout ao processar {agent.role}")
+                    return _fallback_result(agent, stage=stage)
+                logger.warning(f"Timeout ao processar {agent.role}, tentando novamente com prompt mais curto")
+                metrics.retries.labels(stage, "timeout").inc()
+                span.set_attribute("crewai.retries", 1)
+                retry_prompt = f"""
+                {agent.role}, forneça uma resposta concisa para:
+                {task_description}
+                """
+                try:
+                    result = await _acall_llm(retry_prompt, retry_timeout, stage, area, response_format)
+                except asyncio.TimeoutError:
+                    metrics.timeouts.labels(stage).inc()
+                    span.add_event("timeout", {"tentativa": 2})
+                    logger.error(f"Timeout na segunda tentativa para {agent.role}")
+                    return _fallback_result(agent, stage=stage)
+
+            logger.info(f"Execução assíncrona de {agent.role} concluída em {time.time() - start_time:.2f} segundos")
+
+            if not result or len(result) < 50:
+                if not has_budget():
+                    logger.warning(f"Resposta muito curta de {agent.role}, sem tempo para nova tentativa")
+                    return {"agent": agent.role, "result": result or "", "success": False}
+                logger.warning(f"Resposta muito curta de {agent.role}, tentando novamente")
+                metrics.short_response_recursions.labels(stage).inc()
+                span.add_event("resposta_curta", {"caracteres": len(result or "")})
+                return await aexecute_task_directly(
+                    agent, task_description, expected_output, timeout, retry_timeout, stage, area, response_format
+                )
+
+            return {
+                "agent": agent.role,
+                "result": result,
+                "success": True
+            }
+        except GenerationCancelled as e:
+            logger.warning(f"Execução de {agent.role} cancelada: {str(e)}")
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao executar agente {agent.role} (assíncrono): {str(e)}")
+            return _fallback_result(agent, str(e), stage)
+
+def stream_task_directly(agent, task_description, cancel_token=None, stage=STAGE_DEFAULT, area=None):
+    """
+    Executa o agente em modo streaming, produzindo os tokens à medida que chegam
+    """
+    logger.info(f"Executando agente em streaming: {agent.role}")
+    full_prompt = build_agent_prompt(agent, task_description)
+
+    start_time = time.time()
+    cancel_token = cancel_token or current_token()
+    deadline = current_deadline()
+    max_tokens = max_tokens_for(deadline.remaining()) if deadline is not None else 2000
+    for token in llm_adapter.chat_stream(
+        [{"role": "user", "content": full_prompt}], cancel_token=cancel_token, max_tokens=max_tokens,
+        stage=stage, area=area
+    ):
+        yield token
+
+    execution_time = time.time() - start_time
+    logger.info(f"Streaming de {agent.role} concluído em {execution_time:.2f} segundos")
@@ -1,14 +1,28 @@
-from crewai import Agent
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
 from app.core.litellm_adapter import llm_adapter
-from .base_agent import execute_task_directly
+from .base_agent import aexecute_task_directly, execute_task_directly, stream_task_directly
+from .prompt_compaction import PROMPT_COMPACTION, compact_prompt_inputs
+from .structured_output import (
+    STRUCTURED_REPAIR_ATTEMPTS, ProjectPlan, describe_fields, merge_plan, missing_fields, parse_plan, response_format
+)
+from app.core.deadline import has_budget
+from app.core.model_router import STAGE_PROJECT_MANAGER
+from app.core import metrics
 import logging
 
+if TYPE_CHECKING:
+    from crewai import Agent
+
 logger = logging.getLogger("crewai_agents")
 
 def create_project_manager_agent() -> Agent:
     """
     Cria o agente gerente de projeto
     """
+    from crewai import Agent  # import pesado, adiado até o primeiro pedido
+
     project_manager = Agent(
         role="Gerente de Projeto",
         goal="Organizar o plano de projeto",
@@ -19,11 +33,11 @@ def create_project_manager_agent() -> Agent:
     
     return project_manager
 
-def execute_project_manager_task(project_manager: Agent, specialist_result: dict, full_description: str) -> dict:
+def build_project_manager_task(specialist_result: dict, full_description: str) -> str:
     """
-    Executa a tarefa do gerente de projeto
+    Monta a descrição da tarefa do gerente de projeto
     """
-    pm_task = f"""
+    return f"""
     Com base na análise técnica abaixo:
 
     {specialist_result.get('result', 'N/A')}
@@ -96,9 +110,160 @@ def execute_project_manager_task(project_manager: Agent, specialist_result: dict
 
     Seja específico e forneça exemplos práticos quando possível.
     """
+
+def build_project_manager_json_task(specialist_result: dict, full_description: str) -> str:
+    """
+    Monta a tarefa do gerente no modo estruturado: a resposta é um objeto
+    JSON com os campos do resultado final, validado pelo schema
+    """
+    return f"""
+    Com base na análise técnica abaixo:
+
+    {specialist_result.get('result', 'N/A')}
+
+    E na descrição original do projeto:
+
+    {full_description}
+
+    Crie um plano de projeto detalhado. Responda apenas com um objeto JSON com os campos:
+
+    {describe_fields()}
+
+    Seja específico e forneça exemplos práticos quando possível.
+    """
+
+def build_repair_task(plan: ProjectPlan, missing: list[str], specialist_result: dict, full_description: str) -> str:
+    """
+    Monta a tarefa de reparo: pede somente os campos que faltaram, com os já
+    gerados como contexto
+    """
+    return f"""
+    Com base na análise técnica abaixo:
+
+    {specialist_result.get('result', 'N/A')}
+
+    E na descrição original do projeto:
+
+    {full_description}
+
+    Parte do plano de projeto já foi escrita:
+
+    {plan.model_dump_json(include=set(plan.model_fields) - set(missing), indent=2)}
+
+    Complete o plano respondendo apenas com um objeto JSON com os campos:
+
+    {describe_fields(missing)}
+    """
+
+def compact_inputs(specialist_result: dict, full_description: str, build_task=build_project_manager_task):
+    """
+    Compacta a análise dos especialistas e a descrição para que o prompt do
+    gerente caiba em PM_PROMPT_MAX_TOKENS (se PROMPT_COMPACTION estiver ativo)
+    """
+    if not PROMPT_COMPACTION:
+        return specialist_result, full_description
+    specialist_text, description, _ = compact_prompt_inputs(
+        specialist_result.get('result', ''), full_description,
+        lambda text, desc: build_task({"result": text}, desc)
+    )
+    return {**specialist_result, "result": specialist_text}, description
+
+@metrics.timed(metrics.STAGE_PROJECT_MANAGER)
+def execute_project_manager_task(project_manager: Agent, specialist_result: dict, full_description: str) -> dict:
+    """
+    Executa a tarefa do gerente de projeto
+    """
+    specialist_result, full_description = compact_inputs(specialist_result, full_description)
+    pm_task = build_project_manager_task(specialist_result, full_description)
     
     logger.info("Executando tarefa do gerente de projeto...")
-    pm_result = execute_task_directly(project_manager, pm_task, "Plano de projeto estruturado")
+    pm_result = execute_task_directly(
+        project_manager, pm_task, "Plano de projeto estruturado", stage=STAGE_PROJECT_MANAGER
+    )
     logger.info(f"Resultado do gerente: {pm_result.get('result', '')[:200]}...")
     
-    return pm_result 
\ No newline at end of file
+    return pm_result 
+
+@metrics.timed(metrics.STAGE_PROJECT_MANAGER)
+async def aexecute_project_manager_task(project_manager: Agent, specialist_result: dict, full_description: str) -> dict:
+    """
+    Versão assíncrona de execute_project_manager_task
+    """
+    specialist_result, full_description = compact_inputs(specialist_result, full_description)
+    pm_task = build_project_manager_task(specialist_result, full_description)
+    pm_result = await aexecute_task_directly(
+        project_manager, pm_task, "Plano de projeto estruturado", stage=STAGE_PROJECT_MANAGER
+    )
+    logger.info(f"Resultado do gerente: {pm_result.get('result', '')[:200]}...")
+    return pm_result
+
+@metrics.timed(metrics.STAGE_PROJECT_MANAGER)
+def execute_project_manager_structured(project_manager: Agent, specialist_result: dict, full_description: str) -> dict:
+    """
+    Executa a tarefa do gerente pedindo JSON restrito ao schema do resultado.
+    Campos ausentes ou vazios são completados por uma chamada de reparo que
+    pede só esses campos, em vez de repetir a etapa inteira
+    """
+    logger.info("Executando tarefa do gerente de projeto (saída estruturada)...")
+    specialist_result, full_description = compact_inputs(
+        specialist_result, full_description, build_project_manager_json_task
+    )
+    pm_result = execute_task_directly(
+        project_manager, build_project_manager_json_task(specialist_result, full_description),
+        "Plano de projeto em JSON", stage=STAGE_PROJECT_MANAGER, response_format=response_format()
+    )
+    plan = parse_plan(pm_result.get("result", ""))
+    missing = missing_fields(plan)
+
+    for _ in range(STRUCTURED_REPAIR_ATTEMPTS):
+        if not missing or not has_budget():
+            break
+        logger.warning(f"Campos ausentes no plano estruturado: {missing}, reparando só esses campos")
+        repair = execute_task_directly(
+            project_manager, build_repair_task(plan, missing, specialist_result, full_description),
+            "Campos do plano em JSON", retry_timeout=0,
+            stage=STAGE_PROJECT_MANAGER, response_format=response_format(missing)
+        )
+        plan = merge_plan(plan, parse_plan(repair.get("result", "")), missing)
+        missing = missing_fields(plan)
+
+    return {"agent": project_manager.role, "plan": plan, "missing": missing, "success": not missing}
+
+@metrics.timed(metrics.STAGE_PROJECT_MANAGER)
+async def aexecute_project_manager_structured(project_manager: Agent, specialist_result: dict,
+                                              full_description: str) -> dict:
+    """
+    Versão assíncrona de execute_project_manager_structured
+    """
+    specialist_result, full_description = compact_inputs(
+        specialist_result, full_description, build_project_manager_json_task
+    )
+    pm_result = await aexecute_task_directly(
+        project_manager, build_project_manager_json_task(specialist_result, full_description),
+        "Plano de projeto em JSON", stage=STAGE_PROJECT_MANAGER, response_format=response_format()
+    )
+    plan = parse_plan(pm_result.get("result", ""))
+    missing = missing_fields(plan)
+
+    for _ in range(STRUCTURED_REPAIR_ATTEMPTS):
+        if not missing or not has_budget():
+            break
+        logger.warning(f"Campos ausentes no plano estruturado: {missing}, reparando só esses campos")
+        repair = await aexecute_task_directly(
+            project_manager, build_repair_task(plan, missing, specialist_result, full_description),
+            "Campos do plano em JSON", retry_timeout=0,
+            stage=STAGE_PROJECT_MANAGER, response_format=response_format(missing)
+        )
+        plan = merge_plan(plan, parse_plan(repair.get("result", "")), missing)
+        missing = missing_fields(plan)
+
+    return {"agent": project_manager.role, "plan": plan, "missing": missing, "success": not missing}
+
+def stream_project_manager_task(project_manager: Agent, specialist_result: dict, full_description: str, cancel_token=None):
+    """
+    Executa a tarefa do gerente de projeto em streaming, produzindo os tokens gerados
+    """
+    logger.info("Executando tarefa do gerente de projeto em streaming...")
+    specialist_result, full_description = compact_inputs(specialist_result, full_description)
+    pm_task = build_project_manager_task(specialist_result, full_description)
+    yield from stream_task_directly(project_manager, pm_task, cancel_token, stage=STAGE_PROJECT_MANAGER)
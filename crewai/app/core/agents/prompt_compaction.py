@@ -0,0 +1,218 @@
+import logging
+import os
+import re
+import threading
+from collections import deque
+from typing import Callable
+
+from app.core.litellm_adapter import llm_adapter
+from app.service.exa_search import EXA_RESULT_SEPARATOR, EXA_SECTION_TITLE
+from .utils import SectionIndexer
+
+logger = logging.getLogger("crewai_compaction")
+
+# Compacta a análise dos especialistas e a descrição antes do prompt do gerente
+PROMPT_COMPACTION = os.getenv("PROMPT_COMPACTION", "true").lower() == "true"
+# Limite de tokens do prompt do gerente (template + análise + descrição)
+PM_PROMPT_MAX_TOKENS = int(os.getenv("PM_PROMPT_MAX_TOKENS", "3000"))
+# Linhas mantidas de cada bloco de código da análise (árvores de diretórios, exemplos)
+MAX_CODE_LINES = int(os.getenv("PROMPT_MAX_CODE_LINES", "25"))
+# Linhas mais curtas que isso não são consideradas repetição da descrição
+MIN_DEDUP_CHARS = 25
+
+_BULLET = re.compile(r"^\s*(?:[-*+•]|\d+[.)])\s+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def key_points(text: str, description: str = "", summarize: bool = True) -> list[tuple[str, list[str]]]:
+    """
+    Pontos-chave da análise por seção: títulos, itens de lista, a primeira
+    frase de cada parágrafo e os blocos de código (limitados a MAX_CODE_LINES).
+    Linhas repetidas na própria análise ou que repetem a descrição do
+    projeto são descartadas. Com summarize=False só a deduplicação é feita
+    """
+    known = _normalize(description)
+    seen = set()
+    headers = {section.start for section in SectionIndexer.build(text).sections}
+    sections: list[tuple[str, list[str]]] = [("", [])]
+
+    position = 0
+    in_code = False
+    in_paragraph = False
+    code_lines = 0
+    for line in text.splitlines(keepends=True):
+        position += len(line)
+        stripped = line.strip()
+        if position in headers and not in_code:
+            # O conteúdo da seção começa logo depois desta linha: é o título
+            sections.append((stripped, []))
+            in_paragraph = False
+            continue
+        items = sections[-1][1]
+        if stripped.startswith(("```", "~~~")):
+            in_code = not in_code
+            code_lines = 0
+            items.append(stripped)
+            continue
+        if in_code:
+            code_lines += 1
+            if code_lines <= MAX_CODE_LINES or not summarize:
+                items.append(line.rstrip())
+            elif code_lines == MAX_CODE_LINES + 1:
+                items.append("...")
+            continue
+        if not stripped:
+            in_paragraph = False
+            continue
+        normalized = _normalize(stripped)
+        if normalized in seen or (len(normalized) >= MIN_DEDUP_CHARS and normalized in known):
+            continue
+        seen.add(normalized)
+        if _BULLET.match(line) or not summarize:
+            items.append(line.rstrip())
+            in_paragraph = False
+        elif not in_paragraph:
+            # Só a primeira frase de cada parágrafo
+            items.append(_SENTENCE_END.split(stripped, 1)[0])
+            in_paragraph = True
+    return [(title, items) for title, items in sections if items or title]
+
+
+def _render(sections: list[tuple[str, list[str]]]) -> str:
+    parts = []
+    for title, items in sections:
+        block = "\n".join(([title] if title else []) + items).strip()
+        if block:
+            parts.append(block)
+    return "\n\n".join(parts)
+
+
+def _fit_sections(sections, budget: int, tokens_per_char: float) -> list[tuple[str, list[str]]]:
+    """Distribui o orçamento entre as seções em rodízio, para que todas mantenham seus primeiros itens"""
+    cost = lambda line: int(len(line) * tokens_per_char) + 1
+    kept = [(title, []) for title, _ in sections]
+    used = sum(cost(title) for title, _ in sections if title)
+    depth = 0
+    progress = True
+    while progress:
+        progress = False
+        for (title, items), (_, target) in zip(sections, kept):
+            if depth < len(items):
+                progress = True
+                if used + cost(items[depth]) > budget:
+                    return kept
+                target.append(items[depth])
+                used += cost(items[depth])
+        depth += 1
+    return kept
+
+
+def _truncate(text: str, budget: int, tokens_per_char: float) -> str:
+    """Corta o texto em fim de linha (ou de palavra) para caber em budget tokens"""
+    max_chars = int(budget / tokens_per_char) if tokens_per_char else len(text)
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind("\n", 0, max_chars)
+    if cut < max_chars // 2:
+        cut = text.rfind(" ", 0, max_chars)
+    return text[:max(cut, 0)].rstrip() + " [...]"
+
+
+def _fit_description(description: str, budget: int, tokens_per_char: float) -> str:
+    """
+    Reduz a descrição ao orçamento: os resultados da EXA são cortados primeiro,
+    cada um com a mesma fatia; o texto do pedido só é cortado em último caso
+    """
+    head, marker, exa = description.partition(EXA_SECTION_TITLE)
+    head_cost = len(head) * tokens_per_char
+    if not marker or head_cost >= budget:
+        return _truncate(head.rstrip(), budget, tokens_per_char)
+    results = [r.strip() for r in exa.split(EXA_RESULT_SEPARATOR) if r.strip()]
+    share = (budget - head_cost - len(marker) * tokens_per_char) / max(len(results), 1)
+    if share < 20:
+        return head.rstrip()
+    return head + marker + "\n" + EXA_RESULT_SEPARATOR.join(_truncate(r, share, tokens_per_char) for r in results)
+
+
+def compact_prompt_inputs(specialist_text: str, full_description: str, build_prompt: Callable[[str, str], str],
+                          max_tokens: int = PM_PROMPT_MAX_TOKENS) -> tuple[str, str, dict]:
+    """
+    Compacta a análise dos especialistas e a descrição para que o prompt
+    montado por build_prompt(análise, descrição) caiba em max_tokens. Devolve
+    a análise, a descrição e a contagem de tokens antes e depois
+    """
+    before = llm_adapter.count_tokens(build_prompt(specialist_text, full_description))
+    overhead = llm_adapter.count_tokens(build_prompt("", ""))
+
+    target = max(max_tokens - overhead, 0)
+    description = full_description
+    # Primeiro só remove o que repete a descrição; se não couber, fica com os pontos-chave
+    specialist = _render(key_points(specialist_text, full_description, summarize=False))
+    body_tokens = llm_adapter.count_tokens(specialist) + llm_adapter.count_tokens(description)
+    if body_tokens > target:
+        sections = key_points(specialist_text, full_description)
+        specialist = _render(sections)
+        body_tokens = llm_adapter.count_tokens(specialist) + llm_adapter.count_tokens(description)
+
+        # O corte usa uma estimativa por caractere; se o tokenizer ainda contar
+        # mais que o alvo, o orçamento é apertado e o corte refeito
+        budget = target
+        for _ in range(3):
+            if body_tokens <= target:
+                break
+            tokens_per_char = body_tokens / max(len(specialist) + len(description), 1)
+            # A descrição (pedido do usuário + EXA) fica com metade do orçamento,
+            # ou com o que a análise não usar
+            specialist_need = len(_render(sections)) * tokens_per_char
+            description_budget = min(len(full_description) * tokens_per_char, max(budget / 2, budget - specialist_need))
+            description = _fit_description(full_description, description_budget, tokens_per_char)
+            specialist_budget = budget - len(description) * tokens_per_char
+            specialist = _render(_fit_sections(sections, specialist_budget, tokens_per_char))
+            body_tokens = llm_adapter.count_tokens(specialist) + llm_adapter.count_tokens(description)
+            if body_tokens > target:
+                budget = int(budget * target / body_tokens)
+
+    after = llm_adapter.count_tokens(build_prompt(specialist, description))
+    report = {"tokens_antes": before, "tokens_depois": after, "limite": max_tokens}
+    compaction_stats.record(report)
+    logger.info(f"Prompt do gerente compactado: {before} -> {after} tokens (limite {max_tokens})")
+    return specialist, description, report
+
+
+class CompactionStats:
+    """Contagem de tokens do prompt do gerente antes e depois da compactação"""
+
+    def __init__(self, history: int = 50):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=history)
+        self.requests = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.over_limit = 0
+
+    def record(self, report: dict):
+        with self._lock:
+            self.requests += 1
+            self.tokens_before += report["tokens_antes"]
+            self.tokens_after += report["tokens_depois"]
+            self.over_limit += int(report["tokens_depois"] > report["limite"])
+            self._recent.append(report)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "habilitado": PROMPT_COMPACTION,
+                "limite": PM_PROMPT_MAX_TOKENS,
+                "pedidos": self.requests,
+                "tokens_antes_medio": round(self.tokens_before / self.requests) if self.requests else 0,
+                "tokens_depois_medio": round(self.tokens_after / self.requests) if self.requests else 0,
+                "acima_do_limite": self.over_limit,
+                "recentes": list(self._recent)
+            }
+
+
+compaction_stats = CompactionStats()
@@ -1,55 +1,89 @@
-from crewai import Agent
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
 from app.core.litellm_adapter import llm_adapter
-from .base_agent import execute_task_directly
+from .base_agent import aexecute_task_directly, execute_task_directly, stream_task_directly
+from app.core.cancellation import GenerationCancelled, current_token, use_token
+from app.core.model_router import STAGE_SPECIALIST
+from app.core import metrics
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+import contextvars
 import logging
+import os
+import re
+import time
+
+if TYPE_CHECKING:
+    from crewai import Agent
 
 logger = logging.getLogger("crewai_agents")
 
-def create_specialist_agent(selected_areas: list[str]) -> Agent:
-    """
-    Cria o agente especialista com base nas áreas selecionadas
-    """
-    # Determinar o especialista principal com base nas áreas selecionadas
-    primary_role = "Especialista Web"  # default
-    primary_goal = "Definir arquitetura técnica completa"
-    primary_backstory = "Especialista em desenvolvimento de software com conhecimento em múltiplas tecnologias."
-    
-    # Escolher especialidade principal com base na primeira área selecionada
-    if "Web" in selected_areas or len(selected_areas) == 0:
-        primary_role = "Especialista Web"
-        primary_backstory = "Especialista em desenvolvimento web full-stack."
-    elif "Mobile" in selected_areas:
-        primary_role = "Especialista Mobile"
-        primary_backstory = "Especialista em desenvolvimento mobile com React Native ou Flutter."
-    elif "Desktop" in selected_areas:
-        primary_role = "Especialista Desktop"
-        primary_backstory = "Especialista em aplicações desktop."
-    elif "API" in selected_areas:
-        primary_role = "Especialista Backend/API"
-        primary_backstory = "Especialista em desenvolvimento backend e APIs."
-    elif "Inteligência Artificial" in selected_areas or "Machine Learning" in selected_areas:
-        primary_role = "Especialista IA/ML"
-        primary_backstory = "Especialista em IA/ML e implementações práticas."
-    elif "Jogos" in selected_areas:
-        primary_role = "Especialista em Jogos"
-        primary_backstory = "Especialista em desenvolvimento de jogos."
-    
-    # Criar o especialista principal
-    specialist = Agent(
-        role=primary_role,
-        goal=primary_goal,
-        backstory=primary_backstory,
+SPECIALIST_CONCURRENCY = int(os.getenv("SPECIALIST_CONCURRENCY", "3"))
+SPECIALIST_TIMEOUT = float(os.getenv("SPECIALIST_TIMEOUT", "600"))
+
+# Especialista de cada área selecionável no frontend: (papel, backstory)
+AREA_SPECIALISTS = {
+    "Web": ("Especialista Web", "Especialista em desenvolvimento web full-stack."),
+    "Mobile": ("Especialista Mobile", "Especialista em desenvolvimento mobile com React Native ou Flutter."),
+    "Desktop": ("Especialista Desktop", "Especialista em aplicações desktop."),
+    "API": ("Especialista Backend/API", "Especialista em desenvolvimento backend e APIs."),
+    "Inteligência Artificial": ("Especialista IA/ML", "Especialista em IA/ML e implementações práticas."),
+    "Machine Learning": ("Especialista IA/ML", "Especialista em IA/ML e implementações práticas."),
+    "Jogos": ("Especialista em Jogos", "Especialista em desenvolvimento de jogos."),
+    "IoT": ("Especialista IoT", "Especialista em sistemas embarcados e dispositivos conectados."),
+    "Blockchain": ("Especialista Blockchain", "Especialista em contratos inteligentes e aplicações descentralizadas."),
+    "Segurança": ("Especialista em Segurança", "Especialista em segurança de aplicações e infraestrutura."),
+}
+DEFAULT_AREA = "Web"
+# Ordem de prioridade usada quando só um especialista é criado
+PRIMARY_AREA_PRIORITY = ["Web", "Mobile", "Desktop", "API", "Inteligência Artificial", "Machine Learning", "Jogos"]
+
+def _build_specialist(area: str) -> Agent:
+    from crewai import Agent  # import pesado, adiado até o primeiro pedido
+
+    role, backstory = AREA_SPECIALISTS.get(area, AREA_SPECIALISTS[DEFAULT_AREA])
+    return Agent(
+        role=role,
+        goal="Definir arquitetura técnica completa",
+        backstory=backstory,
         verbose=False,  # Reduzir saídas de log
         llm=llm_adapter
     )
-    
-    return specialist
 
-def execute_specialist_task(specialist: Agent, full_description: str) -> dict:
+def specialist_area(specialist: Agent) -> str:
+    """Área atendida pelo especialista, usada para escolher o modelo da rota"""
+    return next((area for area, (role, _) in AREA_SPECIALISTS.items() if role == specialist.role), DEFAULT_AREA)
+
+def create_specialist_agent(selected_areas: list[str]) -> Agent:
+    """
+    Cria o agente especialista principal com base nas áreas selecionadas
+    """
+    primary_area = next((area for area in PRIMARY_AREA_PRIORITY if area in selected_areas), DEFAULT_AREA)
+    return _build_specialist(primary_area)
+
+def create_specialist_agents(selected_areas: list[str]) -> list[Agent]:
     """
-    Executa a tarefa do especialista
+    Cria um especialista por área selecionada (áreas com o mesmo papel,
+    como IA e Machine Learning, compartilham um único especialista)
+    """
+    specialists = []
+    roles = set()
+    for area in selected_areas:
+        if area not in AREA_SPECIALISTS:
+            logger.warning(f"Área sem especialista dedicado: {area}")
+            continue
+        role = AREA_SPECIALISTS[area][0]
+        if role not in roles:
+            roles.add(role)
+            specialists.append(_build_specialist(area))
+    return specialists or [_build_specialist(DEFAULT_AREA)]
+
+def build_specialist_task(full_description: str) -> str:
+    """
+    Monta a descrição da tarefa do especialista
     """
-    specialist_task = f"""
+    return f"""
     Analise o seguinte projeto e forneça recomendações técnicas detalhadas:
 
     {full_description}
@@ -93,9 +127,166 @@ def execute_specialist_task(specialist: Agent, full_description: str) -> dict:
     
     Seja específico e forneça exemplos práticos quando possível.
     """
+
+def execute_specialist_task(specialist: Agent, full_description: str, timeout=10000, retry_timeout=500) -> dict:
+    """
+    Executa a tarefa do especialista
+    """
+    specialist_task = build_specialist_task(full_description)
     
     logger.info("Executando tarefa do especialista...")
-    specialist_result = execute_task_directly(specialist, specialist_task, "Análise técnica concisa")
+    specialist_result = execute_task_directly(
+        specialist, specialist_task, "Análise técnica concisa", timeout=timeout, retry_timeout=retry_timeout,
+        stage=STAGE_SPECIALIST, area=specialist_area(specialist)
+    )
     logger.info(f"Resultado do especialista: {specialist_result.get('result', '')[:200]}...")
     
-    return specialist_result 
\ No newline at end of file
+    return specialist_result 
+
+async def aexecute_specialist_task(specialist: Agent, full_description: str, timeout=10000, retry_timeout=500) -> dict:
+    """
+    Versão assíncrona de execute_specialist_task
+    """
+    return await aexecute_task_directly(
+        specialist, build_specialist_task(full_description), "Análise técnica concisa",
+        timeout=timeout, retry_timeout=retry_timeout, stage=STAGE_SPECIALIST, area=specialist_area(specialist)
+    )
+
+def stream_specialist_task(specialist: Agent, full_description: str, cancel_token=None):
+    """
+    Executa a tarefa do especialista em streaming, produzindo os tokens gerados
+    """
+    logger.info("Executando tarefa do especialista em streaming...")
+    yield from stream_task_directly(
+        specialist, build_specialist_task(full_description), cancel_token,
+        stage=STAGE_SPECIALIST, area=specialist_area(specialist)
+    )
+
+def _run_with_token(cancel_token, func, *args):
+    with use_token(cancel_token):
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        return func(*args)
+
+def iter_specialists_parallel(specialists: list[Agent], full_description: str,
+                              max_concurrency: int = None, timeout: float = None, cancel_token=None):
+    """
+    Executa os especialistas em paralelo (no máximo max_concurrency ao mesmo
+    tempo) e produz (especialista, resultado) à medida que cada um termina.
+    Falhas e timeouts individuais viram resultados com success=False; o
+    cancelamento do pedido interrompe todos
+    """
+    max_concurrency = max(1, max_concurrency or SPECIALIST_CONCURRENCY)
+    timeout = timeout or SPECIALIST_TIMEOUT
+    cancel_token = cancel_token or current_token()
+    logger.info(f"Executando {len(specialists)} especialista(s) com concorrência {max_concurrency}")
+
+    executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="especialista")
+    try:
+        futures = {
+            # Cada especialista herda o contexto do pedido (prazo incluído)
+            executor.submit(
+                contextvars.copy_context().run,
+                _run_with_token, cancel_token, execute_specialist_task, specialist, full_description, timeout, 0
+            ): specialist
+            for specialist in specialists
+        }
+        for future in as_completed(futures):
+            specialist = futures[future]
+            try:
+                result = future.result()
+            except GenerationCancelled:
+                for pending in futures:
+                    pending.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"Erro no especialista {specialist.role}: {str(e)}")
+                result = {"agent": specialist.role, "result": "", "success": False}
+            yield specialist, result
+    finally:
+        executor.shutdown(wait=False)
+
+@metrics.timed(metrics.STAGE_SPECIALISTS)
+def execute_specialists_parallel(specialists: list[Agent], full_description: str,
+                                 max_concurrency: int = None, timeout: float = None) -> list[dict]:
+    """
+    Executa todos os especialistas em paralelo e devolve os resultados na
+    ordem original dos especialistas
+    """
+    start_time = time.time()
+    results = {
+        specialist.role: result
+        for specialist, result in iter_specialists_parallel(specialists, full_description, max_concurrency, timeout)
+    }
+    ok = sum(1 for r in results.values() if r.get("success"))
+    logger.info(f"{ok}/{len(specialists)} especialista(s) concluído(s) em {time.time() - start_time:.2f} segundos")
+    return [results[specialist.role] for specialist in specialists]
+
+@metrics.timed(metrics.STAGE_SPECIALISTS)
+async def aexecute_specialists_parallel(specialists: list[Agent], full_description: str,
+                                        max_concurrency: int = None, timeout: float = None) -> list[dict]:
+    """
+    Versão assíncrona de execute_specialists_parallel: a concorrência é
+    limitada por um semáforo e o cancelamento do pedido cancela todas as tasks
+    """
+    max_concurrency = max(1, max_concurrency or SPECIALIST_CONCURRENCY)
+    timeout = timeout or SPECIALIST_TIMEOUT
+    semaphore = asyncio.Semaphore(max_concurrency)
+    start_time = time.time()
+
+    async def run(specialist):
+        async with semaphore:
+            try:
+                return await aexecute_specialist_task(specialist, full_description, timeout, 0)
+            except GenerationCancelled:
+                raise
+            except Exception as e:
+                logger.error(f"Erro no especialista {specialist.role}: {str(e)}")
+                return {"agent": specialist.role, "result": "", "success": False}
+
+    try:
+        async with asyncio.TaskGroup() as group:
+            tasks = [group.create_task(run(specialist)) for specialist in specialists]
+    except ExceptionGroup as e:
+        # Só o cancelamento escapa de run(); as demais tasks já foram canceladas
+        raise e.exceptions[0]
+    results = [task.result() for task in tasks]
+    ok = sum(1 for r in results if r.get("success"))
+    logger.info(f"{ok}/{len(specialists)} especialista(s) concluído(s) em {time.time() - start_time:.2f} segundos")
+    return results
+
+def merge_specialist_results(results: list[dict]) -> dict:
+    """
+    Junta as análises dos especialistas numa única entrada compacta para o
+    gerente: descarta falhas, rebaixa os títulos para não competirem com as
+    seções do plano e remove linhas repetidas entre especialistas
+    """
+    successful = [r for r in results if r.get("success") and r.get("result")]
+    if not successful:
+        fallback = next((r for r in results if r.get("result")), None)
+        return {
+            "agent": ", ".join(r.get("agent", "") for r in results),
+            "result": fallback["result"] if fallback else "",
+            "success": False
+        }
+    if len(successful) == 1:
+        return dict(successful[0])
+
+    seen = set()
+    parts = []
+    for result in successful:
+        lines = []
+        for line in result["result"].splitlines():
+            normalized = " ".join(line.lower().split())
+            if normalized and not normalized.startswith("#"):
+                if normalized in seen:
+                    continue
+                seen.add(normalized)
+            lines.append(re.sub(r"^(\s*)(#+)", r"\1##\2", line))
+        parts.append(f"## Perspectiva do {result['agent']}\n" + "\n".join(lines).strip())
+
+    return {
+        "agent": ", ".join(r["agent"] for r in successful),
+        "result": "\n\n".join(parts),
+        "success": True
+    }
@@ -0,0 +1,166 @@
+import json
+import logging
+import os
+import re
+from typing import Any
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+from .utils import SectionIndexer, extract_resources
+
+logger = logging.getLogger("crewai_structured")
+
+# Pede ao gerente um JSON validado por schema em vez de markdown; false volta à extração de seções
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "true").lower() == "true"
+# Chamadas de reparo permitidas para completar só os campos que faltaram
+STRUCTURED_REPAIR_ATTEMPTS = int(os.getenv("STRUCTURED_REPAIR_ATTEMPTS", "1"))
+# Tamanho mínimo (em caracteres) de um campo de texto para ser considerado preenchido
+MIN_FIELD_CHARS = 10
+
+# Título da seção em markdown equivalente a cada campo, usado quando o modelo ignora o JSON
+MARKDOWN_SECTIONS = {
+    "resumo": "Resumo do Projeto",
+    "estrutura": "Estrutura do Projeto",
+    "tecnologias": "Tecnologias Recomendadas"
+}
+
+
+class ProjectPlan(BaseModel):
+    """Campos do resultado final gerados pelo gerente de projeto"""
+
+    resumo: str = Field(
+        default="",
+        description="Visão geral do projeto, funcionalidades, público-alvo, diferenciais e considerações técnicas"
+    )
+    estrutura: str = Field(
+        default="",
+        description="Árvore de diretórios e arquivos, incluindo configuração, dependências, ambiente e testes"
+    )
+    tecnologias: str = Field(
+        default="",
+        description="Frameworks, bibliotecas, ferramentas, banco de dados e serviços externos, um por linha com justificativa"
+    )
+    recursos: list[str] = Field(
+        default_factory=list,
+        description="Próximos passos, boas práticas, recursos de aprendizado e conselhos para produção, um item por entrada"
+    )
+
+    @field_validator("resumo", "estrutura", "tecnologias", mode="before")
+    @classmethod
+    def _join_lists(cls, value: Any):
+        # Modelos pequenos às vezes devolvem listas ou objetos onde se esperava texto
+        if isinstance(value, list):
+            return "\n".join(f"- {item}" if isinstance(item, str) else json.dumps(item, ensure_ascii=False) for item in value)
+        if isinstance(value, dict):
+            return "\n".join(f"- {key}: {item}" for key, item in value.items())
+        return "" if value is None else value
+
+    @field_validator("recursos", mode="before")
+    @classmethod
+    def _split_text(cls, value: Any):
+        if isinstance(value, str):
+            return extract_resources(value) or [line.strip() for line in value.splitlines() if line.strip()]
+        if isinstance(value, list):
+            return [item if isinstance(item, str) else json.dumps(item, ensure_ascii=False) for item in value if item]
+        return [] if value is None else value
+
+
+PLAN_FIELDS = list(ProjectPlan.model_fields)
+
+
+def response_format(fields: list[str] = None) -> dict:
+    """response_format do LiteLLM com o schema JSON dos campos pedidos (o Ollama restringe a saída a ele)"""
+    schema = ProjectPlan.model_json_schema()
+    fields = fields or PLAN_FIELDS
+    schema["properties"] = {name: schema["properties"][name] for name in fields}
+    schema["required"] = list(fields)
+    return {"type": "json_schema", "json_schema": {"name": "plano_projeto", "schema": schema}}
+
+
+def describe_fields(fields: list[str] = None) -> str:
+    """Descrição dos campos para o prompt, na ordem do schema"""
+    fields = fields or PLAN_FIELDS
+    return "\n".join(
+        f'- "{name}" ({"lista de textos" if name == "recursos" else "texto em markdown"}): '
+        f"{ProjectPlan.model_fields[name].description}"
+        for name in fields
+    )
+
+
+def _json_candidate(text: str) -> str:
+    """Trecho entre o primeiro '{' e o último '}', sem cercas de código"""
+    text = re.sub(r"```(?:json)?", "", text or "")
+    start, end = text.find("{"), text.rfind("}")
+    return text[start:end + 1] if start != -1 and end > start else ""
+
+
+def _decode_string(raw: str) -> str:
+    """Conteúdo de uma string JSON; escapes inválidos mantêm o texto como veio"""
+    try:
+        return json.loads(f'"{raw}"')
+    except json.JSONDecodeError:
+        return raw
+
+
+def _salvage_fields(text: str) -> dict:
+    """
+    Recupera campo a campo um JSON inválido ou truncado (por exemplo quando o
+    max_tokens corta a resposta no meio)
+    """
+    data = {}
+    for name in ("resumo", "estrutura", "tecnologias"):
+        match = re.search(rf'"{name}"\s*:\s*"((?:[^"\\]|\\.)*)"', text, re.DOTALL)
+        if match:
+            data[name] = _decode_string(match.group(1))
+    match = re.search(r'"recursos"\s*:\s*\[(.*?)(?:\]|$)', text, re.DOTALL)
+    if match:
+        data["recursos"] = [_decode_string(item) for item in re.findall(r'"((?:[^"\\]|\\.)*)"', match.group(1))]
+    return data
+
+
+def _from_markdown(text: str) -> dict:
+    index = SectionIndexer.build(text)
+    data = {name: index.section_text(title) for name, title in MARKDOWN_SECTIONS.items()}
+    data["recursos"] = extract_resources(index.section_text("Próximos Passos"))
+    return data
+
+
+def plan_from_markdown(text: str) -> ProjectPlan:
+    """Extrai os campos das seções em markdown, como o modo sem schema fazia"""
+    return ProjectPlan.model_validate(_from_markdown(text or ""))
+
+
+def parse_plan(text: str) -> ProjectPlan:
+    """Valida a resposta do gerente contra o schema, aproveitando o que for possível de respostas parciais"""
+    candidate = _json_candidate(text)
+    data = None
+    if candidate:
+        try:
+            data = json.loads(candidate)
+        except json.JSONDecodeError:
+            data = None
+    if not isinstance(data, dict):
+        # Sem JSON válido: recupera campo a campo ou, se o modelo ignorou o formato, lê o markdown
+        data = _salvage_fields(text or "") or _from_markdown(text or "")
+    try:
+        return ProjectPlan.model_validate({name: data[name] for name in PLAN_FIELDS if name in data})
+    except ValidationError as e:
+        logger.warning(f"Resposta estruturada fora do schema: {str(e)[:200]}")
+        return ProjectPlan()
+
+
+def missing_fields(plan: ProjectPlan) -> list[str]:
+    """Campos vazios ou curtos demais, que precisam de reparo"""
+    missing = [
+        name for name in ("resumo", "estrutura", "tecnologias")
+        if len(getattr(plan, name).strip()) < MIN_FIELD_CHARS
+    ]
+    if not plan.recursos:
+        missing.append("recursos")
+    return missing
+
+
+def merge_plan(plan: ProjectPlan, repair: ProjectPlan, fields: list[str]) -> ProjectPlan:
+    """Substitui no plano apenas os campos reparados que vieram preenchidos"""
+    update = {name: getattr(repair, name) for name in fields if getattr(repair, name)}
+    return plan.model_copy(update=update)
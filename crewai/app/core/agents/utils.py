@@ -1,39 +1,271 @@
 import logging
+import re
 
 logger = logging.getLogger("crewai_agents")
 
+# Nível atribuído a linhas só em negrito ("**Resumo do Projeto**"), que alguns
+# modelos usam no lugar de títulos; qualquer título de verdade as encerra
+EMPHASIS_LEVEL = 7
+# Começo de linha que pode ser título ou linha em negrito; uma cerca de código
+# abre um bloco que, se fechar no mesmo fragmento, é consumido inteiro
+_SIGNIFICANT_LINE = re.compile(
+    r"^[ \t]*(?:(?P<fence>```|~~~)(?P<block>[^\n]*\n.*?^[ \t]*(?P=fence))?|#|\*\*)",
+    re.MULTILINE | re.DOTALL
+)
+_FENCE_CLOSE = {fence: re.compile(rf"^[ \t]*{fence}", re.MULTILINE) for fence in ("```", "~~~")}
+
+
+def _normalize_title(title):
+    return " ".join(title.strip().strip("*:").lower().split())
+
+
+class Section:
+    """Seção do texto indexada por offsets: o conteúdo vai de start até end"""
+
+    __slots__ = ("title", "level", "start", "end")
+
+    def __init__(self, title, level, start):
+        self.title = title
+        self.level = level
+        self.start = start
+        self.end = None
+
+    @property
+    def complete(self):
+        return self.end is not None
+
+
+class SectionIndexer:
+    """
+    Índice das seções markdown construído numa única passada, à medida que o
+    texto chega em fragmentos. Cada seção guarda só os offsets do conteúdo e
+    é concluída assim que aparece um título de nível igual ou superior; títulos
+    dentro de blocos de código não contam
+    """
+
+    def __init__(self):
+        self.sections = []
+        self._chunks = []
+        self._length = 0
+        self._text = ""
+        self._joined = 0
+        self._lower = None
+        self._pending = []
+        self._pending_marked = False
+        self._line_start = 0
+        self._fence = None
+        self._open = []
+
+    @classmethod
+    def build(cls, text):
+        index = cls()
+        index.feed(text or "")
+        index.finish()
+        return index
+
+    @property
+    def text(self):
+        if self._joined < len(self._chunks):
+            self._text += "".join(self._chunks[self._joined:])
+            self._joined = len(self._chunks)
+        return self._text
+
+    def feed(self, chunk):
+        """Processa um fragmento e retorna as seções concluídas por ele"""
+        self._chunks.append(chunk)
+        if "\n" not in chunk:
+            # Caminho comum no streaming: o fragmento só continua a linha corrente
+            self._length += len(chunk)
+            if self._pending is not None:
+                self._extend_pending(chunk)
+            return []
+        base = self._length
+        self._length += len(chunk)
+        newline = chunk.find("\n")
+
+        # Termina a linha que veio dos fragmentos anteriores
+        closed = []
+        self._extend_pending(chunk[:newline])
+        if self._pending:
+            self._process_line("".join(self._pending), self._line_start, base + newline + 1, closed)
+
+        # Linhas completas do fragmento: a regex pula direto para as que podem
+        # ser título, e blocos de código inteiros são saltados de uma vez
+        last = chunk.rfind("\n")
+        position = newline + 1
+        while position <= last:
+            if self._fence is not None:
+                match = _FENCE_CLOSE[self._fence].search(chunk, position, last + 1)
+                if match is None:
+                    break
+                self._fence = None
+                position = chunk.find("\n", match.end()) + 1
+                continue
+            match = _SIGNIFICANT_LINE.search(chunk, position, last + 1)
+            if match is None:
+                break
+            if match.group("fence"):
+                if match.group("block") is None:
+                    self._fence = match.group("fence")
+                position = chunk.find("\n", match.end()) + 1
+                continue
+            end = chunk.find("\n", match.start())
+            self._process_line(chunk[match.start():end], base + match.start(), base + end + 1, closed)
+            position = end + 1
+
+        self._line_start = base + last + 1
+        self._reset_pending()
+        self._extend_pending(chunk[last + 1:])
+        return closed
+
+    def finish(self):
+        """Finaliza o texto e retorna as seções que ainda estavam abertas"""
+        closed = []
+        if self._pending:
+            self._process_line("".join(self._pending), self._line_start, self._length, closed)
+        self._reset_pending()
+        self._line_start = self._length
+        while self._open:
+            section = self._open.pop()
+            section.end = self._length
+            closed.append(section)
+        return closed
+
+    def _reset_pending(self):
+        self._pending = []
+        self._pending_marked = False
+
+    def _extend_pending(self, text):
+        """
+        Acumula os pedaços da linha corrente, juntados só quando ela termina.
+        Assim que fica claro que a linha não é título nem cerca de código, o
+        resto dela é ignorado (pending = None); o primeiro caractere visível
+        é conferido uma única vez, não a cada fragmento
+        """
+        if self._pending is None or not text:
+            return
+        if not self._pending_marked:
+            head = text.lstrip(" \t")
+            if head:
+                if head[0] not in "#`~*":
+                    self._pending = None
+                    return
+                self._pending_marked = True
+        self._pending.append(text)
+
+    def _process_line(self, line, line_start, content_start, closed):
+        stripped = line.strip()
+        if not stripped or stripped[0] not in "#`~*":
+            return
+        if stripped[0] in "`~":
+            marker = stripped[:3]
+            if marker in ("```", "~~~"):
+                if self._fence is None:
+                    self._fence = marker
+                elif marker == self._fence:
+                    self._fence = None
+            return
+        if self._fence is not None or len(line) - len(line.lstrip(" ")) > 3:
+            return
+
+        if stripped[0] == "#":
+            level = len(stripped) - len(stripped.lstrip("#"))
+            title = stripped[level:]
+            if level > 6 or (title and not title[0].isspace()):
+                return
+            title = title.strip().rstrip("#").strip()
+        elif len(stripped) > 4 and stripped.startswith("**") and stripped.rstrip(":").endswith("**"):
+            level = EMPHASIS_LEVEL
+            title = stripped.rstrip(":").strip("*").strip()
+            if "**" in title:
+                return
+        else:
+            return
+
+        while self._open and self._open[-1].level >= level:
+            section = self._open.pop()
+            section.end = line_start
+            closed.append(section)
+        section = Section(title, level, content_start)
+        self.sections.append(section)
+        self._open.append(section)
+
+    def find(self, title):
+        """
+        Primeira seção com o título pedido (sem diferenciar maiúsculas): título
+        idêntico, depois título que contém as mesmas palavras (como
+        "1. Resumo do Projeto") e, por último, linhas em negrito
+        """
+        wanted = _normalize_title(title)
+        if not wanted:
+            return None
+        headings = [s for s in self.sections if s.level < EMPHASIS_LEVEL]
+        emphasis = [s for s in self.sections if s.level == EMPHASIS_LEVEL]
+        for candidates, exact in ((headings, True), (headings, False), (emphasis, False)):
+            for section in candidates:
+                normalized = _normalize_title(section.title)
+                if normalized == wanted if exact else f" {wanted} " in f" {normalized} ":
+                    return section
+        return None
+
+    def content(self, section):
+        end = section.end if section.end is not None else self._length
+        return self.text[section.start:end].strip()
+
+    def section_text(self, title, default=""):
+        section = self.find(title)
+        if section is not None:
+            return self.content(section)
+        return self._plain_line_text(title, default)
+
+    def _plain_line_text(self, title, default):
+        """
+        Último recurso para modelos que escrevem o nome da seção numa linha
+        comum ("Resumo do Projeto:"), sem '#' nem negrito: o conteúdo vai da
+        linha seguinte até o próximo título
+        """
+        wanted = _normalize_title(title)
+        if not wanted:
+            return default
+        text = self.text
+        lowered = self._lowered()
+        first_word = wanted.split()[0]
+        position = lowered.find(first_word)
+        while position != -1:
+            line_start = text.rfind("\n", 0, position) + 1
+            line_end = text.find("\n", position)
+            line_end = len(text) if line_end == -1 else line_end
+            if _normalize_title(text[line_start:line_end]) == wanted:
+                return text[line_end + 1:self._next_title_line(line_end)].strip()
+            position = lowered.find(first_word, line_end)
+        return default
+
+    def _lowered(self):
+        """Texto em minúsculas com os mesmos offsets do original, guardado entre consultas"""
+        text = self.text
+        if self._lower is None or self._lower[0] != len(text):
+            lowered = text.lower()
+            if len(lowered) != len(text):
+                # Raros caracteres que mudam de tamanho ao passar para minúsculas
+                lowered = "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+            self._lower = (len(text), lowered)
+        return self._lower[1]
+
+    def _next_title_line(self, position):
+        """Início da linha do primeiro título depois de position (ou o fim do texto)"""
+        for section in self.sections:
+            if section.start > position + 1:
+                return self.text.rfind("\n", 0, section.start - 1) + 1
+        return self._length
+
+
 def extract_section(text, section_name):
-    """Extrai uma seção específica do resultado - versão melhorada"""
+    """
+    Extrai uma seção específica do resultado, incluindo suas subseções. Sem
+    título markdown com esse nome, aceita o nome sozinho numa linha ("Resumo:")
+    """
     try:
-        if not text or not section_name:
-            return ""
-            
-        # Normaliza o texto e o nome da seção para comparação
-        text_lower = text.lower()
-        section_name_lower = section_name.lower()
-        
-        # Procura pelo título da seção
-        section_start = text_lower.find(f"# {section_name_lower}")
-        if section_start == -1:
-            # Tenta encontrar sem o #
-            section_start = text_lower.find(section_name_lower)
-            if section_start == -1:
-                return ""
-        
-        # Encontra o início do conteúdo (após o título)
-        content_start = text.find('\n', section_start)
-        if content_start == -1:
-            return ""
-        content_start += 1  # Pula a quebra de linha
-        
-        # Encontra o próximo título de seção
-        next_section = text.find('#', content_start)
-        if next_section == -1:
-            # Se não houver próxima seção, pega todo o conteúdo até o final
-            return text[content_start:].strip()
-        
-        # Retorna o conteúdo entre o título atual e o próximo título
-        return text[content_start:next_section].strip()
+        return SectionIndexer.build(text).section_text(section_name)
     except Exception as e:
         logger.error(f"Erro ao extrair seção {section_name}: {str(e)}")
         return ""
@@ -58,4 +290,26 @@ def extract_resources(resources_text):
             # Adiciona o título da subseção como um recurso
             resources.append(line[3:].strip())
     
-    return resources 
\ No newline at end of file
+    return resources 
+
+class StreamingSectionSplitter:
+    """
+    Detecta seções de primeiro nível ("# Título") enquanto o texto chega em
+    fragmentos, devolvendo cada seção assim que o título seguinte aparece.
+    O índice completo fica em `index` para a extração final das seções
+    """
+
+    def __init__(self):
+        self.index = SectionIndexer()
+
+    def feed(self, chunk):
+        """Processa um fragmento e retorna as seções fechadas por ele"""
+        closed = self.index.feed(chunk)
+        return [self._as_dict(section) for section in closed if section.level == 1] if closed else closed
+
+    def flush(self):
+        """Finaliza o texto e retorna a última seção aberta, se houver"""
+        return [self._as_dict(section) for section in self.index.finish() if section.level == 1]
+
+    def _as_dict(self, section):
+        return {"titulo": section.title, "conteudo": self.index.content(section)}
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+
+class GenerationCancelled(Exception):
+    """Lançada quando uma geração é abortada (timeout ou cliente desconectado)"""
+
+
+class CancelToken:
+    """
+    Sinal de cancelamento compartilhado entre o handler HTTP, o pipeline e as
+    chamadas ao LLM. Tokens filhos são cancelados junto com o pai
+    """
+
+    def __init__(self, parent: Optional["CancelToken"] = None):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: list[Callable[[], None]] = []
+        self.reason: Optional[str] = None
+        if parent is not None:
+            parent.add_callback(lambda: self.cancel(parent.reason))
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelado"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def add_callback(self, callback: Callable[[], None]):
+        """Registra uma função chamada no cancelamento (imediatamente se já cancelado)"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback: Callable[[], None]):
+        """Remove um callback que deixou de ser necessário, como o de uma chamada já encerrada"""
+        with self._lock:
+            try:
+                self._callbacks.remove(callback)
+            except ValueError:
+                pass
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise GenerationCancelled(self.reason)
+
+    def wait(self, timeout: float) -> bool:
+        return self._event.wait(timeout)
+
+
+_current_token: ContextVar[Optional[CancelToken]] = ContextVar("cancel_token", default=None)
+
+
+def current_token() -> Optional[CancelToken]:
+    """Token de cancelamento do pedido em execução no contexto atual"""
+    return _current_token.get()
+
+
+@contextmanager
+def use_token(token: Optional[CancelToken]):
+    """Define o token de cancelamento para o código executado no bloco"""
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+async def run_cancellable(coro, token: CancelToken):
+    """
+    Executa a corrotina numa task que é cancelada junto com o token (que pode
+    ser cancelado de outra thread, como no timer do prazo). O cancelamento
+    vira GenerationCancelled para quem espera
+    """
+    loop = asyncio.get_running_loop()
+    task = asyncio.ensure_future(coro)
+    token.add_callback(lambda: loop.call_soon_threadsafe(task.cancel))
+    try:
+        return await task
+    except asyncio.CancelledError:
+        # Se quem espera também foi cancelado, o cancelamento segue adiante
+        if token.cancelled and not asyncio.current_task().cancelling():
+            raise GenerationCancelled(token.reason)
+        raise
@@ -1,12 +1,31 @@
-from app.core.llm_client import OllamaLLM
 from app.core.litellm_adapter import llm_adapter
+from app.core.cancellation import GenerationCancelled
+from app.core.deadline import DEADLINE_REASON, has_budget
+from app.core.model_router import STAGE_PROJECT_MANAGER, STAGE_SPECIALIST
+from app.core import metrics
+from app.service.exa_passages import EXA_PASSAGE_SELECTION, selecionar_trechos
+from app.service.exa_search import BuscaExa, anexar_resultados
 from app.core.agents import (
-    create_specialist_agent,
-    execute_specialist_task,
+    create_specialist_agents,
+    stream_specialist_task,
+    iter_specialists_parallel,
+    execute_specialists_parallel,
+    aexecute_specialists_parallel,
+    merge_specialist_results,
     create_project_manager_agent,
     execute_project_manager_task,
-    extract_section,
-    extract_resources
+    aexecute_project_manager_task,
+    execute_project_manager_structured,
+    aexecute_project_manager_structured,
+    stream_project_manager_task,
+    STRUCTURED_OUTPUT,
+    ProjectPlan,
+    merge_plan,
+    missing_fields,
+    plan_from_markdown,
+    extract_resources,
+    SectionIndexer,
+    StreamingSectionSplitter
 )
 import logging
 import time
@@ -15,23 +34,18 @@ os.environ["CREWAI_TRACING"] = "false"
 
 logger = logging.getLogger("crewai_generator")
 
+# Pasta onde gravar o texto bruto de cada plano gerado, usado como caso real em
+# benchmarks/bench_text_processing.py (vazio desliga)
+PM_OUTPUT_RECORD_DIR = os.getenv("PM_OUTPUT_RECORD_DIR", "")
+
 llm = llm_adapter
 logger.info("Usando adaptador LiteLLM como modelo de linguagem principal")
 
-def run_project_pipeline(area_selection: list[str], tech_stack: str, description: str):
+def build_full_description(area_selection: list[str], tech_stack: str, description: str) -> str:
     """
-    Pipeline otimizado para gerar projeto mais rapidamente
+    Monta a descrição completa usada como entrada dos agentes
     """
-    pm_result = None
-    try:
-        logger.info(f"Iniciando geração do projeto com áreas: {area_selection}, tecnologias: {tech_stack}")
-        logger.info(f"Descrição do projeto: {description[:100]}...")
-        
-        if not isinstance(description, str) or len(description) < 3:
-            logger.error("Descrição inválida ou muito curta")
-            return {"error": "Descrição inválida ou muito curta"}
-            
-        full_description = f"""
+    return f"""
         # Descrição do Projeto
         {description}
 
@@ -50,37 +64,156 @@ def run_project_pipeline(area_selection: list[str], tech_stack: str, description
 
         Por favor, forneça uma análise técnica completa e estruturada.
         """
+
+def record_output(result_text: str):
+    """Grava a saída do gerente em PM_OUTPUT_RECORD_DIR, se configurado; falhas só geram aviso"""
+    if not PM_OUTPUT_RECORD_DIR:
+        return
+    try:
+        os.makedirs(PM_OUTPUT_RECORD_DIR, exist_ok=True)
+        path = os.path.join(PM_OUTPUT_RECORD_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10 ** 9}.md")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(result_text)
+    except OSError as e:
+        logger.warning(f"Não foi possível gravar a saída em {PM_OUTPUT_RECORD_DIR}: {str(e)}")
+
+def with_search_results(full_description: str, search: BuscaExa = None, description: str = "",
+                        tech_stack: str = "") -> str:
+    """
+    Descrição do gerente com os resultados da EXA que ficaram prontos durante
+    a etapa dos especialistas. A busca nunca é esperada: consultas ainda em
+    andamento são canceladas. Das páginas só entram os trechos mais
+    relevantes para a descrição e as tecnologias (EXA_PASSAGE_SELECTION)
+    """
+    if search is None:
+        return full_description
+    results = search.resultados_prontos()
+    if EXA_PASSAGE_SELECTION:
+        results = selecionar_trechos(results, description, tech_stack)
+    return anexar_resultados(full_description, results)
+
+@metrics.timed(metrics.STAGE_SECTIONS)
+def process_pipeline_result(result_text: str, tech_stack: str, area_selection: list[str],
+                            index: SectionIndexer = None) -> dict:
+    """
+    Extrai as seções do texto final e monta o resultado do projeto. O texto
+    é indexado numa única passada; no streaming o índice já vem pronto
+    """
+    logger.info("Processando resultado final...")
+    record_output(result_text)
+    try:
+        if index is None:
+            index = SectionIndexer.build(result_text)
+        resumo = index.section_text("Resumo do Projeto")
+        estrutura = index.section_text("Estrutura do Projeto")
+        tecnologias = index.section_text("Tecnologias Recomendadas")
+        proximos_passos = index.section_text("Próximos Passos")
+        recursos = extract_resources(proximos_passos)
+
+        logger.info(f"Seções extraídas:")
+        logger.info(f"- Resumo: {resumo[:100]}...")
+        logger.info(f"- Estrutura: {estrutura[:100]}...")
+        logger.info(f"- Tecnologias: {tecnologias[:100]}...")
+        logger.info(f"- Próximos Passos: {proximos_passos[:100]}...")
+        logger.info(f"- Recursos: {len(recursos)} itens encontrados")
+
+        processed_result = {
+            "resumo": resumo or result_text[:250],
+            "tecnologias": tecnologias or tech_stack,
+            "areas": area_selection,
+            "estrutura": estrutura or f"Estrutura padrão para {tech_stack}",
+            "codigo": "",  # Removido pois não é mais usado
+            "recursos": recursos
+        }
+
+        logger.info("Resultado processado com sucesso")
+        return processed_result
+    except Exception as e:
+        logger.error(f"Erro ao processar resultado: {str(e)}")
+        return {
+            "resumo": result_text[:250] + "...",
+            "tecnologias": tech_stack,
+            "areas": area_selection,
+            "estrutura": f"Estrutura padrão para projeto {tech_stack}",
+            "codigo": "",
+            "recursos": []
+        }
+
+@metrics.timed(metrics.STAGE_SECTIONS)
+def process_structured_result(plan: ProjectPlan, fallback_text: str, tech_stack: str, area_selection: list[str]) -> dict:
+    """
+    Monta o resultado a partir do plano validado pelo schema. Campos que nem o
+    reparo preencheu são lidos das seções dos especialistas e, por fim,
+    recebem os mesmos valores padrão de process_pipeline_result
+    """
+    missing = missing_fields(plan)
+    if missing and fallback_text:
+        logger.warning(f"Campos sem conteúdo após o reparo: {missing}, usando a análise dos especialistas")
+        plan = merge_plan(plan, plan_from_markdown(fallback_text), missing)
+
+    return {
+        "resumo": plan.resumo or fallback_text[:250],
+        "tecnologias": plan.tecnologias or tech_stack,
+        "areas": area_selection,
+        "estrutura": plan.estrutura or f"Estrutura padrão para {tech_stack}",
+        "codigo": "",
+        "recursos": plan.recursos
+    }
+
+@metrics.timed(metrics.STAGE_PIPELINE, metrics.pipelines_in_flight)
+def run_project_pipeline(area_selection: list[str], tech_stack: str, description: str, search: BuscaExa = None):
+    """
+    Pipeline otimizado para gerar projeto mais rapidamente. Cada etapa usa o
+    orçamento restante do prazo do pedido e só repete se ainda houver tempo.
+    A busca na EXA (search), se houver, corre junto com os especialistas e
+    alimenta a etapa do gerente
+    """
+    pm_result = None
+    try:
+        logger.info(f"Iniciando geração do projeto com áreas: {area_selection}, tecnologias: {tech_stack}")
+        logger.info(f"Descrição do projeto: {description[:100]}...")
         
-        specialist = create_specialist_agent(area_selection)
-        project_manager = create_project_manager_agent()
-        logger.info(f"Agentes criados: {[specialist.role, project_manager.role]}")
+        if not isinstance(description, str) or len(description) < 3:
+            logger.error("Descrição inválida ou muito curta")
+            return {"error": "Descrição inválida ou muito curta"}
+            
+        full_description = build_full_description(area_selection, tech_stack, description)
         
-        overall_timeout = 700000
-        start_time = time.time()
+        specialists = create_specialist_agents(area_selection)
+        project_manager = create_project_manager_agent()
+        logger.info(f"Agentes criados: {[s.role for s in specialists] + [project_manager.role]}")
         
-        logger.info("Executando tarefa do especialista...")
-        specialist_result = execute_specialist_task(specialist, full_description)
+        logger.info("Executando tarefas dos especialistas...")
+        specialist_result = merge_specialist_results(
+            execute_specialists_parallel(specialists, full_description)
+        )
         
-        if time.time() - start_time > overall_timeout:
-            logger.warning("Timeout atingido durante execução do especialista")
-            return {
-                "resumo": f"Análise básica com {tech_stack}",
-                "tecnologias": tech_stack,
-                "areas": area_selection,
-                "estrutura": f"Estrutura padrão para projeto com {tech_stack}",
-                "codigo": "",
-                "recursos": []
-            }
+        if (not specialist_result.get('success', False) or not specialist_result.get('result')) and has_budget():
+            logger.warning("Resultado dos especialistas inválido, tentando novamente")
+            metrics.retries.labels(STAGE_SPECIALIST, "resultado_invalido").inc()
+            specialist_result = merge_specialist_results(
+                execute_specialists_parallel(specialists, full_description)
+            )
         
-        if not specialist_result.get('success', False) or not specialist_result.get('result'):
-            logger.warning("Resultado do especialista inválido, tentando novamente")
-            specialist_result = execute_specialist_task(specialist, full_description)
+        if not has_budget():
+            # O chamador desiste antes que o gerente consiga responder
+            logger.warning("Prazo do pedido esgotado antes da tarefa do gerente de projeto")
+            raise GenerationCancelled(DEADLINE_REASON)
         
+        full_description = with_search_results(full_description, search, description, tech_stack)
+        if STRUCTURED_OUTPUT:
+            # Campos ausentes são reparados individualmente; não há nova execução da etapa inteira
+            pm_result = execute_project_manager_structured(project_manager, specialist_result, full_description)
+            return process_structured_result(
+                pm_result["plan"], specialist_result.get('result', ''), tech_stack, area_selection
+            )
+
         logger.info("Executando tarefa do gerente de projeto...")
         pm_result = execute_project_manager_task(project_manager, specialist_result, full_description)
 
-        if not pm_result.get('success', False) or not pm_result.get('result'):
+        if (not pm_result.get('success', False) or not pm_result.get('result')) and has_budget():
             logger.warning("Resultado do gerente inválido, tentando novamente")
+            metrics.retries.labels(STAGE_PROJECT_MANAGER, "resultado_invalido").inc()
             pm_result = execute_project_manager_task(project_manager, specialist_result, full_description)
 
         result_text = (
@@ -88,42 +221,10 @@ def run_project_pipeline(area_selection: list[str], tech_stack: str, description
             else specialist_result.get('result', 'Não foi possível gerar resultado completo')
         )
         
-        logger.info("Processando resultado final...")
-        try:
-            resumo = extract_section(result_text, "Resumo do Projeto")
-            estrutura = extract_section(result_text, "Estrutura do Projeto")
-            tecnologias = extract_section(result_text, "Tecnologias Recomendadas")
-            proximos_passos = extract_section(result_text, "Próximos Passos")
-            recursos = extract_resources(proximos_passos)
-            
-            logger.info(f"Seções extraídas:")
-            logger.info(f"- Resumo: {resumo[:100]}...")
-            logger.info(f"- Estrutura: {estrutura[:100]}...")
-            logger.info(f"- Tecnologias: {tecnologias[:100]}...")
-            logger.info(f"- Próximos Passos: {proximos_passos[:100]}...")
-            logger.info(f"- Recursos: {len(recursos)} itens encontrados")
-            
-            processed_result = {
-                "resumo": resumo or result_text[:250],
-                "tecnologias": tecnologias or tech_stack,
-                "areas": area_selection,
-                "estrutura": estrutura or f"Estrutura padrão para {tech_stack}",
-                "codigo": "",  # Removido pois não é mais usado
-                "recursos": recursos
-            }
-                
-            logger.info("Resultado processado com sucesso")
-            return processed_result
-        except Exception as e:
-            logger.error(f"Erro ao processar resultado: {str(e)}")
-            return {
-                "resumo": result_text[:250] + "...",
-                "tecnologias": tech_stack,
-                "areas": area_selection,
-                "estrutura": f"Estrutura padrão para projeto {tech_stack}",
-                "codigo": "",
-                "recursos": []
-            }
+        return process_pipeline_result(result_text, tech_stack, area_selection)
+    except GenerationCancelled:
+        logger.warning("Geração do projeto cancelada")
+        raise
     except Exception as e:
         logger.error(f"Erro durante geração do projeto: {str(e)}")
         return {
@@ -134,3 +235,165 @@ def run_project_pipeline(area_selection: list[str], tech_stack: str, description
             "codigo": "",
             "recursos": []
         }
+
+@metrics.timed(metrics.STAGE_PIPELINE, metrics.pipelines_in_flight)
+async def arun_project_pipeline(area_selection: list[str], tech_stack: str, description: str,
+                                search: BuscaExa = None):
+    """
+    Versão assíncrona de run_project_pipeline: as chamadas ao Ollama são
+    aguardadas no event loop, sem ocupar threads durante a geração
+    """
+    try:
+        logger.info(f"Iniciando geração assíncrona com áreas: {area_selection}, tecnologias: {tech_stack}")
+
+        if not isinstance(description, str) or len(description) < 3:
+            logger.error("Descrição inválida ou muito curta")
+            return {"error": "Descrição inválida ou muito curta"}
+
+        full_description = build_full_description(area_selection, tech_stack, description)
+
+        specialists = create_specialist_agents(area_selection)
+        project_manager = create_project_manager_agent()
+
+        specialist_result = merge_specialist_results(
+            await aexecute_specialists_parallel(specialists, full_description)
+        )
+        if (not specialist_result.get('success', False) or not specialist_result.get('result')) and has_budget():
+            logger.warning("Resultado dos especialistas inválido, tentando novamente")
+            metrics.retries.labels(STAGE_SPECIALIST, "resultado_invalido").inc()
+            specialist_result = merge_specialist_results(
+                await aexecute_specialists_parallel(specialists, full_description)
+            )
+
+        if not has_budget():
+            logger.warning("Prazo do pedido esgotado antes da tarefa do gerente de projeto")
+            raise GenerationCancelled(DEADLINE_REASON)
+
+        full_description = with_search_results(full_description, search, description, tech_stack)
+        if STRUCTURED_OUTPUT:
+            pm_result = await aexecute_project_manager_structured(project_manager, specialist_result, full_description)
+            return process_structured_result(
+                pm_result["plan"], specialist_result.get('result', ''), tech_stack, area_selection
+            )
+
+        pm_result = await aexecute_project_manager_task(project_manager, specialist_result, full_description)
+        if (not pm_result.get('success', False) or not pm_result.get('result')) and has_budget():
+            logger.warning("Resultado do gerente inválido, tentando novamente")
+            metrics.retries.labels(STAGE_PROJECT_MANAGER, "resultado_invalido").inc()
+            pm_result = await aexecute_project_manager_task(project_manager, specialist_result, full_description)
+
+        result_text = (
+            pm_result.get('result') if pm_result.get('result')
+            else specialist_result.get('result', 'Não foi possível gerar resultado completo')
+        )
+        return process_pipeline_result(result_text, tech_stack, area_selection)
+    except GenerationCancelled:
+        logger.warning("Geração do projeto cancelada")
+        raise
+    except Exception as e:
+        logger.error(f"Erro durante geração assíncrona do projeto: {str(e)}")
+        return {
+            "resumo": f"Não foi possível processar completamente o projeto com {tech_stack}. Por favor, tente novamente.",
+            "tecnologias": tech_stack,
+            "areas": area_selection,
+            "estrutura": "",
+            "codigo": "",
+            "recursos": []
+        }
+
+@metrics.timed(metrics.STAGE_PIPELINE, metrics.pipelines_in_flight)
+def stream_project_pipeline(area_selection: list[str], tech_stack: str, description: str, cancel_token=None,
+                            search: BuscaExa = None):
+    """
+    Variante em streaming do pipeline: produz eventos de etapa, tokens e
+    seções à medida que o Ollama gera o texto. Cancelar o token (por exemplo
+    quando o cliente desconecta) aborta a geração em curso
+    """
+    try:
+        logger.info(f"Iniciando geração em streaming com áreas: {area_selection}, tecnologias: {tech_stack}")
+
+        if not isinstance(description, str) or len(description) < 3:
+            logger.error("Descrição inválida ou muito curta")
+            yield {"tipo": "erro", "detalhe": "Descrição inválida ou muito curta"}
+            return
+
+        full_description = build_full_description(area_selection, tech_stack, description)
+
+        specialists = create_specialist_agents(area_selection)
+        project_manager = create_project_manager_agent()
+
+        start_time = time.time()
+        if len(specialists) == 1:
+            specialist = specialists[0]
+            yield {"tipo": "especialista_iniciado", "agente": specialist.role}
+            specialist_tokens = []
+            for token in stream_specialist_task(specialist, full_description, cancel_token):
+                specialist_tokens.append(token)
+                yield {"tipo": "token", "etapa": "especialista", "conteudo": token}
+            specialist_result = {
+                "agent": specialist.role,
+                "result": "".join(specialist_tokens),
+                "success": bool(specialist_tokens)
+            }
+            yield {
+                "tipo": "especialista_concluido",
+                "agente": specialist.role,
+                "duracao": round(time.time() - start_time, 2)
+            }
+        else:
+            # Vários especialistas rodam em paralelo; os eventos saem conforme cada um termina
+            for specialist in specialists:
+                yield {"tipo": "especialista_iniciado", "agente": specialist.role}
+            results = []
+            for specialist, result in iter_specialists_parallel(
+                specialists, full_description, cancel_token=cancel_token
+            ):
+                results.append(result)
+                yield {
+                    "tipo": "especialista_concluido",
+                    "agente": specialist.role,
+                    "sucesso": bool(result.get("success")),
+                    "duracao": round(time.time() - start_time, 2)
+                }
+            specialist_result = merge_specialist_results(results)
+        metrics.stage_duration.labels(metrics.STAGE_SPECIALISTS).observe(time.time() - start_time)
+
+        if not has_budget():
+            raise GenerationCancelled(DEADLINE_REASON)
+
+        if search is not None:
+            full_description = with_search_results(full_description, search, description, tech_stack)
+            yield {"tipo": "exa_concluido", "resultados": len(search.resultados_prontos())}
+
+        pm_start = time.time()
+        yield {"tipo": "gerente_iniciado", "agente": project_manager.role}
+        splitter = StreamingSectionSplitter()
+        pm_tokens = []
+        for token in stream_project_manager_task(project_manager, specialist_result, full_description, cancel_token):
+            pm_tokens.append(token)
+            yield {"tipo": "token", "etapa": "gerente", "conteudo": token}
+            for section in splitter.feed(token):
+                yield {"tipo": "secao", **section}
+        for section in splitter.flush():
+            yield {"tipo": "secao", **section}
+        metrics.stage_duration.labels(metrics.STAGE_PROJECT_MANAGER).observe(time.time() - pm_start)
+        yield {
+            "tipo": "gerente_concluido",
+            "agente": project_manager.role,
+            "duracao": round(time.time() - pm_start, 2)
+        }
+
+        result_text = "".join(pm_tokens) or specialist_result.get('result') or 'Não foi possível gerar resultado completo'
+        yield {
+            "tipo": "resultado",
+            "resultado": process_pipeline_result(
+                result_text, tech_stack, area_selection, splitter.index if pm_tokens else None
+            )
+        }
+        logger.info(f"Geração em streaming concluída em {time.time() - start_time:.2f} segundos")
+    except GenerationCancelled as e:
+        logger.warning(f"Geração em streaming cancelada: {str(e)}")
+        yield {"tipo": "erro", "detalhe": f"Geração cancelada: {str(e)}"}
+    except Exception as e:
+        logger.error(f"Erro durante geração do projeto em streaming: {str(e)}")
+        yield {"tipo": "erro", "detalhe": str(e)}
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from app.core.cancellation import CancelToken
+
+logger = logging.getLogger("crewai_deadline")
+
+# Cabeçalho com o orçamento (em segundos) que o chamador ainda tem para a resposta
+DEADLINE_HEADER = "X-Request-Timeout"
+DEADLINE_REASON = "prazo esgotado"
+
+DEFAULT_REQUEST_TIMEOUT = float(os.getenv("DEFAULT_REQUEST_TIMEOUT", "600"))
+MAX_REQUEST_TIMEOUT = float(os.getenv("MAX_REQUEST_TIMEOUT", "3600"))
+# Orçamento mínimo para valer a pena iniciar uma etapa ou uma nova tentativa
+MIN_STAGE_BUDGET = float(os.getenv("MIN_STAGE_BUDGET", "10"))
+
+# Estimativas usadas para dimensionar max_tokens ao tempo restante
+LLM_TOKENS_PER_SECOND = float(os.getenv("LLM_TOKENS_PER_SECOND", "8"))
+LLM_PREFILL_SECONDS = float(os.getenv("LLM_PREFILL_SECONDS", "5"))
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "2000"))
+LLM_MIN_TOKENS = int(os.getenv("LLM_MIN_TOKENS", "128"))
+
+
+class Deadline:
+    """Instante (relógio monotônico) em que o chamador deixa de esperar pela resposta"""
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+        self._timer: Optional[threading.Timer] = None
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def has_budget(self, seconds: float = MIN_STAGE_BUDGET) -> bool:
+        return self.remaining() >= seconds
+
+    def arm(self, cancel_token: CancelToken):
+        """
+        Cancela o token quando o prazo expira, interrompendo a etapa em curso.
+        Dentro do event loop usa um timer do próprio loop, sem criar threads
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            self._timer = loop.call_later(self.remaining(), cancel_token.cancel, DEADLINE_REASON)
+        else:
+            self._timer = threading.Timer(self.remaining(), cancel_token.cancel, args=(DEADLINE_REASON,))
+            self._timer.daemon = True
+            self._timer.start()
+        return self
+
+    def disarm(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+def parse_deadline(header_value: Optional[str]) -> Deadline:
+    """Cria o prazo a partir do cabeçalho X-Request-Timeout (ou do padrão do serviço)"""
+    budget = DEFAULT_REQUEST_TIMEOUT
+    if header_value:
+        try:
+            budget = float(header_value)
+        except ValueError:
+            logger.warning(f"Valor inválido em {DEADLINE_HEADER}: {header_value!r}, usando {budget}s")
+    return Deadline(min(max(budget, 0.0), MAX_REQUEST_TIMEOUT))
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Prazo do pedido em execução no contexto atual"""
+    return _current_deadline.get()
+
+
+@contextmanager
+def use_deadline(deadline: Optional[Deadline]):
+    """Define o prazo para o código executado no bloco"""
+    reset = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(reset)
+
+
+def stage_timeout(timeout: float) -> float:
+    """Limita o timeout de uma etapa ao orçamento restante do pedido"""
+    deadline = current_deadline()
+    return min(timeout, deadline.remaining()) if deadline is not None else timeout
+
+
+def has_budget(seconds: float = MIN_STAGE_BUDGET) -> bool:
+    """Indica se ainda há tempo para iniciar uma etapa ou repetir uma tentativa"""
+    deadline = current_deadline()
+    return deadline is None or deadline.has_budget(seconds)
+
+
+def max_tokens_for(seconds: float) -> int:
+    """Quantidade de tokens que o modelo consegue gerar no tempo disponível"""
+    tokens = int((seconds - LLM_PREFILL_SECONDS) * LLM_TOKENS_PER_SECOND)
+    return max(LLM_MIN_TOKENS, min(LLM_MAX_TOKENS, tokens))
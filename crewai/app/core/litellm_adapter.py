@@ -1,14 +1,23 @@
+import asyncio
+import itertools
 import os
+import threading
 import time
 import logging
 from typing import Dict, List, Any, Optional
 
+from app.core.cancellation import GenerationCancelled
+from app.core.model_router import STAGE_DEFAULT, model_router
+
+# Endereço do Ollama; nos testes de carga aponta para o Ollama simulado (benchmarks/fake_ollama.py)
+OLLAMA_BASE_URL = os.getenv("LITELLM_API_BASE", "http://ollama:11434")
+
 # Configuração do LiteLLM para usar nossa instância de Ollama com tolerância a falhas
 class CustomLiteLLM:
     def __init__(self):
         # Configurar variáveis de ambiente para o LiteLLM
         os.environ["LITELLM_MODEL_NAME"] = "ollama/llama2"  # Formato correto com provider
-        os.environ["LITELLM_API_BASE"] = "http://ollama:11434"  # Usar o nome do serviço do Docker Compose
+        os.environ["LITELLM_API_BASE"] = OLLAMA_BASE_URL  # Por padrão, o nome do serviço do Docker Compose
         os.environ["LITELLM_PROVIDER"] = "ollama"
         os.environ["LITELLM_API_KEY"] = "dummy"
         
@@ -18,38 +27,67 @@ class CustomLiteLLM:
         print(f"  - API Base: {os.environ['LITELLM_API_BASE']}")
         print(f"  - Provider: {os.environ['LITELLM_PROVIDER']}")
         
-        # Inicializar o módulo litellm
-        import litellm
-        os.environ["LITELLM_LOG"] = "INFO"  # Usar variável de ambiente em vez de set_verbose
-        
-        # Configurar tentativas para lidar com problemas de conexão
-        litellm.num_retries = 3
-        litellm.request_timeout = 1200
-        
-        # Armazenar o módulo para uso posterior
-        self.litellm = litellm
-        self._test_connection()
-    
-    def _test_connection(self):
-        """Testa a conexão com o Ollama e espera até estar pronto"""
+        # Modelo padrão; cada chamada usa o modelo escolhido pelo model_router
+        self.model = model_router.default_model
+        self._litellm = None
+        self._lock = threading.Lock()
+        # Última verificação de prontidão do Ollama: (pronto, instante)
+        self._ready = (False, 0.0)
+
+    @property
+    def litellm(self):
+        """Importa e configura o LiteLLM no primeiro uso; o import é pesado e atrasava o boot"""
+        if self._litellm is None:
+            with self._lock:
+                if self._litellm is None:
+                    import litellm
+                    os.environ["LITELLM_LOG"] = "INFO"  # Usar variável de ambiente em vez de set_verbose
+
+                    # Configurar tentativas para lidar com problemas de conexão
+                    litellm.num_retries = 3
+                    litellm.request_timeout = 1200
+                    self._litellm = litellm
+        return self._litellm
+
+    def count_tokens(self, text: str, model: Optional[str] = None) -> int:
+        """Tokens do texto pelo tokenizer do LiteLLM para o modelo; estimativa por caracteres se indisponível"""
+        if not text:
+            return 0
+        try:
+            return self.litellm.token_counter(model=model or self.model, text=text)
+        except Exception:
+            return max(1, len(text) // 4)
+
+    def check_connection(self, timeout: float = 2) -> bool:
+        """Uma única verificação rápida de que o Ollama está respondendo"""
         import requests
-        
+
+        try:
+            response = requests.get(f"{os.environ['LITELLM_API_BASE']}/api/version", timeout=timeout)
+            ready = response.status_code == 200
+        except Exception:
+            ready = False
+        self._ready = (ready, time.time())
+        return ready
+
+    def is_ready(self, max_age: float = 10) -> bool:
+        """Prontidão do Ollama, reaproveitando uma verificação recente"""
+        ready, checked_at = self._ready
+        if ready and time.time() - checked_at < max_age:
+            return True
+        return self.check_connection()
+
+    def wait_until_ready(self):
+        """Testa a conexão com o Ollama e espera até estar pronto (roda em segundo plano no startup)"""
         max_retries = 5
         retry_count = 0
         
         print("Testando conexão com o Ollama...")
         
         while retry_count < max_retries:
-            try:
-                # Tenta fazer uma requisição simples à API do Ollama
-                response = requests.get(f"{os.environ['LITELLM_API_BASE']}/api/version")
-                if response.status_code == 200:
-                    print(f"Conexão com Ollama estabelecida: {response.json()}")
-                    return
-                else:
-                    print(f"Ollama respondeu com status code: {response.status_code}")
-            except Exception as e:
-                print(f"Erro ao conectar com Ollama: {str(e)}")
+            if self.check_connection(timeout=5):
+                print("Conexão com Ollama estabelecida")
+                return True
             
             retry_count += 1
             wait_time = 2 * retry_count
@@ -57,53 +95,303 @@ class CustomLiteLLM:
             time.sleep(wait_time)
         
         print("Aviso: Não foi possível conectar ao Ollama após várias tentativas, mas continuando mesmo assim...")
+        return False
         
-    def chat(self, messages):
+    def chat(self, messages, cancel_token=None, max_tokens=2000, timeout=10000, stage=STAGE_DEFAULT, area=None,
+             response_format=None):
         """
         Implementa o método chat para compatibilidade com a interface esperada
-        por execute_task_directly no crewai_generator.py
+        por execute_task_directly no crewai_generator.py. Com cancel_token a
+        resposta é lida em streaming para que a geração possa ser abortada.
+        O modelo é escolhido pelo model_router a partir da etapa e da área
         """
+        if cancel_token is not None:
+            return "".join(self.chat_stream(
+                messages, cancel_token=cancel_token, max_tokens=max_tokens, timeout=timeout, stage=stage, area=area,
+                response_format=response_format
+            ))
+
         try:
-            from litellm import completion
-            
-            # Formatar mensagens para melhor compreensão
-            formatted_messages = []
-            for msg in messages:
-                if isinstance(msg, dict) and "content" in msg:
-                    # Adicionar instruções claras para o modelo
-                    if msg["role"] == "user":
-                        formatted_content = f"""
-                        Instruções: Analise cuidadosamente e forneça uma resposta detalhada e estruturada.
-                        
-                        {msg["content"]}
-                        """
-                        formatted_messages.append({"role": "user", "content": formatted_content})
-                    else:
-                        formatted_messages.append(msg)
-            
-            # Usar o formato correto para o modelo
-            response = completion(
-                model="ollama/llama2",
-                api_base="http://ollama:11434",
-                messages=formatted_messages,
-                temperature=0.3,
-                max_tokens=2000,  # Aumentado para respostas mais completas
-                timeout=10000
-            )
-            
-            # Extrair a resposta do modelo
-            if hasattr(response, 'choices') and len(response.choices) > 0:
-                if hasattr(response.choices[0], 'message') and hasattr(response.choices[0].message, 'content'):
-                    return response.choices[0].message.content
-            
-            # Fallback caso a estrutura da resposta seja diferente
-            return str(response)
-            
+            completion = self.litellm.completion
+            formatted = self._format_messages(messages)
+            route = self._route(formatted, stage, area)
+            prompt_tokens = self._prompt_tokens(formatted, route[0])
+
+            error = None
+            for model in model_router.by_availability(route):
+                call = model_router.start(stage, model, fallback=model != route[0], prompt_tokens=prompt_tokens)
+                try:
+                    # Usar o formato correto para o modelo
+                    response = completion(
+                        model=model,
+                        api_base=OLLAMA_BASE_URL,
+                        messages=formatted,
+                        temperature=0.3,
+                        max_tokens=max_tokens,
+                        timeout=timeout,
+                        **self._output_format(response_format)
+                    )
+                except Exception as e:
+                    print(f"Modelo {model} indisponível para {stage}: {str(e)}")
+                    call.fail(e)
+                    call.finish()
+                    error = e
+                    continue
+
+                # Extrair a resposta do modelo
+                content = None
+                if hasattr(response, 'choices') and len(response.choices) > 0:
+                    if hasattr(response.choices[0], 'message') and hasattr(response.choices[0].message, 'content'):
+                        content = response.choices[0].message.content
+                usage = getattr(response, 'usage', None)
+                call.prompt_tokens = getattr(usage, 'prompt_tokens', None) or prompt_tokens
+                call.token(getattr(usage, 'completion_tokens', None) or len((content or "").split()))
+                call.complete()
+                call.finish()
+
+                # Fallback caso a estrutura da resposta seja diferente
+                return content if content is not None else str(response)
+            raise error
+
         except Exception as e:
             error_msg = f"Erro ao gerar resposta via LiteLLM: {str(e)}"
             print(error_msg)
             # Retornar uma resposta de erro que ainda pode ser usada pelo sistema
             return f"Não foi possível gerar uma análise devido a um erro técnico. Por favor, tente novamente mais tarde."
 
-# Configurar o LiteLLM uma única vez na inicialização
+    def chat_stream(self, messages, cancel_token=None, max_tokens=2000, timeout=10000, stage=STAGE_DEFAULT, area=None,
+                    response_format=None):
+        """
+        Versão em streaming de chat: produz os fragmentos de texto à medida
+        que o Ollama os gera, em vez de esperar pela resposta completa.
+        Se cancel_token for cancelado, a conexão com o Ollama é fechada (o que
+        interrompe a geração no servidor) e GenerationCancelled é lançada.
+        Se o modelo da rota falhar antes do primeiro token, o próximo é tentado
+        """
+        try:
+            completion = self.litellm.completion
+
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+
+            formatted = self._format_messages(messages)
+            route = self._route(formatted, stage, area)
+            prompt_tokens = self._prompt_tokens(formatted, route[0])
+
+            error = None
+            for model in model_router.by_availability(route):
+                call = model_router.start(stage, model, fallback=model != route[0], prompt_tokens=prompt_tokens)
+                response = None
+                close_on_cancel = None
+                try:
+                    try:
+                        response = completion(
+                            model=model,
+                            api_base=OLLAMA_BASE_URL,
+                            messages=formatted,
+                            temperature=0.3,
+                            max_tokens=max_tokens,
+                            timeout=timeout,
+                            stream=True,
+                            **self._output_format(response_format)
+                        )
+                        if cancel_token is not None:
+                            # Fecha a conexão assim que o token é cancelado, mesmo com a
+                            # leitura bloqueada à espera do próximo fragmento do Ollama
+                            close_on_cancel = lambda response=response: self._close_stream(response)
+                            cancel_token.add_callback(close_on_cancel)
+                        # O Ollama só responde (ou recusa o modelo) quando o stream começa a ser lido
+                        chunks = iter(response)
+                        first = next(chunks, None)
+                    except Exception as e:
+                        if response is not None:
+                            self._close_stream(response)
+                        if cancel_token is not None and cancel_token.cancelled:
+                            call.finish()
+                            raise GenerationCancelled(cancel_token.reason) from e
+                        print(f"Modelo {model} indisponível para {stage}: {str(e)}")
+                        call.fail(e)
+                        call.finish()
+                        error = e
+                        continue
+
+                    try:
+                        for chunk in itertools.chain([first], chunks):
+                            if cancel_token is not None:
+                                cancel_token.raise_if_cancelled()
+                            content = self._chunk_content(chunk)
+                            if content:
+                                call.token()
+                                yield content
+                        # O stream fechado pelo cancelamento termina sem erro em alguns clientes HTTP
+                        if cancel_token is not None:
+                            cancel_token.raise_if_cancelled()
+                        call.complete()
+                    except GenerationCancelled:
+                        raise
+                    except Exception as e:
+                        if cancel_token is not None and cancel_token.cancelled:
+                            raise GenerationCancelled(cancel_token.reason) from e
+                        call.fail(e)
+                        raise
+                    finally:
+                        call.finish()
+                        # Fecha o stream HTTP se a leitura foi interrompida antes do fim
+                        self._close_stream(response)
+                    return
+                finally:
+                    if close_on_cancel is not None:
+                        cancel_token.remove_callback(close_on_cancel)
+            raise error
+
+        except GenerationCancelled:
+            print(f"Geração cancelada: {cancel_token.reason}")
+            raise
+        except Exception as e:
+            error_msg = f"Erro ao gerar resposta em streaming via LiteLLM: {str(e)}"
+            print(error_msg)
+            yield f"Não foi possível gerar uma análise devido a um erro técnico. Por favor, tente novamente mais tarde."
+
+    async def achat(self, messages, max_tokens=2000, timeout=10000, stage=STAGE_DEFAULT, area=None,
+                    response_format=None):
+        """Versão assíncrona de chat, usada pelo pipeline assíncrono"""
+        return "".join([
+            token async for token in self.achat_stream(
+                messages, max_tokens=max_tokens, timeout=timeout, stage=stage, area=area,
+                response_format=response_format
+            )
+        ])
+
+    async def achat_stream(self, messages, max_tokens=2000, timeout=10000, stage=STAGE_DEFAULT, area=None,
+                           response_format=None):
+        """
+        Versão assíncrona de chat_stream com litellm.acompletion: a espera pelo
+        Ollama não ocupa nenhuma thread. Cancelar a task que consome o stream
+        fecha a conexão e interrompe a geração no servidor
+        """
+        try:
+            acompletion = self.litellm.acompletion
+            formatted = self._format_messages(messages)
+            route = self._route(formatted, stage, area)
+            prompt_tokens = self._prompt_tokens(formatted, route[0])
+
+            error = None
+            for model in model_router.by_availability(route):
+                call = model_router.start(stage, model, fallback=model != route[0], prompt_tokens=prompt_tokens)
+                response = None
+                try:
+                    response = await acompletion(
+                        model=model,
+                        api_base=OLLAMA_BASE_URL,
+                        messages=formatted,
+                        temperature=0.3,
+                        max_tokens=max_tokens,
+                        timeout=timeout,
+                        stream=True,
+                        **self._output_format(response_format)
+                    )
+                    chunks = aiter(response)
+                    first = await anext(chunks, None)
+                except asyncio.CancelledError:
+                    call.finish()
+                    if response is not None:
+                        await self._aclose_stream(response)
+                    raise
+                except Exception as e:
+                    print(f"Modelo {model} indisponível para {stage}: {str(e)}")
+                    call.fail(e)
+                    call.finish()
+                    if response is not None:
+                        await self._aclose_stream(response)
+                    error = e
+                    continue
+
+                try:
+                    if first is not None:
+                        content = self._chunk_content(first)
+                        if content:
+                            call.token()
+                            yield content
+                    async for chunk in chunks:
+                        content = self._chunk_content(chunk)
+                        if content:
+                            call.token()
+                            yield content
+                    call.complete()
+                except Exception as e:
+                    call.fail(e)
+                    raise
+                finally:
+                    call.finish()
+                    await self._aclose_stream(response)
+                return
+            raise error
+
+        except Exception as e:
+            error_msg = f"Erro ao gerar resposta assíncrona via LiteLLM: {str(e)}"
+            print(error_msg)
+            yield f"Não foi possível gerar uma análise devido a um erro técnico. Por favor, tente novamente mais tarde."
+
+    def _output_format(self, response_format):
+        """Repassa o formato de saída (schema JSON) só quando pedido"""
+        return {"response_format": response_format} if response_format else {}
+
+    def _route(self, formatted_messages, stage, area):
+        """Modelos da rota para a chamada, considerando o tamanho do prompt"""
+        prompt_chars = sum(len(msg.get("content") or "") for msg in formatted_messages)
+        route = model_router.route(stage, area, prompt_chars)
+        if not route:
+            raise RuntimeError(f"Nenhum modelo configurado para a etapa {stage}")
+        return route
+
+    def _prompt_tokens(self, formatted_messages, model):
+        """Tokens do prompt da chamada, para as métricas de uso por modelo"""
+        return self.count_tokens("\n".join(msg.get("content") or "" for msg in formatted_messages), model)
+
+    def _chunk_content(self, chunk):
+        """Extrai o texto de um chunk do stream do LiteLLM"""
+        if not getattr(chunk, 'choices', None):
+            return None
+        delta = getattr(chunk.choices[0], 'delta', None)
+        return getattr(delta, 'content', None) if delta is not None else None
+
+    async def _aclose_stream(self, response):
+        """Equivalente assíncrono de _close_stream"""
+        for stream in (getattr(response, 'completion_stream', None), response):
+            aclose = getattr(stream, 'aclose', None)
+            if callable(aclose):
+                try:
+                    await aclose()
+                except Exception as e:
+                    print(f"Erro ao fechar stream do LiteLLM: {str(e)}")
+
+    def _close_stream(self, response):
+        """Fecha o stream do LiteLLM e, com ele, a conexão HTTP com o Ollama"""
+        for stream in (getattr(response, 'completion_stream', None), response):
+            close = getattr(stream, 'close', None)
+            if callable(close):
+                try:
+                    close()
+                except Exception as e:
+                    print(f"Erro ao fechar stream do LiteLLM: {str(e)}")
+
+    def _format_messages(self, messages):
+        """Formata as mensagens adicionando instruções claras para o modelo"""
+        formatted_messages = []
+        for msg in messages:
+            if isinstance(msg, dict) and "content" in msg:
+                # Adicionar instruções claras para o modelo
+                if msg["role"] == "user":
+                    formatted_content = f"""
+                    Instruções: Analise cuidadosamente e forneça uma resposta detalhada e estruturada.
+                    
+                    {msg["content"]}
+                    """
+                    formatted_messages.append({"role": "user", "content": formatted_content})
+                else:
+                    formatted_messages.append(msg)
+        return formatted_messages
+
+# Criar o adaptador é barato: o LiteLLM é importado no primeiro uso e a
+# conexão com o Ollama é verificada em segundo plano (ver /ready)
 llm_adapter = CustomLiteLLM() 
\ No newline at end of file
@@ -0,0 +1,133 @@
+import functools
+import inspect
+import time
+
+from opentelemetry import trace
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from app.core.tracing import tracer
+
+# Etapas medidas no histograma de duração
+STAGE_EXA = "exa"
+STAGE_SPECIALISTS = "especialistas"
+STAGE_PROJECT_MANAGER = "gerente"
+STAGE_SECTIONS = "extracao_secoes"
+STAGE_PIPELINE = "pipeline"
+
+# Faixas (segundos) do histograma de duração: da extração de seções (ms) ao pipeline inteiro (minutos)
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200)
+# Faixas do histograma de tokens/s de geração por modelo
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 50, 80, 120, 200)
+
+stage_duration = Histogram(
+    "crewai_stage_duration_seconds", "Duração de cada etapa do pipeline", ["stage"], buckets=DURATION_BUCKETS
+)
+retries = Counter(
+    "crewai_retries_total", "Novas tentativas, por etapa e motivo", ["stage", "reason"]
+)
+timeouts = Counter(
+    "crewai_timeouts_total", "Chamadas que estouraram o timeout, por etapa", ["stage"]
+)
+fallbacks = Counter(
+    "crewai_fallbacks_total", "Resultados degradados ou modelos de fallback, por etapa e tipo", ["stage", "kind"]
+)
+short_response_recursions = Counter(
+    "crewai_short_response_recursions_total", "Respostas curtas demais que geraram nova execução do agente",
+    ["stage"]
+)
+prompt_tokens = Counter(
+    "crewai_llm_prompt_tokens_total", "Tokens de prompt enviados ao LLM", ["model"]
+)
+completion_tokens = Counter(
+    "crewai_llm_completion_tokens_total", "Tokens gerados pelo LLM", ["model"]
+)
+tokens_per_second = Histogram(
+    "crewai_llm_tokens_per_second", "Vazão de geração de cada chamada ao LLM (após o primeiro token)", ["model"],
+    buckets=TOKENS_PER_SECOND_BUCKETS
+)
+llm_in_flight = Gauge(
+    "crewai_llm_calls_in_flight", "Chamadas ao LLM em andamento", ["model"]
+)
+pipelines_in_flight = Gauge(
+    "crewai_pipelines_in_flight", "Gerações de projeto em andamento"
+)
+admission_active = Gauge(
+    "crewai_admission_active", "Gerações admitidas pelo controle de admissão e em andamento"
+)
+admission_queue_depth = Gauge(
+    "crewai_admission_queue_depth", "Pedidos esperando uma vaga de geração"
+)
+admission_wait = Histogram(
+    "crewai_admission_wait_seconds", "Tempo de espera por uma vaga de geração (zero quando havia vaga livre)",
+    buckets=DURATION_BUCKETS
+)
+admission_rejections = Counter(
+    "crewai_admission_rejections_total", "Pedidos recusados pelo controle de admissão, por motivo", ["reason"]
+)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Métricas no formato de texto do Prometheus e o content-type da resposta"""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class track:
+    """
+    Context manager que mede um trecho em stage_duration, o conta em in_flight
+    enquanto roda e o registra como um span "etapa.<stage>" do trace atual
+    """
+
+    def __init__(self, stage: str, in_flight: Gauge = None, current: bool = True):
+        self.stage = stage
+        self.histogram = stage_duration.labels(stage)
+        self.in_flight = in_flight
+        # Um gerador é retomado em contextos diferentes a cada next(); nele o span
+        # não vira o span atual, senão o contexto seria restaurado no lugar errado
+        self.current = current
+
+    def __enter__(self):
+        if self.in_flight is not None:
+            self.in_flight.inc()
+        self.span = tracer.start_span(f"etapa.{self.stage}", attributes={"crewai.stage": self.stage})
+        self._scope = trace.use_span(self.span, end_on_exit=True) if self.current else None
+        if self._scope is not None:
+            self._scope.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        if self._scope is not None:
+            self._scope.__exit__(*exc)
+        else:
+            if exc[1] is not None:
+                self.span.record_exception(exc[1])
+                self.span.set_status(trace.StatusCode.ERROR, str(exc[1]))
+            self.span.end()
+        if self.in_flight is not None:
+            self.in_flight.dec()
+
+
+def timed(stage: str, in_flight: Gauge = None):
+    """
+    Decorador equivalente a track para funções síncronas, assíncronas e
+    geradores; num gerador a medição vai até ele ser esgotado ou fechado
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with track(stage, in_flight):
+                    return await func(*args, **kwargs)
+        elif inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with track(stage, in_flight, current=False):
+                    yield from func(*args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with track(stage, in_flight):
+                    return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,269 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from opentelemetry.trace import StatusCode
+
+from app.core import metrics as prometheus
+from app.core.tracing import tracer
+
+logger = logging.getLogger("crewai_model_router")
+
+STAGE_SPECIALIST = "specialist"
+STAGE_PROJECT_MANAGER = "project_manager"
+STAGE_DEFAULT = "default"
+
+# Modelo usado quando a etapa não tem rota própria; é sempre o último fallback
+MODEL_DEFAULT = os.getenv("MODEL_DEFAULT", "ollama/llama2")
+# Modelos dos especialistas; o docker-compose aponta para um modelo pequeno quantizado
+# (instalado pelo `make up`) e, sem configuração, vale o MODEL_DEFAULT
+MODEL_SPECIALIST = os.getenv("MODEL_SPECIALIST", MODEL_DEFAULT)
+MODEL_PROJECT_MANAGER = os.getenv("MODEL_PROJECT_MANAGER", MODEL_DEFAULT)
+# Rotas por área do especialista, no formato "IoT=ollama/phi3:mini;Segurança=ollama/llama2"
+MODEL_AREA_ROUTES = os.getenv("MODEL_AREA_ROUTES", "")
+# Prompts acima deste tamanho (em caracteres) vão para MODEL_LONG_PROMPT; 0 desativa
+MODEL_LONG_PROMPT_CHARS = int(os.getenv("MODEL_LONG_PROMPT_CHARS", "0"))
+MODEL_LONG_PROMPT = os.getenv("MODEL_LONG_PROMPT", MODEL_DEFAULT)
+# Chamadas simultâneas por modelo antes de considerá-lo ocupado (OLLAMA_NUM_PARALLEL)
+MODEL_MAX_INFLIGHT = int(os.getenv("MODEL_MAX_INFLIGHT", "3"))
+# Por quanto tempo um modelo que falhou é evitado; modelos ausentes ficam fora por mais tempo
+MODEL_COOLDOWN = float(os.getenv("MODEL_COOLDOWN", "30"))
+MODEL_MISSING_COOLDOWN = float(os.getenv("MODEL_MISSING_COOLDOWN", "300"))
+# Quantas latências por rota são guardadas para os percentis
+METRICS_WINDOW = 500
+
+
+def _models(value: str) -> list[str]:
+    return [model.strip() for model in value.split(",") if model.strip()]
+
+
+def _parse_area_routes(value: str) -> dict[str, list[str]]:
+    routes = {}
+    for entry in value.split(";"):
+        if "=" not in entry:
+            continue
+        area, models = entry.split("=", 1)
+        if area.strip() and _models(models):
+            routes[area.strip()] = _models(models)
+    return routes
+
+
+def _is_missing_model(error: BaseException) -> bool:
+    """
+    Modelo não instalado no Ollama: o LiteLLM converte o 404 em NotFoundError,
+    que traz status_code; erros do cliente HTTP trazem o status na resposta
+    """
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code == 404
+
+
+def _percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class RouteMetrics:
+    """Latência e vazão acumuladas de uma rota (etapa, modelo)"""
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.fallbacks = 0
+        self.tokens = 0
+        self.generation_time = 0.0
+        self.latencies = deque(maxlen=METRICS_WINDOW)
+        self.first_tokens = deque(maxlen=METRICS_WINDOW)
+
+    def snapshot(self) -> dict:
+        stats = {
+            "chamadas": self.calls,
+            "falhas": self.failures,
+            "fallbacks": self.fallbacks,
+            "tokens": self.tokens,
+            "tokens_por_s": round(self.tokens / self.generation_time, 2) if self.generation_time else 0.0
+        }
+        if self.latencies:
+            stats["latencia_p50_s"] = round(_percentile(self.latencies, 0.5), 3)
+            stats["latencia_p95_s"] = round(_percentile(self.latencies, 0.95), 3)
+        if self.first_tokens:
+            stats["primeiro_token_p50_s"] = round(_percentile(self.first_tokens, 0.5), 3)
+        return stats
+
+
+class ModelCall:
+    """
+    Uma chamada a um modelo; acumula as métricas, libera o slot do modelo ao
+    terminar e vira um span "llm.chat" filho da etapa que a fez
+    """
+
+    def __init__(self, router: "ModelRouter", stage: str, model: str, fallback: bool, prompt_tokens: int = 0):
+        self.router = router
+        self.stage = stage
+        self.model = model
+        self.fallback = fallback
+        self.prompt_tokens = prompt_tokens
+        self.started_at = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.tokens = 0
+        self.error: Optional[BaseException] = None
+        self.completed = False
+        self._finished = False
+        self.span = tracer.start_span("llm.chat", attributes={
+            "gen_ai.request.model": model, "crewai.stage": stage, "crewai.fallback": fallback
+        })
+
+    def token(self, count: int = 1):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.tokens += count
+
+    def fail(self, error: BaseException):
+        self.error = error
+
+    def complete(self):
+        """A resposta foi lida até o fim; chamadas interrompidas não entram na latência"""
+        self.completed = True
+
+    def finish(self):
+        if not self._finished:
+            self._finished = True
+            self.router._finish(self)
+
+
+class ModelRouter:
+    """
+    Escolhe o modelo de cada chamada ao LLM pela etapa do pipeline (e,
+    opcionalmente, pela área e pelo tamanho do prompt). Cada rota é uma lista
+    de modelos em ordem de preferência terminada em MODEL_DEFAULT; modelos
+    ocupados ou que falharam recentemente vão para o fim da fila
+    """
+
+    def __init__(self, stage_routes: dict[str, list[str]], area_routes: dict[str, list[str]] = None,
+                 default_model: str = MODEL_DEFAULT, long_prompt_chars: int = MODEL_LONG_PROMPT_CHARS,
+                 long_prompt_models: list[str] = None, max_inflight: int = MODEL_MAX_INFLIGHT):
+        self.stage_routes = stage_routes
+        self.area_routes = area_routes or {}
+        self.default_model = default_model
+        self.long_prompt_chars = long_prompt_chars
+        self.long_prompt_models = long_prompt_models or [default_model]
+        self.max_inflight = max_inflight
+        self._inflight: dict[str, int] = {}
+        self._unavailable_until: dict[str, float] = {}
+        self._metrics: dict[tuple[str, str], RouteMetrics] = {}
+        self._lock = threading.Lock()
+
+    def route(self, stage: str = STAGE_DEFAULT, area: Optional[str] = None, prompt_chars: int = 0) -> list[str]:
+        """Modelos configurados para a chamada, em ordem de preferência"""
+        if self.long_prompt_chars and prompt_chars > self.long_prompt_chars:
+            preferred = self.long_prompt_models
+        elif stage == STAGE_SPECIALIST and area in self.area_routes:
+            preferred = self.area_routes[area]
+        else:
+            preferred = self.stage_routes.get(stage, [])
+        models = []
+        for model in [*preferred, self.default_model]:
+            if model and model not in models:
+                models.append(model)
+        return models
+
+    def by_availability(self, models: list[str]) -> list[str]:
+        """Reordena a rota: modelos livres primeiro, depois os ocupados e por último os em pausa"""
+        now = time.monotonic()
+        with self._lock:
+            def rank(model):
+                if self._unavailable_until.get(model, 0) > now:
+                    return 2
+                return 1 if self._inflight.get(model, 0) >= self.max_inflight else 0
+            return sorted(models, key=rank)
+
+    def start(self, stage: str, model: str, fallback: bool = False, prompt_tokens: int = 0) -> ModelCall:
+        with self._lock:
+            self._inflight[model] = self._inflight.get(model, 0) + 1
+        prometheus.llm_in_flight.labels(model).inc()
+        return ModelCall(self, stage, model, fallback, prompt_tokens)
+
+    def _export(self, call: ModelCall, now: float):
+        """Repassa a chamada às métricas do Prometheus e fecha o span dela"""
+        call.span.set_attributes({
+            "gen_ai.usage.input_tokens": call.prompt_tokens,
+            "gen_ai.usage.output_tokens": call.tokens,
+            "crewai.completed": call.completed
+        })
+        if call.first_token_at is not None:
+            call.span.set_attribute("crewai.first_token_s", round(call.first_token_at - call.started_at, 3))
+        if call.error is not None:
+            call.span.record_exception(call.error)
+            call.span.set_status(StatusCode.ERROR, str(call.error))
+        call.span.end()
+        prometheus.llm_in_flight.labels(call.model).dec()
+        if call.error is None or call.first_token_at is not None:
+            # Um modelo que recusou a chamada não chegou a processar o prompt
+            prometheus.prompt_tokens.labels(call.model).inc(call.prompt_tokens)
+        prometheus.completion_tokens.labels(call.model).inc(call.tokens)
+        if call.fallback:
+            prometheus.fallbacks.labels(call.stage, "modelo").inc()
+        if call.error is None and call.completed and call.first_token_at is not None and now > call.first_token_at:
+            prometheus.tokens_per_second.labels(call.model).observe(call.tokens / (now - call.first_token_at))
+
+    def _finish(self, call: ModelCall):
+        now = time.perf_counter()
+        elapsed = now - call.started_at
+        self._export(call, now)
+        with self._lock:
+            self._inflight[call.model] = max(0, self._inflight.get(call.model, 0) - 1)
+            metrics = self._metrics.setdefault((call.stage, call.model), RouteMetrics())
+            metrics.calls += 1
+            metrics.fallbacks += int(call.fallback)
+            if call.error is not None:
+                metrics.failures += 1
+                cooldown = MODEL_MISSING_COOLDOWN if _is_missing_model(call.error) else MODEL_COOLDOWN
+                self._unavailable_until[call.model] = time.monotonic() + cooldown
+                return
+            if not call.completed:
+                return
+            metrics.latencies.append(elapsed)
+            if call.first_token_at is not None:
+                metrics.first_tokens.append(call.first_token_at - call.started_at)
+                metrics.tokens += call.tokens
+                metrics.generation_time += now - call.first_token_at
+        if call.error is None and call.fallback:
+            logger.info(f"Etapa {call.stage} atendida pelo modelo de fallback {call.model}")
+
+    def signature(self) -> str:
+        """Identifica a política de roteamento; entra na chave do cache de resultados"""
+        parts = [f"{stage}={','.join(self.route(stage))}" for stage in sorted(self.stage_routes)]
+        parts += [f"{area}={','.join(models)}" for area, models in sorted(self.area_routes.items())]
+        if self.long_prompt_chars:
+            parts.append(f">{self.long_prompt_chars}={','.join(self.long_prompt_models)}")
+        return ";".join(parts)
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            rotas = {
+                f"{stage}:{model}": metrics.snapshot()
+                for (stage, model), metrics in sorted(self._metrics.items())
+            }
+            em_pausa = {model: round(until - now, 1) for model, until in self._unavailable_until.items() if until > now}
+            em_uso = {model: count for model, count in self._inflight.items() if count}
+        return {
+            "politica": {stage: self.route(stage) for stage in sorted(self.stage_routes)},
+            "rotas": rotas,
+            "em_uso": em_uso,
+            "em_pausa_s": em_pausa
+        }
+
+
+model_router = ModelRouter(
+    stage_routes={
+        STAGE_SPECIALIST: _models(MODEL_SPECIALIST),
+        STAGE_PROJECT_MANAGER: _models(MODEL_PROJECT_MANAGER)
+    },
+    area_routes=_parse_area_routes(MODEL_AREA_ROUTES),
+    long_prompt_models=_models(MODEL_LONG_PROMPT)
+)
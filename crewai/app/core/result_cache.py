@@ -0,0 +1,211 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from typing import Optional
+
+logger = logging.getLogger("crewai_cache")
+
+# Textos usados pelos fallbacks do pipeline; resultados degradados não são guardados
+FALLBACK_PREFIX = "Não foi possível"
+
+
+def normalize_text(text: str) -> str:
+    """Normaliza caixa e espaços para que pedidos triviais gerem a mesma chave"""
+    return " ".join((text or "").lower().split())
+
+
+def cache_key(area_selection: list[str], tech_stack: str, description: str, usar_exa: bool, model: str) -> str:
+    """Hash canônico dos parâmetros que determinam o resultado do pipeline"""
+    canonical = {
+        "areas": sorted({normalize_text(area) for area in area_selection if area.strip()}),
+        "tecnologias": sorted({normalize_text(tech) for tech in tech_stack.split(",") if tech.strip()}),
+        "descricao": normalize_text(description),
+        "usar_exa": bool(usar_exa),
+        "modelo": model
+    }
+    payload = json.dumps(canonical, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(resultado) -> bool:
+    """Só resultados completos entram no cache; erros e fallbacks são descartados"""
+    if not isinstance(resultado, dict) or "error" in resultado:
+        return False
+    resumo = resultado.get("resumo") or ""
+    return bool(resumo and resultado.get("estrutura")) and not resumo.startswith(FALLBACK_PREFIX)
+
+
+class DiskCache:
+    """Camada persistente em SQLite que sobrevive a reinícios do serviço"""
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        with closing(self._connect()) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS resultados (
+                    chave TEXT PRIMARY KEY,
+                    valor TEXT NOT NULL,
+                    expira_em REAL NOT NULL,
+                    ultimo_acesso REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_resultados_acesso ON resultados (ultimo_acesso)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def get(self, key: str) -> Optional[tuple]:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT valor, expira_em FROM resultados WHERE chave = ?", (key,)).fetchone()
+            if not row:
+                return None
+            if row[1] <= time.time():
+                conn.execute("DELETE FROM resultados WHERE chave = ?", (key,))
+                return None
+            conn.execute("UPDATE resultados SET ultimo_acesso = ? WHERE chave = ?", (time.time(), key))
+            return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: dict, expires_at: float) -> int:
+        """Grava a entrada e devolve quantas entradas antigas foram removidas"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO resultados (chave, valor, expira_em, ultimo_acesso) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires_at, time.time())
+            )
+            conn.execute("DELETE FROM resultados WHERE expira_em <= ?", (time.time(),))
+            excesso = conn.execute("SELECT COUNT(*) FROM resultados").fetchone()[0] - self.max_entries
+            if excesso > 0:
+                conn.execute(
+                    "DELETE FROM resultados WHERE chave IN "
+                    "(SELECT chave FROM resultados ORDER BY ultimo_acesso LIMIT ?)",
+                    (excesso,)
+                )
+                return excesso
+            return 0
+
+    def size(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM resultados").fetchone()[0]
+
+
+class ResultCache:
+    """
+    Cache de resultados do pipeline: camada LRU em memória com TTL e limite
+    de tamanho, e camada opcional em disco
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 86400, disk: Optional[DiskCache] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk = disk
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits_memoria": 0,
+            "hits_disco": 0,
+            "misses": 0,
+            "gravacoes": 0,
+            "evictions_memoria": 0,
+            "evictions_disco": 0,
+            "expiracoes": 0,
+            "bypass": 0,
+            "refresh": 0
+        }
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.stats["hits_memoria"] += 1
+                    return value
+                del self._entries[key]
+                self.stats["expiracoes"] += 1
+
+        if self.disk:
+            try:
+                entry = self.disk.get(key)
+            except Exception as e:
+                logger.warning(f"Erro ao ler cache em disco: {str(e)}")
+                entry = None
+            if entry:
+                value, expires_at = entry
+                with self._lock:
+                    self._store_memory(key, value, expires_at)
+                    self.stats["hits_disco"] += 1
+                return value
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def set(self, key: str, value: dict):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store_memory(key, value, expires_at)
+            self.stats["gravacoes"] += 1
+        if self.disk:
+            try:
+                removidas = self.disk.set(key, value, expires_at)
+                with self._lock:
+                    self.stats["evictions_disco"] += removidas
+            except Exception as e:
+                logger.warning(f"Erro ao gravar cache em disco: {str(e)}")
+
+    def record(self, event: str):
+        with self._lock:
+            self.stats[event] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _store_memory(self, key: str, value: dict, expires_at: float):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions_memoria"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entradas_memoria"] = len(self._entries)
+        hits = stats["hits_memoria"] + stats["hits_disco"]
+        consultas = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / consultas, 4) if consultas else 0.0
+        stats["max_entradas"] = self.max_entries
+        stats["ttl_segundos"] = self.ttl
+        if self.disk:
+            try:
+                stats["entradas_disco"] = self.disk.size()
+            except Exception:
+                stats["entradas_disco"] = None
+        return stats
+
+
+def create_result_cache() -> Optional[ResultCache]:
+    """Cria o cache a partir das variáveis RESULT_CACHE_*; devolve None se desativado"""
+    if os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    disk = None
+    disk_path = os.getenv("RESULT_CACHE_DISK_PATH")
+    if disk_path:
+        disk = DiskCache(disk_path, int(os.getenv("RESULT_CACHE_DISK_MAX_ENTRIES", "5000")))
+    return ResultCache(
+        max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256")),
+        ttl=float(os.getenv("RESULT_CACHE_TTL", "86400")),
+        disk=disk
+    )
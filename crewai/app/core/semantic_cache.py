@@ -0,0 +1,230 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import unicodedata
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger("crewai_semantic_cache")
+
+SKETCH_WORDS = 2  # 2 x 64 bits por assinatura
+SKETCH_BITS = 64 * SKETCH_WORDS
+
+_STOPWORDS = {
+    "a", "o", "as", "os", "um", "uma", "uns", "umas", "de", "do", "da", "dos", "das", "em", "no", "na",
+    "nos", "nas", "com", "para", "pra", "por", "que", "e", "ou", "se", "meu", "minha", "sistema",
+    "projeto", "aplicacao", "aplicativo", "app", "application", "the", "an", "of", "for", "with",
+    "and", "or", "in", "on", "to", "using", "usando", "feito", "criar", "quero", "simples"
+}
+
+# Sinônimos frequentes nas descrições (pt/en) reduzidos a um termo canônico
+_SYNONYMS = {
+    "todo": "tarefa", "todos": "tarefa", "tarefas": "tarefa", "task": "tarefa", "tasks": "tarefa",
+    "afazeres": "tarefa", "list": "lista", "listas": "lista", "loja": "ecommerce", "shop": "ecommerce",
+    "store": "ecommerce", "e-commerce": "ecommerce", "blog": "blog", "posts": "post",
+    "chat": "chat", "mensagens": "chat", "messaging": "chat", "jogo": "jogo", "game": "jogo",
+    "games": "jogo", "jogos": "jogo", "financas": "financas", "finance": "financas",
+    "financeiro": "financas", "usuarios": "usuario", "users": "usuario", "user": "usuario",
+    "reactjs": "react", "react.js": "react", "nodejs": "node", "node.js": "node"
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9+#.\-]+")
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(values: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(values).sum(axis=-1, dtype=np.int32)
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(values: np.ndarray) -> np.ndarray:
+        as_bytes = values.view(np.uint8).reshape(values.shape[0], -1)
+        return _POPCOUNT_TABLE[as_bytes].sum(axis=1, dtype=np.int32)
+
+
+def _strip_accents(text: str) -> str:
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+
+
+def tokenize(text: str) -> list[str]:
+    """Normaliza o texto e devolve os termos canônicos sem stopwords"""
+    tokens = []
+    for token in _TOKEN_RE.findall(_strip_accents((text or "").lower())):
+        token = token.strip(".-")
+        token = _SYNONYMS.get(token, token)
+        if token and token not in _STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+def extract_features(area_selection: list[str], tech_stack: str, description: str) -> dict[str, float]:
+    """Features ponderadas da tupla (áreas, tecnologias, descrição)"""
+    features: dict[str, float] = {}
+    for token in tokenize(description):
+        features["w:" + token] = features.get("w:" + token, 0.0) + 1.0
+        # Trigramas de caracteres toleram flexões e erros de digitação
+        padded = f"_{token}_"
+        for i in range(len(padded) - 2):
+            key = "c:" + padded[i:i + 3]
+            features[key] = features.get(key, 0.0) + 0.25
+    for tech in tech_stack.split(","):
+        for token in tokenize(tech):
+            features["t:" + token] = 1.5
+    for area in area_selection:
+        key = "a:" + " ".join(tokenize(area))
+        features[key] = 1.0
+    return features
+
+
+def request_scope(area_selection: list[str], tech_stack: str) -> tuple:
+    """Áreas e tecnologias normalizadas; um hit exige o mesmo escopo, não só texto parecido"""
+    areas = frozenset(" ".join(tokenize(area)) for area in area_selection)
+    techs = frozenset(" ".join(tokenize(tech)) for tech in tech_stack.split(","))
+    return areas - {""}, techs - {""}
+
+
+def _feature_hashes(names: list[str]) -> np.ndarray:
+    hashes = np.empty((len(names), SKETCH_WORDS), dtype=np.uint64)
+    for i, name in enumerate(names):
+        digest = hashlib.blake2b(name.encode("utf-8"), digest_size=8 * SKETCH_WORDS).digest()
+        hashes[i] = np.frombuffer(digest, dtype=np.uint64)
+    return hashes
+
+
+def simhash(features: dict[str, float]) -> np.ndarray:
+    """Assinatura SimHash de 128 bits (2 x uint64) das features ponderadas"""
+    sketch = np.zeros(SKETCH_WORDS, dtype=np.uint64)
+    if not features:
+        return sketch
+    names = list(features)
+    weights = np.fromiter((features[name] for name in names), dtype=np.float64, count=len(names))
+    bits = np.unpackbits(_feature_hashes(names).view(np.uint8), axis=1, bitorder="little")
+    scores = (np.where(bits, 1.0, -1.0) * weights[:, None]).sum(axis=0)
+    packed = np.packbits(scores > 0, bitorder="little")
+    return packed.view(np.uint64).copy()
+
+
+class SimHashIndex:
+    """
+    Índice compacto de assinaturas em um array contíguo de uint64; a busca
+    calcula a distância de Hamming contra todas as entradas de forma vetorizada
+    """
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._sketches = np.zeros((min(1024, max_entries), SKETCH_WORDS), dtype=np.uint64)
+        self._payloads: list = []
+        self._size = 0
+        self._next = 0  # posição a sobrescrever quando o índice está cheio
+
+    def __len__(self):
+        return self._size
+
+    def add(self, sketch: np.ndarray, payload) -> int:
+        if self._size < self.max_entries:
+            if self._size == len(self._sketches):
+                grown = np.zeros((min(len(self._sketches) * 2, self.max_entries), SKETCH_WORDS), dtype=np.uint64)
+                grown[:self._size] = self._sketches[:self._size]
+                self._sketches = grown
+            slot = self._size
+            self._payloads.append(payload)
+            self._size += 1
+        else:
+            # Índice cheio: substitui a entrada mais antiga (FIFO)
+            slot = self._next
+            self._payloads[slot] = payload
+            self._next = (self._next + 1) % self.max_entries
+        self._sketches[slot] = sketch
+        return slot
+
+    def add_many(self, sketches: np.ndarray, payloads: list):
+        for sketch, payload in zip(sketches, payloads):
+            self.add(sketch, payload)
+
+    def search(self, sketch: np.ndarray) -> Optional[tuple]:
+        """Devolve (payload, similaridade) da entrada mais próxima"""
+        if not self._size:
+            return None
+        distances = _popcount(np.bitwise_xor(self._sketches[:self._size], sketch))
+        best = int(np.argmin(distances))
+        return self._payloads[best], 1.0 - distances[best] / SKETCH_BITS
+
+
+class SemanticCache:
+    """
+    Cache de quase-duplicados: encontra planos gerados para pedidos
+    parecidos (paráfrases da mesma ideia) acima de um limiar de similaridade.
+    O plano só é reaproveitado direto (hit) quando as áreas e tecnologias
+    normalizadas são as mesmas; com escopo diferente ele serve de semente
+    """
+
+    def __init__(self, threshold: float = 0.85, seed_threshold: Optional[float] = 0.75, max_entries: int = 100_000):
+        self.threshold = threshold
+        self.seed_threshold = seed_threshold
+        self.index = SimHashIndex(max_entries)
+        self._lock = threading.Lock()
+        self.stats = {"consultas": 0, "hits": 0, "sementes": 0, "misses": 0, "gravacoes": 0}
+
+    def lookup(self, area_selection: list[str], tech_stack: str, description: str, model: str) -> Optional[dict]:
+        """
+        Procura um plano semelhante. Devolve {"modo": "hit"|"semente", "resultado",
+        "similaridade"} ou None quando nada passa do limiar
+        """
+        sketch = simhash(extract_features(area_selection, tech_stack, description))
+        with self._lock:
+            self.stats["consultas"] += 1
+            found = self.index.search(sketch)
+            if found:
+                payload, similarity = found
+                if payload["modelo"] == model:
+                    same_scope = payload["escopo"] == request_scope(area_selection, tech_stack)
+                    if similarity >= self.threshold and same_scope:
+                        self.stats["hits"] += 1
+                        return {"modo": "hit", "resultado": payload["resultado"], "similaridade": similarity}
+                    if self.seed_threshold is not None and similarity >= self.seed_threshold:
+                        self.stats["sementes"] += 1
+                        return {"modo": "semente", "resultado": payload["resultado"], "similaridade": similarity}
+            self.stats["misses"] += 1
+        return None
+
+    def add(self, area_selection: list[str], tech_stack: str, description: str, model: str, resultado: dict):
+        sketch = simhash(extract_features(area_selection, tech_stack, description))
+        with self._lock:
+            self.index.add(sketch, {
+                "modelo": model,
+                "escopo": request_scope(area_selection, tech_stack),
+                "resultado": resultado
+            })
+            self.stats["gravacoes"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entradas"] = len(self.index)
+        stats["limiar"] = self.threshold
+        stats["limiar_semente"] = self.seed_threshold
+        return stats
+
+
+def build_seed_description(description: str, resultado: dict) -> str:
+    """Acrescenta à descrição um plano semelhante como referência para os agentes"""
+    referencia = (resultado.get("resumo") or "")[:600]
+    tecnologias = (resultado.get("tecnologias") or "")[:300]
+    return (
+        f"{description}\n\nPlano de referência de um projeto semelhante "
+        f"(adapte ao pedido atual):\n{referencia}\nTecnologias usadas: {tecnologias}"
+    )
+
+
+def create_semantic_cache() -> Optional[SemanticCache]:
+    """Cria o cache semântico a partir das variáveis SEMANTIC_CACHE_*; devolve None se desativado"""
+    if os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    seed = os.getenv("SEMANTIC_CACHE_SEED_THRESHOLD", "0.75")
+    return SemanticCache(
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85")),
+        seed_threshold=float(seed) if seed else None,
+        max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "100000"))
+    )
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Iterator, Optional
+
+from app.core.cancellation import CancelToken
+from app.core.deadline import Deadline
+
+logger = logging.getLogger("crewai_single_flight")
+
+# Tempo que uma execução sem ninguém esperando continua viva, para que um
+# retry do frontend ainda consiga se juntar a ela
+SINGLE_FLIGHT_GRACE = float(os.getenv("SINGLE_FLIGHT_GRACE", "5"))
+ORPHAN_REASON = "sem clientes esperando"
+
+
+class Flight:
+    """
+    Uma geração em andamento compartilhada por todos os pedidos com a mesma
+    chave: o resultado fica em `future` e, no streaming, os eventos já
+    produzidos ficam guardados para quem chega depois
+    """
+
+    def __init__(self, key: str, deadline: Optional[Deadline] = None):
+        self.key = key
+        self.future: Future = Future()
+        self.token = CancelToken()
+        # Cópia do prazo: quem se junta depois pode estendê-lo
+        self.deadline = Deadline(deadline.remaining()) if deadline is not None else None
+        self.waiters = 1
+        self.started_at = time.time()
+        self._events: list = []
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def publish(self, event: dict):
+        with self._cond:
+            self._events.append(event)
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def subscribe(self, cancel_token: Optional[CancelToken] = None, poll_interval: float = 0.5) -> Iterator[dict]:
+        """Repete os eventos já publicados e segue os novos até a execução terminar"""
+        position = 0
+        while True:
+            with self._cond:
+                while position >= len(self._events) and not self._closed:
+                    if cancel_token is not None and cancel_token.cancelled:
+                        break
+                    self._cond.wait(poll_interval)
+                pending = self._events[position:]
+                closed = self._closed
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            for event in pending:
+                yield event
+            position += len(pending)
+            if closed and position >= len(self._events):
+                return
+
+    async def wait(self):
+        """Aguarda o resultado no event loop; cancelar quem espera não cancela a execução"""
+        waiting = asyncio.wrap_future(self.future)
+        # Evita o aviso de exceção não lida quando quem esperava já desistiu
+        waiting.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return await asyncio.shield(waiting)
+
+
+class SingleFlight:
+    """
+    Registro das gerações em andamento. Um pedido cuja chave coincide com uma
+    execução em curso se junta a ela em vez de iniciar outra; a execução só
+    é cancelada quando não sobra ninguém esperando
+    """
+
+    def __init__(self, name: str, grace: float = SINGLE_FLIGHT_GRACE):
+        self.name = name
+        self.grace = grace
+        self._flights: dict[str, Flight] = {}
+        self._lock = threading.Lock()
+        self.stats = {"execucoes": 0, "coalescidos": 0, "canceladas": 0}
+
+    def join(self, key: str, deadline: Optional[Deadline] = None) -> tuple[Flight, bool]:
+        """Devolve (execução, é_líder); o líder é quem deve iniciar a geração"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and not flight.token.cancelled:
+                flight.waiters += 1
+                if deadline is not None and flight.deadline is not None:
+                    flight.deadline.expires_at = max(flight.deadline.expires_at, deadline.expires_at)
+                self.stats["coalescidos"] += 1
+                logger.info(f"[{self.name}] Pedido coalescido com execução em andamento ({flight.waiters} esperando)")
+                return flight, False
+            flight = Flight(key, deadline)
+            self._flights[key] = flight
+            self.stats["execucoes"] += 1
+            return flight, True
+
+    def active(self, key: str) -> bool:
+        """Indica se um pedido com esta chave se juntaria a uma execução em andamento"""
+        with self._lock:
+            flight = self._flights.get(key)
+            return flight is not None and not flight.token.cancelled
+
+    def leave(self, flight: Flight):
+        """Um pedido deixou de esperar; sem ninguém esperando, a execução é cancelada"""
+        with self._lock:
+            flight.waiters -= 1
+            orphan = flight.waiters <= 0 and not flight.future.done()
+        if orphan:
+            if self.grace > 0:
+                timer = threading.Timer(self.grace, self._cancel_if_orphan, args=(flight,))
+                timer.daemon = True
+                timer.start()
+            else:
+                self._cancel_if_orphan(flight)
+
+    def finish(self, flight: Flight, result=None, error: Optional[BaseException] = None):
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        if not flight.future.done():
+            if error is not None:
+                flight.future.set_exception(error)
+            else:
+                flight.future.set_result(result)
+        flight.close()
+
+    def _cancel_if_orphan(self, flight: Flight):
+        with self._lock:
+            if flight.waiters > 0 or flight.future.done():
+                return
+            self.stats["canceladas"] += 1
+        logger.info(f"[{self.name}] Execução sem clientes esperando, cancelando")
+        flight.token.cancel(ORPHAN_REASON)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["em_andamento"] = len(self._flights)
+            stats["esperando"] = sum(flight.waiters for flight in self._flights.values())
+        pedidos = stats["execucoes"] + stats["coalescidos"]
+        stats["taxa_coalescencia"] = round(stats["coalescidos"] / pedidos, 4) if pedidos else 0.0
+        return stats
@@ -0,0 +1,120 @@
+import logging
+import os
+import threading
+from typing import Optional
+
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind, StatusCode
+from opentelemetry.propagate import extract, inject
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor, SpanExporter, SpanExportResult
+)
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+logger = logging.getLogger("crewai_tracing")
+
+# Para onde vão os spans: none, console, arquivo, memoria ou otlp
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+# Arquivo JSON Lines usado pelo exportador "arquivo"
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+# Fração dos traces iniciados aqui que são gravados; traces vindos do backend seguem a decisão dele
+TRACING_SAMPLE_RATIO = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+SERVICE_NAME = "crewai"
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Grava cada span como uma linha JSON; útil para investigar latência sem um coletor"""
+
+    def __init__(self, path: str = TRACING_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans) -> SpanExportResult:
+        lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as file:
+                file.write(lines)
+        except OSError as e:
+            logger.error(f"Erro ao gravar spans em {self.path}: {str(e)}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+
+def create_exporter(name: str = TRACING_EXPORTER) -> Optional[SpanExporter]:
+    """Exportador configurado; None desliga a exportação (a propagação do contexto continua)"""
+    if name == "console":
+        return ConsoleSpanExporter()
+    if name == "arquivo":
+        return JsonLinesSpanExporter()
+    if name == "memoria":
+        return InMemorySpanExporter()
+    if name == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("opentelemetry-exporter-otlp não está instalado; spans não serão exportados")
+            return None
+        return OTLPSpanExporter()
+    return None
+
+
+def create_tracer_provider(exporter: Optional[SpanExporter] = None) -> TracerProvider:
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(TRACING_SAMPLE_RATIO))
+    )
+    if exporter is not None:
+        # Console e memória recebem cada span na hora; arquivo e OTLP em lotes, fora do caminho do pedido
+        immediate = isinstance(exporter, (ConsoleSpanExporter, InMemorySpanExporter))
+        provider.add_span_processor(SimpleSpanProcessor(exporter) if immediate else BatchSpanProcessor(exporter))
+        logger.info(f"Tracing habilitado com o exportador {type(exporter).__name__}")
+    return provider
+
+
+exporter = create_exporter()
+tracer_provider = create_tracer_provider(exporter)
+tracer = tracer_provider.get_tracer("crewai")
+
+
+def current_span() -> trace.Span:
+    """Span em andamento no contexto atual (um span inválido, sem efeito, fora de um trace)"""
+    return trace.get_current_span()
+
+
+class TracingMiddleware:
+    """
+    Middleware ASGI que abre um span SERVER por pedido HTTP, continuando o
+    trace recebido no header traceparent. Fica aberto até o último byte da
+    resposta, então cobre também as respostas em streaming
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        with tracer.start_as_current_span(
+            f"{scope['method']} {scope['path']}", context=extract(headers), kind=SpanKind.SERVER,
+            attributes={"http.request.method": scope["method"], "url.path": scope["path"]}
+        ) as span:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.response.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_status(StatusCode.ERROR)
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                # O nome final usa o template da rota (/jobs/{job_id}), não o caminho com o id
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    span.update_name(f"{scope['method']} {route}")
+                    span.set_attribute("http.route", route)
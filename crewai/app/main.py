@@ -1,11 +1,32 @@
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, Header, HTTPException, Query, Request, status
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
+import contextvars
+import json
 import logging
+import os
+import threading
+import time
 import traceback
 
-from app.core.crewai_generator import run_project_pipeline
-from app.service.exa_search import buscar_com_exa
+from app.core.admission import AdmissionRejected, admission
+from app.core.cancellation import CancelToken, GenerationCancelled, run_cancellable, use_token
+from app.core.crewai_generator import arun_project_pipeline, run_project_pipeline, stream_project_pipeline
+from app.core.deadline import DEADLINE_HEADER, Deadline, parse_deadline, use_deadline
+from app.core.agents.prompt_compaction import compaction_stats
+from app.core.litellm_adapter import llm_adapter
+from app.core.metrics import render_metrics
+from app.core.model_router import model_router
+from app.core.result_cache import cache_key, create_result_cache, is_cacheable
+from app.core.semantic_cache import build_seed_description, create_semantic_cache
+from app.core.single_flight import Flight, SingleFlight
+from app.core.tracing import TracingMiddleware, tracer_provider
+from app.service.exa_passages import estatisticas_trechos
+from app.service.exa_search import BuscaExa, cliente_exa
+from app.service.job_queue import JobQueue, create_job_backend
 
 # Configurar logging
 logging.basicConfig(
@@ -15,6 +36,18 @@ logging.basicConfig(
 logger = logging.getLogger("crewai_api")
 
 app = FastAPI(title="Gerador de Projetos com CrewAI")
+# Cada pedido vira um span que continua o trace do backend (header traceparent)
+app.add_middleware(TracingMiddleware)
+
+# Status usado (como no nginx) quando o cliente fecha a conexão antes da resposta
+STATUS_CLIENTE_DESCONECTADO = 499
+# Intervalo com que os endpoints verificam se o cliente ainda está conectado
+INTERVALO_DESCONEXAO = 1.0
+# Jobs não têm um chamador esperando; o prazo serve só para não prender o worker
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "1800"))
+# Com o pipeline assíncrono, /gerar-projeto espera o Ollama no event loop em vez
+# de ocupar uma thread por pedido
+PIPELINE_ASSINCRONO = os.getenv("ASYNC_PIPELINE", "true").lower() not in ("0", "false", "no")
 
 
 class ProjetoRequest(BaseModel):
@@ -22,6 +55,249 @@ class ProjetoRequest(BaseModel):
     tecnologias: str
     descricao: str
     usar_exa: Optional[bool] = False
+    # Ignora o cache de resultados (não lê nem grava)
+    ignorar_cache: Optional[bool] = False
+    # Regenera o resultado e substitui a entrada em cache
+    atualizar_cache: Optional[bool] = False
+
+
+result_cache = create_result_cache()
+semantic_cache = create_semantic_cache()
+# Gerações em andamento, para que pedidos idênticos simultâneos compartilhem a execução
+voos = SingleFlight("resultado")
+voos_stream = SingleFlight("stream")
+
+
+def chave_do_pedido(req: ProjetoRequest) -> str:
+    return cache_key(req.areas, req.tecnologias, req.descricao, req.usar_exa, model_router.signature())
+
+
+def consultar_cache(req: ProjetoRequest) -> Optional[dict]:
+    """Devolve o resultado em cache para o pedido, respeitando as flags de bypass/refresh"""
+    if not result_cache:
+        return None
+    if req.ignorar_cache:
+        result_cache.record("bypass")
+        return None
+    if req.atualizar_cache:
+        result_cache.record("refresh")
+        return None
+    return result_cache.get(chave_do_pedido(req))
+
+
+def consultar_cache_semantico(req: ProjetoRequest) -> Optional[dict]:
+    """Procura um plano de um pedido semelhante (hit direto ou semente para o prompt)"""
+    if not semantic_cache or req.ignorar_cache or req.atualizar_cache:
+        return None
+    encontrado = semantic_cache.lookup(req.areas, req.tecnologias, req.descricao, model_router.signature())
+    if encontrado:
+        logger.info(f"Cache semântico: {encontrado['modo']} com similaridade {encontrado['similaridade']:.2f}")
+    return encontrado
+
+
+def resultado_semelhante(req: ProjetoRequest, semelhante: dict) -> dict:
+    """Plano do hit semântico com as áreas do pedido atual (o escopo é o mesmo, a grafia pode mudar)"""
+    return {**semelhante["resultado"], "areas": req.areas}
+
+
+def guardar_no_cache(req: ProjetoRequest, resultado: dict):
+    if req.ignorar_cache or not is_cacheable(resultado):
+        return
+    if result_cache:
+        result_cache.set(chave_do_pedido(req), resultado)
+    if semantic_cache:
+        semantic_cache.add(req.areas, req.tecnologias, req.descricao, model_router.signature(), resultado)
+
+
+def iniciar_busca_exa(req: ProjetoRequest) -> Optional[BuscaExa]:
+    """
+    Dispara a busca na EXA quando solicitada. As consultas correm em paralelo
+    aos especialistas e o gerente usa o que tiver ficado pronto; erros e
+    lentidão da EXA não atrasam a geração
+    """
+    return cliente_exa.iniciar(req.descricao, req.areas) if req.usar_exa else None
+
+
+def ainiciar_busca_exa(req: ProjetoRequest) -> Optional[BuscaExa]:
+    """Versão de iniciar_busca_exa para o pipeline assíncrono"""
+    return cliente_exa.ainiciar(req.descricao, req.areas) if req.usar_exa else None
+
+
+def montar_descricao(req: ProjetoRequest, semente: Optional[dict] = None) -> str:
+    """Acrescenta à descrição, se houver, o plano semelhante encontrado no cache semântico"""
+    descricao_final = req.descricao
+    if semente:
+        descricao_final = build_seed_description(descricao_final, semente["resultado"])
+    return descricao_final
+
+
+def gerar_resultado(req: ProjetoRequest, cancel_token: Optional[CancelToken] = None,
+                    deadline: Optional[Deadline] = None, fila_limitada: bool = True) -> dict:
+    """
+    Executa a busca na EXA (se pedida) e o pipeline completo de geração,
+    passando antes pelo cache de resultados. Cancelar o token aborta as
+    chamadas ao LLM em curso e lança GenerationCancelled; o prazo limita o
+    tempo de cada etapa. Fora do cache a geração espera uma vaga no controle
+    de admissão (sem limite de fila para os jobs, com `fila_limitada` falso)
+    """
+    em_cache = consultar_cache(req)
+    if em_cache is not None:
+        logger.info("Resultado encontrado no cache")
+        return em_cache
+
+    semelhante = consultar_cache_semantico(req)
+    if semelhante and semelhante["modo"] == "hit":
+        return resultado_semelhante(req, semelhante)
+
+    descricao_final = montar_descricao(req, semelhante)
+    with admission.slot(deadline, cancel_token, bounded=fila_limitada):
+        busca = iniciar_busca_exa(req)
+        logger.info("Iniciando pipeline de geração do projeto...")
+        try:
+            with use_token(cancel_token), use_deadline(deadline):
+                resultado = run_project_pipeline(
+                    area_selection=req.areas,
+                    tech_stack=req.tecnologias,
+                    description=descricao_final,
+                    search=busca
+                )
+        finally:
+            if busca:
+                busca.cancelar()
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+    guardar_no_cache(req, resultado)
+    return resultado
+
+
+async def agerar_resultado(req: ProjetoRequest, deadline: Optional[Deadline] = None) -> dict:
+    """
+    Versão assíncrona de gerar_resultado: EXA e Ollama são aguardados no
+    event loop. O cancelamento chega como cancelamento da task
+    """
+    em_cache = consultar_cache(req)
+    if em_cache is not None:
+        logger.info("Resultado encontrado no cache")
+        return em_cache
+
+    semelhante = consultar_cache_semantico(req)
+    if semelhante and semelhante["modo"] == "hit":
+        return resultado_semelhante(req, semelhante)
+
+    descricao_final = montar_descricao(req, semelhante)
+    async with admission.aslot(deadline):
+        busca = ainiciar_busca_exa(req)
+        logger.info("Iniciando pipeline assíncrono de geração do projeto...")
+        try:
+            with use_deadline(deadline):
+                resultado = await arun_project_pipeline(
+                    area_selection=req.areas,
+                    tech_stack=req.tecnologias,
+                    description=descricao_final,
+                    search=busca
+                )
+        finally:
+            if busca:
+                busca.cancelar()
+    guardar_no_cache(req, resultado)
+    return resultado
+
+
+def _concluir_voo(voo: Flight, tarefa: asyncio.Task):
+    if tarefa.cancelled():
+        voos.finish(voo, error=GenerationCancelled(voo.token.reason or "cancelado"))
+    else:
+        voos.finish(voo, tarefa.result() if tarefa.exception() is None else None, tarefa.exception())
+
+
+async def gerar_coalescido(req: ProjetoRequest, cancel_token: CancelToken, deadline: Deadline) -> dict:
+    """
+    Gera o resultado do pedido ou, se um pedido idêntico já está em
+    andamento, espera pelo resultado dele. A geração compartilhada só é
+    cancelada quando nenhum dos pedidos está mais esperando
+    """
+    voo, lider = voos.join(chave_do_pedido(req), deadline)
+    if lider:
+        if PIPELINE_ASSINCRONO:
+            execucao = run_cancellable(agerar_resultado(req, voo.deadline), voo.token)
+        else:
+            execucao = run_in_threadpool(gerar_resultado, req, voo.token, voo.deadline)
+        asyncio.create_task(execucao).add_done_callback(lambda tarefa: _concluir_voo(voo, tarefa))
+    try:
+        return await run_cancellable(voo.wait(), cancel_token)
+    finally:
+        voos.leave(voo)
+
+
+def executar_job(payload: dict) -> dict:
+    """Handler dos workers da fila de jobs"""
+    req = ProjetoRequest(**payload)
+    voo, lider = voos.join(chave_do_pedido(req), Deadline(JOB_TIMEOUT))
+    try:
+        if lider:
+            deadline = voo.deadline.arm(voo.token)
+            try:
+                # Jobs já passaram pela fila própria; esperam a vaga sem serem recusados
+                resultado = gerar_resultado(req, voo.token, deadline, fila_limitada=False)
+                voos.finish(voo, resultado)
+            except BaseException as e:
+                voos.finish(voo, error=e)
+                raise
+            finally:
+                deadline.disarm()
+        else:
+            resultado = voo.future.result(timeout=JOB_TIMEOUT)
+    finally:
+        voos.leave(voo)
+    if isinstance(resultado, dict) and "error" in resultado:
+        raise RuntimeError(resultado.get("erro_detalhes", resultado["error"]))
+    return resultado
+
+
+job_queue = JobQueue(
+    backend=create_job_backend(),
+    handler=executar_job,
+    workers=int(os.getenv("JOB_WORKERS", "1"))
+)
+
+
+@app.on_event("startup")
+def iniciar_fila_de_jobs():
+    job_queue.start()
+
+
+def preaquecer():
+    """Carrega os imports pesados e espera o Ollama sem bloquear o boot do servidor"""
+    inicio = time.time()
+    try:
+        # O LiteLLM primeiro: uma falha no import do CrewAI não deixa o adaptador frio
+        llm_adapter.litellm
+        import crewai  # noqa: F401
+    except Exception as e:
+        logger.error(f"Erro ao carregar dependências do pipeline: {str(e)}")
+    logger.info(f"Dependências do pipeline carregadas em {time.time() - inicio:.2f} segundos")
+    llm_adapter.wait_until_ready()
+
+
+@app.on_event("startup")
+def iniciar_preaquecimento():
+    threading.Thread(target=preaquecer, name="preaquecimento", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def parar_fila_de_jobs():
+    job_queue.stop()
+
+
+@app.on_event("shutdown")
+async def fechar_cliente_exa():
+    await cliente_exa.fechar()
+
+
+@app.on_event("shutdown")
+def encerrar_tracing():
+    # Envia os spans ainda no lote antes de o processo terminar
+    tracer_provider.shutdown()
 
 
 @app.get("/")
@@ -32,7 +308,7 @@ def read_root():
 def health_check():
     # Certifica que o serviço está realmente saudável
     try:
-        # Aqui poderia verificar conexão com Ollama se necessário
+        # Liveness apenas; a conexão com o Ollama é verificada em /ready
         return {"status": "healthy", "service": "crewai"}
     except Exception as e:
         logger.error(f"Erro no health check: {str(e)}")
@@ -41,28 +317,95 @@ def health_check():
             detail=f"Serviço não está saudável: {str(e)}"
         )
 
+@app.get("/ready")
+def readiness_check():
+    """
+    Prontidão para gerar projetos: o Ollama precisa estar respondendo.
+    Diferente de /health, que só indica que o processo está de pé
+    """
+    if llm_adapter.is_ready():
+        return {"status": "ready", "service": "crewai", "modelos": model_router.snapshot()["politica"]}
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Ollama ainda não está disponível"
+    )
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Estatísticas do cache de resultados (hits, misses, evictions)"""
+    stats = {"habilitado": bool(result_cache)}
+    if result_cache:
+        stats.update(result_cache.snapshot())
+    stats["semantico"] = semantic_cache.snapshot() if semantic_cache else {"habilitado": False}
+    return stats
+
+@app.get("/coalescencia/stats")
+def coalescencia_stats():
+    """Gerações em andamento, clientes esperando e taxa de pedidos coalescidos"""
+    return {"resultado": voos.snapshot(), "stream": voos_stream.snapshot()}
+
+@app.get("/admissao/stats")
+def admissao_stats():
+    """Vagas de geração ocupadas, fila de espera, tempos de espera e pedidos recusados por motivo"""
+    return admission.snapshot()
+
+@app.get("/compactacao/stats")
+def compactacao_stats():
+    """Tokens do prompt do gerente antes e depois da compactação (médias e pedidos recentes)"""
+    return compaction_stats.snapshot()
+
+@app.get("/exa/stats")
+def exa_stats():
+    """
+    Consultas à EXA, falhas/timeouts, quantas ficaram prontas a tempo para o
+    gerente, cache e tokens dos resultados antes e depois da seleção de trechos
+    """
+    return {**cliente_exa.snapshot(), "trechos": estatisticas_trechos.snapshot()}
+
+@app.get("/modelos/stats")
+def modelos_stats():
+    """Política de roteamento e latência/tokens por segundo de cada rota (etapa:modelo)"""
+    return model_router.snapshot()
+
+@app.get("/metrics")
+def metrics():
+    """
+    Métricas no formato do Prometheus: duração de cada etapa (EXA,
+    especialistas, gerente, extração de seções, pipeline), novas tentativas,
+    timeouts, fallbacks, tokens e tokens/s por modelo e chamadas em andamento
+    """
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
+def resposta_recusada(rejeicao: AdmissionRejected) -> JSONResponse:
+    """429 (fila cheia) ou 503 (espera longa demais) com o Retry-After calculado"""
+    return JSONResponse(
+        status_code=rejeicao.status_code,
+        content={"detail": str(rejeicao), "motivo": rejeicao.reason, "retry_after": rejeicao.retry_after},
+        headers={"Retry-After": str(rejeicao.retry_after)}
+    )
+
+async def vigiar_desconexao(request: Request, cancel_token: CancelToken):
+    """Cancela o token assim que o cliente fecha a conexão"""
+    while not cancel_token.cancelled:
+        if await request.is_disconnected():
+            logger.warning("Cliente desconectado, cancelando a geração")
+            cancel_token.cancel("cliente desconectado")
+            return
+        await asyncio.sleep(INTERVALO_DESCONEXAO)
+
+
 @app.post("/gerar-projeto")
-def gerar_projeto(req: ProjetoRequest):
+async def gerar_projeto(req: ProjetoRequest, request: Request,
+                        prazo: Optional[str] = Header(None, alias=DEADLINE_HEADER)):
+    cancel_token = CancelToken()
+    deadline = parse_deadline(prazo).arm(cancel_token)
+    vigia = asyncio.create_task(vigiar_desconexao(request, cancel_token))
     try:
-        logger.info(f"Recebido pedido para gerar projeto com áreas: {req.areas}, tecnologias: {req.tecnologias}")
+        logger.info(f"Recebido pedido para gerar projeto com áreas: {req.areas}, tecnologias: {req.tecnologias} "
+                    f"(prazo de {deadline.budget:.0f}s)")
         
-        descricao_final = req.descricao
-
-        if req.usar_exa:
-            logger.info("🔍 Buscando insights com EXA.ai...")
-            try:
-                resultados_exa = buscar_com_exa(req.descricao)
-                descricao_final += "\n\nResultados da EXA:\n" + "\n".join(resultados_exa)
-            except Exception as e:
-                logger.warning(f"Erro ao buscar com EXA: {str(e)}")
-                # Continua mesmo com erro na EXA
-
-        logger.info("Iniciando pipeline de geração do projeto...")
-        resultado = run_project_pipeline(
-            area_selection=req.areas,
-            tech_stack=req.tecnologias,
-            description=descricao_final
-        )
+        resultado = await gerar_coalescido(req, cancel_token, deadline)
         
         # Verifica se ocorreu um erro na geração
         if isinstance(resultado, dict) and "error" in resultado:
@@ -73,10 +416,17 @@ def gerar_projeto(req: ProjetoRequest):
             )
             
         logger.info("Projeto gerado com sucesso!")
-        return {"resultado": resultado}
+        return {"resultado": resultado, "modelo": model_router.signature()}
     except HTTPException:
         # Re-lança HTTPExceptions
         raise
+    except AdmissionRejected as e:
+        return resposta_recusada(e)
+    except GenerationCancelled as e:
+        logger.warning(f"Geração do projeto cancelada: {str(e)}")
+        if deadline.expired:
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Prazo do pedido esgotado")
+        return JSONResponse(status_code=STATUS_CLIENTE_DESCONECTADO, content={"detail": "Geração cancelada"})
     except Exception as e:
         error_traceback = traceback.format_exc()
         error_message = f"Erro na API durante geração do projeto: {str(e)}"
@@ -87,3 +437,127 @@ def gerar_projeto(req: ProjetoRequest):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
+    finally:
+        vigia.cancel()
+        deadline.disarm()
+
+@app.post("/gerar-projeto/stream")
+def gerar_projeto_stream(req: ProjetoRequest, prazo: Optional[str] = Header(None, alias=DEADLINE_HEADER)):
+    """
+    Variante em streaming de /gerar-projeto: devolve eventos em NDJSON
+    (uma linha JSON por evento) à medida que o pipeline avança. Pedidos
+    idênticos simultâneos acompanham o mesmo stream; a geração só é cancelada
+    quando todos os clientes desconectam
+    """
+    logger.info(f"Recebido pedido de geração em streaming com áreas: {req.areas}, tecnologias: {req.tecnologias}")
+    # Consultado uma única vez por pedido: decide a recusa abaixo e é o resultado entregue pelo stream
+    em_cache = consultar_cache(req)
+    # Com a fila cheia a recusa sai antes do stream começar, enquanto ainda dá para responder 429;
+    # pedidos em cache ou idênticos a um stream em andamento continuam sendo atendidos
+    if em_cache is None and admission.full() and not voos_stream.active(chave_do_pedido(req)):
+        return resposta_recusada(admission.reject_full())
+    cancel_token = CancelToken()
+    deadline = parse_deadline(prazo)
+
+    def eventos(voo):
+        # O primeiro evento sai antes de qualquer chamada externa
+        yield {"tipo": "pipeline_iniciado"}
+        if em_cache is not None:
+            yield {"tipo": "resultado", "resultado": em_cache, "cache": True}
+            return
+        semelhante = consultar_cache_semantico(req)
+        if semelhante and semelhante["modo"] == "hit":
+            yield {"tipo": "resultado", "resultado": resultado_semelhante(req, semelhante), "cache": True}
+            return
+        descricao_final = montar_descricao(req, semelhante)
+        with admission.slot(voo.deadline, voo.token):
+            busca = iniciar_busca_exa(req)
+            try:
+                for evento in stream_project_pipeline(
+                    area_selection=req.areas,
+                    tech_stack=req.tecnologias,
+                    description=descricao_final,
+                    cancel_token=voo.token,
+                    search=busca
+                ):
+                    if evento["tipo"] == "resultado" and not voo.token.cancelled:
+                        guardar_no_cache(req, evento["resultado"])
+                    yield evento
+            finally:
+                if busca:
+                    busca.cancelar()
+
+    def produzir(voo):
+        """Roda o pipeline uma única vez e publica os eventos para todos os clientes"""
+        try:
+            with use_deadline(voo.deadline):
+                for evento in eventos(voo):
+                    voo.publish(evento)
+        except AdmissionRejected as e:
+            voo.publish({"tipo": "erro", "detalhe": str(e), "status": e.status_code, "retry_after": e.retry_after})
+        except Exception as e:
+            logger.error(f"Erro na geração em streaming: {str(e)}")
+            voo.publish({"tipo": "erro", "detalhe": str(e)})
+        finally:
+            voos_stream.finish(voo)
+
+    def linhas(voo):
+        try:
+            for evento in voo.subscribe(cancel_token):
+                yield json.dumps(evento, ensure_ascii=False) + "\n"
+        except GenerationCancelled as e:
+            yield json.dumps({"tipo": "erro", "detalhe": f"Geração cancelada: {str(e)}"}, ensure_ascii=False) + "\n"
+
+    async def eventos_com_cancelamento():
+        # O Starlette encerra este gerador quando o cliente desconecta; o
+        # finally libera o cliente e, se era o último, cancela a geração
+        voo, lider = voos_stream.join(chave_do_pedido(req), deadline)
+        if lider:
+            # A thread leva o contexto do pedido para os spans do pipeline ficarem no mesmo trace
+            threading.Thread(
+                target=contextvars.copy_context().run, args=(produzir, voo), name="stream-pipeline", daemon=True
+            ).start()
+        deadline.arm(cancel_token)
+        try:
+            async for linha in iterate_in_threadpool(linhas(voo)):
+                yield linha
+        finally:
+            deadline.disarm()
+            if not cancel_token.cancelled:
+                cancel_token.cancel("cliente desconectado")
+            voos_stream.leave(voo)
+
+    return StreamingResponse(
+        eventos_com_cancelamento(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+def criar_job(req: ProjetoRequest):
+    """Enfileira a geração do projeto e devolve o id do job imediatamente"""
+    job = job_queue.submit(req.model_dump())
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "pendentes": job_queue.pending_count()
+    }
+
+@app.get("/jobs/{job_id}")
+async def consultar_job(job_id: str, espera: float = Query(0, ge=0, le=60)):
+    """
+    Consulta o estado de um job. Com `espera` > 0 faz long-poll até o job
+    terminar ou o tempo (em segundos) acabar, sem ocupar o threadpool
+    """
+    job = await job_queue.wait_async(job_id, espera)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job não encontrado")
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "resultado": job.get("resultado"),
+        "erro": job.get("erro"),
+        "criado_em": job.get("criado_em"),
+        "iniciado_em": job.get("iniciado_em"),
+        "concluido_em": job.get("concluido_em")
+    }
@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Optional
+
+from app.core.result_cache import normalize_text
+
+logger = logging.getLogger("crewai_exa_cache")
+
+# Entradas mais novas que isso são devolvidas sem consultar a EXA
+EXA_CACHE_TTL = float(os.getenv("EXA_CACHE_TTL", "86400"))
+# Depois do TTL, a entrada ainda é devolvida por esse tempo enquanto é revalidada em segundo plano
+EXA_CACHE_STALE = float(os.getenv("EXA_CACHE_STALE", "604800"))
+
+FRESH = "fresco"
+STALE = "velho"
+
+
+def exa_cache_key(query: str, num_results: int) -> str:
+    return f"{num_results}:{normalize_text(query)}"
+
+
+class ExaCache:
+    """
+    Cache em SQLite das respostas da EXA, por consulta normalizada e número
+    de resultados. Entradas vencidas continuam servindo por EXA_CACHE_STALE
+    segundos (stale-while-revalidate); acima de max_entries as menos usadas
+    recentemente são removidas
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: float = EXA_CACHE_TTL,
+                 stale: float = EXA_CACHE_STALE):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale = stale
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "hits_velhos": 0,
+            "misses": 0,
+            "gravacoes": 0,
+            "evictions": 0,
+            "expiracoes": 0,
+            "erros": 0
+        }
+        with closing(self._connect()) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS exa_resultados (
+                    chave TEXT PRIMARY KEY,
+                    valor TEXT NOT NULL,
+                    gravado_em REAL NOT NULL,
+                    ultimo_acesso REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_exa_acesso ON exa_resultados (ultimo_acesso)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def _record(self, event: str, count: int = 1):
+        with self._lock:
+            self.stats[event] += count
+
+    def get(self, query: str, num_results: int) -> tuple[Optional[list], Optional[str]]:
+        """Devolve (resultados, FRESH ou STALE), ou (None, None) se não houver entrada utilizável"""
+        key = exa_cache_key(query, num_results)
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute("SELECT valor, gravado_em FROM exa_resultados WHERE chave = ?", (key,)).fetchone()
+                if row and now - row[1] > self.ttl + self.stale:
+                    conn.execute("DELETE FROM exa_resultados WHERE chave = ?", (key,))
+                    self._record("expiracoes")
+                    row = None
+                if row:
+                    conn.execute("UPDATE exa_resultados SET ultimo_acesso = ? WHERE chave = ?", (now, key))
+        except Exception as e:
+            logger.warning(f"Erro ao ler cache da EXA: {str(e)}")
+            self._record("erros")
+            return None, None
+
+        if not row:
+            self._record("misses")
+            return None, None
+        if now - row[1] <= self.ttl:
+            self._record("hits")
+            return json.loads(row[0]), FRESH
+        self._record("hits_velhos")
+        return json.loads(row[0]), STALE
+
+    def set(self, query: str, num_results: int, results: list):
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO exa_resultados (chave, valor, gravado_em, ultimo_acesso) VALUES (?, ?, ?, ?)",
+                    (exa_cache_key(query, num_results), json.dumps(results, ensure_ascii=False), now, now)
+                )
+                excesso = conn.execute("SELECT COUNT(*) FROM exa_resultados").fetchone()[0] - self.max_entries
+                if excesso > 0:
+                    conn.execute(
+                        "DELETE FROM exa_resultados WHERE chave IN "
+                        "(SELECT chave FROM exa_resultados ORDER BY ultimo_acesso LIMIT ?)",
+                        (excesso,)
+                    )
+                    self._record("evictions", excesso)
+        except Exception as e:
+            logger.warning(f"Erro ao gravar cache da EXA: {str(e)}")
+            self._record("erros")
+            return
+        self._record("gravacoes")
+
+    def size(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM exa_resultados").fetchone()[0]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        hits = stats["hits"] + stats["hits_velhos"]
+        consultas = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / consultas, 4) if consultas else 0.0
+        stats["max_entradas"] = self.max_entries
+        stats["ttl_segundos"] = self.ttl
+        stats["velho_segundos"] = self.stale
+        try:
+            stats["entradas"] = self.size()
+        except Exception:
+            stats["entradas"] = None
+        return stats
+
+
+def create_exa_cache() -> Optional[ExaCache]:
+    """Cria o cache a partir das variáveis EXA_CACHE_*; devolve None se desativado"""
+    if os.getenv("EXA_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    path = os.getenv("EXA_CACHE_PATH", "exa_cache.sqlite3")
+    try:
+        return ExaCache(path, max_entries=int(os.getenv("EXA_CACHE_MAX_ENTRIES", "10000")))
+    except Exception as e:
+        logger.warning(f"Cache da EXA desativado, não foi possível abrir {path}: {str(e)}")
+        return None
@@ -0,0 +1,152 @@
+import logging
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from app.core.litellm_adapter import llm_adapter
+from app.core.semantic_cache import tokenize
+
+logger = logging.getLogger("crewai_exa_passages")
+
+# Seleciona os trechos mais relevantes da EXA em vez de anexar as páginas inteiras
+EXA_PASSAGE_SELECTION = os.getenv("EXA_PASSAGE_SELECTION", "true").lower() == "true"
+# Tokens que os trechos da EXA podem ocupar no prompt
+EXA_PASSAGE_MAX_TOKENS = int(os.getenv("EXA_PASSAGE_MAX_TOKENS", "800"))
+# Tamanho aproximado de cada trecho, em palavras
+EXA_PASSAGE_WORDS = int(os.getenv("EXA_PASSAGE_WORDS", "120"))
+
+# Parâmetros usuais do BM25
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Peso dos termos das tecnologias na consulta, como no cache semântico
+TECH_WEIGHT = 1.5
+
+_PARAGRAPH = re.compile(r"\n\s*\n")
+
+
+def dividir_trechos(textos: list[str], palavras: int = EXA_PASSAGE_WORDS) -> list[str]:
+    """
+    Divide os textos em trechos de cerca de `palavras` palavras, juntando
+    parágrafos curtos e quebrando os longos; um trecho nunca mistura textos
+    """
+    trechos = []
+    for texto in textos:
+        atual = []
+        for paragrafo in _PARAGRAPH.split(texto or ""):
+            termos = paragrafo.split()
+            while len(termos) > palavras * 2:
+                trechos.append(" ".join(termos[:palavras]))
+                termos = termos[palavras:]
+            if atual and len(atual) + len(termos) > palavras:
+                trechos.append(" ".join(atual))
+                atual = []
+            atual.extend(termos)
+        if atual:
+            trechos.append(" ".join(atual))
+    return trechos
+
+
+def pontuar_bm25(trechos: list[str], descricao: str, tecnologias: str = "") -> np.ndarray:
+    """Pontuação BM25 de cada trecho para a consulta (descrição + tecnologias), calculada em matriz"""
+    pesos = {}
+    for termo in tokenize(descricao):
+        pesos[termo] = 1.0
+    for termo in tokenize(tecnologias.replace(",", " ")):
+        pesos[termo] = TECH_WEIGHT
+    if not trechos or not pesos:
+        return np.zeros(len(trechos))
+
+    vocabulario = {termo: i for i, termo in enumerate(pesos)}
+    linhas, colunas = [], []
+    tamanhos = np.empty(len(trechos))
+    for i, trecho in enumerate(trechos):
+        termos = tokenize(trecho)
+        tamanhos[i] = len(termos)
+        ids = [vocabulario[t] for t in termos if t in vocabulario]
+        linhas.extend([i] * len(ids))
+        colunas.extend(ids)
+
+    frequencias = np.zeros((len(trechos), len(vocabulario)))
+    np.add.at(frequencias, (np.array(linhas, dtype=np.intp), np.array(colunas, dtype=np.intp)), 1)
+    n_documentos = (frequencias > 0).sum(axis=0)
+    idf = np.log1p((len(trechos) - n_documentos + 0.5) / (n_documentos + 0.5))
+    normalizacao = BM25_K1 * (1 - BM25_B + BM25_B * tamanhos / max(tamanhos.mean(), 1.0))
+    saturacao = frequencias * (BM25_K1 + 1) / (frequencias + normalizacao[:, None])
+    return saturacao @ (idf * np.array(list(pesos.values())))
+
+
+def selecionar_trechos(textos: list[str], descricao: str, tecnologias: str = "",
+                       max_tokens: int = EXA_PASSAGE_MAX_TOKENS) -> list[str]:
+    """
+    Os trechos dos resultados da EXA mais relevantes para o projeto, do mais
+    ao menos relevante, até max_tokens. Trechos sem nenhum termo da consulta
+    só entram se nenhum outro tiver
+    """
+    if not textos:
+        return []
+    inicio = time.perf_counter()
+    trechos = dividir_trechos(textos)
+    pontuacoes = pontuar_bm25(trechos, descricao, tecnologias)
+    ordem = [int(i) for i in np.argsort(-pontuacoes, kind="stable") if pontuacoes[i] > 0]
+    if not ordem:
+        ordem = list(range(len(trechos)))
+
+    selecionados = []
+    vistos = set()
+    usados = 0
+    for i in ordem:
+        if trechos[i] in vistos:
+            continue
+        tokens = llm_adapter.count_tokens(trechos[i])
+        if usados + tokens > max_tokens:
+            continue
+        vistos.add(trechos[i])
+        selecionados.append(trechos[i])
+        usados += tokens
+
+    antes = llm_adapter.count_tokens("\n".join(textos))
+    estatisticas_trechos.record(antes, usados, len(trechos), len(selecionados), time.perf_counter() - inicio)
+    logger.info(f"Trechos da EXA: {len(selecionados)}/{len(trechos)} selecionados, {antes} -> {usados} tokens")
+    return selecionados
+
+
+class EstatisticasTrechos:
+    """Tokens dos resultados da EXA antes e depois da seleção de trechos"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.selections = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.passages = 0
+        self.selected = 0
+        self.total_time = 0.0
+
+    def record(self, tokens_before: int, tokens_after: int, passages: int, selected: int, elapsed: float):
+        with self._lock:
+            self.selections += 1
+            self.tokens_before += tokens_before
+            self.tokens_after += tokens_after
+            self.passages += passages
+            self.selected += selected
+            self.total_time += elapsed
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            n = self.selections
+            return {
+                "habilitado": EXA_PASSAGE_SELECTION,
+                "limite_tokens": EXA_PASSAGE_MAX_TOKENS,
+                "selecoes": n,
+                "tokens_antes_medio": round(self.tokens_before / n) if n else 0,
+                "tokens_depois_medio": round(self.tokens_after / n) if n else 0,
+                "trechos_medio": round(self.passages / n, 1) if n else 0,
+                "selecionados_medio": round(self.selected / n, 1) if n else 0,
+                "tempo_medio_ms": round(self.total_time / n * 1000, 2) if n else 0.0
+            }
+
+
+estatisticas_trechos = EstatisticasTrechos()
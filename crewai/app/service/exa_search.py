@@ -1,10 +1,39 @@
-import requests
+import asyncio
+import contextvars
+import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from opentelemetry.trace import StatusCode
+
+from app.core import metrics
+from app.core.tracing import tracer
+from app.core.result_cache import normalize_text
+from app.service.exa_cache import FRESH, ExaCache, create_exa_cache
+
+logger = logging.getLogger("crewai_exa")
 
 EXA_API_KEY = os.getenv("EXA_API_KEY")
-EXA_API_URL = "https://api.exa.ai/search"
+EXA_API_URL = os.getenv("EXA_API_URL", "https://api.exa.ai/search")
+# Tempo máximo de cada consulta; a busca roda em paralelo aos especialistas e
+# o que não terminar a tempo é descartado
+EXA_TIMEOUT = float(os.getenv("EXA_TIMEOUT", "5"))
+# Consultas disparadas em paralelo por pedido (a descrição e uma por área)
+EXA_MAX_QUERIES = int(os.getenv("EXA_MAX_QUERIES", "4"))
+# Resultados pedidos a cada consulta
+EXA_NUM_RESULTS = int(os.getenv("EXA_NUM_RESULTS", "3"))
+# Como os resultados entram na descrição do projeto (ver anexar_resultados)
+EXA_SECTION_TITLE = "Resultados da EXA:"
+EXA_RESULT_SEPARATOR = "\n---\n"
 
-def buscar_com_exa(query: str, num_results: int = 5) -> list[str]:
+def _montar_requisicao(query: str, num_results: int):
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {EXA_API_KEY}"
@@ -14,9 +43,271 @@ def buscar_com_exa(query: str, num_results: int = 5) -> list[str]:
         "query": query,
         "numResults": num_results
     }
+    return headers, payload
 
-    response = requests.post(EXA_API_URL, json=payload, headers=headers)
-    response.raise_for_status()
-
-    results = response.json().get("results", [])
+def _textos(results: list[dict]) -> list[str]:
     return [r.get("text", "") for r in results]
+
+def montar_consultas(descricao: str, areas: list[str]) -> list[str]:
+    """A descrição do projeto e uma consulta por área, até EXA_MAX_QUERIES"""
+    consultas = [descricao] + [f"{area}: {descricao}" for area in areas]
+    return consultas[:max(EXA_MAX_QUERIES, 1)]
+
+def anexar_resultados(descricao: str, resultados: list[str]) -> str:
+    """Acrescenta os resultados da EXA ao fim da descrição"""
+    if not resultados:
+        return descricao
+    return f"{descricao}\n\n{EXA_SECTION_TITLE}\n" + EXA_RESULT_SEPARATOR.join(resultados)
+
+
+class BuscaExa:
+    """
+    Consultas à EXA de um pedido, em andamento enquanto os especialistas
+    trabalham. Funciona com futures de thread e com tasks do asyncio: quem
+    consome os resultados pega só o que já terminou e cancela o resto
+    """
+
+    def __init__(self, cliente: "ClienteExa", futuros: list):
+        self.cliente = cliente
+        self.futuros = futuros
+        self._resultados = None
+
+    def concluida(self) -> bool:
+        return all(f.done() for f in self.futuros)
+
+    def resultados_prontos(self) -> list[str]:
+        """Resultados das consultas já concluídas, sem repetir textos; as demais são canceladas"""
+        if self._resultados is not None:
+            return self._resultados
+        vistos = set()
+        resultados = []
+        prontas = 0
+        for futuro in self.futuros:
+            if not futuro.done() or futuro.cancelled():
+                continue
+            if futuro.result():
+                prontas += 1
+            for resultado in futuro.result():
+                chave = resultado.get("url") or resultado.get("text", "")
+                if resultado.get("text") and chave not in vistos:
+                    vistos.add(chave)
+                    resultados.append(resultado["text"])
+        pendentes = sum(1 for futuro in self.futuros if not futuro.done())
+        self.cancelar()
+        self.cliente.registrar_uso(prontas, pendentes)
+        if pendentes:
+            logger.info(f"EXA: {prontas} consultas prontas, {pendentes} descartadas para não atrasar o pedido")
+        self._resultados = resultados
+        return resultados
+
+    def cancelar(self):
+        for futuro in self.futuros:
+            futuro.cancel()
+
+
+class ClienteExa:
+    """
+    Cliente da EXA com conexões keep-alive reaproveitadas entre pedidos
+    (uma sessão requests para o caminho síncrono e um httpx.AsyncClient para
+    o assíncrono) e timeout estrito. Falhas devolvem lista vazia: a EXA nunca
+    interrompe a geração. Com cache, consultas repetidas não saem para a
+    rede; entradas vencidas são devolvidas e revalidadas em segundo plano
+    """
+
+    def __init__(self, url: str = EXA_API_URL, timeout: float = EXA_TIMEOUT, max_queries: int = EXA_MAX_QUERIES,
+                 cache: ExaCache = None):
+        self.url = url
+        self.timeout = timeout
+        self.max_queries = max_queries
+        self.cache = cache
+        # Consultas sendo revalidadas, para não repetir a mesma em paralelo
+        self._revalidating = set()
+        self._lock = threading.Lock()
+        self._session = None
+        self._async_client = None
+        self._executor = ThreadPoolExecutor(max_workers=max(max_queries, 1) * 4, thread_name_prefix="exa")
+        self.queries = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.used = 0
+        self.discarded = 0
+        self.total_time = 0.0
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_queries * 4)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_queries * 4, max_keepalive_connections=self.max_queries * 4)
+            )
+        return self._async_client
+
+    def _span(self, query: str):
+        return tracer.start_span("exa.consulta", attributes={
+            "http.request.method": "POST", "url.full": self.url, "exa.query": query[:200]
+        })
+
+    def _registrar(self, inicio: float, span, erro: Exception = None):
+        duracao = time.perf_counter() - inicio
+        timeout = isinstance(erro, (requests.Timeout, httpx.TimeoutException))
+        span.set_attribute("crewai.timeout_hit", timeout)
+        if erro is not None:
+            span.record_exception(erro)
+            span.set_status(StatusCode.ERROR, str(erro))
+        span.end()
+        with self._lock:
+            self.queries += 1
+            self.total_time += duracao
+            if erro is not None:
+                self.failures += 1
+                self.timeouts += int(timeout)
+        metrics.stage_duration.labels(metrics.STAGE_EXA).observe(duracao)
+        if timeout:
+            metrics.timeouts.labels(metrics.STAGE_EXA).inc()
+        if erro is not None:
+            logger.warning(f"Erro ao buscar com EXA: {str(erro)}")
+
+    def registrar_uso(self, prontas: int, pendentes: int):
+        with self._lock:
+            self.used += prontas
+            self.discarded += pendentes
+
+    def _post(self, query: str, num_results: int) -> Optional[list[dict]]:
+        """Consulta a EXA pela sessão compartilhada; None se a consulta falhar"""
+        headers, payload = _montar_requisicao(query, num_results)
+        span = self._span(query)
+        inicio = time.perf_counter()
+        try:
+            response = self.session.post(self.url, json=payload, headers=headers, timeout=self.timeout)
+            response.raise_for_status()
+            results = response.json().get("results", [])
+        except Exception as e:
+            self._registrar(inicio, span, e)
+            return None
+        span.set_attribute("exa.resultados", len(results))
+        self._registrar(inicio, span)
+        if self.cache:
+            self.cache.set(query, num_results, results)
+        return results
+
+    async def _apost(self, query: str, num_results: int) -> Optional[list[dict]]:
+        """Versão assíncrona de _post"""
+        headers, payload = _montar_requisicao(query, num_results)
+        span = self._span(query)
+        inicio = time.perf_counter()
+        try:
+            response = await self.async_client.post(self.url, json=payload, headers=headers)
+            response.raise_for_status()
+            results = response.json().get("results", [])
+        except asyncio.CancelledError:
+            span.end()
+            raise
+        except Exception as e:
+            self._registrar(inicio, span, e)
+            return None
+        span.set_attribute("exa.resultados", len(results))
+        self._registrar(inicio, span)
+        if self.cache:
+            self.cache.set(query, num_results, results)
+        return results
+
+    def _from_cache(self, query: str, num_results: int) -> Optional[list[dict]]:
+        """Resultados em cache; se a entrada estiver vencida, agenda a revalidação"""
+        if not self.cache:
+            return None
+        results, freshness = self.cache.get(query, num_results)
+        if results is not None and freshness != FRESH:
+            self._revalidate(query, num_results)
+        return results
+
+    def _revalidate(self, query: str, num_results: int):
+        key = (normalize_text(query), num_results)
+        with self._lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def revalidate():
+            try:
+                self._post(query, num_results)
+            finally:
+                with self._lock:
+                    self._revalidating.discard(key)
+
+        self._executor.submit(revalidate)
+
+    def consultar(self, query: str, num_results: int = EXA_NUM_RESULTS) -> list[dict]:
+        """Uma consulta, pelo cache ou pela EXA; erros viram lista vazia"""
+        results = self._from_cache(query, num_results)
+        if results is None:
+            results = self._post(query, num_results)
+        return results or []
+
+    async def aconsultar(self, query: str, num_results: int = EXA_NUM_RESULTS) -> list[dict]:
+        """Versão assíncrona de consultar"""
+        results = self._from_cache(query, num_results)
+        if results is None:
+            results = await self._apost(query, num_results)
+        return results or []
+
+    def iniciar(self, descricao: str, areas: list[str]) -> BuscaExa:
+        """Dispara as consultas do pedido em paralelo e devolve sem esperar"""
+        logger.info("🔍 Buscando insights com EXA.ai em paralelo aos especialistas...")
+        consultas = montar_consultas(descricao, areas)
+        # Cada consulta leva uma cópia do contexto para o span dela ficar no trace do pedido
+        return BuscaExa(self, [
+            self._executor.submit(contextvars.copy_context().run, self.consultar, q) for q in consultas
+        ])
+
+    def ainiciar(self, descricao: str, areas: list[str]) -> BuscaExa:
+        """Versão de iniciar para o event loop: cada consulta vira uma task"""
+        logger.info("🔍 Buscando insights com EXA.ai em paralelo aos especialistas...")
+        consultas = montar_consultas(descricao, areas)
+        return BuscaExa(self, [asyncio.create_task(self.aconsultar(q)) for q in consultas])
+
+    async def fechar(self):
+        """Fecha as conexões mantidas abertas (no shutdown do serviço)"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = {
+                "consultas": self.queries,
+                "falhas": self.failures,
+                "timeouts": self.timeouts,
+                "tempo_medio": round(self.total_time / self.queries, 3) if self.queries else 0.0,
+                "usadas": self.used,
+                "descartadas": self.discarded,
+                "timeout": self.timeout,
+                "max_consultas": self.max_queries,
+                "revalidando": len(self._revalidating)
+            }
+        stats["cache"] = self.cache.snapshot() if self.cache else {"habilitado": False}
+        return stats
+
+
+cliente_exa = ClienteExa(cache=create_exa_cache())
+
+def buscar_com_exa(query: str, num_results: int = 5) -> list[str]:
+    return _textos(cliente_exa.consultar(query, num_results))
+
+async def buscar_com_exa_async(query: str, num_results: int = 5) -> list[str]:
+    """Versão assíncrona de buscar_com_exa, usada pelo pipeline assíncrono"""
+    return _textos(await cliente_exa.aconsultar(query, num_results))
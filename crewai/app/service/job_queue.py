@@ -0,0 +1,440 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from contextlib import closing
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger("crewai_jobs")
+
+STATUS_PENDENTE = "pendente"
+STATUS_EXECUTANDO = "executando"
+STATUS_CONCLUIDO = "concluido"
+STATUS_ERRO = "erro"
+STATUS_FINAIS = (STATUS_CONCLUIDO, STATUS_ERRO)
+
+# Execuções iniciadas de um job antes de desistir dele quando o worker cai no meio
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+# Validade do registro de um consumidor Redis; sem renovação seus jobs são recuperados
+JOB_CONSUMER_TTL = int(os.getenv("JOB_CONSUMER_TTL", "30"))
+# Intervalo com que o long-poll consulta o estado do job
+WAIT_POLL_INTERVAL = 0.5
+
+
+def interrupted_error(attempts: int) -> str:
+    return f"Job interrompido {attempts} vez(es) sem concluir; worker reiniciado durante a execução"
+
+
+class InMemoryJobBackend:
+    """
+    Backend em memória, usado em desenvolvimento e testes. Como no Redis, os
+    jobs terminados são descartados depois de `ttl` segundos
+    """
+
+    def __init__(self, ttl: float = 86400):
+        self.ttl = ttl
+        self._jobs: Dict[str, dict] = {}
+        self._fila = deque()
+        # (concluido_em, id) dos jobs terminados, em ordem de conclusão
+        self._finalizados = deque()
+        self._cond = threading.Condition()
+
+    def _evict(self):
+        limite = time.time() - self.ttl
+        while self._finalizados and self._finalizados[0][0] < limite:
+            self._jobs.pop(self._finalizados.popleft()[1], None)
+
+    def enqueue(self, job: dict):
+        with self._cond:
+            self._evict()
+            self._jobs[job["id"]] = dict(job)
+            self._fila.append(job["id"])
+            self._cond.notify()
+
+    def dequeue(self, timeout: float) -> Optional[dict]:
+        with self._cond:
+            if not self._fila:
+                self._cond.wait(timeout)
+            if not self._fila:
+                return None
+            job_id = self._fila.popleft()
+            job = self._jobs[job_id]
+            job.update(status=STATUS_EXECUTANDO, iniciado_em=time.time(), tentativas=job.get("tentativas", 0) + 1)
+            return dict(job)
+
+    def update(self, job_id: str, **fields):
+        with self._cond:
+            self._evict()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            final = job["status"] in STATUS_FINAIS
+            job.update(fields)
+            if not final and job["status"] in STATUS_FINAIS:
+                self._finalizados.append((job.get("concluido_em") or time.time(), job_id))
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._fila)
+
+    def ack(self, job_id: str):
+        pass
+
+    def heartbeat(self):
+        pass
+
+    def recover(self, max_attempts: int) -> int:
+        # Nada sobrevive ao reinício do processo
+        return 0
+
+
+class SQLiteJobBackend:
+    """Backend persistente em SQLite, útil para testes sem Redis"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    resultado TEXT,
+                    erro TEXT,
+                    criado_em REAL NOT NULL,
+                    iniciado_em REAL,
+                    concluido_em REAL,
+                    tentativas INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            colunas = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "tentativas" not in colunas:
+                conn.execute("ALTER TABLE jobs ADD COLUMN tentativas INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, criado_em)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def enqueue(self, job: dict):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, payload, criado_em) VALUES (?, ?, ?, ?)",
+                (job["id"], job["status"], json.dumps(job["payload"]), job["criado_em"])
+            )
+
+    def dequeue(self, timeout: float) -> Optional[dict]:
+        deadline = time.time() + timeout
+        while True:
+            with self._lock, closing(self._connect()) as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE status = ? ORDER BY criado_em LIMIT 1",
+                    (STATUS_PENDENTE,)
+                ).fetchone()
+                if row:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, iniciado_em = ?, tentativas = tentativas + 1 WHERE id = ?",
+                        (STATUS_EXECUTANDO, time.time(), row[0])
+                    )
+                conn.execute("COMMIT")
+            if row:
+                return self.get(row[0])
+            if time.time() >= deadline:
+                return None
+            time.sleep(min(0.2, max(0.0, deadline - time.time())))
+
+    def update(self, job_id: str, **fields):
+        if "resultado" in fields:
+            fields["resultado"] = json.dumps(fields["resultado"])
+        colunas = ", ".join(f"{campo} = ?" for campo in fields)
+        with closing(self._connect()) as conn:
+            conn.execute(f"UPDATE jobs SET {colunas} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["resultado"] = json.loads(job["resultado"]) if job["resultado"] else None
+        return job
+
+    def pending_count(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (STATUS_PENDENTE,)).fetchone()[0]
+
+    def ack(self, job_id: str):
+        pass
+
+    def heartbeat(self):
+        pass
+
+    def recover(self, max_attempts: int) -> int:
+        """
+        Devolve à fila os jobs que ficaram 'executando' quando o processo caiu,
+        ou os marca como erro depois de max_attempts execuções. O arquivo
+        pertence a um único processo, então todo job 'executando' no início
+        ficou órfão
+        """
+        with self._lock, closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE jobs SET status = ?, erro = ?, concluido_em = ? WHERE status = ? AND tentativas >= ?",
+                (STATUS_ERRO, interrupted_error(max_attempts), time.time(), STATUS_EXECUTANDO, max_attempts)
+            )
+            recuperados = conn.execute(
+                "UPDATE jobs SET status = ?, iniciado_em = NULL WHERE status = ?",
+                (STATUS_PENDENTE, STATUS_EXECUTANDO)
+            ).rowcount
+            conn.execute("COMMIT")
+        return recuperados
+
+
+class RedisJobBackend:
+    """
+    Backend em Redis: lista para a fila e um hash por job. Cada processo é um
+    consumidor com a sua lista de jobs em execução, para onde o BLMOVE move o
+    job de forma atômica, e um registro renovado pelo heartbeat; se o processo
+    cai, o próximo a iniciar encontra a lista sem registro e recupera os jobs
+    """
+
+    def __init__(self, url: str, prefix: str = "codesprint", ttl: int = 86400,
+                 consumer_ttl: int = JOB_CONSUMER_TTL):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("O backend Redis da fila de jobs requer o pacote 'redis'") from e
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.fila = f"{prefix}:jobs:fila"
+        self.prefix = f"{prefix}:job:"
+        self.ttl = ttl
+        self.consumer = uuid.uuid4().hex
+        self.consumer_ttl = consumer_ttl
+        self.prefixo_processando = f"{prefix}:jobs:processando:"
+        self.prefixo_consumidor = f"{prefix}:jobs:consumidor:"
+        self.processando = self.prefixo_processando + self.consumer
+
+    def enqueue(self, job: dict):
+        chave = self.prefix + job["id"]
+        pipe = self.redis.pipeline()
+        pipe.hset(chave, mapping={
+            "id": job["id"],
+            "status": job["status"],
+            "payload": json.dumps(job["payload"]),
+            "criado_em": job["criado_em"]
+        })
+        pipe.expire(chave, self.ttl)
+        pipe.lpush(self.fila, job["id"])
+        pipe.execute()
+
+    def dequeue(self, timeout: float) -> Optional[dict]:
+        job_id = self.redis.blmove(self.fila, self.processando, max(1, int(timeout)), "RIGHT", "LEFT")
+        if not job_id:
+            return None
+        pipe = self.redis.pipeline()
+        pipe.hset(self.prefix + job_id, mapping={"status": STATUS_EXECUTANDO, "iniciado_em": time.time()})
+        pipe.hincrby(self.prefix + job_id, "tentativas", 1)
+        pipe.execute()
+        return self.get(job_id)
+
+    def update(self, job_id: str, **fields):
+        if "resultado" in fields:
+            fields["resultado"] = json.dumps(fields["resultado"])
+        fields = {campo: valor for campo, valor in fields.items() if valor is not None}
+        if fields:
+            self.redis.hset(self.prefix + job_id, mapping=fields)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        dados = self.redis.hgetall(self.prefix + job_id)
+        if not dados:
+            return None
+        job = dict(dados)
+        job["payload"] = json.loads(job["payload"])
+        job["resultado"] = json.loads(job["resultado"]) if job.get("resultado") else None
+        for campo in ("criado_em", "iniciado_em", "concluido_em"):
+            if job.get(campo):
+                job[campo] = float(job[campo])
+        if job.get("tentativas"):
+            job["tentativas"] = int(job["tentativas"])
+        return job
+
+    def pending_count(self) -> int:
+        return self.redis.llen(self.fila)
+
+    def ack(self, job_id: str):
+        """Tira da lista de execução o job que chegou a um estado final"""
+        self.redis.lrem(self.processando, 1, job_id)
+
+    def heartbeat(self):
+        self.redis.set(self.prefixo_consumidor + self.consumer, time.time(), ex=self.consumer_ttl)
+
+    def recover(self, max_attempts: int) -> int:
+        """Recupera os jobs das listas de execução de consumidores sem registro válido"""
+        recuperados = 0
+        for lista in self.redis.scan_iter(match=self.prefixo_processando + "*"):
+            consumidor = lista[len(self.prefixo_processando):]
+            if consumidor == self.consumer or self.redis.exists(self.prefixo_consumidor + consumidor):
+                continue
+            # RPOP é atômico: se dois processos iniciam juntos, cada job vai para um só
+            while (job_id := self.redis.rpop(lista)) is not None:
+                chave = self.prefix + job_id
+                tentativas = int(self.redis.hget(chave, "tentativas") or 0)
+                if tentativas >= max_attempts:
+                    self.redis.hset(chave, mapping={
+                        "status": STATUS_ERRO,
+                        "erro": interrupted_error(tentativas),
+                        "concluido_em": time.time()
+                    })
+                    continue
+                pipe = self.redis.pipeline()
+                pipe.hset(chave, "status", STATUS_PENDENTE)
+                pipe.hdel(chave, "iniciado_em")
+                pipe.rpush(self.fila, job_id)
+                pipe.execute()
+                recuperados += 1
+        return recuperados
+
+
+class JobQueue:
+    """
+    Fila de jobs com um pool limitado de workers que executam o handler
+    recebido (normalmente a geração completa do projeto)
+    """
+
+    def __init__(self, backend, handler: Callable[[dict], dict], workers: int = 1, poll_interval: float = 1.0,
+                 max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.backend = backend
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.max_attempts = max(1, max_attempts)
+        self._threads = []
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        self.backend.heartbeat()
+        recuperados = self.backend.recover(self.max_attempts)
+        if recuperados:
+            logger.warning(f"{recuperados} job(s) interrompido(s) por queda do worker voltaram para a fila")
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Fila de jobs iniciada com {self.workers} worker(s) ({type(self.backend).__name__})")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, payload: dict) -> dict:
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": STATUS_PENDENTE,
+            "payload": payload,
+            "criado_em": time.time()
+        }
+        self.backend.enqueue(job)
+        logger.info(f"Job {job['id']} enfileirado")
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self.backend.get(job_id)
+
+    def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """Long-poll: aguarda o job terminar ou o timeout expirar"""
+        deadline = time.time() + timeout
+        job = self.backend.get(job_id)
+        while job and job["status"] not in STATUS_FINAIS and time.time() < deadline:
+            time.sleep(min(WAIT_POLL_INTERVAL, max(0.0, deadline - time.time())))
+            job = self.backend.get(job_id)
+        return job
+
+    async def wait_async(self, job_id: str, timeout: float) -> Optional[dict]:
+        """
+        Long-poll para o event loop: a espera não ocupa uma thread e as
+        consultas ao backend (SQLite ou Redis) rodam fora do loop
+        """
+        deadline = time.time() + timeout
+        job = await asyncio.to_thread(self.backend.get, job_id)
+        while job and job["status"] not in STATUS_FINAIS and time.time() < deadline:
+            await asyncio.sleep(min(WAIT_POLL_INTERVAL, max(0.0, deadline - time.time())))
+            job = await asyncio.to_thread(self.backend.get, job_id)
+        return job
+
+    def pending_count(self) -> int:
+        return self.backend.pending_count()
+
+    def _heartbeat_loop(self):
+        intervalo = getattr(self.backend, "consumer_ttl", JOB_CONSUMER_TTL) / 3
+        while not self._stop.wait(intervalo):
+            try:
+                self.backend.heartbeat()
+            except Exception as e:
+                logger.error(f"Erro ao renovar o registro do consumidor da fila: {str(e)}")
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            try:
+                job = self.backend.dequeue(self.poll_interval)
+            except Exception as e:
+                logger.error(f"Erro ao obter job da fila: {str(e)}")
+                time.sleep(self.poll_interval)
+                continue
+            if job:
+                self._run(job)
+
+    def _run(self, job: dict):
+        logger.info(f"Executando job {job['id']}")
+        try:
+            resultado = self.handler(job["payload"])
+            self.backend.update(job["id"], status=STATUS_CONCLUIDO, resultado=resultado, concluido_em=time.time())
+            logger.info(f"Job {job['id']} concluído")
+        except Exception as e:
+            # Inclui falhas ao gravar o resultado (por exemplo um resultado que não vira JSON)
+            logger.error(f"Erro ao executar job {job['id']}: {str(e)}\n{traceback.format_exc()}")
+            self._fail(job["id"], e)
+        # Uma falha do backend aqui não pode derrubar o worker; o job volta pela recuperação
+        try:
+            self.backend.ack(job["id"])
+        except Exception as e:
+            logger.error(f"Erro ao confirmar o job {job['id']} na fila: {str(e)}")
+
+    def _fail(self, job_id: str, error: Exception):
+        try:
+            self.backend.update(job_id, status=STATUS_ERRO, erro=str(error), concluido_em=time.time())
+        except Exception as e:
+            logger.error(f"Erro ao gravar a falha do job {job_id}: {str(e)}")
+
+
+def create_job_backend():
+    """Cria o backend da fila a partir de JOB_QUEUE_BACKEND (memory, sqlite ou redis)"""
+    tipo = os.getenv("JOB_QUEUE_BACKEND", "memory").lower()
+    if tipo == "redis":
+        return RedisJobBackend(os.getenv("REDIS_URL", "redis://redis:6379/0"))
+    if tipo == "sqlite":
+        return SQLiteJobBackend(os.getenv("JOB_QUEUE_SQLITE_PATH", "/tmp/codesprint_jobs.db"))
+    return InMemoryJobBackend()
@@ -0,0 +1,6 @@
+import os
+
+# O LiteLLM baixa a tabela de custos dos modelos ao ser importado; nos testes usa a cópia local
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+# Sem cache da EXA em disco; os testes que precisam dele criam o seu em tmp_path
+os.environ.setdefault("EXA_CACHE_ENABLED", "false")
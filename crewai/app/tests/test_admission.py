@@ -0,0 +1,173 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.admission import (
+    REASON_DEADLINE, REASON_QUEUE_FULL, REASON_QUEUE_TIMEOUT, AdmissionController, AdmissionRejected
+)
+from app.core.cancellation import CancelToken, GenerationCancelled
+from app.core.deadline import Deadline
+
+
+def ocupar(controle, liberar: threading.Event, **kwargs):
+    """Ocupa uma vaga numa thread até `liberar`; devolve a thread e a lista de erros"""
+    erros = []
+    entrou = threading.Event()
+
+    def rodar():
+        try:
+            with controle.slot(**kwargs):
+                entrou.set()
+                liberar.wait(5)
+        except Exception as e:
+            erros.append(e)
+        finally:
+            entrou.set()
+
+    thread = threading.Thread(target=rodar)
+    thread.start()
+    return thread, entrou, erros
+
+
+def esperar_fila(controle, tamanho):
+    limite = time.monotonic() + 2
+    while controle.snapshot()["fila"] < tamanho and time.monotonic() < limite:
+        time.sleep(0.01)
+
+
+def test_vaga_livre_entra_direto():
+    controle = AdmissionController(max_concurrent=1, max_queue=1, initial_estimate=10)
+    with controle.slot():
+        assert controle.snapshot()["em_andamento"] == 1
+    snapshot = controle.snapshot()
+    assert (snapshot["em_andamento"], snapshot["admitidos"], snapshot["enfileirados"]) == (0, 1, 0)
+
+
+def test_fila_cheia_recusada_com_429():
+    controle = AdmissionController(max_concurrent=1, max_queue=1, initial_estimate=10)
+    liberar = threading.Event()
+    primeira, entrou, _ = ocupar(controle, liberar)
+    entrou.wait(2)
+    segunda, _, erros = ocupar(controle, liberar)
+    esperar_fila(controle, 1)
+    assert controle.full()
+
+    with pytest.raises(AdmissionRejected) as recusa:
+        with controle.slot():
+            pass
+    assert recusa.value.reason == REASON_QUEUE_FULL
+    assert recusa.value.status_code == 429
+    # Dois na frente (um rodando e um na fila), 10 s cada, uma vaga
+    assert recusa.value.retry_after == 20
+
+    liberar.set()
+    primeira.join()
+    segunda.join()
+    assert erros == []
+    assert controle.snapshot()["admitidos"] == 2
+
+
+def test_tempo_de_fila_esgotado_recusado_com_503():
+    controle = AdmissionController(max_concurrent=1, max_queue=2, queue_timeout=0.1)
+    liberar = threading.Event()
+    thread, entrou, _ = ocupar(controle, liberar)
+    entrou.wait(2)
+    with pytest.raises(AdmissionRejected) as recusa:
+        with controle.slot():
+            pass
+    liberar.set()
+    thread.join()
+
+    assert recusa.value.reason == REASON_QUEUE_TIMEOUT
+    assert recusa.value.status_code == 503
+    assert controle.snapshot()["fila"] == 0
+    assert controle.snapshot()["recusados"][REASON_QUEUE_TIMEOUT] == 1
+
+
+def test_prazo_menor_que_a_espera_estimada():
+    controle = AdmissionController(max_concurrent=1, max_queue=5, initial_estimate=30)
+    liberar = threading.Event()
+    thread, entrou, _ = ocupar(controle, liberar)
+    entrou.wait(2)
+    with pytest.raises(AdmissionRejected) as recusa:
+        with controle.slot(deadline=Deadline(5)):
+            pass
+    liberar.set()
+    thread.join()
+    assert recusa.value.reason == REASON_DEADLINE
+    assert controle.snapshot()["enfileirados"] == 0
+
+
+def test_jobs_nao_sao_limitados_pela_fila():
+    controle = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=0.05)
+    liberar = threading.Event()
+    primeira, entrou, _ = ocupar(controle, liberar)
+    entrou.wait(2)
+    job, _, erros = ocupar(controle, liberar, bounded=False)
+    esperar_fila(controle, 1)
+    time.sleep(0.1)
+    liberar.set()
+    primeira.join()
+    job.join()
+    assert erros == []
+
+
+def test_cancelamento_tira_da_fila():
+    controle = AdmissionController(max_concurrent=1, max_queue=2)
+    liberar = threading.Event()
+    thread, entrou, _ = ocupar(controle, liberar)
+    entrou.wait(2)
+    token = CancelToken()
+    threading.Timer(0.05, token.cancel).start()
+    with pytest.raises(GenerationCancelled):
+        with controle.slot(cancel_token=token):
+            pass
+    assert controle.snapshot()["fila"] == 0
+    liberar.set()
+    thread.join()
+    assert controle.snapshot()["em_andamento"] == 0
+
+
+def test_vaga_assincrona_em_ordem_de_chegada():
+    controle = AdmissionController(max_concurrent=1, max_queue=5)
+    ordem = []
+
+    async def gerar(nome):
+        async with controle.aslot():
+            ordem.append(nome)
+            await asyncio.sleep(0.01)
+
+    async def rodar():
+        await asyncio.gather(*(gerar(nome) for nome in "abc"))
+
+    asyncio.run(rodar())
+    assert ordem == ["a", "b", "c"]
+    snapshot = controle.snapshot()
+    assert (snapshot["admitidos"], snapshot["enfileirados"], snapshot["em_andamento"]) == (3, 2, 0)
+    assert snapshot["espera_p99_s"] > 0
+
+
+def test_task_cancelada_sai_da_fila():
+    controle = AdmissionController(max_concurrent=1, max_queue=5)
+
+    async def rodar():
+        async with controle.aslot():
+            espera = asyncio.create_task(controle.aslot().__aenter__())
+            await asyncio.sleep(0.01)
+            assert controle.snapshot()["fila"] == 1
+            espera.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await espera
+            assert controle.snapshot()["fila"] == 0
+
+    asyncio.run(rodar())
+    assert controle.snapshot()["em_andamento"] == 0
+
+
+def test_desligado_nao_limita():
+    controle = AdmissionController(max_concurrent=0)
+    with controle.slot(), controle.slot():
+        assert not controle.full()
+    assert controle.snapshot()["retry_after_s"] == 0
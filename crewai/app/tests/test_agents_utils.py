@@ -0,0 +1,103 @@
+from app.core.agents.utils import SectionIndexer, StreamingSectionSplitter, extract_resources, extract_section
+
+PLANO = """# Resumo do Projeto
+Um sistema de tarefas.
+
+# Estrutura Técnica
+## Backend
+- FastAPI
+```python
+# comentário dentro do código
+```
+## Frontend
+- React
+
+# Recursos Necessários
+- 2 desenvolvedores
+- ## Não é título
+
+# Próximos Passos
+1. Protótipo
+"""
+
+
+def alimentar(texto, tamanho):
+    indice = SectionIndexer()
+    for i in range(0, len(texto), tamanho):
+        indice.feed(texto[i:i + tamanho])
+    indice.finish()
+    return indice
+
+
+def test_extract_section_inclui_subsecoes_e_ignora_codigo():
+    estrutura = extract_section(PLANO, "Estrutura Técnica")
+    assert estrutura.startswith("## Backend")
+    assert "# comentário dentro do código" in estrutura
+    assert estrutura.endswith("- React")
+    assert extract_section(PLANO, "resumo do projeto") == "Um sistema de tarefas."
+    assert extract_section(PLANO, "Inexistente") == ""
+
+
+def test_indice_em_fragmentos_igual_ao_texto_inteiro():
+    esperado = SectionIndexer.build(PLANO)
+    for tamanho in (1, 2, 3, 7, 64):
+        indice = alimentar(PLANO, tamanho)
+        assert [(s.title, s.level, s.start, s.end) for s in indice.sections] == \
+               [(s.title, s.level, s.start, s.end) for s in esperado.sections]
+
+
+def test_titulo_dividido_em_muitos_fragmentos():
+    titulo = "# " + "Resumo " * 500
+    indice = alimentar(titulo + "\nconteúdo\n", 3)
+    assert indice.sections[0].title == titulo[2:].strip()
+    assert indice.section_text(titulo[2:]) == "conteúdo"
+
+
+def test_linha_longa_sem_titulo_e_descartada():
+    indice = alimentar("texto " * 10000 + "\n# Fim\nok", 4)
+    assert [s.title for s in indice.sections] == ["Fim"]
+    assert indice.section_text("Fim") == "ok"
+
+
+def test_streaming_splitter_devolve_secoes_de_primeiro_nivel():
+    splitter = StreamingSectionSplitter()
+    secoes = []
+    for i in range(0, len(PLANO), 5):
+        secoes.extend(splitter.feed(PLANO[i:i + 5]))
+    secoes.extend(splitter.flush())
+    assert [s["titulo"] for s in secoes] == ["Resumo do Projeto", "Estrutura Técnica", "Recursos Necessários",
+                                             "Próximos Passos"]
+    assert secoes[-1]["conteudo"] == "1. Protótipo"
+
+
+def test_extract_resources():
+    assert extract_resources(extract_section(PLANO, "Recursos Necessários")) == ["2 desenvolvedores",
+                                                                                 "## Não é título"]
+    assert extract_resources("") == []
+
+
+def test_extract_section_sem_titulo_markdown_usa_linha_com_o_nome():
+    texto = "Resumo:\nUm sistema de tarefas.\nCom prazos.\n\nTecnologias\n- Python\n# Próximos Passos\n1. Protótipo"
+    assert extract_section(texto, "Resumo") == "Um sistema de tarefas.\nCom prazos.\n\nTecnologias\n- Python"
+    assert extract_section(texto.replace("\n", "\r\n"), "resumo").startswith("Um sistema de tarefas.")
+    assert extract_section("**Resumo do Projeto:**\nTexto", "Resumo do Projeto") == "Texto"
+
+
+def test_extract_section_prefere_titulo_markdown_a_linha_comum():
+    texto = "Resumo\nlinha comum\n# Resumo\nseção de verdade"
+    assert extract_section(texto, "Resumo") == "seção de verdade"
+
+
+def test_extract_section_nome_no_meio_da_frase_nao_conta():
+    assert extract_section("O resumo do projeto vem depois.\nTexto", "Resumo do Projeto") == ""
+
+
+def test_saidas_gravadas_tem_as_secoes_do_plano():
+    from benchmarks.bench_text_processing import GRAVADAS, carregar_gravadas
+
+    gravadas = carregar_gravadas(GRAVADAS)
+    assert gravadas
+    for nome, texto in gravadas.items():
+        indice = SectionIndexer.build(texto)
+        for secao in ("Resumo do Projeto", "Estrutura do Projeto", "Tecnologias Recomendadas"):
+            assert indice.section_text(secao), f"{nome}: seção {secao} vazia"
@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.cancellation import CancelToken, GenerationCancelled, current_token, run_cancellable, use_token
+from app.core.deadline import (
+    DEADLINE_REASON,
+    LLM_MAX_TOKENS,
+    LLM_MIN_TOKENS,
+    MAX_REQUEST_TIMEOUT,
+    Deadline,
+    has_budget,
+    max_tokens_for,
+    parse_deadline,
+    stage_timeout,
+    use_deadline,
+)
+
+
+def test_cancel_chama_callbacks_uma_vez():
+    token = CancelToken()
+    chamadas = []
+    token.add_callback(lambda: chamadas.append(token.reason))
+
+    token.cancel("cliente desconectado")
+    token.cancel("de novo")
+
+    assert token.cancelled
+    assert token.reason == "cliente desconectado"
+    assert chamadas == ["cliente desconectado"]
+
+
+def test_callback_em_token_ja_cancelado_roda_na_hora():
+    token = CancelToken()
+    token.cancel()
+    chamadas = []
+    token.add_callback(lambda: chamadas.append(1))
+    assert chamadas == [1]
+
+
+def test_remove_callback():
+    token = CancelToken()
+    chamadas = []
+    callback = lambda: chamadas.append(1)
+    token.add_callback(callback)
+    token.remove_callback(callback)
+    token.remove_callback(callback)
+
+    token.cancel()
+    assert chamadas == []
+
+
+def test_token_filho_cancelado_com_o_pai():
+    pai = CancelToken()
+    filho = CancelToken(pai)
+
+    pai.cancel("prazo esgotado")
+
+    assert filho.cancelled
+    assert filho.reason == "prazo esgotado"
+    with pytest.raises(GenerationCancelled, match="prazo esgotado"):
+        filho.raise_if_cancelled()
+
+
+def test_cancelar_filho_nao_afeta_o_pai():
+    pai = CancelToken()
+    CancelToken(pai).cancel()
+    assert not pai.cancelled
+
+
+def test_use_token_restaura_o_anterior():
+    token = CancelToken()
+    with use_token(token):
+        assert current_token() is token
+    assert current_token() is None
+
+
+def test_run_cancellable_cancelado_de_outra_thread():
+    token = CancelToken()
+
+    async def lenta():
+        await asyncio.sleep(5)
+
+    async def principal():
+        threading.Timer(0.05, token.cancel, args=("cancelado pelo teste",)).start()
+        await run_cancellable(lenta(), token)
+
+    inicio = time.monotonic()
+    with pytest.raises(GenerationCancelled, match="cancelado pelo teste"):
+        asyncio.run(principal())
+    assert time.monotonic() - inicio < 2
+
+
+def test_run_cancellable_devolve_resultado():
+    async def rapida():
+        return 42
+
+    async def principal():
+        return await run_cancellable(rapida(), CancelToken())
+
+    assert asyncio.run(principal()) == 42
+
+
+def test_parse_deadline():
+    assert parse_deadline("30").budget == 30
+    assert parse_deadline("-5").budget == 0
+    assert parse_deadline(str(MAX_REQUEST_TIMEOUT * 2)).budget == MAX_REQUEST_TIMEOUT
+    assert parse_deadline("abc").budget == parse_deadline(None).budget
+
+
+def test_deadline_expira():
+    prazo = Deadline(0.05)
+    assert not prazo.expired
+    assert prazo.has_budget(0.01)
+    time.sleep(0.1)
+    assert prazo.expired
+    assert prazo.remaining() == 0
+    assert not prazo.has_budget(0.01)
+
+
+def test_arm_cancela_token_fora_do_loop():
+    token = CancelToken()
+    Deadline(0.05).arm(token)
+    assert token.wait(2)
+    assert token.reason == DEADLINE_REASON
+
+
+def test_arm_cancela_token_no_event_loop():
+    token = CancelToken()
+
+    async def principal():
+        Deadline(0.05).arm(token)
+        await asyncio.sleep(0.2)
+
+    asyncio.run(principal())
+    assert token.reason == DEADLINE_REASON
+
+
+def test_disarm_impede_cancelamento():
+    token = CancelToken()
+    Deadline(0.05).arm(token).disarm()
+    assert not token.wait(0.2)
+
+
+def test_stage_timeout_e_has_budget_usam_o_prazo_do_contexto():
+    assert stage_timeout(120) == 120
+    assert has_budget(10_000)
+    with use_deadline(Deadline(30)):
+        assert stage_timeout(120) <= 30
+        assert stage_timeout(5) == 5
+        assert not has_budget(60)
+
+
+def test_max_tokens_for_limites():
+    assert max_tokens_for(0) == LLM_MIN_TOKENS
+    assert max_tokens_for(100_000) == LLM_MAX_TOKENS
+    assert LLM_MIN_TOKENS <= max_tokens_for(60) <= LLM_MAX_TOKENS
@@ -0,0 +1,114 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.core import crewai_generator
+from app.core.crewai_generator import arun_project_pipeline, run_project_pipeline
+from app.core.litellm_adapter import llm_adapter
+
+PLANO_MD = """# Resumo do Projeto
+Um sistema de tarefas para equipes pequenas.
+
+# Estrutura do Projeto
+- backend/app/main.py
+- frontend/src/App.tsx
+
+# Tecnologias Recomendadas
+- FastAPI: API assíncrona
+- React: interface
+
+# Próximos Passos
+- Criar o protótipo
+- Escrever os testes
+"""
+PLANO_JSON = json.dumps({
+    "resumo": "Um sistema de tarefas para equipes pequenas.",
+    "estrutura": "backend/app/main.py\nfrontend/src/App.tsx",
+    "tecnologias": "- FastAPI: API assíncrona\n- React: interface",
+    "recursos": ["Criar o protótipo", "Escrever os testes"]
+}, ensure_ascii=False)
+
+
+def fragmentos(kwargs):
+    """Resposta do Ollama simulado em fragmentos de stream: JSON quando há schema, markdown nos demais casos"""
+    texto = PLANO_JSON if kwargs.get("response_format") else PLANO_MD
+    return [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=texto[i:i + 16]))])
+            for i in range(0, len(texto), 16)]
+
+
+class StreamAssincrono:
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+@pytest.fixture
+def chamadas(monkeypatch):
+    """LiteLLM simulado; registra qual API (completion ou acompletion) atendeu cada chamada"""
+    registro = []
+
+    def completion(**kwargs):
+        registro.append("completion")
+        return iter(fragmentos(kwargs))
+
+    async def acompletion(**kwargs):
+        registro.append("acompletion")
+        return StreamAssincrono(fragmentos(kwargs))
+
+    litellm = SimpleNamespace(completion=completion, acompletion=acompletion,
+                              token_counter=lambda model, text: len(text) // 4)
+    monkeypatch.setattr(llm_adapter, "_litellm", litellm)
+    # Os agentes do CrewAI só contribuem com o papel para o prompt
+    monkeypatch.setattr(crewai_generator, "create_specialist_agents",
+                        lambda areas: [SimpleNamespace(role=f"Especialista {area}") for area in areas])
+    monkeypatch.setattr(crewai_generator, "create_project_manager_agent",
+                        lambda: SimpleNamespace(role="Gerente de Projeto"))
+    return registro
+
+
+def gerar_sincrono():
+    return run_project_pipeline(["Web", "API"], "Python, FastAPI", "Um sistema de tarefas")
+
+
+def gerar_assincrono():
+    return asyncio.run(arun_project_pipeline(["Web", "API"], "Python, FastAPI", "Um sistema de tarefas"))
+
+
+@pytest.mark.parametrize("estruturado", [True, False])
+def test_pipeline_assincrono_igual_ao_sincrono(chamadas, monkeypatch, estruturado):
+    monkeypatch.setattr(crewai_generator, "STRUCTURED_OUTPUT", estruturado)
+    sincrono = gerar_sincrono()
+    assert set(chamadas) == {"completion"}
+    chamadas.clear()
+
+    assincrono = gerar_assincrono()
+    assert set(chamadas) == {"acompletion"}
+    assert assincrono == sincrono
+    assert assincrono["resumo"] == "Um sistema de tarefas para equipes pequenas."
+    assert assincrono["recursos"] == ["Criar o protótipo", "Escrever os testes"]
+
+
+def test_gerar_projeto_usa_o_pipeline_assincrono(chamadas, monkeypatch):
+    monkeypatch.setattr(main, "PIPELINE_ASSINCRONO", True)
+    monkeypatch.setattr(main, "result_cache", None)
+    monkeypatch.setattr(main, "semantic_cache", None)
+    resposta = TestClient(main.app).post("/gerar-projeto", json={
+        "areas": ["Web", "API"], "tecnologias": "Python, FastAPI", "descricao": "Um sistema de tarefas"
+    })
+
+    assert resposta.status_code == 200
+    assert set(chamadas) == {"acompletion"}
+    chamadas.clear()
+    assert resposta.json()["resultado"] == gerar_sincrono()
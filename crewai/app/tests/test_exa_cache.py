@@ -0,0 +1,86 @@
+import time
+
+from app.service.exa_cache import FRESH, STALE, ExaCache, create_exa_cache
+
+RESULTADOS = [{"url": "https://exemplo.com", "text": "FastAPI"}]
+
+
+def test_consulta_normalizada_e_numero_de_resultados(tmp_path):
+    cache = ExaCache(str(tmp_path / "exa.sqlite3"))
+    cache.set("FastAPI  Tutorial", 3, RESULTADOS)
+
+    assert cache.get("fastapi tutorial", 3) == (RESULTADOS, FRESH)
+    assert cache.get("fastapi tutorial", 5) == (None, None)
+    snapshot = cache.snapshot()
+    assert (snapshot["hits"], snapshot["misses"], snapshot["entradas"]) == (1, 1, 1)
+    assert snapshot["hit_rate"] == 0.5
+
+
+def test_entrada_vencida_serve_ate_o_limite(tmp_path, monkeypatch):
+    cache = ExaCache(str(tmp_path / "exa.sqlite3"), ttl=10, stale=100)
+    cache.set("react", 3, RESULTADOS)
+    agora = time.time()
+
+    monkeypatch.setattr(time, "time", lambda: agora + 50)
+    assert cache.get("react", 3) == (RESULTADOS, STALE)
+
+    monkeypatch.setattr(time, "time", lambda: agora + 200)
+    assert cache.get("react", 3) == (None, None)
+    assert cache.snapshot()["expiracoes"] == 1
+    assert cache.size() == 0
+
+
+def test_remove_as_menos_usadas(tmp_path, monkeypatch):
+    cache = ExaCache(str(tmp_path / "exa.sqlite3"), max_entries=2)
+    relogio = iter(range(1000, 2000))
+    monkeypatch.setattr(time, "time", lambda: next(relogio))
+    cache.set("a", 3, RESULTADOS)
+    cache.set("b", 3, RESULTADOS)
+    cache.get("a", 3)
+    cache.set("c", 3, RESULTADOS)
+
+    assert cache.get("b", 3) == (None, None)
+    assert cache.get("a", 3)[0] == RESULTADOS
+    assert cache.snapshot()["evictions"] == 1
+
+
+def test_persiste_entre_instancias(tmp_path):
+    caminho = str(tmp_path / "exa.sqlite3")
+    ExaCache(caminho).set("vue", 3, RESULTADOS)
+    assert ExaCache(caminho).get("vue", 3) == (RESULTADOS, FRESH)
+
+
+def test_criacao_pelas_variaveis(tmp_path, monkeypatch):
+    monkeypatch.setenv("EXA_CACHE_ENABLED", "false")
+    assert create_exa_cache() is None
+
+    monkeypatch.setenv("EXA_CACHE_ENABLED", "true")
+    monkeypatch.setenv("EXA_CACHE_PATH", str(tmp_path / "exa.sqlite3"))
+    monkeypatch.setenv("EXA_CACHE_MAX_ENTRIES", "5")
+    assert create_exa_cache().max_entries == 5
+
+    monkeypatch.setenv("EXA_CACHE_PATH", str(tmp_path / "inexistente" / "exa.sqlite3"))
+    assert create_exa_cache() is None
+
+
+def test_cliente_devolve_entrada_vencida_e_revalida(tmp_path, monkeypatch):
+    from app.service.exa_search import ClienteExa
+
+    cache = ExaCache(str(tmp_path / "exa.sqlite3"), ttl=0)
+    cache.set("svelte", 3, RESULTADOS)
+    novos = [{"url": "https://exemplo.com/novo", "text": "Svelte"}]
+    consultas = []
+
+    def post(query, num_results):
+        consultas.append(query)
+        cache.set(query, num_results, novos)
+        return novos
+
+    exa = ClienteExa(url="http://127.0.0.1:9/search", cache=cache)
+    monkeypatch.setattr(exa, "_post", post)
+    assert exa.consultar("svelte") == RESULTADOS
+
+    exa._executor.shutdown(wait=True)
+    assert consultas == ["svelte"]
+    assert cache.get("svelte", 3)[0] == novos
+    assert exa.snapshot()["revalidando"] == 0
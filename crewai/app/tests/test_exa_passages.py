@@ -0,0 +1,60 @@
+import pytest
+
+from app.service import exa_passages
+from app.service.exa_passages import EstatisticasTrechos, dividir_trechos, pontuar_bm25, selecionar_trechos
+
+
+@pytest.fixture(autouse=True)
+def contagem_por_palavras(monkeypatch):
+    # Um token por palavra, sem depender do tokenizer do modelo
+    monkeypatch.setattr(exa_passages.llm_adapter, "count_tokens", lambda text, model=None: len((text or "").split()))
+    monkeypatch.setattr(exa_passages, "estatisticas_trechos", EstatisticasTrechos())
+
+
+def paragrafo(assunto, palavras=30):
+    return " ".join([assunto] + ["texto"] * (palavras - 1))
+
+
+def test_paragrafos_curtos_juntados_e_longos_quebrados():
+    curtos = "\n\n".join(paragrafo("a", 20) for _ in range(3))
+    longo = paragrafo("b", 250)
+    trechos = dividir_trechos([curtos, longo], palavras=50)
+    assert [len(t.split()) for t in trechos] == [40, 20, 50, 50, 50, 100]
+    assert not any("a" in t.split() and "b" in t.split() for t in trechos)
+
+
+def test_trechos_com_termos_da_consulta_pontuam_mais():
+    trechos = ["fastapi com postgresql e docker", "receita de bolo de cenoura", "fastapi e react"]
+    pontuacoes = pontuar_bm25(trechos, "API em fastapi", "PostgreSQL, Docker")
+    assert pontuacoes[1] == 0
+    assert pontuacoes[0] > pontuacoes[2] > 0
+    assert pontuar_bm25(trechos, "").tolist() == [0, 0, 0]
+
+
+def test_selecao_respeita_relevancia_e_orcamento():
+    # Parágrafos maiores que EXA_PASSAGE_WORDS viram trechos separados
+    textos = [
+        "\n\n".join([paragrafo("jardinagem", 130), paragrafo("kubernetes", 130)]),
+        "\n\n".join([paragrafo("deploy kubernetes", 129), paragrafo("culinária", 130)])
+    ]
+    selecionados = selecionar_trechos(textos, "deploy com kubernetes", max_tokens=300)
+    assert [t.split()[0] for t in selecionados] == ["deploy", "kubernetes"]
+
+    assert selecionar_trechos(textos, "deploy com kubernetes", max_tokens=200) == [selecionados[0]]
+    assert selecionar_trechos(textos, "deploy com kubernetes", max_tokens=100) == []
+
+    snapshot = exa_passages.estatisticas_trechos.snapshot()
+    assert snapshot["selecoes"] == 3
+    assert snapshot["trechos_medio"] == 4
+    assert snapshot["tokens_antes_medio"] == 520
+
+
+def test_sem_termos_em_comum_usa_a_ordem_original():
+    textos = [paragrafo("primeiro", 10), paragrafo("segundo", 10)]
+    assert selecionar_trechos(textos, "blockchain", max_tokens=100) == textos
+    assert selecionar_trechos([], "blockchain") == []
+
+
+def test_trechos_repetidos_entram_uma_vez():
+    texto = paragrafo("react", 10)
+    assert selecionar_trechos([texto, texto], "react", max_tokens=100) == [texto]
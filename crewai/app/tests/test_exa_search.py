@@ -0,0 +1,111 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.service.exa_cache import ExaCache
+from app.service.exa_search import ClienteExa, anexar_resultados, montar_consultas
+
+
+class ExaFalsa(BaseHTTPRequestHandler):
+    """Responde como a API de busca da EXA; consultas com 'lenta' demoram e com 'erro' devolvem 500"""
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.consultas.append(payload)
+        if "lenta" in payload["query"]:
+            time.sleep(1)
+        if "erro" in payload["query"]:
+            self.send_response(500)
+            self.end_headers()
+            return
+        corpo = json.dumps({"results": [
+            {"url": f"https://exemplo.com/{i}", "text": f"{payload['query']} #{i}"}
+            for i in range(payload["numResults"])
+        ]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidor():
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), ExaFalsa)
+    servidor.daemon_threads = True
+    servidor.consultas = []
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def cliente(servidor, **kwargs) -> ClienteExa:
+    return ClienteExa(url=f"http://127.0.0.1:{servidor.server_port}/search", **kwargs)
+
+
+def test_consulta_sincrona_e_assincrona(servidor):
+    exa = cliente(servidor)
+    assert [r["text"] for r in exa.consultar("fastapi", 2)] == ["fastapi #0", "fastapi #1"]
+    assert [r["text"] for r in asyncio.run(exa.aconsultar("react", 1))] == ["react #0"]
+    assert servidor.consultas == [{"query": "fastapi", "numResults": 2}, {"query": "react", "numResults": 1}]
+    assert exa.snapshot()["consultas"] == 2
+
+
+def test_falhas_e_timeouts_viram_lista_vazia(servidor):
+    exa = cliente(servidor, timeout=0.2)
+    assert exa.consultar("erro") == []
+    assert exa.consultar("lenta") == []
+    snapshot = exa.snapshot()
+    assert snapshot["falhas"] == 2
+    assert snapshot["timeouts"] == 1
+
+
+def test_consultas_lentas_descartadas_sem_esperar(servidor):
+    exa = cliente(servidor, max_queries=3)
+    busca = exa.iniciar("app", ["Web", "lenta"])
+    limite = time.monotonic() + 2
+    while sum(f.done() for f in busca.futuros) < 2 and time.monotonic() < limite:
+        time.sleep(0.01)
+
+    inicio = time.monotonic()
+    resultados = busca.resultados_prontos()
+    assert time.monotonic() - inicio < 0.5
+    # As duas consultas rápidas devolvem as mesmas URLs; os textos repetidos por URL são descartados
+    assert resultados == ["app #0", "app #1", "app #2"]
+    assert exa.snapshot()["usadas"] == 2
+    assert exa.snapshot()["descartadas"] == 1
+
+
+def test_busca_assincrona_usa_o_que_terminou(servidor):
+    exa = cliente(servidor, max_queries=2)
+
+    async def buscar():
+        busca = exa.ainiciar("api", ["lenta"])
+        await asyncio.sleep(0.3)
+        resultados = busca.resultados_prontos()
+        await exa.fechar()
+        return resultados
+
+    assert asyncio.run(buscar()) == ["api #0", "api #1", "api #2"]
+
+
+def test_cache_evita_nova_consulta(servidor, tmp_path):
+    exa = cliente(servidor, cache=ExaCache(str(tmp_path / "exa.sqlite3")))
+    primeira = exa.consultar("Django ORM")
+    assert exa.consultar("  django   orm ") == primeira
+    assert len(servidor.consultas) == 1
+
+
+def test_consultas_e_secao_de_resultados(monkeypatch):
+    monkeypatch.setattr("app.service.exa_search.EXA_MAX_QUERIES", 2)
+    assert montar_consultas("loja", ["Web", "Mobile"]) == ["loja", "Web: loja"]
+    assert anexar_resultados("loja", []) == "loja"
+    assert anexar_resultados("loja", ["a", "b"]) == "loja\n\nResultados da EXA:\na\n---\nb"
@@ -0,0 +1,232 @@
+import asyncio
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from app.service.job_queue import (
+    STATUS_CONCLUIDO,
+    STATUS_ERRO,
+    STATUS_EXECUTANDO,
+    STATUS_PENDENTE,
+    InMemoryJobBackend,
+    JobQueue,
+    SQLiteJobBackend,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteJobBackend(str(tmp_path / "jobs.db"))
+    return InMemoryJobBackend()
+
+
+def fila_com(backend, handler, workers=1):
+    fila = JobQueue(backend, handler, workers=workers, poll_interval=0.05)
+    fila.start()
+    return fila
+
+
+def test_submit_sem_workers_fica_pendente(backend):
+    fila = JobQueue(backend, lambda payload: payload)
+    job = fila.submit({"areas": ["Web"]})
+
+    salvo = fila.get(job["id"])
+    assert salvo["status"] == STATUS_PENDENTE
+    assert salvo["payload"] == {"areas": ["Web"]}
+    assert fila.pending_count() == 1
+
+
+def test_job_concluido_guarda_resultado(backend):
+    fila = fila_com(backend, lambda payload: {"projeto": f"plano para {payload['areas'][0]}"})
+    try:
+        job = fila.submit({"areas": ["Web"]})
+        resultado = fila.wait(job["id"], 5)
+    finally:
+        fila.stop()
+
+    assert resultado["status"] == STATUS_CONCLUIDO
+    assert resultado["resultado"] == {"projeto": "plano para Web"}
+    assert resultado["concluido_em"] >= resultado["iniciado_em"] >= resultado["criado_em"]
+    assert fila.pending_count() == 0
+
+
+def test_job_com_erro_guarda_mensagem(backend):
+    def handler(payload):
+        raise ValueError("Ollama indisponível")
+
+    fila = fila_com(backend, handler)
+    try:
+        job = fila.submit({})
+        resultado = fila.wait(job["id"], 5)
+    finally:
+        fila.stop()
+
+    assert resultado["status"] == STATUS_ERRO
+    assert resultado["erro"] == "Ollama indisponível"
+    assert resultado.get("resultado") is None
+
+
+def test_wait_expira_com_job_pendente(backend):
+    fila = JobQueue(backend, lambda payload: payload)
+    job = fila.submit({})
+
+    assert fila.wait(job["id"], 0.1)["status"] == STATUS_PENDENTE
+
+
+def test_wait_job_inexistente(backend):
+    assert JobQueue(backend, lambda payload: payload).wait("inexistente", 0.1) is None
+
+
+def test_varios_workers_processam_todos_os_jobs(backend):
+    fila = fila_com(backend, lambda payload: payload["n"] * 2, workers=3)
+    try:
+        jobs = [fila.submit({"n": n}) for n in range(6)]
+        resultados = [fila.wait(job["id"], 5) for job in jobs]
+    finally:
+        fila.stop()
+
+    assert [r["status"] for r in resultados] == [STATUS_CONCLUIDO] * 6
+    assert [r["resultado"] for r in resultados] == [n * 2 for n in range(6)]
+
+
+def interromper(backend, vezes=1):
+    """Simula workers que pegaram o job e caíram antes de concluir, com reinícios entre eles"""
+    for i in range(vezes):
+        if i:
+            backend.recover(max_attempts=vezes + 1)
+        job = backend.dequeue(0)
+        assert job["status"] == STATUS_EXECUTANDO
+    return job
+
+
+def test_sqlite_start_devolve_job_interrompido_a_fila(tmp_path):
+    caminho = str(tmp_path / "jobs.db")
+    anterior = JobQueue(SQLiteJobBackend(caminho), lambda payload: payload)
+    job = anterior.submit({"n": 1})
+    interromper(anterior.backend)
+
+    fila = fila_com(SQLiteJobBackend(caminho), lambda payload: payload["n"] + 1)
+    try:
+        resultado = fila.wait(job["id"], 5)
+    finally:
+        fila.stop()
+
+    assert resultado["status"] == STATUS_CONCLUIDO
+    assert resultado["resultado"] == 2
+    assert resultado["tentativas"] == 2
+
+
+def test_sqlite_start_desiste_depois_de_max_tentativas(tmp_path):
+    caminho = str(tmp_path / "jobs.db")
+    anterior = JobQueue(SQLiteJobBackend(caminho), lambda payload: payload)
+    job = anterior.submit({})
+    interromper(anterior.backend, vezes=2)
+
+    fila = JobQueue(SQLiteJobBackend(caminho), lambda payload: payload, max_attempts=2, poll_interval=0.05)
+    fila.start()
+    fila.stop()
+
+    resultado = fila.get(job["id"])
+    assert resultado["status"] == STATUS_ERRO
+    assert "interrompido" in resultado["erro"]
+    assert fila.pending_count() == 0
+
+
+def test_sqlite_migra_tabela_sem_coluna_de_tentativas(tmp_path):
+    caminho = str(tmp_path / "jobs.db")
+    with closing(sqlite3.connect(caminho)) as conn:
+        conn.execute(
+            "CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, payload TEXT NOT NULL, resultado TEXT, "
+            "erro TEXT, criado_em REAL NOT NULL, iniciado_em REAL, concluido_em REAL)"
+        )
+        conn.commit()
+
+    backend = SQLiteJobBackend(caminho)
+    JobQueue(backend, lambda payload: payload).submit({})
+    assert backend.dequeue(0)["tentativas"] == 1
+
+
+def test_wait_async_aguarda_conclusao(backend):
+    fila = fila_com(backend, lambda payload: "pronto")
+    try:
+        job = fila.submit({})
+        resultado = asyncio.run(fila.wait_async(job["id"], 5))
+    finally:
+        fila.stop()
+
+    assert resultado["status"] == STATUS_CONCLUIDO
+    assert resultado["resultado"] == "pronto"
+
+
+def test_wait_async_sem_espera_devolve_estado_atual(backend):
+    fila = JobQueue(backend, lambda payload: payload)
+    job = fila.submit({})
+
+    assert asyncio.run(fila.wait_async(job["id"], 0))["status"] == STATUS_PENDENTE
+    assert asyncio.run(fila.wait_async("inexistente", 0)) is None
+
+
+class BackendInstavel(InMemoryJobBackend):
+    """Falha ao gravar o estado e ao confirmar os jobs marcados em `falhas`"""
+
+    def __init__(self, falhas):
+        super().__init__()
+        self.falhas = falhas
+
+    def update(self, job_id, **fields):
+        if self.get(job_id)["payload"].get("falha") in self.falhas:
+            raise ConnectionError("backend fora do ar")
+        super().update(job_id, **fields)
+
+    def ack(self, job_id):
+        if self.get(job_id)["payload"].get("falha") in self.falhas:
+            raise ConnectionError("backend fora do ar")
+
+
+def test_worker_sobrevive_a_falhas_do_backend():
+    fila = fila_com(BackendInstavel({"gravar"}), lambda payload: payload)
+    try:
+        perdido = fila.submit({"falha": "gravar"})
+        job = fila.submit({"falha": None})
+        resultado = fila.wait(job["id"], 5)
+    finally:
+        fila.stop()
+
+    assert resultado["status"] == STATUS_CONCLUIDO
+    assert fila.get(perdido["id"])["status"] == STATUS_EXECUTANDO
+
+
+def test_resultado_que_nao_vira_json_conclui_com_erro(tmp_path):
+    fila = fila_com(SQLiteJobBackend(str(tmp_path / "jobs.db")), lambda payload: {"valor": object()})
+    try:
+        job = fila.submit({})
+        resultado = fila.wait(job["id"], 5)
+        seguinte = fila.submit({})
+        assert fila.wait(seguinte["id"], 5)["status"] == STATUS_ERRO
+    finally:
+        fila.stop()
+
+    assert resultado["status"] == STATUS_ERRO
+    assert "JSON" in resultado["erro"]
+
+
+def test_memoria_descarta_jobs_terminados_depois_do_ttl(monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr("app.service.job_queue.time.time", lambda: agora[0])
+    backend = InMemoryJobBackend(ttl=60)
+    fila = JobQueue(backend, lambda payload: payload)
+    antigo = fila.submit({})
+    pendente = fila.submit({})
+    backend.dequeue(0)
+    backend.update(antigo["id"], status=STATUS_CONCLUIDO, resultado={}, concluido_em=agora[0])
+
+    agora[0] += 30
+    fila.submit({})
+    assert fila.get(antigo["id"])["status"] == STATUS_CONCLUIDO
+
+    agora[0] += 31
+    fila.submit({})
+    assert fila.get(antigo["id"]) is None
+    assert fila.get(pendente["id"])["status"] == STATUS_PENDENTE
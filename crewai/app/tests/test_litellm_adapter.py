@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.cancellation import CancelToken, GenerationCancelled
+from app.core.litellm_adapter import CustomLiteLLM
+
+
+def chunk(texto):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=texto))])
+
+
+class StreamBloqueado:
+    """Stream que entrega um fragmento e depois fica esperando o Ollama até ser fechado"""
+
+    def __init__(self):
+        self.fechado = threading.Event()
+
+    def __iter__(self):
+        yield chunk("primeiro")
+        if not self.fechado.wait(5):
+            raise AssertionError("o stream não foi fechado no cancelamento")
+        raise ConnectionError("conexão fechada")
+
+    def close(self):
+        self.fechado.set()
+
+
+class StreamCompleto:
+    def __init__(self, textos):
+        self.textos = textos
+        self.fechado = False
+
+    def __iter__(self):
+        return iter([chunk(texto) for texto in self.textos])
+
+    def close(self):
+        self.fechado = True
+
+
+def adaptador_com(stream):
+    adaptador = CustomLiteLLM()
+
+    def token_counter(model, text):
+        raise RuntimeError("sem tokenizer")
+
+    adaptador._litellm = SimpleNamespace(completion=lambda **kwargs: stream, token_counter=token_counter)
+    return adaptador
+
+
+def test_cancelamento_fecha_stream_bloqueado():
+    stream = StreamBloqueado()
+    token = CancelToken()
+    fragmentos = adaptador_com(stream).chat_stream([{"role": "user", "content": "oi"}], cancel_token=token)
+
+    assert next(fragmentos) == "primeiro"
+    threading.Timer(0.1, token.cancel, args=("cliente desconectado",)).start()
+    inicio = time.monotonic()
+    with pytest.raises(GenerationCancelled, match="cliente desconectado"):
+        next(fragmentos)
+
+    assert stream.fechado.is_set()
+    assert time.monotonic() - inicio < 2
+
+
+def test_callback_de_cancelamento_removido_ao_terminar():
+    stream = StreamCompleto(["a", "b"])
+    token = CancelToken()
+
+    texto = "".join(adaptador_com(stream).chat_stream([{"role": "user", "content": "oi"}], cancel_token=token))
+
+    assert texto == "ab"
+    assert stream.fechado
+    assert token._callbacks == []
+
+
+def test_token_ja_cancelado_nao_chama_o_modelo():
+    token = CancelToken()
+    token.cancel("prazo esgotado")
+    adaptador = adaptador_com(StreamCompleto(["a"]))
+
+    with pytest.raises(GenerationCancelled):
+        list(adaptador.chat_stream([{"role": "user", "content": "oi"}], cancel_token=token))
+
+
+def test_sem_modelo_configurado_para_a_etapa(monkeypatch, capsys):
+    from app.core import litellm_adapter
+    from app.core.model_router import ModelRouter
+
+    monkeypatch.setattr(litellm_adapter, "model_router", ModelRouter(stage_routes={}, default_model=""))
+    chamadas = []
+    adaptador = adaptador_com(StreamCompleto(["a"]))
+    adaptador._litellm.completion = lambda **kwargs: chamadas.append(kwargs)
+
+    async def acompletion(**kwargs):
+        chamadas.append(kwargs)
+
+    adaptador._litellm.acompletion = acompletion
+    mensagens = [{"role": "user", "content": "oi"}]
+
+    respostas = [
+        adaptador.chat(mensagens, stage="specialist"),
+        "".join(adaptador.chat_stream(mensagens, stage="specialist")),
+        asyncio.run(adaptador.achat(mensagens, stage="specialist"))
+    ]
+
+    assert chamadas == []
+    assert all(resposta.startswith("Não foi possível gerar") for resposta in respostas)
+    assert capsys.readouterr().out.count("Nenhum modelo configurado para a etapa specialist") == 3
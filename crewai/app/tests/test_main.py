@@ -0,0 +1,52 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.core.admission import AdmissionController
+from app.core.result_cache import ResultCache
+
+PEDIDO = {"areas": ["Web"], "tecnologias": "Python, FastAPI", "descricao": "Um sistema de tarefas"}
+RESULTADO = {"areas": ["Web"], "resumo": "Sistema de tarefas", "estrutura": "app/", "tecnologias": "FastAPI",
+             "recursos": ["Protótipo"]}
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    # Sem o `with`, os eventos de startup (fila de jobs, pré-aquecimento) não rodam
+    monkeypatch.setattr(main, "result_cache", ResultCache())
+    monkeypatch.setattr(main, "semantic_cache", None)
+    return TestClient(main.app)
+
+
+def eventos(resposta):
+    return [json.loads(linha) for linha in resposta.text.splitlines() if linha]
+
+
+def test_stream_em_cache_consulta_o_cache_uma_vez(cliente):
+    main.result_cache.set(main.chave_do_pedido(main.ProjetoRequest(**PEDIDO)), RESULTADO)
+    resposta = cliente.post("/gerar-projeto/stream", json=PEDIDO)
+
+    assert resposta.status_code == 200
+    assert eventos(resposta) == [
+        {"tipo": "pipeline_iniciado"},
+        {"tipo": "resultado", "resultado": RESULTADO, "cache": True}
+    ]
+    stats = main.result_cache.snapshot()
+    assert (stats["hits_memoria"], stats["misses"]) == (1, 0)
+
+
+def test_stream_com_fila_cheia(cliente, monkeypatch):
+    controle = AdmissionController(max_concurrent=1, max_queue=0, initial_estimate=10)
+    monkeypatch.setattr(controle, "full", lambda: True)
+    monkeypatch.setattr(main, "admission", controle)
+
+    resposta = cliente.post("/gerar-projeto/stream", json=PEDIDO)
+    assert resposta.status_code == 429
+    assert resposta.headers["Retry-After"] == "10"
+
+    main.result_cache.set(main.chave_do_pedido(main.ProjetoRequest(**PEDIDO)), RESULTADO)
+    assert eventos(cliente.post("/gerar-projeto/stream", json=PEDIDO))[-1]["cache"] is True
+    stats = main.result_cache.snapshot()
+    assert (stats["hits_memoria"], stats["misses"]) == (1, 1)
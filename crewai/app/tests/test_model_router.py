@@ -0,0 +1,95 @@
+import os
+
+import httpx
+import litellm
+import pytest
+
+from app.core import model_router as router_module
+from app.core.model_router import (
+    MODEL_COOLDOWN,
+    MODEL_MISSING_COOLDOWN,
+    STAGE_PROJECT_MANAGER,
+    STAGE_SPECIALIST,
+    ModelRouter,
+    _is_missing_model,
+    _parse_area_routes,
+)
+
+
+def roteador(**kwargs):
+    return ModelRouter(
+        stage_routes={STAGE_SPECIALIST: ["ollama/pequeno"], STAGE_PROJECT_MANAGER: ["ollama/grande"]},
+        default_model="ollama/padrao",
+        **kwargs
+    )
+
+
+def test_especialista_usa_modelo_padrao_sem_configuracao():
+    if "MODEL_SPECIALIST" in os.environ:
+        pytest.skip("MODEL_SPECIALIST configurado no ambiente")
+    assert router_module.MODEL_SPECIALIST == router_module.MODEL_DEFAULT
+
+
+def test_rota_por_etapa_termina_no_modelo_padrao():
+    rotas = roteador()
+    assert rotas.route(STAGE_SPECIALIST) == ["ollama/pequeno", "ollama/padrao"]
+    assert rotas.route(STAGE_PROJECT_MANAGER) == ["ollama/grande", "ollama/padrao"]
+    assert rotas.route("outra") == ["ollama/padrao"]
+
+
+def test_rota_por_area_e_prompt_longo():
+    rotas = roteador(area_routes=_parse_area_routes("IoT=ollama/phi3, ollama/padrao; =x;Web"),
+                     long_prompt_chars=100, long_prompt_models=["ollama/contexto-longo"])
+    assert rotas.route(STAGE_SPECIALIST, area="IoT") == ["ollama/phi3", "ollama/padrao"]
+    assert rotas.route(STAGE_SPECIALIST, area="Web") == ["ollama/pequeno", "ollama/padrao"]
+    assert rotas.route(STAGE_SPECIALIST, area="IoT", prompt_chars=500) == ["ollama/contexto-longo",
+                                                                           "ollama/padrao"]
+
+
+def test_modelo_ocupado_vai_para_o_fim():
+    rotas = roteador(max_inflight=1)
+    chamada = rotas.start(STAGE_SPECIALIST, "ollama/pequeno")
+    assert rotas.by_availability(["ollama/pequeno", "ollama/padrao"]) == ["ollama/padrao", "ollama/pequeno"]
+    chamada.complete()
+    chamada.finish()
+    assert rotas.by_availability(["ollama/pequeno", "ollama/padrao"]) == ["ollama/pequeno", "ollama/padrao"]
+
+
+def pausa_apos_erro(erro):
+    rotas = roteador()
+    chamada = rotas.start(STAGE_SPECIALIST, "ollama/pequeno")
+    chamada.fail(erro)
+    chamada.finish()
+    return rotas.snapshot()["em_pausa_s"]["ollama/pequeno"]
+
+
+def test_modelo_ausente_fica_em_pausa_mais_tempo():
+    ausente = litellm.NotFoundError(message="model 'pequeno' not found", model="ollama/pequeno",
+                                    llm_provider="ollama")
+    assert pausa_apos_erro(ausente) == pytest.approx(MODEL_MISSING_COOLDOWN, abs=1)
+    assert pausa_apos_erro(TimeoutError("sem resposta")) == pytest.approx(MODEL_COOLDOWN, abs=1)
+
+
+def test_is_missing_model_usa_o_status_e_nao_a_mensagem():
+    requisicao = httpx.Request("POST", "http://ollama:11434/api/chat")
+    assert _is_missing_model(litellm.NotFoundError(message="x", model="m", llm_provider="ollama"))
+    assert _is_missing_model(httpx.HTTPStatusError("404", request=requisicao,
+                                                   response=httpx.Response(404, request=requisicao)))
+    assert not _is_missing_model(RuntimeError("model not found, try pulling it first (404)"))
+    assert not _is_missing_model(litellm.ServiceUnavailableError(message="404", model="m", llm_provider="ollama"))
+
+
+def test_snapshot_e_metricas_da_rota():
+    rotas = roteador()
+    chamada = rotas.start(STAGE_PROJECT_MANAGER, "ollama/padrao", fallback=True, prompt_tokens=10)
+    chamada.token(5)
+    chamada.complete()
+    chamada.finish()
+    chamada.finish()
+
+    snapshot = rotas.snapshot()
+    metricas = snapshot["rotas"][f"{STAGE_PROJECT_MANAGER}:ollama/padrao"]
+    assert metricas["chamadas"] == 1
+    assert metricas["fallbacks"] == 1
+    assert snapshot["em_uso"] == {}
+    assert snapshot["politica"][STAGE_SPECIALIST] == ["ollama/pequeno", "ollama/padrao"]
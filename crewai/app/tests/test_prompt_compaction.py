@@ -0,0 +1,87 @@
+import pytest
+
+from app.core.agents import prompt_compaction
+from app.core.agents.prompt_compaction import CompactionStats, compact_prompt_inputs, key_points
+from app.service.exa_search import EXA_RESULT_SEPARATOR, EXA_SECTION_TITLE
+
+DESCRICAO = "Um aplicativo de tarefas com login social e notificações por e-mail."
+
+
+@pytest.fixture(autouse=True)
+def contagem_por_caracteres(monkeypatch):
+    # Contagem determinística, sem depender do tokenizer do modelo
+    monkeypatch.setattr(prompt_compaction.llm_adapter, "count_tokens", lambda text, model=None: len(text or "") // 4)
+    monkeypatch.setattr(prompt_compaction, "compaction_stats", CompactionStats())
+
+
+def montar(analise, descricao):
+    return f"Analise o projeto.\n{descricao}\n\nEspecialistas:\n{analise}\n"
+
+
+def analise(secoes=6, itens=30):
+    blocos = []
+    for s in range(secoes):
+        linhas = [f"# Seção {s}", f"Primeira frase da seção {s}. Segunda frase que some no resumo."]
+        linhas += [f"- Item {i} da seção {s} com alguma explicação adicional" for i in range(itens)]
+        blocos.append("\n".join(linhas))
+    return "\n\n".join(blocos)
+
+
+def test_pontos_chave_descartam_repeticoes_e_resumem_paragrafos():
+    texto = ("# Backend\n"
+             f"{DESCRICAO}\n"
+             "O backend usa FastAPI. Ele expõe uma API REST.\n"
+             "- Autenticação com OAuth\n"
+             "- Autenticação com OAuth\n"
+             "```\n" + "\n".join(f"linha {i}" for i in range(40)) + "\n```\n")
+    secoes = dict(key_points(texto, DESCRICAO))
+    itens = secoes["# Backend"]
+    assert DESCRICAO not in itens
+    assert "O backend usa FastAPI." in itens
+    assert itens.count("- Autenticação com OAuth") == 1
+    assert "..." in itens
+    assert len([i for i in itens if i.startswith("linha")]) == prompt_compaction.MAX_CODE_LINES
+
+
+def test_sem_resumo_mantem_paragrafos_inteiros():
+    itens = dict(key_points("# A\nPrimeira frase. Segunda frase.\n", summarize=False))["# A"]
+    assert itens == ["Primeira frase. Segunda frase."]
+
+
+def test_prompt_pequeno_fica_intacto():
+    texto = "# Backend\n- FastAPI\n\n# Frontend\n- React"
+    especialistas, descricao, relatorio = compact_prompt_inputs(texto, DESCRICAO, montar, max_tokens=1000)
+    assert especialistas == texto
+    assert descricao == DESCRICAO
+    assert relatorio["tokens_antes"] == relatorio["tokens_depois"]
+
+
+def test_prompt_grande_cabe_no_limite_e_mantem_todas_as_secoes():
+    especialistas, descricao, relatorio = compact_prompt_inputs(analise(), DESCRICAO, montar, max_tokens=400)
+    assert relatorio["tokens_depois"] <= 400 < relatorio["tokens_antes"]
+    assert descricao == DESCRICAO
+    for s in range(6):
+        assert f"- Item 0 da seção {s}" in especialistas
+    assert "Segunda frase" not in especialistas
+    assert prompt_compaction.compaction_stats.snapshot()["acima_do_limite"] == 0
+
+
+def test_resultados_da_exa_cortados_antes_do_pedido():
+    exa = EXA_RESULT_SEPARATOR.join(f"Resultado {i}: " + "conteúdo da página " * 200 for i in range(3))
+    completa = f"{DESCRICAO}\n\n{EXA_SECTION_TITLE}\n{exa}"
+    _, descricao, relatorio = compact_prompt_inputs(analise(2, 5), completa, montar, max_tokens=600)
+    assert relatorio["tokens_depois"] <= 600
+    assert descricao.startswith(DESCRICAO)
+    assert all(f"Resultado {i}:" in descricao for i in range(3))
+    assert descricao.count("[...]") == 3
+
+
+def test_estatisticas_acumulam_os_pedidos():
+    estatisticas = CompactionStats()
+    estatisticas.record({"tokens_antes": 1000, "tokens_depois": 400, "limite": 500})
+    estatisticas.record({"tokens_antes": 600, "tokens_depois": 600, "limite": 500})
+    snapshot = estatisticas.snapshot()
+    assert snapshot["pedidos"] == 2
+    assert snapshot["tokens_antes_medio"] == 800
+    assert snapshot["tokens_depois_medio"] == 500
+    assert snapshot["acima_do_limite"] == 1
@@ -0,0 +1,65 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.core.litellm_adapter import CustomLiteLLM
+
+
+class OllamaFalso(BaseHTTPRequestHandler):
+    """Responde /api/version com 200 só depois que o servidor é marcado como pronto"""
+
+    def do_GET(self):
+        self.server.consultas += 1
+        self.send_response(200 if self.server.pronto and self.path == "/api/version" else 503)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def ollama(monkeypatch):
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), OllamaFalso)
+    servidor.pronto = False
+    servidor.consultas = 0
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    adaptador = CustomLiteLLM()
+    monkeypatch.setenv("LITELLM_API_BASE", f"http://127.0.0.1:{servidor.server_port}")
+    monkeypatch.setattr(main, "llm_adapter", adaptador)
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_litellm_importado_so_no_primeiro_uso():
+    adaptador = CustomLiteLLM()
+    assert adaptador._litellm is None
+    assert adaptador.litellm.num_retries == 3
+    assert adaptador._litellm is adaptador.litellm
+
+
+def test_ready_so_depois_do_preaquecimento(ollama):
+    cliente = TestClient(main.app)
+    assert cliente.get("/health").status_code == 200
+    assert cliente.get("/ready").status_code == 503
+    assert main.llm_adapter._litellm is None
+
+    ollama.pronto = True
+    main.preaquecer()
+    assert main.llm_adapter._litellm is not None
+
+    resposta = cliente.get("/ready")
+    assert resposta.status_code == 200
+    assert resposta.json()["status"] == "ready"
+
+
+def test_ready_reaproveita_verificacao_recente(ollama):
+    ollama.pronto = True
+    cliente = TestClient(main.app)
+    assert cliente.get("/ready").status_code == 200
+    assert cliente.get("/ready").status_code == 200
+    assert ollama.consultas == 1
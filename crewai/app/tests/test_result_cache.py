@@ -0,0 +1,79 @@
+import time
+
+from app.core.result_cache import DiskCache, ResultCache, cache_key, create_result_cache, is_cacheable
+
+RESULTADO = {"resumo": "Plano", "estrutura": "src/", "tecnologias": "Python", "recursos": []}
+
+
+def test_cache_key_normaliza_caixa_espacos_e_ordem():
+    a = cache_key(["Web", "API"], "Python, FastAPI", "App  de Tarefas", False, "m")
+    b = cache_key([" api", "web "], "fastapi,python", "app de tarefas", False, "m")
+    assert a == b
+    assert a != cache_key(["Web", "API"], "Python, FastAPI", "App de Tarefas", True, "m")
+    assert a != cache_key(["Web", "API"], "Python, FastAPI", "App de Tarefas", False, "outro")
+
+
+def test_is_cacheable_descarta_erros_e_fallbacks():
+    assert is_cacheable(RESULTADO)
+    assert not is_cacheable({**RESULTADO, "error": "falhou"})
+    assert not is_cacheable({**RESULTADO, "resumo": "Não foi possível gerar uma análise"})
+    assert not is_cacheable({**RESULTADO, "estrutura": ""})
+    assert not is_cacheable("texto")
+
+
+def test_lru_em_memoria_remove_o_menos_usado():
+    cache = ResultCache(max_entries=2)
+    cache.set("a", {"id": "a"})
+    cache.set("b", {"id": "b"})
+    assert cache.get("a") == {"id": "a"}
+    cache.set("c", {"id": "c"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"id": "a"}
+    stats = cache.snapshot()
+    assert stats["evictions_memoria"] == 1
+    assert stats["hits_memoria"] == 2
+    assert stats["misses"] == 1
+
+
+def test_entrada_expirada_e_miss():
+    cache = ResultCache(ttl=0.05)
+    cache.set("a", {"id": "a"})
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.snapshot()["expiracoes"] == 1
+
+
+def test_camada_em_disco_sobrevive_ao_reinicio(tmp_path):
+    caminho = str(tmp_path / "cache.sqlite3")
+    ResultCache(disk=DiskCache(caminho, max_entries=10)).set("a", RESULTADO)
+
+    novo = ResultCache(disk=DiskCache(caminho, max_entries=10))
+    assert novo.get("a") == RESULTADO
+    assert novo.get("a") == RESULTADO
+    stats = novo.snapshot()
+    assert stats["hits_disco"] == 1
+    assert stats["hits_memoria"] == 1
+    assert stats["entradas_disco"] == 1
+
+
+def test_disco_remove_as_entradas_mais_antigas(tmp_path):
+    disco = DiskCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    expira = time.time() + 60
+    for chave in ("a", "b", "c"):
+        disco.set(chave, {"id": chave}, expira)
+        time.sleep(0.01)
+    assert disco.size() == 2
+    assert disco.get("a") is None
+
+
+def test_create_result_cache_respeita_as_variaveis(monkeypatch, tmp_path):
+    monkeypatch.setenv("RESULT_CACHE_ENABLED", "false")
+    assert create_result_cache() is None
+
+    monkeypatch.setenv("RESULT_CACHE_ENABLED", "true")
+    monkeypatch.setenv("RESULT_CACHE_MAX_ENTRIES", "3")
+    monkeypatch.setenv("RESULT_CACHE_DISK_PATH", str(tmp_path / "cache.sqlite3"))
+    cache = create_result_cache()
+    assert cache.max_entries == 3
+    assert cache.disk is not None
@@ -0,0 +1,76 @@
+import numpy as np
+
+from app.core.semantic_cache import (
+    SemanticCache,
+    SimHashIndex,
+    build_seed_description,
+    extract_features,
+    request_scope,
+    simhash,
+    tokenize,
+)
+
+PLANO = {"resumo": "Lista de tarefas", "tecnologias": "React, Node", "areas": ["Web"]}
+
+
+def test_tokenize_normaliza_acentos_sinonimos_e_stopwords():
+    assert tokenize("Criar um App de TAREFAS com Node.js e finanças") == ["tarefa", "node", "financas"]
+
+
+def test_simhash_igual_para_o_mesmo_pedido():
+    a = simhash(extract_features(["Web"], "React", "app de tarefas"))
+    b = simhash(extract_features(["Web"], "React", "app de tarefas"))
+    assert a.dtype == np.uint64 and a.shape == (2,)
+    assert np.array_equal(a, b)
+
+
+def test_request_scope_ignora_ordem_caixa_e_sinonimos():
+    assert request_scope(["Web", "API"], "React, Node.js") == request_scope(["api", "web"], " nodejs ,REACT")
+    assert request_scope(["Web"], "React") != request_scope(["Web"], "Vue")
+
+
+def test_parafrase_com_mesmo_escopo_e_hit():
+    cache = SemanticCache(threshold=0.85, seed_threshold=0.5)
+    cache.add(["Web"], "React, Node", "app de lista de tarefas", "m", PLANO)
+
+    encontrado = cache.lookup(["web"], "node, react", "aplicativo de lista de tarefas", "m")
+
+    assert encontrado["modo"] == "hit"
+    assert encontrado["resultado"] is PLANO
+    assert cache.snapshot()["hits"] == 1
+
+
+def test_escopo_diferente_vira_semente_mesmo_com_similaridade_alta():
+    cache = SemanticCache(threshold=0.5, seed_threshold=0.5)
+    cache.add(["Web"], "React, Node", "app de lista de tarefas", "m", PLANO)
+
+    assert cache.lookup(["Web"], "Vue, Node", "app de lista de tarefas", "m")["modo"] == "semente"
+    assert cache.lookup(["Web", "Mobile"], "React, Node", "app de lista de tarefas", "m")["modo"] == "semente"
+
+
+def test_escopo_diferente_sem_semente_e_miss():
+    cache = SemanticCache(threshold=0.5, seed_threshold=None)
+    cache.add(["Web"], "React", "app de lista de tarefas", "m", PLANO)
+    assert cache.lookup(["Web"], "Vue", "app de lista de tarefas", "m") is None
+
+
+def test_outro_modelo_nao_reaproveita():
+    cache = SemanticCache(threshold=0.5, seed_threshold=0.5)
+    cache.add(["Web"], "React", "app de lista de tarefas", "m1", PLANO)
+    assert cache.lookup(["Web"], "React", "app de lista de tarefas", "m2") is None
+    assert cache.snapshot()["misses"] == 1
+
+
+def test_indice_cheio_substitui_a_entrada_mais_antiga():
+    indice = SimHashIndex(max_entries=2)
+    for i in range(3):
+        indice.add(np.array([i, i], dtype=np.uint64), i)
+    assert len(indice) == 2
+    assert indice.search(np.array([0, 0], dtype=np.uint64))[0] != 0
+    assert indice.search(np.array([2, 2], dtype=np.uint64)) == (2, 1.0)
+
+
+def test_build_seed_description_inclui_o_plano():
+    descricao = build_seed_description("app de tarefas", PLANO)
+    assert descricao.startswith("app de tarefas")
+    assert "Lista de tarefas" in descricao and "React, Node" in descricao
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.cancellation import CancelToken, GenerationCancelled
+from app.core.deadline import Deadline
+from app.core.single_flight import ORPHAN_REASON, SingleFlight
+
+
+def test_pedidos_iguais_compartilham_a_execucao():
+    voos = SingleFlight("teste", grace=0)
+    voo, lider = voos.join("chave")
+    mesmo, segundo_lider = voos.join("chave")
+    outro, outro_lider = voos.join("outra")
+
+    assert lider and not segundo_lider and outro_lider
+    assert mesmo is voo and outro is not voo
+    assert voo.waiters == 2
+    assert voos.active("chave")
+    assert voos.snapshot()["coalescidos"] == 1
+
+
+def test_resultado_entregue_a_todos_e_chave_liberada():
+    voos = SingleFlight("teste", grace=0)
+    voo, _ = voos.join("chave")
+    voos.join("chave")
+
+    async def esperar():
+        return await asyncio.gather(voo.wait(), voo.wait())
+
+    voos.finish(voo, {"projeto": "ok"})
+    assert asyncio.run(esperar()) == [{"projeto": "ok"}, {"projeto": "ok"}]
+    assert not voos.active("chave")
+    assert voos.join("chave")[1]
+
+
+def test_erro_propagado_para_quem_espera():
+    voos = SingleFlight("teste", grace=0)
+    voo, _ = voos.join("chave")
+    voos.finish(voo, error=GenerationCancelled("prazo esgotado"))
+    with pytest.raises(GenerationCancelled):
+        asyncio.run(voo.wait())
+
+
+def test_execucao_cancelada_quando_todos_desistem():
+    voos = SingleFlight("teste", grace=0)
+    voo, _ = voos.join("chave")
+    voos.join("chave")
+
+    voos.leave(voo)
+    assert not voo.token.cancelled
+    voos.leave(voo)
+
+    assert voo.token.reason == ORPHAN_REASON
+    assert not voos.active("chave")
+    assert voos.join("chave")[1]
+    assert voos.snapshot()["canceladas"] == 1
+
+
+def test_carencia_permite_retry_se_juntar():
+    voos = SingleFlight("teste", grace=0.1)
+    voo, _ = voos.join("chave")
+    voos.leave(voo)
+    mesmo, lider = voos.join("chave")
+
+    assert mesmo is voo and not lider
+    assert not voo.token.wait(0.3)
+
+
+def test_prazo_estendido_por_quem_chega_depois():
+    voos = SingleFlight("teste")
+    voo, _ = voos.join("chave", Deadline(10))
+    voos.join("chave", Deadline(100))
+    assert voo.deadline.remaining() > 90
+
+
+def test_subscribe_repete_eventos_e_segue_ate_fechar():
+    voos = SingleFlight("teste")
+    voo, _ = voos.join("chave")
+    voo.publish({"n": 1})
+
+    def produzir():
+        voo.publish({"n": 2})
+        voos.finish(voo, "fim")
+
+    threading.Timer(0.05, produzir).start()
+    assert [evento["n"] for evento in voo.subscribe(poll_interval=0.01)] == [1, 2]
+
+
+def test_subscribe_interrompido_pelo_token():
+    voos = SingleFlight("teste")
+    voo, _ = voos.join("chave")
+    token = CancelToken()
+    threading.Timer(0.05, token.cancel).start()
+    with pytest.raises(GenerationCancelled):
+        list(voo.subscribe(token, poll_interval=0.01))
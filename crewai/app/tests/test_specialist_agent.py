@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.agents import specialist_agent
+from app.core.agents.specialist_agent import (
+    aexecute_specialists_parallel,
+    execute_specialists_parallel,
+    iter_specialists_parallel,
+    merge_specialist_results,
+    specialist_area,
+)
+from app.core.cancellation import CancelToken, GenerationCancelled
+
+
+def especialistas(*papeis):
+    return [SimpleNamespace(role=papel) for papel in papeis]
+
+
+def test_specialist_area_pelo_papel():
+    assert specialist_area(SimpleNamespace(role="Especialista IoT")) == "IoT"
+    assert specialist_area(SimpleNamespace(role="Desconhecido")) == "Web"
+
+
+def test_merge_um_resultado_devolvido_como_esta():
+    resultado = {"agent": "Web", "result": "# Análise\nok", "success": True}
+    assert merge_specialist_results([resultado, {"agent": "API", "result": "", "success": False}]) == resultado
+
+
+def test_merge_rebaixa_titulos_e_remove_linhas_repetidas():
+    mesclado = merge_specialist_results([
+        {"agent": "Web", "result": "# Análise Técnica\n- Use Docker\n- React", "success": True},
+        {"agent": "API", "result": "# Análise Técnica\n- use  docker\n- FastAPI", "success": True},
+    ])
+
+    assert mesclado["success"]
+    assert mesclado["agent"] == "Web, API"
+    texto = mesclado["result"]
+    assert texto.startswith("## Perspectiva do Web\n### Análise Técnica")
+    assert "## Perspectiva do API\n### Análise Técnica\n- FastAPI" in texto
+    assert texto.lower().count("docker") == 1
+
+
+def test_merge_sem_sucesso_usa_o_primeiro_texto_disponivel():
+    mesclado = merge_specialist_results([
+        {"agent": "Web", "result": "", "success": False},
+        {"agent": "API", "result": "parcial", "success": False},
+    ])
+    assert mesclado == {"agent": "Web, API", "result": "parcial", "success": False}
+
+
+def test_paralelo_respeita_concorrencia_e_ordem(monkeypatch):
+    ativos, maximo = [0], [0]
+    trava = threading.Lock()
+
+    def executar(especialista, descricao, timeout, retry_timeout):
+        with trava:
+            ativos[0] += 1
+            maximo[0] = max(maximo[0], ativos[0])
+        time.sleep(0.05)
+        with trava:
+            ativos[0] -= 1
+        if especialista.role == "falha":
+            raise RuntimeError("Ollama caiu")
+        return {"agent": especialista.role, "result": descricao, "success": True}
+
+    monkeypatch.setattr(specialist_agent, "execute_specialist_task", executar)
+    resultados = execute_specialists_parallel(especialistas("a", "falha", "c", "d"), "plano", max_concurrency=2)
+
+    assert [r["agent"] for r in resultados] == ["a", "falha", "c", "d"]
+    assert [r["success"] for r in resultados] == [True, False, True, True]
+    assert maximo[0] == 2
+
+
+def test_paralelo_cancelado_interrompe_todos(monkeypatch):
+    token = CancelToken()
+
+    def executar(especialista, descricao, timeout, retry_timeout):
+        token.cancel("cliente desconectado")
+        raise GenerationCancelled(token.reason)
+
+    monkeypatch.setattr(specialist_agent, "execute_specialist_task", executar)
+    with pytest.raises(GenerationCancelled):
+        list(iter_specialists_parallel(especialistas("a", "b", "c"), "plano", max_concurrency=1, cancel_token=token))
+
+
+def test_paralelo_assincrono(monkeypatch):
+    async def executar(especialista, descricao, timeout, retry_timeout):
+        await asyncio.sleep(0.01)
+        if especialista.role == "falha":
+            raise RuntimeError("Ollama caiu")
+        return {"agent": especialista.role, "result": descricao, "success": True}
+
+    monkeypatch.setattr(specialist_agent, "aexecute_specialist_task", executar)
+    resultados = asyncio.run(aexecute_specialists_parallel(especialistas("a", "falha"), "plano", max_concurrency=1))
+
+    assert [r["success"] for r in resultados] == [True, False]
+
+
+def test_paralelo_assincrono_propaga_cancelamento(monkeypatch):
+    async def executar(especialista, descricao, timeout, retry_timeout):
+        if especialista.role == "b":
+            raise GenerationCancelled("prazo esgotado")
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(specialist_agent, "aexecute_specialist_task", executar)
+    with pytest.raises(GenerationCancelled):
+        asyncio.run(aexecute_specialists_parallel(especialistas("a", "b"), "plano"))
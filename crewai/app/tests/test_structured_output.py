@@ -0,0 +1,79 @@
+import json
+
+from app.core.agents.structured_output import (
+    PLAN_FIELDS,
+    ProjectPlan,
+    merge_plan,
+    missing_fields,
+    parse_plan,
+    plan_from_markdown,
+    response_format,
+)
+
+PLANO = {
+    "resumo": "Um sistema de tarefas para equipes pequenas.",
+    "estrutura": "backend/\n  app/main.py\nfrontend/\n  src/App.tsx",
+    "tecnologias": "- FastAPI: API assíncrona\n- React: interface",
+    "recursos": ["Criar o protótipo", "Escrever os testes"]
+}
+
+
+def test_json_valido_com_cercas_de_codigo():
+    plano = parse_plan(f"Aqui está:\n```json\n{json.dumps(PLANO, ensure_ascii=False)}\n```")
+    assert plano.model_dump() == PLANO
+    assert missing_fields(plano) == []
+
+
+def test_listas_e_objetos_viram_texto():
+    plano = parse_plan(json.dumps({**PLANO, "tecnologias": {"FastAPI": "API"}, "estrutura": ["app/", "tests/"],
+                                   "recursos": "- Protótipo\n- Testes"}))
+    assert plano.tecnologias == "- FastAPI: API"
+    assert plano.estrutura == "- app/\n- tests/"
+    assert plano.recursos == ["Protótipo", "Testes"]
+
+
+def test_json_truncado_recupera_campos_completos():
+    truncado = json.dumps(PLANO, ensure_ascii=False)[:-40]
+    plano = parse_plan(truncado)
+    assert plano.resumo == PLANO["resumo"]
+    assert plano.estrutura == PLANO["estrutura"]
+    assert "tecnologias" not in missing_fields(plano)
+
+
+def test_resposta_em_markdown():
+    texto = ("# Resumo do Projeto\nUm sistema de tarefas para equipes.\n"
+             "# Estrutura do Projeto\n- app/main.py\n- tests/\n"
+             "# Tecnologias Recomendadas\n- FastAPI e PostgreSQL\n"
+             "# Próximos Passos\n- Protótipo\n- Testes\n")
+    plano = parse_plan(texto)
+    assert plano == plan_from_markdown(texto)
+    assert plano.resumo == "Um sistema de tarefas para equipes."
+    assert plano.recursos == ["Protótipo", "Testes"]
+    assert missing_fields(plano) == []
+
+
+def test_campos_curtos_ou_vazios_precisam_de_reparo():
+    plano = ProjectPlan(resumo="curto", estrutura=PLANO["estrutura"])
+    assert missing_fields(plano) == ["resumo", "tecnologias", "recursos"]
+
+
+def test_reparo_so_substitui_campos_preenchidos():
+    plano = ProjectPlan(resumo="curto", estrutura=PLANO["estrutura"])
+    reparo = ProjectPlan(resumo=PLANO["resumo"], estrutura="outra", recursos=[])
+    mesclado = merge_plan(plano, reparo, ["resumo", "recursos"])
+    assert mesclado.resumo == PLANO["resumo"]
+    assert mesclado.estrutura == PLANO["estrutura"]
+    assert mesclado.recursos == []
+
+
+def test_schema_restrito_aos_campos_pedidos():
+    schema = response_format(["resumo"])["json_schema"]["schema"]
+    assert list(schema["properties"]) == ["resumo"]
+    assert schema["required"] == ["resumo"]
+    assert response_format()["json_schema"]["schema"]["required"] == PLAN_FIELDS
+
+
+def test_item_com_escape_invalido_mantem_o_texto():
+    plano = parse_plan('{"resumo": "abc def ghi jkl", "recursos": ["Use C:\\q path", "Linha\\nnova", "truncated')
+    assert plano.resumo == "abc def ghi jkl"
+    assert plano.recursos == ["Use C:\\q path", "Linha\nnova"]
@@ -0,0 +1,120 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import SpanKind, StatusCode
+
+from app.core import metrics, tracing
+from app.core.tracing import JsonLinesSpanExporter, TracingMiddleware, create_exporter, create_tracer_provider
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+TRACEPARENT = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+
+
+@pytest.fixture
+def spans(monkeypatch):
+    """Spans gravados em memória pelo tracer usado no middleware e nas etapas"""
+    exporter = InMemorySpanExporter()
+    tracer = create_tracer_provider(exporter).get_tracer("teste")
+    monkeypatch.setattr(tracing, "tracer", tracer)
+    monkeypatch.setattr(metrics, "tracer", tracer)
+    return exporter
+
+
+def pedido(app, path="/jobs/123", headers=()):
+    enviados = []
+    scope = {"type": "http", "method": "GET", "path": path, "headers": list(headers)}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        enviados.append(message)
+
+    asyncio.run(TracingMiddleware(app)(scope, receive, send))
+    return enviados
+
+
+def aplicacao(status, route=None):
+    async def app(scope, receive, send):
+        if route:
+            scope["route"] = SimpleNamespace(path=route)
+        with metrics.track("teste"):
+            pass
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+    return app
+
+
+def test_middleware_continua_o_trace_do_backend(spans):
+    enviados = pedido(aplicacao(200, "/jobs/{job_id}"), headers=[(b"traceparent", TRACEPARENT.encode())])
+    assert [m["type"] for m in enviados] == ["http.response.start", "http.response.body"]
+
+    etapa, servidor = spans.get_finished_spans()
+    assert servidor.name == "GET /jobs/{job_id}"
+    assert servidor.kind == SpanKind.SERVER
+    assert format(servidor.context.trace_id, "032x") == TRACE_ID
+    assert servidor.attributes["http.route"] == "/jobs/{job_id}"
+    assert servidor.attributes["http.response.status_code"] == 200
+    assert servidor.status.status_code == StatusCode.UNSET
+    assert etapa.name == "etapa.teste"
+    assert etapa.parent.span_id == servidor.context.span_id
+
+
+def test_middleware_marca_erro_do_servidor(spans):
+    pedido(aplicacao(503))
+    servidor = spans.get_finished_spans()[-1]
+    assert servidor.name == "GET /jobs/123"
+    assert servidor.status.status_code == StatusCode.ERROR
+
+
+def test_middleware_ignora_outros_tipos_de_scope(spans):
+    chamados = []
+
+    async def app(scope, receive, send):
+        chamados.append(scope["type"])
+
+    asyncio.run(TracingMiddleware(app)({"type": "lifespan"}, None, None))
+    assert chamados == ["lifespan"]
+    assert spans.get_finished_spans() == ()
+
+
+def test_etapa_registra_excecao(spans):
+    with pytest.raises(ValueError):
+        with metrics.track("falha"):
+            raise ValueError("quebrou")
+    span, = spans.get_finished_spans()
+    assert span.status.status_code == StatusCode.ERROR
+    assert span.events[0].name == "exception"
+
+
+def test_gerador_medido_ate_ser_esgotado(spans):
+    @metrics.timed("gerador")
+    def gerar():
+        yield 1
+        assert spans.get_finished_spans() == ()
+        yield 2
+
+    assert list(gerar()) == [1, 2]
+    assert [s.name for s in spans.get_finished_spans()] == ["etapa.gerador"]
+
+
+def test_exportador_em_arquivo(tmp_path):
+    caminho = tmp_path / "traces.jsonl"
+    provider = create_tracer_provider(JsonLinesSpanExporter(str(caminho)))
+    with provider.get_tracer("teste").start_as_current_span("pedido"):
+        pass
+    provider.shutdown()
+    linhas = [json.loads(linha) for linha in caminho.read_text(encoding="utf-8").splitlines()]
+    assert [linha["name"] for linha in linhas] == ["pedido"]
+    assert linhas[0]["resource"]["attributes"]["service.name"] == "crewai"
+
+
+def test_exportadores_pelo_nome():
+    assert create_exporter("none") is None
+    assert isinstance(create_exporter("memoria"), InMemorySpanExporter)
+    assert isinstance(create_exporter("console"), ConsoleSpanExporter)
+    assert isinstance(create_exporter("arquivo"), JsonLinesSpanExporter)
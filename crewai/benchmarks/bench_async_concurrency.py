@@ -0,0 +1,131 @@
+"""
+Benchmark de concorrência do /gerar-projeto: compara o pipeline síncrono
+(uma thread por pedido) com o assíncrono (espera no event loop).
+
+O Ollama é simulado dentro do processo: cada chamada ao LLM leva
+`--latencia` segundos, produzindo tokens em intervalos regulares, como numa
+geração em streaming. Os caches são desativados para que todos os pedidos
+cheguem ao pipeline.
+
+Uso (a partir de crewai/):
+    python -m benchmarks.bench_async_concurrency [--pedidos 100] [--latencia 1.0] [--json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+os.environ["RESULT_CACHE_ENABLED"] = "false"
+os.environ["SEMANTIC_CACHE_ENABLED"] = "false"
+# Todos os pedidos rodam juntos: o benchmark mede o pipeline, não o controle de admissão
+os.environ["ADMISSION_MAX_CONCURRENT"] = "0"
+
+import httpx
+
+TEXTO = (
+    "# Resumo do Projeto\nPlano de teste gerado pelo Ollama simulado para o benchmark.\n\n"
+    "# Estrutura do Projeto\n- src/\n- tests/\n\n# Tecnologias Recomendadas\n- Python\n\n"
+    "# Próximos Passos\n## Configuração e Setup\n- instalar dependências\n"
+)
+TOKENS = TEXTO.split(" ")
+
+
+def _carregar_app():
+    from app import main
+    from app.core.litellm_adapter import llm_adapter
+    return main, llm_adapter
+
+
+def simular_ollama(llm_adapter, latencia):
+    """Substitui as chamadas ao LiteLLM por um Ollama simulado com a latência dada"""
+    intervalo = latencia / len(TOKENS)
+
+    def chat_stream(messages, cancel_token=None, max_tokens=2000, timeout=10000, **rota):
+        for token in TOKENS:
+            time.sleep(intervalo)
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            yield token + " "
+
+    async def achat_stream(messages, max_tokens=2000, timeout=10000, **rota):
+        for token in TOKENS:
+            await asyncio.sleep(intervalo)
+            yield token + " "
+
+    llm_adapter.chat_stream = chat_stream
+    llm_adapter.achat_stream = achat_stream
+
+
+async def rodar(main, modo, pedidos, areas):
+    main.PIPELINE_ASSINCRONO = modo == "async"
+    pico_threads = threading.active_count()
+    parar = asyncio.Event()
+
+    async def amostrar_threads():
+        nonlocal pico_threads
+        while not parar.is_set():
+            pico_threads = max(pico_threads, threading.active_count())
+            await asyncio.sleep(0.05)
+
+    async def pedido(client, i):
+        inicio = time.perf_counter()
+        r = await client.post("/gerar-projeto", json={
+            "areas": areas, "tecnologias": "Python", "descricao": f"projeto de benchmark {i}"
+        })
+        return r.status_code, time.perf_counter() - inicio
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        amostrador = asyncio.create_task(amostrar_threads())
+        inicio = time.perf_counter()
+        respostas = await asyncio.gather(*(pedido(client, i) for i in range(pedidos)))
+        total = time.perf_counter() - inicio
+        parar.set()
+        await amostrador
+
+    latencias = sorted(t for _, t in respostas)
+    return {
+        "modo": modo,
+        "pedidos": pedidos,
+        "ok": sum(1 for status, _ in respostas if status == 200),
+        "tempo_total_s": round(total, 2),
+        "pedidos_por_s": round(pedidos / total, 2),
+        "latencia_p50_s": round(latencias[len(latencias) // 2], 2),
+        "latencia_p95_s": round(latencias[int(len(latencias) * 0.95) - 1], 2),
+        "pico_threads": pico_threads
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pedidos", type=int, default=100)
+    parser.add_argument("--latencia", type=float, default=1.0, help="Segundos por chamada ao LLM simulado")
+    parser.add_argument("--areas", default="Web", help="Áreas separadas por vírgula (uma chamada por especialista)")
+    parser.add_argument("--modos", default="sync,async")
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    args = parser.parse_args()
+
+    app_main, llm_adapter = _carregar_app()
+    logging.disable(logging.INFO)
+    simular_ollama(llm_adapter, args.latencia)
+    areas = [area.strip() for area in args.areas.split(",") if area.strip()]
+
+    resultados = [
+        asyncio.run(rodar(app_main, modo.strip(), args.pedidos, areas))
+        for modo in args.modos.split(",")
+    ]
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+        return
+    print(f"{args.pedidos} pedidos simultâneos, {args.latencia}s por chamada ao LLM, áreas={areas}")
+    for r in resultados:
+        print(f"  {r['modo']:>5}: {r['ok']}/{r['pedidos']} ok em {r['tempo_total_s']}s "
+              f"({r['pedidos_por_s']} pedidos/s) p50={r['latencia_p50_s']}s p95={r['latencia_p95_s']}s "
+              f"pico de threads={r['pico_threads']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Benchmark da busca na EXA no caminho do pedido: compara a versão anterior
+(uma consulta síncrona, com conexão nova, antes do pipeline) com a busca em
+paralelo aos especialistas (várias consultas por área numa sessão keep-alive,
+usando só o que ficar pronto antes do gerente).
+
+A EXA é substituída por um servidor HTTP local que responde em 0.1s
+(cenário "rapida") ou em 3x a latência do LLM ("lenta"); no cenário "fora"
+nada escuta na porta.
+O Ollama é simulado dentro do processo, com `--latencia` segundos por chamada.
+Além da latência de cada pedido, o benchmark conta as conexões TCP abertas
+no servidor falso e quantos resultados da EXA chegaram ao gerente.
+
+Uso (a partir de crewai/):
+    python -m benchmarks.bench_exa [--pedidos 5] [--latencia 1.0] [--cenarios rapida,lenta,fora] [--json]
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ["RESULT_CACHE_ENABLED"] = "false"
+os.environ["SEMANTIC_CACHE_ENABLED"] = "false"
+# Todos os pedidos rodam juntos: o benchmark mede o pipeline, não o controle de admissão
+os.environ["ADMISSION_MAX_CONCURRENT"] = "0"
+os.environ["STRUCTURED_OUTPUT"] = "false"
+# Todas as consultas precisam chegar ao servidor falso
+os.environ["EXA_CACHE_ENABLED"] = "false"
+
+import requests
+
+from benchmarks.bench_async_concurrency import simular_ollama
+
+# Timeout da versão anterior (EXA_TIMEOUT antigo)
+TIMEOUT_ANTERIOR = 15
+
+
+class ServidorExaFalso:
+    """Servidor local no lugar da EXA: responde a POST /search depois de `atraso` segundos"""
+
+    def __init__(self, atraso: float):
+        self.atraso = atraso
+        self.conexoes = set()
+        self.consultas = 0
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                tamanho = int(self.headers.get("Content-Length", 0))
+                consulta = json.loads(self.rfile.read(tamanho) or b"{}")
+                servidor.conexoes.add(self.client_address)
+                servidor.consultas += 1
+                time.sleep(servidor.atraso)
+                corpo = json.dumps({"results": [
+                    {"url": f"https://exemplo.com/{consulta.get('query', '')[:20]}/{i}",
+                     "text": f"Artigo {i} sobre {consulta.get('query', '')[:40]}"}
+                    for i in range(consulta.get("numResults", 3))
+                ]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/search"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def parar(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def porta_fechada() -> str:
+    """URL de uma porta local sem ninguém escutando (EXA fora do ar)"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        porta = s.getsockname()[1]
+    return f"http://127.0.0.1:{porta}/search"
+
+
+def pedido_anterior(main, req, url):
+    """Caminho anterior: busca síncrona com conexão nova e só depois o pipeline"""
+    from app.core.cancellation import CancelToken, use_token
+    from app.core.deadline import Deadline, use_deadline
+    from app.service.exa_search import anexar_resultados
+
+    try:
+        resposta = requests.post(url, json={"query": req.descricao, "numResults": 5}, timeout=TIMEOUT_ANTERIOR)
+        resultados = [r.get("text", "") for r in resposta.json().get("results", [])]
+    except Exception:
+        resultados = []
+    with use_token(CancelToken()), use_deadline(Deadline(600)):
+        return main.run_project_pipeline(req.areas, req.tecnologias, anexar_resultados(req.descricao, resultados))
+
+
+def pedido_paralelo(main, req, url):
+    from app.core.cancellation import CancelToken
+    from app.core.deadline import Deadline
+
+    return main.gerar_resultado(req, CancelToken(), Deadline(600))
+
+
+def rodar(main, cliente, modo, cenario, pedidos, latencia, areas):
+    servidor = None
+    if cenario == "fora":
+        url = porta_fechada()
+    else:
+        servidor = ServidorExaFalso(0.1 if cenario == "rapida" else latencia * 3)
+        url = servidor.url
+    cliente.url = url
+    usadas_antes = cliente.snapshot()["usadas"]
+
+    executar = pedido_anterior if modo == "anterior" else pedido_paralelo
+    latencias = []
+    for i in range(pedidos):
+        req = main.ProjetoRequest(areas=areas, tecnologias="Python", descricao=f"plataforma de cursos {i}", usar_exa=True)
+        inicio = time.perf_counter()
+        executar(main, req, url)
+        latencias.append(time.perf_counter() - inicio)
+
+    if servidor:
+        servidor.parar()
+    return {
+        "modo": modo,
+        "cenario": cenario,
+        "pedidos": pedidos,
+        "latencia_p50_s": round(statistics.median(latencias), 2),
+        "latencia_max_s": round(max(latencias), 2),
+        "consultas_exa": servidor.consultas if servidor else 0,
+        "conexoes_exa": len(servidor.conexoes) if servidor else 0,
+        "consultas_usadas_pelo_gerente": cliente.snapshot()["usadas"] - usadas_antes if modo == "paralelo" else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pedidos", type=int, default=5)
+    parser.add_argument("--latencia", type=float, default=1.0, help="Segundos por chamada ao LLM simulado")
+    parser.add_argument("--areas", default="Web,Mobile", help="Áreas separadas por vírgula")
+    parser.add_argument("--cenarios", default="rapida,lenta,fora",
+                        help="rapida (0.1s), lenta (3x a latência do LLM) e fora (porta fechada)")
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    args = parser.parse_args()
+
+    from app import main as app_main
+    from app.core.litellm_adapter import llm_adapter
+    from app.service.exa_search import cliente_exa
+
+    # Os avisos de falha da EXA são esperados no cenário "fora"
+    logging.disable(logging.WARNING)
+    simular_ollama(llm_adapter, args.latencia)
+    areas = [area.strip() for area in args.areas.split(",") if area.strip()]
+
+    resultados = [
+        rodar(app_main, cliente_exa, modo, cenario.strip(), args.pedidos, args.latencia, areas)
+        for cenario in args.cenarios.split(",")
+        for modo in ("anterior", "paralelo")
+    ]
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+        return
+    print(f"{args.pedidos} pedidos em sequência, {args.latencia}s por chamada ao LLM, áreas={areas}")
+    for r in resultados:
+        usadas = r["consultas_usadas_pelo_gerente"]
+        print(f"  {r['cenario']:>6} {r['modo']:>9}: p50={r['latencia_p50_s']}s max={r['latencia_max_s']}s "
+              f"consultas={r['consultas_exa']} conexões={r['conexoes_exa']}"
+              + (f" usadas pelo gerente={usadas}" if usadas is not None else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark da seleção de trechos da EXA: compara o prompt do gerente com as
+páginas da EXA anexadas inteiras (versão anterior) e com só os trechos
+mais relevantes pelo BM25 dentro de EXA_PASSAGE_MAX_TOKENS.
+
+As páginas são sintéticas: parágrafos sobre o projeto misturados com texto
+irrelevante (menus, cookies, anúncios, outros assuntos), como numa página
+real. O benchmark mostra os tokens do prompt, o tempo da seleção, a fração
+de trechos selecionados que são de fato relevantes e a latência de
+geração: estimada pelo prefill (`--prefill-tps` tokens/s) ou, com
+`--ollama`, medida numa chamada real ao modelo do gerente.
+
+Uso (a partir de crewai/):
+    python -m benchmarks.bench_exa_passages [--paginas 5] [--palavras 2000] [--ollama] [--json]
+"""
+import argparse
+import json
+import logging
+import random
+import statistics
+import time
+
+from app.core.agents.project_manager_agent import build_project_manager_task
+from app.core.crewai_generator import build_full_description
+from app.core.litellm_adapter import llm_adapter
+from app.core.model_router import STAGE_PROJECT_MANAGER
+from app.service.exa_passages import EXA_PASSAGE_MAX_TOKENS, dividir_trechos, selecionar_trechos
+from app.service.exa_search import anexar_resultados
+
+DESCRICAO = "Plataforma de cursos online com autenticação de usuários, pagamentos e área do aluno"
+TECNOLOGIAS = "Python, FastAPI, PostgreSQL, React"
+AREAS = ["Web", "Backend"]
+
+RELEVANTES = [
+    "A autenticação de usuários com FastAPI costuma usar OAuth2 com tokens JWT e senhas com hash bcrypt.",
+    "Para plataformas de cursos online, o PostgreSQL guarda matrículas, progresso do aluno e certificados.",
+    "Pagamentos recorrentes exigem webhooks idempotentes e conciliação das assinaturas dos cursos.",
+    "O frontend em React consome a API do FastAPI e mostra a área do aluno com as aulas e o progresso.",
+    "Migrations com Alembic mantêm o schema do PostgreSQL versionado junto com o código Python.",
+    "Vídeos das aulas devem ficar num storage de objetos com URLs assinadas para os usuários matriculados.",
+]
+IRRELEVANTES = [
+    "Aceite os cookies para continuar navegando e receber ofertas personalizadas dos nossos parceiros.",
+    "Menu principal: início, sobre nós, blog, contato, política de privacidade, termos de uso.",
+    "Receita do dia: bolo de cenoura com cobertura de chocolate pronto em quarenta minutos.",
+    "Os melhores destinos de praia para as férias de verão com a família e os amigos.",
+    "Inscreva-se na newsletter e ganhe dez por cento de desconto na primeira compra da loja.",
+    "Resultado do campeonato: o time da casa venceu por dois a um com gol nos acréscimos.",
+    "Compartilhe este artigo nas redes sociais e deixe seu comentário logo abaixo.",
+]
+
+
+def paginas_sinteticas(paginas: int, palavras: int, fracao_relevante: float, semente: int = 42) -> list[str]:
+    """Páginas com parágrafos de 3 a 6 frases; só uma fração dos parágrafos fala do projeto"""
+    aleatorio = random.Random(semente)
+    resultado = []
+    for _ in range(paginas):
+        paragrafos = []
+        total = 0
+        while total < palavras:
+            fonte = RELEVANTES if aleatorio.random() < fracao_relevante else IRRELEVANTES
+            paragrafo = " ".join(aleatorio.choice(fonte) for _ in range(aleatorio.randint(3, 6)))
+            paragrafos.append(paragrafo)
+            total += len(paragrafo.split())
+        resultado.append("\n\n".join(paragrafos))
+    return resultado
+
+
+def relevancia(trechos: list[str]) -> float:
+    """Fração das frases dos trechos que vêm dos parágrafos sobre o projeto"""
+    relevantes = sum(t.count(frase) for t in trechos for frase in RELEVANTES)
+    irrelevantes = sum(t.count(frase) for t in trechos for frase in IRRELEVANTES)
+    return round(relevantes / (relevantes + irrelevantes), 3) if relevantes + irrelevantes else 0.0
+
+
+def gerar(prompt: str, max_tokens: int) -> float:
+    """Tempo de uma geração real com o modelo do gerente"""
+    inicio = time.perf_counter()
+    llm_adapter.chat([{"role": "user", "content": prompt}], max_tokens=max_tokens, stage=STAGE_PROJECT_MANAGER)
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", type=int, default=5, help="Resultados da EXA (o pipeline pede até 12)")
+    parser.add_argument("--palavras", type=int, default=2000, help="Palavras por página")
+    parser.add_argument("--relevante", type=float, default=0.2, help="Fração dos parágrafos sobre o projeto")
+    parser.add_argument("--repeticoes", type=int, default=10)
+    parser.add_argument("--prefill-tps", type=float, default=100, help="Tokens/s de prefill para a estimativa")
+    parser.add_argument("--ollama", action="store_true", help="Mede a geração real com o modelo do gerente")
+    parser.add_argument("--max-tokens", type=int, default=64, help="Tokens gerados na medição real")
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    textos = paginas_sinteticas(args.paginas, args.palavras, args.relevante)
+    analise = {"result": "# Análise\n- Backend em FastAPI\n- Banco PostgreSQL\n- Frontend em React"}
+    base = build_full_description(AREAS, TECNOLOGIAS, DESCRICAO)
+
+    tempos = []
+    for _ in range(args.repeticoes):
+        inicio = time.perf_counter()
+        trechos = selecionar_trechos(textos, DESCRICAO, TECNOLOGIAS)
+        tempos.append(time.perf_counter() - inicio)
+
+    resultados = []
+    for modo, resultados_exa in (("paginas_inteiras", textos), ("trechos_bm25", trechos)):
+        prompt = build_project_manager_task(analise, anexar_resultados(base, resultados_exa))
+        tokens = llm_adapter.count_tokens(prompt)
+        linha = {
+            "modo": modo,
+            "resultados": len(resultados_exa),
+            "tokens_exa": llm_adapter.count_tokens("\n".join(resultados_exa)),
+            "tokens_prompt": tokens,
+            "relevancia": relevancia(resultados_exa),
+            "prefill_estimado_s": round(tokens / args.prefill_tps, 2)
+        }
+        if modo == "trechos_bm25":
+            linha["selecao_ms"] = round(statistics.median(tempos) * 1000, 2)
+            linha["trechos_candidatos"] = len(dividir_trechos(textos))
+        if args.ollama:
+            linha["geracao_s"] = round(gerar(prompt, args.max_tokens), 2)
+        resultados.append(linha)
+
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+        return
+    print(f"{args.paginas} páginas de {args.palavras} palavras ({args.relevante:.0%} relevante), "
+          f"limite de {EXA_PASSAGE_MAX_TOKENS} tokens para os trechos")
+    for r in resultados:
+        print(f"  {r['modo']:>16}: EXA={r['tokens_exa']} tokens, prompt={r['tokens_prompt']} tokens, "
+              f"relevância={r['relevancia']}, prefill estimado={r['prefill_estimado_s']}s"
+              + (f", seleção={r['selecao_ms']} ms de {r['trechos_candidatos']} trechos" if "selecao_ms" in r else "")
+              + (f", geração={r['geracao_s']}s" if "geracao_s" in r else ""))
+
+
+if __name__ == "__main__":
+    main()
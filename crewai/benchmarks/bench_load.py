@@ -0,0 +1,252 @@
+"""
+Teste de carga do /gerar-projeto no CrewAI e no backend, com o Ollama
+simulado (benchmarks/fake_ollama.py) no lugar do modelo.
+
+Para cada alvo e cada nível de `--concorrencia`, N clientes enviam pedidos em
+sequência durante `--duracao` segundos (carga em loop fechado). Cada pedido
+tem uma descrição diferente, para não ser atendido por cache nem coalescido.
+Por nível são medidos:
+- vazão
+- percentis de latência
+- taxa e tipos de erro
+- tempo de fila no Ollama simulado (espera por uma vaga de geração)
+
+Por padrão o benchmark sobe os três serviços em portas livres:
+- o Ollama simulado
+- o CrewAI, com os caches desligados e LITELLM_API_BASE apontando para o simulado
+- o backend, com um banco SQLite em memória
+
+Com --ollama-url, --crewai-url e --backend-url usa serviços já em execução
+(o Ollama precisa ser o simulado para haver tempo de fila).
+
+Uso (a partir de crewai/):
+    python -m benchmarks.bench_load [--alvos crewai,backend] [--concorrencia 1,2,4,8] [--duracao 20] [--json]
+    python -m benchmarks.bench_load --decode 50 --jitter 0.3 --falhas 0.05 --paralelo 4
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+AREAS = ["Web", "API"]
+# O backend fica ao lado do CrewAI no repositório
+BACKEND_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "backend"))
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _esperar(url: str, processo: subprocess.Popen, log: str, timeout: float = 120):
+    """Espera o serviço responder 200 em url; falha cedo se o processo morrer"""
+    limite = time.time() + timeout
+    while time.time() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"{url} encerrou durante a inicialização (log em {log})")
+        try:
+            if httpx.get(url, timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.3)
+    raise RuntimeError(f"{url} não respondeu em {timeout:.0f}s (log em {log})")
+
+
+@contextlib.contextmanager
+def servicos(args):
+    """Sobe os serviços que não foram passados por URL e os encerra no fim"""
+    processos = []
+    pasta_logs = tempfile.mkdtemp(prefix="bench_load_")
+
+    def subir(nome, comando, cwd, env, url_saude):
+        log = os.path.join(pasta_logs, f"{nome}.log")
+        processo = subprocess.Popen(
+            comando, cwd=cwd, env={**os.environ, **env}, stdout=open(log, "w"), stderr=subprocess.STDOUT
+        )
+        processos.append(processo)
+        _esperar(url_saude, processo, log)
+
+    try:
+        ollama_url = args.ollama_url
+        if ollama_url is None:
+            porta = _porta_livre()
+            ollama_url = f"http://127.0.0.1:{porta}"
+            subir("ollama", [
+                sys.executable, "-m", "benchmarks.fake_ollama", "--porta", str(porta),
+                "--prefill", str(args.prefill), "--decode", str(args.decode), "--jitter", str(args.jitter),
+                "--falhas", str(args.falhas), "--paralelo", str(args.paralelo), "--tokens", str(args.tokens)
+            ], ".", {}, f"{ollama_url}/api/version")
+
+        crewai_url = args.crewai_url
+        if crewai_url is None:
+            porta = _porta_livre()
+            crewai_url = f"http://127.0.0.1:{porta}"
+            subir("crewai", [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(porta)], ".", {
+                "LITELLM_API_BASE": ollama_url,
+                "RESULT_CACHE_ENABLED": "false",
+                "SEMANTIC_CACHE_ENABLED": "false",
+                "EXA_CACHE_ENABLED": "false",
+                # Sem isso o LiteLLM busca a tabela de custos dos modelos na internet ao carregar
+                "LITELLM_LOCAL_MODEL_COST_MAP": "True"
+            }, f"{crewai_url}/health")
+
+        backend_url = args.backend_url
+        if backend_url is None and "backend" in args.alvos:
+            porta = _porta_livre()
+            backend_url = f"http://127.0.0.1:{porta}"
+            subir("backend", [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(porta)], BACKEND_DIR, {
+                "CREWAI_BASE_URL": crewai_url,
+                "OLLAMA_BASE_URL": ollama_url,
+                "DATABASE_URL": "sqlite://",
+                "CREWAI_TIMEOUT": str(args.timeout)
+            }, f"{backend_url}/health")
+
+        yield {"ollama": ollama_url, "crewai": crewai_url, "backend": backend_url}
+    finally:
+        for processo in reversed(processos):
+            processo.terminate()
+        for processo in processos:
+            try:
+                processo.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                processo.kill()
+
+
+def _erro(alvo: str, resposta: httpx.Response):
+    """Tipo de erro do pedido, ou None; o backend responde 200 com status "error" no corpo"""
+    if resposta.status_code != 200:
+        return f"http_{resposta.status_code}"
+    if alvo == "backend" and resposta.json().get("status") != "success":
+        return "crewai_indisponivel"
+    return None
+
+
+async def carga(alvo: str, url: str, concorrencia: int, duracao: float, timeout: float, contador) -> list[dict]:
+    """N clientes em loop fechado até acabar o tempo; devolve um registro por pedido"""
+    fim = time.perf_counter() + duracao
+    registros = []
+
+    async def cliente(http):
+        while time.perf_counter() < fim:
+            n = next(contador)
+            inicio = time.perf_counter()
+            try:
+                resposta = await http.post("/gerar-projeto", json={
+                    "areas": AREAS, "tecnologias": "Python, FastAPI", "ignorar_cache": True,
+                    "descricao": f"Projeto de teste de carga número {n}: uma API de tarefas com autenticação"
+                })
+                erro = _erro(alvo, resposta)
+            except httpx.TimeoutException:
+                erro = "timeout"
+            except httpx.HTTPError as e:
+                erro = type(e).__name__
+            registros.append({"inicio": inicio, "latencia": time.perf_counter() - inicio, "erro": erro})
+
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limites) as http:
+        await asyncio.gather(*(cliente(http) for _ in range(concorrencia)))
+    return registros
+
+
+def _percentil(valores, fracao):
+    ordenados = sorted(valores)
+    return round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * fracao))], 3) if ordenados else None
+
+
+def resumir(alvo: str, concorrencia: int, registros: list[dict], fila: dict) -> dict:
+    if registros:
+        janela = max(r["inicio"] + r["latencia"] for r in registros) - min(r["inicio"] for r in registros)
+    else:
+        janela = 0
+    ok = [r["latencia"] for r in registros if r["erro"] is None]
+    erros = {}
+    for r in registros:
+        if r["erro"] is not None:
+            erros[r["erro"]] = erros.get(r["erro"], 0) + 1
+    return {
+        "alvo": alvo,
+        "concorrencia": concorrencia,
+        "pedidos": len(registros),
+        "ok": len(ok),
+        "taxa_erro": round(1 - len(ok) / len(registros), 4) if registros else None,
+        "erros": erros,
+        "duracao_s": round(janela, 2),
+        "vazao_rps": round(len(ok) / janela, 3) if janela else 0.0,
+        "latencia_p50_s": _percentil(ok, 0.5),
+        "latencia_p90_s": _percentil(ok, 0.9),
+        "latencia_p99_s": _percentil(ok, 0.99),
+        "latencia_max_s": round(max(ok), 3) if ok else None,
+        "ollama": fila
+    }
+
+
+async def rodar(args, urls: dict) -> list[dict]:
+    contador = iter(range(10 ** 9))
+    resultados = []
+    async with httpx.AsyncClient(base_url=urls["ollama"], timeout=10) as ollama:
+        for alvo in args.alvos:
+            # Aquecimento: o primeiro pedido carrega o LiteLLM e abre as conexões
+            async with httpx.AsyncClient(base_url=urls[alvo], timeout=args.timeout) as http:
+                await http.post("/gerar-projeto", json={
+                    "areas": AREAS, "tecnologias": "Python", "descricao": "aquecimento", "ignorar_cache": True
+                })
+            for concorrencia in args.concorrencia:
+                await ollama.post("/stats/reset")
+                registros = await carga(alvo, urls[alvo], concorrencia, args.duracao, args.timeout, contador)
+                fila = (await ollama.get("/stats")).json()
+                resultados.append(resumir(alvo, concorrencia, registros, fila))
+                if not args.json:
+                    imprimir(resultados[-1])
+    return resultados
+
+
+def imprimir(r: dict):
+    ollama = r["ollama"]
+    print(f"{r['alvo']:>7} c={r['concorrencia']:<3} {r['ok']}/{r['pedidos']} ok "
+          f"({r['vazao_rps']} pedidos/s) p50={r['latencia_p50_s']}s p90={r['latencia_p90_s']}s "
+          f"p99={r['latencia_p99_s']}s erros={r['erros'] or '-'} | ollama: {ollama['chamadas']} chamadas, "
+          f"fila p50={ollama['fila_p50_s']}s p99={ollama['fila_p99_s']}s, pico {ollama['pico_em_andamento']}"
+          f"/{ollama['paralelo']}, falhas injetadas {ollama['falhas_injetadas']}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alvos", default="crewai,backend", help="crewai e/ou backend, separados por vírgula")
+    parser.add_argument("--concorrencia", default="1,2,4,8", help="Níveis de clientes simultâneos")
+    parser.add_argument("--duracao", type=float, default=20, help="Segundos de carga por nível")
+    parser.add_argument("--timeout", type=float, default=600, help="Timeout de cada pedido")
+    parser.add_argument("--prefill", type=float, default=800, help="Ollama simulado: tokens de prompt por segundo")
+    parser.add_argument("--decode", type=float, default=25, help="Ollama simulado: tokens gerados por segundo")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Ollama simulado: variação relativa por chamada")
+    parser.add_argument("--falhas", type=float, default=0.0, help="Ollama simulado: fração de chamadas com erro")
+    parser.add_argument("--paralelo", type=int, default=3, help="Ollama simulado: chamadas atendidas ao mesmo tempo")
+    parser.add_argument("--tokens", type=int, default=150, help="Ollama simulado: tamanho de cada resposta")
+    parser.add_argument("--ollama-url", help="Ollama simulado já em execução")
+    parser.add_argument("--crewai-url", help="CrewAI já em execução")
+    parser.add_argument("--backend-url", help="Backend já em execução")
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    args = parser.parse_args()
+    args.alvos = [alvo.strip() for alvo in args.alvos.split(",") if alvo.strip()]
+    args.concorrencia = [int(c) for c in args.concorrencia.split(",")]
+
+    with servicos(args) as urls:
+        resultados = asyncio.run(rodar(args, urls))
+    if args.json:
+        print(json.dumps({"ollama_simulado": {
+            "prefill": args.prefill, "decode": args.decode, "jitter": args.jitter,
+            "falhas": args.falhas, "paralelo": args.paralelo, "tokens": args.tokens
+        }, "resultados": resultados}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Microbenchmark da extração de seções do plano gerado: compara a versão
+anterior (extract_section chamado uma vez por seção, cortando no próximo '#')
+com o SectionIndexer de uma passada, tanto no texto completo quanto em
+streaming (fragmentos do tamanho de tokens). Também mostra quanto de
+"Próximos Passos" cada versão recupera, já que a anterior corta a seção na
+primeira subseção "##".
+
+O texto sintético imita a saída do gerente de projeto, com subseções "##" e
+blocos de código com comentários "#", repetidos até o tamanho pedido.
+
+Uso (a partir de crewai/):
+    python -m benchmarks.bench_section_index [--tamanhos 10,100,1000] [--repeticoes 20] [--json]
+"""
+import argparse
+import json
+import statistics
+import time
+
+from app.core.agents.utils import SectionIndexer, StreamingSectionSplitter
+
+SECOES = ["Resumo do Projeto", "Estrutura do Projeto", "Tecnologias Recomendadas", "Próximos Passos"]
+
+BLOCO = """
+O sistema oferece cadastro de usuários, autenticação e painel administrativo.
+A API expõe recursos REST com paginação e filtros.
+
+```bash
+# instalar dependências
+pip install -r requirements.txt
+```
+"""
+
+
+def texto_sintetico(tamanho_kb):
+    """Plano com as quatro seções, subseções e código, com cerca de tamanho_kb KB"""
+    alvo = tamanho_kb * 1024
+    repeticoes = max(1, alvo // (len(BLOCO) * 7))
+    corpo = BLOCO * repeticoes
+    passos = "".join(
+        f"## {titulo}\n- item de {titulo.lower()}\n- outro item\n{corpo}\n"
+        for titulo in ["Configuração e Setup", "Desenvolvimento", "Dicas e Boas Práticas"]
+    )
+    return (
+        f"# Resumo do Projeto\n{corpo}\n"
+        f"# Estrutura do Projeto\n- src/\n- tests/\n{corpo}\n"
+        f"# Tecnologias Recomendadas\n- Python\n- FastAPI\n{corpo}\n"
+        f"# Próximos Passos\n{passos}"
+    )
+
+
+def extract_section_anterior(text, section_name):
+    """Cópia de extract_section antes do SectionIndexer"""
+    text_lower = text.lower()
+    section_start = text_lower.find(f"# {section_name.lower()}")
+    if section_start == -1:
+        section_start = text_lower.find(section_name.lower())
+        if section_start == -1:
+            return ""
+    content_start = text.find('\n', section_start)
+    if content_start == -1:
+        return ""
+    content_start += 1
+    next_section = text.find('#', content_start)
+    if next_section == -1:
+        return text[content_start:].strip()
+    return text[content_start:next_section].strip()
+
+
+class SplitterAnterior:
+    """Cópia de StreamingSectionSplitter antes do SectionIndexer"""
+
+    def __init__(self):
+        self._pending_line = ""
+        self._current_title = None
+        self._current_lines = []
+
+    def feed(self, chunk):
+        closed = []
+        self._pending_line += chunk
+        while '\n' in self._pending_line:
+            line, self._pending_line = self._pending_line.split('\n', 1)
+            section = self._process_line(line)
+            if section:
+                closed.append(section)
+        return closed
+
+    def flush(self):
+        closed = []
+        if self._pending_line:
+            section = self._process_line(self._pending_line)
+            self._pending_line = ""
+            if section:
+                closed.append(section)
+        if self._current_title is not None:
+            closed.append(self._close_current())
+        return closed
+
+    def _process_line(self, line):
+        stripped = line.strip()
+        if stripped.startswith('# '):
+            section = self._close_current() if self._current_title is not None else None
+            self._current_title = stripped[2:].strip()
+            self._current_lines = []
+            return section
+        if self._current_title is not None:
+            self._current_lines.append(line)
+        return None
+
+    def _close_current(self):
+        section = {"titulo": self._current_title, "conteudo": '\n'.join(self._current_lines).strip()}
+        self._current_title = None
+        self._current_lines = []
+        return section
+
+
+def localizar_anterior(texto):
+    return {nome: extract_section_anterior(texto, nome) for nome in SECOES}
+
+
+def localizar_indice(texto):
+    indice = SectionIndexer.build(texto)
+    return {nome: indice.section_text(nome) for nome in SECOES}
+
+
+def stream_anterior(fragmentos):
+    """Seções emitidas durante o stream e, no fim, as quatro extrações sobre o texto completo"""
+    splitter = SplitterAnterior()
+    eventos = [s for f in fragmentos for s in splitter.feed(f)] + splitter.flush()
+    return eventos, localizar_anterior("".join(fragmentos))
+
+
+def stream_indice(fragmentos):
+    """Seções emitidas durante o stream; no fim, o índice já pronto só é consultado"""
+    splitter = StreamingSectionSplitter()
+    eventos = [s for f in fragmentos for s in splitter.feed(f)] + splitter.flush()
+    return eventos, {nome: splitter.index.section_text(nome) for nome in SECOES}
+
+
+def medir(funcao, argumento, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(argumento)
+        tempos.append(time.perf_counter() - inicio)
+    return round(statistics.median(tempos) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", default="10,100,1000", help="Tamanhos do texto em KB, separados por vírgula")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--fragmento", type=int, default=4, help="Caracteres por fragmento no modo streaming")
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    args = parser.parse_args()
+
+    resultados = []
+    for tamanho in [int(t) for t in args.tamanhos.split(",") if t.strip()]:
+        texto = texto_sintetico(tamanho)
+        fragmentos = [texto[i:i + args.fragmento] for i in range(0, len(texto), args.fragmento)]
+        passos_anterior = localizar_anterior(texto)["Próximos Passos"]
+        passos_indice = localizar_indice(texto)["Próximos Passos"]
+        resultados.append({
+            "tamanho_kb": round(len(texto) / 1024, 1),
+            "completo_anterior_ms": medir(localizar_anterior, texto, args.repeticoes),
+            "completo_indice_ms": medir(localizar_indice, texto, args.repeticoes),
+            "stream_anterior_ms": medir(stream_anterior, fragmentos, max(1, args.repeticoes // 4)),
+            "stream_indice_ms": medir(stream_indice, fragmentos, max(1, args.repeticoes // 4)),
+            "proximos_passos_anterior_chars": len(passos_anterior),
+            "proximos_passos_indice_chars": len(passos_indice)
+        })
+
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+        return
+    print(f"Mediana de {args.repeticoes} execuções (streaming em fragmentos de {args.fragmento} caracteres)")
+    for r in resultados:
+        print(f"  {r['tamanho_kb']:>8} KB  completo: {r['completo_anterior_ms']:>9} ms -> {r['completo_indice_ms']:>9} ms"
+              f"  stream: {r['stream_anterior_ms']:>9} ms -> {r['stream_indice_ms']:>9} ms"
+              f"  'Próximos Passos': {r['proximos_passos_anterior_chars']} -> {r['proximos_passos_indice_chars']} chars")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark do cache semântico: recall em paráfrases, taxa de falsos
+positivos e latência de busca no índice SimHash.
+
+Uso (a partir de crewai/):
+    python -m benchmarks.bench_semantic_cache [--entradas 100000] [--json]
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from app.core.semantic_cache import SemanticCache, SimHashIndex, extract_features, simhash
+
+IDEIAS = [
+    ("app de tarefas com lembretes", ["todo list com lembretes", "aplicativo de afazeres com lembretes", "lista de tarefas com lembretes"]),
+    ("loja virtual de roupas com carrinho de compras", ["e-commerce de roupas com carrinho", "shop online de roupas com carrinho de compras", "loja online de roupas com carrinho"]),
+    ("blog pessoal com comentários e tags", ["blog com tags e comentários", "plataforma de blog pessoal com comentários e tags", "meu blog com comentários e tags"]),
+    ("chat em tempo real com salas privadas", ["aplicativo de mensagens em tempo real com salas privadas", "chat realtime com salas privadas", "sistema de chat com salas privadas em tempo real"]),
+    ("controle de finanças pessoais com gráficos", ["app de finanças pessoais com gráficos", "gestão financeira pessoal com gráficos", "controle financeiro pessoal com gráficos"]),
+    ("jogo de plataforma 2d com fases", ["game de plataforma 2d com fases", "jogo 2d de plataforma com várias fases", "jogo plataforma 2D com fases"]),
+    ("sistema de agendamento para clínicas", ["agendamento de consultas para clínicas", "app de agendamento para clínica", "agenda online para clínicas"]),
+    ("dashboard de métricas de vendas", ["painel de métricas de vendas", "dashboard de vendas com métricas", "dashboard com métricas de vendas"]),
+    ("rede social para fotógrafos", ["rede social de fotografia para fotógrafos", "comunidade online para fotógrafos", "rede social para fotógrafos amadores"]),
+    ("classificador de imagens de plantas", ["classificação de imagens de plantas", "modelo para classificar imagens de plantas", "classificador de fotos de plantas"]),
+]
+TECNOLOGIAS = ["React, Node.js", "Python, FastAPI", "Flutter, Firebase", "Vue, Django", "Unity, C#", "Next.js, PostgreSQL"]
+AREAS = [["Web"], ["Mobile"], ["API"], ["Web", "API"], ["Inteligência Artificial"], ["Jogos"]]
+
+
+def _ruido(texto, rng):
+    """Variações triviais: caixa, espaços e palavras de preenchimento"""
+    palavras = texto.split()
+    if rng.random() < 0.5:
+        palavras.insert(0, rng.choice(["quero", "criar um", "preciso de um", "um"]))
+    texto = "  ".join(palavras) if rng.random() < 0.3 else " ".join(palavras)
+    return texto.upper() if rng.random() < 0.2 else texto
+
+
+def medir_recall(limiares, rng):
+    cache = SemanticCache(threshold=1.0, seed_threshold=None)
+    consultas, negativos = [], []
+    for i, (base, parafrases) in enumerate(IDEIAS):
+        tech, areas = TECNOLOGIAS[i % len(TECNOLOGIAS)], AREAS[i % len(AREAS)]
+        cache.add(areas, tech, base, "m", {"id": i})
+        consultas += [(areas, tech, _ruido(p, rng), i) for p in parafrases]
+        # Mesma ideia com outra stack não deve ser considerada duplicata
+        outra = TECNOLOGIAS[(i + 3) % len(TECNOLOGIAS)]
+        negativos += [(areas, outra, p) for p in parafrases]
+
+    resultados = {}
+    for limiar in limiares:
+        acertos = sum(
+            1 for areas, tech, texto, esperado in consultas
+            if (r := cache.index.search(simhash(extract_features(areas, tech, texto))))
+            and r[1] >= limiar and r[0]["resultado"]["id"] == esperado
+        )
+        falsos = sum(
+            1 for areas, tech, texto in negativos
+            if (r := cache.index.search(simhash(extract_features(areas, tech, texto)))) and r[1] >= limiar
+        )
+        resultados[str(limiar)] = {
+            "recall": round(acertos / len(consultas), 3),
+            "falsos_positivos": round(falsos / len(negativos), 3)
+        }
+    return resultados
+
+
+def medir_latencia(entradas, repeticoes, rng):
+    index = SimHashIndex(max_entries=entradas)
+    gerador = np.random.default_rng(rng.randint(0, 2**32))
+    sketches = gerador.integers(0, 2**63, size=(entradas, 2), dtype=np.uint64, endpoint=False)
+    inicio = time.perf_counter()
+    index.add_many(sketches, [None] * entradas)
+    carga = time.perf_counter() - inicio
+
+    consulta = simhash(extract_features(["Web"], "React", "app de tarefas"))
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        index.search(consulta)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    return {
+        "entradas": entradas,
+        "bytes_indice": index._sketches.nbytes,
+        "carga_s": round(carga, 3),
+        "busca_p50_ms": round(tempos[len(tempos) // 2], 3),
+        "busca_p99_ms": round(tempos[int(len(tempos) * 0.99) - 1], 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entradas", type=int, default=100_000)
+    parser.add_argument("--repeticoes", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    relatorio = {
+        "recall": medir_recall([0.75, 0.8, 0.85, 0.9], rng),
+        "latencia": medir_latencia(args.entradas, args.repeticoes, rng)
+    }
+    if args.json:
+        print(json.dumps(relatorio, indent=2))
+        return
+    print("Recall por limiar (paráfrases da mesma ideia / mesma ideia com outra stack):")
+    for limiar, valores in relatorio["recall"].items():
+        print(f"  {limiar}: recall={valores['recall']:.3f} falsos_positivos={valores['falsos_positivos']:.3f}")
+    lat = relatorio["latencia"]
+    print(f"Busca em {lat['entradas']} entradas ({lat['bytes_indice'] / 1024:.0f} KiB): "
+          f"p50={lat['busca_p50_ms']} ms p99={lat['busca_p99_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
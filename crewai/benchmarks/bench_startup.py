@@ -0,0 +1,135 @@
+"""
+Benchmark de cold start do serviço: tempo de import de app.main, os pacotes
+mais caros no import e o tempo até o servidor responder /health (e,
+opcionalmente, /ready).
+
+Cada medição roda num processo novo, como num container recém-criado pelo
+autoscaling.
+
+Uso (a partir de crewai/):
+    python -m benchmarks.bench_startup [--repeticoes 3] [--espera-ready 0] [--json]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+
+def medir_import(top):
+    """Tempo de `import app.main` num processo novo e os pacotes mais caros (-X importtime)"""
+    inicio = time.perf_counter()
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True, text=True, env=os.environ.copy()
+    )
+    total = time.perf_counter() - inicio
+    if processo.returncode != 0:
+        raise RuntimeError(f"Falha ao importar app.main:\n{processo.stderr[-2000:]}")
+
+    # Maior tempo cumulativo por pacote raiz: o import mais externo de cada
+    # pacote inclui todos os seus submódulos
+    pacotes = {}
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith("import time:") or "cumulative" in linha:
+            continue
+        _, cumulativo, nome = linha[len("import time:"):].split("|")
+        raiz = nome.strip().split(".")[0]
+        if raiz != "app":
+            pacotes[raiz] = max(pacotes.get(raiz, 0.0), int(cumulativo) / 1e6)
+    mais_caros = sorted(pacotes.items(), key=lambda item: item[1], reverse=True)
+    return total, mais_caros[:top]
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _esperar(url, limite):
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < limite:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return time.perf_counter() - inicio
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    return None
+
+
+def medir_boot(espera_ready, limite):
+    """Tempo até /health (e /ready) responderem 200 num servidor uvicorn novo"""
+    porta = _porta_livre()
+    inicio = time.perf_counter()
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(porta), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=os.environ.copy()
+    )
+    try:
+        health = _esperar(f"http://127.0.0.1:{porta}/health", limite)
+        ready = None
+        if espera_ready and health is not None:
+            restante = _esperar(f"http://127.0.0.1:{porta}/ready", espera_ready)
+            ready = time.perf_counter() - inicio if restante is not None else None
+        return health, ready
+    finally:
+        servidor.terminate()
+        try:
+            servidor.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            servidor.kill()
+
+
+def _resumo(valores):
+    validos = [v for v in valores if v is not None]
+    if not validos:
+        return None
+    return {"min_s": round(min(validos), 3), "mediana_s": round(statistics.median(validos), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="Quantos imports mais caros listar")
+    parser.add_argument("--espera-ready", type=float, default=0,
+                        help="Segundos para esperar /ready (0 = não mede; exige Ollama)")
+    parser.add_argument("--limite", type=float, default=120, help="Tempo máximo até /health responder")
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    args = parser.parse_args()
+
+    imports, boots_health, boots_ready = [], [], []
+    pacotes = []
+    for _ in range(args.repeticoes):
+        total, pacotes = medir_import(args.top)
+        imports.append(total)
+        health, ready = medir_boot(args.espera_ready, args.limite)
+        boots_health.append(health)
+        boots_ready.append(ready)
+
+    relatorio = {
+        "import_app_main": _resumo(imports),
+        "ate_health": _resumo(boots_health),
+        "ate_ready": _resumo(boots_ready) if args.espera_ready else None,
+        "imports_mais_caros": [{"pacote": nome, "cumulativo_s": round(t, 3)} for nome, t in pacotes]
+    }
+    if args.json:
+        print(json.dumps(relatorio, indent=2))
+        return
+    print(f"import app.main (processo novo): {relatorio['import_app_main']}")
+    print(f"até /health responder:           {relatorio['ate_health']}")
+    if args.espera_ready:
+        print(f"até /ready responder:            {relatorio['ate_ready']}")
+    print("Pacotes mais caros no import (cumulativo):")
+    for item in relatorio["imports_mais_caros"]:
+        print(f"  {item['cumulativo_s']:>7.3f}s  {item['pacote']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Microbenchmark do pós-processamento de texto feito em todo pedido, com
+comparação contra uma linha de base gravada para pegar regressões:
+- extract_section nas quatro seções do plano
+- SectionIndexer (uma passada) com as quatro consultas
+- extract_resources
+- process_pipeline_result, incluindo os f-strings de log com [:100]
+- StreamingSectionSplitter alimentado em fragmentos do tamanho de tokens
+- montagem dos prompts (build_full_description e build_project_manager_task)
+
+Casos medidos:
+- planos sintéticos de 1 KB a 1 MB
+- casos patológicos: muitos '#' fora de títulos, milhares de títulos, texto
+  sem nenhum título, quebras de linha CRLF e uma única linha de 1 MB
+- saídas reais gravadas com PM_OUTPUT_RECORD_DIR, lidas de --gravadas
+
+Os tempos são normalizados por uma carga de referência medida na mesma
+execução, para que a linha de base gravada numa máquina sirva em outra. Uma
+operação regride quando fica mais que --limiar mais lenta que a linha de base
+e a diferença passa de --minimo-ms; nesse caso o processo termina com código 1.
+
+Uso (a partir de crewai/):
+    python -m benchmarks.bench_text_processing [--limiar 0.25] [--json]
+    python -m benchmarks.bench_text_processing --salvar-baseline
+    python -m benchmarks.bench_text_processing --gravadas /tmp/saidas --casos gravada
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+
+from app.core.agents.project_manager_agent import build_project_manager_task
+from app.core.agents.utils import SectionIndexer, StreamingSectionSplitter, extract_resources, extract_section
+from app.core.crewai_generator import build_full_description, process_pipeline_result
+from benchmarks.bench_section_index import SECOES, texto_sintetico
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(PASTA, "baselines", "text_processing.json")
+GRAVADAS = os.path.join(PASTA, "saidas_gravadas")
+AREAS = ["Web", "API"]
+TECNOLOGIAS = "Python, FastAPI, PostgreSQL"
+TAMANHOS_KB = [1, 10, 100, 1000]
+
+
+def _ate(texto, tamanho_kb):
+    """Repete o texto até cerca de tamanho_kb KB"""
+    return texto * max(1, tamanho_kb * 1024 // len(texto))
+
+
+def casos_patologicos() -> dict:
+    base = texto_sintetico(100)
+    return {
+        # '#' fora de títulos: comentários, C#, âncoras e hashtags no meio das seções
+        "muitos_hashes": "# Resumo do Projeto\n" + _ate(
+            "Suporte a C# e F#, issue #42, cor #fff e #hashtag.\n# comentário\n#### ###\n#\n", 50
+        ) + "# Próximos Passos\n" + _ate("## Passo\n- item # com hash\n", 50),
+        "muitos_titulos": _ate("# Seção\n## Subseção\n- item\n", 100) + base,
+        "sem_titulos": _ate("Texto corrido sem nenhum título de seção, só parágrafos.\n- item solto\n", 100),
+        "crlf": base.replace("\n", "\r\n"),
+        "linha_unica": base.replace("\n", " ") * 10
+    }
+
+
+def carregar_gravadas(pasta: str) -> dict:
+    """Saídas reais gravadas pelo gerador (PM_OUTPUT_RECORD_DIR); pasta ausente não é erro"""
+    if not os.path.isdir(pasta):
+        return {}
+    casos = {}
+    for nome in sorted(os.listdir(pasta)):
+        caminho = os.path.join(pasta, nome)
+        if os.path.isfile(caminho) and nome.endswith((".md", ".txt")):
+            with open(caminho, encoding="utf-8") as arquivo:
+                casos[f"gravada:{os.path.splitext(nome)[0]}"] = arquivo.read()
+    return casos
+
+
+def _extract_section(texto):
+    return [extract_section(texto, secao) for secao in SECOES]
+
+
+def _indice(texto):
+    indice = SectionIndexer.build(texto)
+    return [indice.section_text(secao) for secao in SECOES]
+
+
+def _streaming(fragmentos):
+    splitter = StreamingSectionSplitter()
+    for fragmento in fragmentos:
+        splitter.feed(fragmento)
+    return splitter.flush()
+
+
+def _pipeline(texto):
+    return process_pipeline_result(texto, TECNOLOGIAS, AREAS)
+
+
+def _prompts(texto):
+    # Pior caso: a descrição do usuário e a análise dos especialistas do tamanho da saída
+    return build_project_manager_task({"result": texto}, build_full_description(AREAS, TECNOLOGIAS, texto))
+
+
+OPERACOES = {
+    "extract_section": _extract_section,
+    "indice": _indice,
+    "recursos": extract_resources,
+    "pipeline": _pipeline,
+    "streaming": _streaming,
+    "prompts": _prompts
+}
+
+
+def referencia():
+    """Carga fixa em Python puro (split, strip, lower, join) usada para normalizar entre máquinas"""
+    linhas = ("  Linha de Referência com # e texto  \n" * 20000).split("\n")
+    return "\n".join(linha.strip().lower() for linha in linhas if linha)
+
+
+def medir(funcao, argumento, tempo_minimo: float) -> float:
+    """Mediana em ms; repete até somar tempo_minimo segundos (mínimo de 5 execuções)"""
+    inicio = time.perf_counter()
+    funcao(argumento)
+    primeira = time.perf_counter() - inicio
+    repeticoes = max(5, min(1000, int(tempo_minimo / max(primeira, 1e-7))))
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(argumento)
+        tempos.append(time.perf_counter() - inicio)
+    return round(statistics.median(tempos) * 1000, 4)
+
+
+def medir_casos(casos: dict, fragmento: int, tempo_minimo: float) -> dict:
+    medicoes = {}
+    for nome, texto in casos.items():
+        fragmentos = [texto[i:i + fragmento] for i in range(0, len(texto), fragmento)]
+        for operacao, funcao in OPERACOES.items():
+            argumento = fragmentos if operacao == "streaming" else texto
+            medicoes[f"{nome}/{operacao}"] = medir(funcao, argumento, tempo_minimo)
+    return medicoes
+
+
+def comparar(atual: dict, baseline: dict, limiar: float, minimo_ms: float) -> list[dict]:
+    """Compara os tempos normalizados pela referência de cada execução"""
+    escala = atual["referencia_ms"] / baseline["referencia_ms"]
+    comparacoes = []
+    for chave, ms in atual["medicoes"].items():
+        anterior = baseline["medicoes"].get(chave)
+        if anterior is None:
+            comparacoes.append({"medicao": chave, "ms": ms, "baseline_ms": None, "variacao": None,
+                                "regressao": False})
+            continue
+        esperado = anterior * escala
+        variacao = ms / esperado - 1 if esperado else 0.0
+        comparacoes.append({
+            "medicao": chave,
+            "ms": ms,
+            "baseline_ms": round(esperado, 4),
+            "variacao": round(variacao, 3),
+            "regressao": variacao > limiar and ms - esperado > minimo_ms
+        })
+    return comparacoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--casos", default="", help="Prefixos dos casos a medir, separados por vírgula (padrão: todos)")
+    parser.add_argument("--gravadas", default=GRAVADAS, help="Pasta com saídas reais gravadas (.md ou .txt)")
+    parser.add_argument("--baseline", default=BASELINE, help="Arquivo da linha de base")
+    parser.add_argument("--salvar-baseline", action="store_true", help="Grava as medições como nova linha de base")
+    parser.add_argument("--limiar", type=float, default=0.25, help="Piora relativa tolerada antes de falhar")
+    parser.add_argument("--minimo-ms", type=float, default=0.05,
+                        help="Diferença absoluta mínima para contar como regressão (ignora ruído em tempos pequenos)")
+    parser.add_argument("--fragmento", type=int, default=4, help="Caracteres por fragmento no modo streaming")
+    parser.add_argument("--tempo-minimo", type=float, default=0.2, help="Segundos medidos por operação e caso")
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    args = parser.parse_args()
+    if args.salvar_baseline and args.casos:
+        parser.error("--salvar-baseline grava todos os casos; não use junto com --casos")
+
+    # Os logs não são emitidos, mas os f-strings de process_pipeline_result continuam sendo montados
+    logging.disable(logging.INFO)
+
+    casos = {f"sintetico_{kb}kb": texto_sintetico(kb) for kb in TAMANHOS_KB}
+    casos.update(casos_patologicos())
+    casos.update(carregar_gravadas(args.gravadas))
+    prefixos = [p.strip() for p in args.casos.split(",") if p.strip()]
+    if prefixos:
+        casos = {nome: texto for nome, texto in casos.items() if nome.startswith(tuple(prefixos))}
+
+    atual = {
+        "python": platform.python_version(),
+        "referencia_ms": medir(lambda _: referencia(), None, args.tempo_minimo),
+        "tamanhos_kb": {nome: round(len(texto) / 1024, 1) for nome, texto in casos.items()},
+        "medicoes": medir_casos(casos, args.fragmento, args.tempo_minimo)
+    }
+
+    if args.salvar_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as arquivo:
+            json.dump(atual, arquivo, indent=2, ensure_ascii=False)
+            arquivo.write("\n")
+
+    comparacoes = []
+    if not args.salvar_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as arquivo:
+            comparacoes = comparar(atual, json.load(arquivo), args.limiar, args.minimo_ms)
+    regressoes = [c for c in comparacoes if c["regressao"]]
+
+    if args.json:
+        print(json.dumps({**atual, "comparacoes": comparacoes, "regressoes": len(regressoes)}, indent=2,
+                         ensure_ascii=False))
+    else:
+        print(f"Referência: {atual['referencia_ms']} ms (Python {atual['python']})")
+        por_chave = {c["medicao"]: c for c in comparacoes}
+        for chave, ms in atual["medicoes"].items():
+            linha = f"  {chave:<40} {ms:>11} ms"
+            c = por_chave.get(chave)
+            if c and c["baseline_ms"] is not None:
+                linha += f"  baseline {c['baseline_ms']:>11} ms  {c['variacao']:+.0%}"
+                if c["regressao"]:
+                    linha += "  REGRESSÃO"
+            print(linha)
+        if args.salvar_baseline:
+            print(f"Linha de base gravada em {args.baseline}")
+        elif not comparacoes:
+            print(f"Sem linha de base em {args.baseline}; use --salvar-baseline para criar")
+        else:
+            print(f"{len(regressoes)} regressões acima de {args.limiar:.0%} (e {args.minimo_ms} ms)")
+
+    if regressoes:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Ollama simulado para testes de carga: responde à API do Ollama (/api/generate,
+/api/chat, /api/version, /api/tags, /api/show) e à API compatível com a OpenAI
+(/v1/chat/completions) sem modelo nenhum, só imitando o tempo de uma geração.
+
+Cada chamada espera uma vaga (como OLLAMA_NUM_PARALLEL), processa o prompt a
+`--prefill` tokens/s e gera a resposta a `--decode` tokens/s, com `--jitter`
+de variação e `--falhas` de chance de erro 500. Pedidos com `format` (schema
+JSON) recebem um JSON válido para o schema. GET /stats devolve o tempo de
+fila, o paralelismo e as falhas injetadas; POST /stats/reset zera os números.
+
+Uso (a partir de crewai/):
+    python -m benchmarks.fake_ollama [--porta 11434] [--prefill 800] [--decode 25] [--jitter 0.2] [--falhas 0.0]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CABECALHO = (
+    "# Resumo do Projeto\nPlano de teste gerado pelo Ollama simulado para o teste de carga.\n\n"
+    "# Estrutura do Projeto\n- src/\n- tests/\n\n# Tecnologias Recomendadas\n- Python\n\n"
+    "# Próximos Passos\n## Configuração e Setup\n"
+)
+
+
+def _percentil(valores, fracao):
+    ordenados = sorted(valores)
+    return round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * fracao))], 4) if ordenados else None
+
+
+def exemplo_do_schema(schema: dict, nome: str = "campo"):
+    """Valor mínimo válido para um schema JSON (objetos, listas, strings, números e booleanos)"""
+    tipo = schema.get("type")
+    if "enum" in schema:
+        return schema["enum"][0]
+    if tipo == "object" or "properties" in schema:
+        return {chave: exemplo_do_schema(sub, chave) for chave, sub in schema.get("properties", {}).items()}
+    if tipo == "array":
+        return [exemplo_do_schema(schema.get("items", {}), nome) for _ in range(max(2, schema.get("minItems", 0)))]
+    if tipo in ("integer", "number"):
+        return 1
+    if tipo == "boolean":
+        return True
+    return f"{nome.replace('_', ' ')} gerado pelo Ollama simulado para o teste de carga"
+
+
+def texto_da_resposta(formato, tokens: int) -> list[str]:
+    """Tokens da resposta: JSON completo quando há formato, senão `tokens` palavras de markdown"""
+    if isinstance(formato, dict):
+        return json.dumps(exemplo_do_schema(formato), ensure_ascii=False).split(" ")
+    if formato == "json":
+        return ['{"resultado":', '"ok"}']
+    palavras = CABECALHO.split(" ")
+    i = 0
+    while len(palavras) < tokens:
+        i += 1
+        palavras += ["\n-", "tarefa", str(i)]
+    return palavras[:max(1, tokens)]
+
+
+class FakeOllama:
+    """Estado do servidor simulado: configuração, vagas de geração e estatísticas"""
+
+    def __init__(self, prefill: float = 800, decode: float = 25, jitter: float = 0.2, falhas: float = 0.0,
+                 paralelo: int = 3, tokens: int = 150):
+        self.prefill = prefill
+        self.decode = decode
+        self.jitter = jitter
+        self.falhas = falhas
+        self.paralelo = paralelo
+        self.tokens = tokens
+        self.vagas = asyncio.Semaphore(paralelo)
+        self.reset()
+
+    def reset(self):
+        self.chamadas = 0
+        self.falhas_injetadas = 0
+        self.canceladas = 0
+        self.em_andamento = 0
+        self.pico_em_andamento = 0
+        self.filas = []
+        self.duracoes = []
+
+    def _fator(self) -> float:
+        return max(0.0, random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    async def gerar(self, prompt: str, formato, limite: int):
+        """
+        Gerador de tokens de uma chamada: espera a vaga, o prefill e cada token
+        do decode. Sobe RuntimeError quando a falha é sorteada
+        """
+        self.chamadas += 1
+        chegada = time.perf_counter()
+        async with self.vagas:
+            inicio = time.perf_counter()
+            self.filas.append(inicio - chegada)
+            self.em_andamento += 1
+            self.pico_em_andamento = max(self.pico_em_andamento, self.em_andamento)
+            concluida = False
+            try:
+                if random.random() < self.falhas:
+                    self.falhas_injetadas += 1
+                    raise RuntimeError("falha injetada pelo Ollama simulado")
+                fator = self._fator()
+                await asyncio.sleep(max(1, len(prompt) // 4) / self.prefill * fator)
+                tokens = texto_da_resposta(formato, min(limite, self.tokens) if limite > 0 else self.tokens)
+                for i, token in enumerate(tokens):
+                    await asyncio.sleep(fator / self.decode)
+                    yield token if i == len(tokens) - 1 else token + " "
+                concluida = True
+            finally:
+                self.em_andamento -= 1
+                if concluida:
+                    self.duracoes.append(time.perf_counter() - chegada)
+                else:
+                    self.canceladas += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "chamadas": self.chamadas,
+            "falhas_injetadas": self.falhas_injetadas,
+            "interrompidas": self.canceladas - self.falhas_injetadas,
+            "pico_em_andamento": self.pico_em_andamento,
+            "paralelo": self.paralelo,
+            "fila_p50_s": _percentil(self.filas, 0.5),
+            "fila_p99_s": _percentil(self.filas, 0.99),
+            "fila_max_s": round(max(self.filas), 4) if self.filas else None,
+            "duracao_p50_s": _percentil(self.duracoes, 0.5),
+            "duracao_p99_s": _percentil(self.duracoes, 0.99)
+        }
+
+
+def _prompt_de(corpo: dict) -> str:
+    if "prompt" in corpo:
+        return corpo["prompt"] or ""
+    return "\n".join(str(m.get("content") or "") for m in corpo.get("messages", []))
+
+
+def criar_app(ollama: FakeOllama) -> FastAPI:
+    app = FastAPI(title="Ollama simulado")
+
+    async def responder(corpo: dict, linha, final, media_type="application/x-ndjson"):
+        """Resposta do Ollama: NDJSON token a token com stream, ou um JSON só no fim"""
+        prompt = _prompt_de(corpo)
+        limite = int((corpo.get("options") or {}).get("num_predict") or corpo.get("max_tokens") or 0)
+        tokens = ollama.gerar(prompt, corpo.get("format") or _formato_openai(corpo), limite)
+        try:
+            primeiro = await anext(tokens)
+        except StopAsyncIteration:
+            primeiro = ""
+        except RuntimeError as e:
+            return JSONResponse(status_code=500, content={"error": str(e)})
+        contagem = {"prompt_eval_count": max(1, len(prompt) // 4)}
+
+        if corpo.get("stream", True) is False:
+            texto = [primeiro] + [token async for token in tokens]
+            return JSONResponse(final("".join(texto), {**contagem, "eval_count": len(texto)}))
+
+        async def corpo_em_stream():
+            enviados = 1
+            yield linha(primeiro)
+            async for token in tokens:
+                enviados += 1
+                yield linha(token)
+            yield linha(None, {**contagem, "eval_count": enviados})
+
+        return StreamingResponse(corpo_em_stream(), media_type=media_type)
+
+    def _agora():
+        return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        corpo = await request.json()
+        modelo = corpo.get("model", "fake")
+
+        def linha(token, contagem=None):
+            if token is None:
+                return json.dumps({"model": modelo, "created_at": _agora(), "response": "", "done": True,
+                                   "done_reason": "stop", **contagem}) + "\n"
+            return json.dumps({"model": modelo, "created_at": _agora(), "response": token, "done": False}) + "\n"
+
+        return await responder(corpo, linha, lambda texto, contagem: {
+            "model": modelo, "created_at": _agora(), "response": texto, "done": True, "done_reason": "stop",
+            **contagem
+        })
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        corpo = await request.json()
+        modelo = corpo.get("model", "fake")
+
+        def mensagem(texto):
+            return {"role": "assistant", "content": texto}
+
+        def linha(token, contagem=None):
+            if token is None:
+                return json.dumps({"model": modelo, "created_at": _agora(), "message": mensagem(""), "done": True,
+                                   "done_reason": "stop", **contagem}) + "\n"
+            return json.dumps({"model": modelo, "created_at": _agora(), "message": mensagem(token),
+                               "done": False}) + "\n"
+
+        return await responder(corpo, linha, lambda texto, contagem: {
+            "model": modelo, "created_at": _agora(), "message": mensagem(texto), "done": True,
+            "done_reason": "stop", **contagem
+        })
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        corpo = await request.json()
+        corpo.setdefault("stream", False)
+        modelo = corpo.get("model", "fake")
+        id_resposta = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+        def linha(token, contagem=None):
+            if token is None:
+                return "data: " + json.dumps({
+                    "id": id_resposta, "object": "chat.completion.chunk", "model": modelo,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+                }) + "\n\ndata: [DONE]\n\n"
+            return "data: " + json.dumps({
+                "id": id_resposta, "object": "chat.completion.chunk", "model": modelo,
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+            }) + "\n\n"
+
+        return await responder(corpo, linha, lambda texto, contagem: {
+            "id": id_resposta, "object": "chat.completion", "model": modelo,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": texto}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": contagem["prompt_eval_count"], "completion_tokens": contagem["eval_count"],
+                      "total_tokens": contagem["prompt_eval_count"] + contagem["eval_count"]}
+        }, media_type="text/event-stream")
+
+    @app.get("/api/version")
+    def version():
+        return {"version": "0.0.0-simulado"}
+
+    @app.get("/api/tags")
+    def tags():
+        return {"models": []}
+
+    @app.post("/api/show")
+    def show():
+        return {"details": {}, "model_info": {}, "template": "{{ .Prompt }}"}
+
+    @app.get("/stats")
+    def stats():
+        return ollama.snapshot()
+
+    @app.post("/stats/reset")
+    def reset():
+        ollama.reset()
+        return ollama.snapshot()
+
+    return app
+
+
+def _formato_openai(corpo: dict):
+    """Schema pedido no response_format da API da OpenAI, no formato do campo format do Ollama"""
+    formato = corpo.get("response_format") or {}
+    if formato.get("type") == "json_schema":
+        return formato.get("json_schema", {}).get("schema")
+    return "json" if formato.get("type") == "json_object" else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=11434)
+    parser.add_argument("--prefill", type=float, default=800, help="Tokens de prompt processados por segundo")
+    parser.add_argument("--decode", type=float, default=25, help="Tokens gerados por segundo em cada chamada")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Variação relativa do tempo de cada chamada")
+    parser.add_argument("--falhas", type=float, default=0.0, help="Fração das chamadas que respondem com erro 500")
+    parser.add_argument("--paralelo", type=int, default=3, help="Chamadas atendidas ao mesmo tempo (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--tokens", type=int, default=150, help="Tamanho das respostas sem num_predict")
+    args = parser.parse_args()
+
+    import uvicorn
+    ollama = FakeOllama(args.prefill, args.decode, args.jitter, args.falhas, args.paralelo, args.tokens)
+    uvicorn.run(criar_app(ollama), host=args.host, port=args.porta, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()